@@ -5,10 +5,7 @@ Es zeigt das Szenario-Auswahlverfahren und die Instruktionen an, bevor automatis
 auf die einzelnen Seiten (Anamnese, Untersuchung, Diagnostik usw.) verzweigt wird.
 """
 
-import os
-
 import streamlit as st
-from openai import OpenAI
 
 # Externe Helfermodule, die für die Fallvorbereitung und das Startlayout benötigt werden.
 from module.sidebar import show_sidebar
@@ -16,20 +13,22 @@ from module.startinfo import zeige_instruktionen_vor_start
 from module.offline import display_offline_banner
 from module.fallverwaltung import (
     fallauswahl_prompt,
-    lade_fallbeispiele,
+    lade_fallindex,
     prepare_fall_session_state,
 )
 from module.fall_config import clear_fixed_scenario, get_fall_fix_state
 from module.feedback_mode import determine_feedback_mode
 from module.footer import copyright_footer
+from module.openai_client import get_openai_client
 
 # ---------------------------------------------------------------------------
 # Initialisierung
 # ---------------------------------------------------------------------------
 
-# Einmaliger Aufbau des OpenAI-Clients. Die nachfolgenden Seiten greifen über den
-# Session-State darauf zu, weshalb wir die Instanz hier zentral ablegen.
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Der OpenAI-Client wird prozessweit geteilt (Verbindungspool, Keep-Alive). Die
+# nachfolgenden Seiten greifen über den Session-State darauf zu, weshalb wir die
+# gemeinsame Instanz hier zusätzlich ablegen.
+client = get_openai_client()
 st.session_state["openai_client"] = client
 
 
@@ -67,9 +66,11 @@ def fuehre_fall_vorbereitung_durch() -> None:
     # Die Falldaten werden erst geladen, sobald die Instruktionen angezeigt
     # werden. Dadurch bleibt der erste Eindruck aufgeräumt und es entsteht kein
     # fühlbarer Verzug zwischen Hinweistext und Ladeindikator.
+    # Für die Auswahl genügt der schlanke Fallindex (ID + Szenario); die
+    # Textspalten lädt ``fallauswahl_prompt`` nur für den gezogenen Fall nach.
     szenario_df = st.session_state.get("fallliste_df")
     if szenario_df is None:
-        szenario_df = lade_fallbeispiele()
+        szenario_df = lade_fallindex()
         st.session_state["fallliste_df"] = szenario_df
 
     if szenario_df.empty:
@@ -1,5 +1,4 @@
-from module.token_counter import init_token_counters, add_usage
-from module.gpt_timing import messe_gpt_aktion
+from module.llm_gateway import chat_completion
 from module.patient_language import get_patient_forms
 from module.offline import get_offline_befund, is_offline
 
@@ -24,20 +23,13 @@ Falls **Laborwerte** angefordert wurden, gib sie bitte **nur in folgender Tabell
 📌 Nutze niemals Einheiten wie mg/dL, ng/mL, µg/L oder % – ersetze diese durch SI-konforme Angaben.  
 
 Gib die Befunde **strukturiert, sachlich und ohne Interpretation** wieder. Nenne **nicht das Diagnose-Szenario**. Ergänze keine nicht angeforderten Untersuchungen."""
-    init_token_counters()
     # Für strukturierte Diagnostik-Befunde ist ein präzises, aber kosteneffizientes
-    # Modell ausreichend und liefert konsistente Tabellenformate.
-    response = messe_gpt_aktion(
-        lambda: client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.4,
-        ),
+    # Modell ausreichend und liefert konsistente Tabellenformate (Profil
+    # "diagnostik_befund", bei Zeitüberschreitung Ausweichmodell).
+    response = chat_completion(
+        "diagnostik_befund",
+        [{"role": "user", "content": prompt}],
+        client=client,
         kontext="Diagnostik-Befund",
     )
-    add_usage(
-        prompt_tokens=response.usage.prompt_tokens,
-        completion_tokens=response.usage.completion_tokens,
-        total_tokens=response.usage.total_tokens
-    )
     return response.choices[0].message.content.strip()
@@ -3,18 +3,24 @@
 from __future__ import annotations
 
 import json
-from typing import Any
+from typing import Any, Callable, Dict, List, Optional
 
 import streamlit as st
 
-from module.token_counter import init_token_counters, add_usage
 from module.patient_language import get_patient_forms
 from module.offline import get_offline_feedback, is_offline
 from module.feedback_mode import (
     FEEDBACK_MODE_AMBOSS_CHATGPT,
     determine_feedback_mode,
 )
-from module.gpt_timing import messe_gpt_aktion
+from module.llm_gateway import chat_completion
+from module.feedback_vorab import plane_vorab_feedback, uebernimm_vorab_feedback
+from module.fall_config import (
+    FEEDBACK_ENGINE_EINZELPROMPT,
+    FEEDBACK_ENGINE_PIPELINE,
+    get_feedback_engine,
+)
+from module.feedback_pipeline import FeedbackContext, combine_sections, run_feedback_pipeline
 
 # Mindestlänge in Zeichen, damit eine AMBOSS-Zusammenfassung als belastbar gilt.
 _MIN_AMBOSS_SUMMARY_CHARS = 200
@@ -22,6 +28,41 @@ _MIN_AMBOSS_SUMMARY_CHARS = 200
 # Maximale Länge eines Debug-Auszugs aus dem Roh-Payload, damit der Prompt klein bleibt.
 _MAX_AMBOSS_RAW_SNIPPET = 2000
 
+# Statische Bewertungsrubrik des Abschlussfeedbacks. Sie enthält bewusst keine
+# fall- oder sitzungsbezogenen Werte, damit sie als identischer Präfix vom
+# Prompt-Cache des Anbieters profitiert. Fallbezogene Angaben (Szenariodiagnose,
+# Differentialdiagnosen usw.) folgen in der Nutzernachricht.
+# Straffungshinweis: Kompakte Teilantworten pro Abschnitt halten die
+# Ausgabe kürzer und reduzieren typischerweise Tokenverbrauch sowie Wartezeit.
+_FEEDBACK_RUBRIK = """
+Ein Medizinstudierender hat eine vollständige virtuelle Fallbesprechung mit einer simulierten Person durchgeführt. Du bist ein erfahrener medizinischer Prüfer.
+
+Beurteile ausschließlich die Eingaben und Entscheidungen des Studierenden – NICHT die Antworten der simulierten Person oder automatisch generierte Inhalte.
+
+Die Falldaten (Szenariodiagnose, Gesprächsverlauf, Befunde, Nutzereingaben) folgen in der nächsten Nachricht.
+
+Strukturiere dein Feedback focussiert, konstruktiv und differenziert – wie ein persönlicher Kommentar bei einer mündlichen Prüfung, schreibe in der zweiten Person.
+
+Nenne Szenario und Diagnosekorrektheit in einem einzigen kurzen Einleitungssatz.
+
+Ausgabeformat (kompakte Antworten, je Punkt max. 75 Wörter, nenne nur die wichtigsten Punkte (Stärken und Schwächen), die für den Lernfortschritt relevant sind.):
+1. Wurden im Gespräch alle relevanten anamnestischen Informationen erhoben?
+2. War die gewählte Diagnostik nachvollziehbar, vollständig und passend zur Szenariodiagnose? Erkläre bei Diskrepanz kurz den Einfluss des Versorgungssettings (ambulant vs. Einweisung).
+3. War die gewählte Diagnostik nachvollziehbar, vollständig und passend zu den erhobenen Differentialdiagnosen?
+4. Beurteile die diagnostische Strategie hinsichtlich Reihenfolge und Inhalt der Diagnostik-Kontakte: Gab es unnötige Doppeluntersuchungen und war die Reihenfolge sinnvoll?
+5. Ist die finale Diagnose nachvollziehbar, insbesondere im Hinblick auf Differentialdiagnosen?
+6. Ist das Therapiekonzept leitliniengerecht, plausibel und auf die Diagnose abgestimmt? Ist das Versorgungssetting angemessen?
+# Bewerte bei stationärem/Notaufnahme-Setting die Zahl von Diagnostik-Terminen nicht negativ; im ambulanten Setting die Zahl der diagnostischen Kontakte explizit im Sinne von Termin- und Zeitfaktoren.
+
+
+**Berücksichtige und kommentiere kompakt, 2-3 Sätze**:
+- ökologische Aspekte (z. B. überflüssige Diagnostik, zuviele Anforderungen, CO₂-Bilanz, Strahlenbelastung bei CT oder Röntgen, Ressourcenverbrauch).
+- ökonomische Sinnhaftigkeit (Kosten-Nutzen-Verhältnis)
+- Falls zutreffend: erkläre auch, warum zuwenig Diagnostik unwirtschaftlich und nicht nachhaltig sein kann, bzw. wie zuviel Diangostik auch für Patienten schädlich sein kann.
+
+Weitere Hinweise (Setting-Kongruenz, AMBOSS-Fachinformationen) können am Ende der Falldaten stehen und sind dann zu berücksichtigen.
+"""
+
 
 def _build_amboss_context() -> str:
     """Gibt den AMBOSS-Kontext für den Feedback-Prompt zurück."""
@@ -66,8 +107,46 @@ def _build_amboss_context() -> str:
     )
 
 
-def feedback_erzeugen(
-    client,
+def aktive_feedback_engine() -> str:
+    """Im Adminbereich gewählte Feedback-Engine; bei Lesefehlern der Einzelprompt."""
+
+    try:
+        return get_feedback_engine()
+    except Exception:
+        # Debug-Hinweis: ``st.write(get_feedback_engine())`` zeigt den Fehler direkt.
+        return FEEDBACK_ENGINE_EINZELPROMPT
+
+
+def sammle_feedback_eingaben() -> Dict[str, Any]:
+    """Liest die Prompt-Eingaben des Abschlussfeedbacks aus dem Session-State.
+
+    Entspricht der Zusammenstellung auf den Feedback-Seiten. Fehlen die
+    Therapiesettings (Widget-State bereits entfernt), greifen wie dort die
+    persistierten Kopien.
+    """
+
+    eingaben: Dict[str, Any] = {
+        "final_diagnose": st.session_state.get("final_diagnose", ""),
+        "therapie_vorschlag": st.session_state.get("therapie_vorschlag", ""),
+        "user_ddx2": st.session_state.get("user_ddx2", ""),
+        "diagnostik_eingaben": st.session_state.get("diagnostik_eingaben_kumuliert", ""),
+        "gpt_befunde": st.session_state.get("gpt_befunde_kumuliert", ""),
+        "koerper_befund": st.session_state.get("koerper_befund", ""),
+        "user_verlauf": "\n".join(
+            msg["content"] for msg in st.session_state.get("messages", []) if msg["role"] == "user"
+        ),
+        "anzahl_termine": st.session_state.get("diagnostik_runden_gesamt", 1),
+        "diagnose_szenario": st.session_state.get("diagnose_szenario", ""),
+    }
+    for key in ("therapie_setting_verdacht", "therapie_setting_final"):
+        if key in st.session_state:
+            eingaben[key] = st.session_state.get(key, "")
+        else:
+            eingaben[key] = st.session_state.get(f"{key}_persisted", "")
+    return eingaben
+
+
+def baue_feedback_nachrichten(
     final_diagnose,
     therapie_vorschlag,
     user_ddx2,
@@ -79,51 +158,19 @@ def feedback_erzeugen(
     diagnose_szenario,
     therapie_setting_verdacht="",
     therapie_setting_final="",
-    amboss_payload=None,
-    patient_alter=None,
-    status_updater=None,
-):
-    """Generiert das Abschlussfeedback anhand eines einzigen konsistenten Prompts."""
-    # Hinweis: Die Parameter ``amboss_payload``, ``patient_alter`` und
-    # ``status_updater`` werden aktuell nicht im Prompt verwendet, bleiben aber
-    # als Schnittstelle für Admin-Ansichten erhalten. Für Debugging kann ein
-    # späteres Logging hier ergänzt werden.
+    feedback_mode=None,
+) -> List[Dict[str, str]]:
+    """Setzt Rubrik und Falldaten zu den Nachrichten des Feedback-Aufrufs zusammen.
 
-    # Der Modus entscheidet, ob zusätzlich AMBOSS-Ergebnisse in die Bewertung
-    # einbezogen werden dürfen. Bei Bedarf kann hier zur Fehlersuche der Modus
-    # geloggt werden.
-    feedback_mode = determine_feedback_mode()
+    Liest Modus, Patientenformen, Setting-Kongruenz und AMBOSS-Kontext aus dem
+    Session-State und muss deshalb im Hauptthread laufen.
+    """
 
-    # Die Settings werden bewusst unverändert weitergegeben, damit leere oder
-    # fehlende Angaben im Prompt sichtbar bleiben.
-    # Debug-Hinweis: Bei Unklarheiten kann hier temporär
-    # `st.write(therapie_setting_verdacht, therapie_setting_final)` aktiviert
-    # werden, um die rohen Session-State-Werte zu prüfen.
-    # Debug-Hinweis (beschriftet): Für die Nachverfolgung im App-Verlauf kann
-    # zusätzlich dieser Block aktiviert werden, um Quelle und Übergabe klar zu
-    # trennen:
-    # TODO: Debug-Ausgaben später entfernen.
-    # st.write("Debug Feedbackmodul > Param verdacht:", therapie_setting_verdacht)
-    # st.write("Debug Feedbackmodul > Param final:", therapie_setting_final)
-    # st.write("Debug Feedbackmodul > Session verdacht:", st.session_state.get("therapie_setting_verdacht"))
-    # st.write("Debug Feedbackmodul > Session final:", st.session_state.get("therapie_setting_final"))
-    # Im Offline-Modus wird eine vorbereitete Rückfallantwort genutzt. Weitere
-    # Fallbacks sind bewusst nicht vorhanden, um das Verhalten transparent zu
-    # halten.
-    if is_offline():
-        return get_offline_feedback(
-            diagnose_szenario,
-            therapie_setting_verdacht=therapie_setting_verdacht,
-            therapie_setting_final=therapie_setting_final,
-        )
+    if feedback_mode is None:
+        feedback_mode = determine_feedback_mode()
 
     patient_forms = get_patient_forms()
 
-    # Tokenzähler initialisieren, damit sowohl der Prompt als auch die Antwort
-    # konsistent dokumentiert werden. Für Debugging lässt sich hier ein
-    # zusätzlicher Logeintrag ergänzen.
-    init_token_counters()
-
     # Optionaler AMBOSS-Kontext wird nur im entsprechenden Modus geladen.
     amboss_context = ""
     # Ergebnis der optionalen Kongruenzprüfung zwischen Setting und Diagnostik.
@@ -137,19 +184,18 @@ def feedback_erzeugen(
         # `_build_amboss_context`.
         amboss_context = _build_amboss_context()
 
-    # Der Prompt wird komplett in einem String aufgebaut, sodass das Modell das
-    # Feedback in einem Schritt erzeugt. Dadurch vermeiden wir divergierende
-    # Teilantworten und gewährleisten eine konsistente Tonalität.
-    # Straffungshinweis: Kompakte Teilantworten pro Abschnitt halten die
-    # Ausgabe kürzer und reduzieren typischerweise Tokenverbrauch sowie Wartezeit.
-    # Debug-Tipp: Bei Bedarf kann temporär `st.write(prompt)` aktiviert werden,
+    # Der Prompt besteht aus zwei Teilen: Die unveränderliche Bewertungsrubrik
+    # (``_FEEDBACK_RUBRIK``) steht als System-Nachricht vorne und ist für alle
+    # Sitzungen byte-identisch, die fallbezogenen Eingaben folgen danach. So
+    # kann der Anbieter den gemeinsamen Präfix zwischenspeichern (Prompt
+    # Caching), was Kosten und Wartezeit senkt. Das Modell erzeugt das Feedback
+    # weiterhin in einem Schritt mit konsistenter Tonalität.
+    # Debug-Tipp: Bei Bedarf kann temporär `st.write(falldaten)` aktiviert werden,
     # um die final zusammengesetzte Promptversion im UI direkt zu prüfen.
-    prompt = f"""
-Ein Medizinstudierender hat eine vollständige virtuelle Fallbesprechung mit {patient_forms.phrase("dat", article="indefinite")} durchgeführt. Du bist ein erfahrener medizinischer Prüfer.
-
-Beurteile ausschließlich die Eingaben und Entscheidungen des Studierenden – NICHT die Antworten {patient_forms.phrase("gen")} oder automatisch generierte Inhalte.
+    falldaten = f"""
+Die Fallbesprechung fand mit {patient_forms.phrase("dat", article="indefinite")} statt. Bewerte nicht die Antworten {patient_forms.phrase("gen")}.
 
-Die zugrunde liegende Erkrankung im Szenario lautet: **{diagnose_szenario}**.
+Die zugrunde liegende Erkrankung im Szenario (Szenariodiagnose) lautet: **{diagnose_szenario}**.
 
 Hier ist der Gesprächsverlauf mit den Fragen und Aussagen des Nutzers:
 {user_verlauf}
@@ -175,29 +221,10 @@ Therapiekonzept (Nutzereingabe):
 {therapie_vorschlag}
 
 Die Fallbearbeitung umfasste {anzahl_termine} Diagnostik-Kontakte.
-
-Strukturiere dein Feedback focussiert, konstruktiv und differenziert – wie ein persönlicher Kommentar bei einer mündlichen Prüfung, schreibe in der zweiten Person.
-
-Nenne Szenario und Diagnosekorrektheit in einem einzigen kurzen Einleitungssatz.
-
-Ausgabeformat (kompakte Antworten, je Punkt max. 75 Wörter, nenne nur die wichtigsten Punkte (Stärken und Schwächen), die für den Lernfortschritt relevant sind.):
-1. Wurden im Gespräch alle relevanten anamnestischen Informationen erhoben?
-2. War die gewählte Diagnostik nachvollziehbar, vollständig und passend zur Szenariodiagnose **{diagnose_szenario}**? Erkläre bei Diskrepanz kurz den Einfluss des Versorgungssettings (ambulant vs. Einweisung).
-3. War die gewählte Diagnostik nachvollziehbar, vollständig und passend zu den Differentialdiagnosen **{user_ddx2}**?
-4. Beurteile die diagnostische Strategie hinsichtlich Reihenfolge und Inhalt der Diagnostik-Kontakte: Gab es unnötige Doppeluntersuchungen und war die Reihenfolge sinnvoll?
-5. Ist die finale Diagnose nachvollziehbar, insbesondere im Hinblick auf Differentialdiagnosen?
-6. Ist das Therapiekonzept leitliniengerecht, plausibel und auf die Diagnose abgestimmt? Ist das Versorgungssetting angemessen? 
-# Bewerte bei stationärem/Notaufnahme-Setting die Zahl von Diagnostik-Terminen nicht negativ; im ambulanten Setting die Zahl der diagnostischen Kontakte explizit im Sinne von Termin- und Zeitfaktoren.
-
-
-**Berücksichtige und kommentiere kompakt, 2-3 Sätze**:
-- ökologische Aspekte (z. B. überflüssige Diagnostik, zuviele Anforderungen, CO₂-Bilanz, Strahlenbelastung bei CT oder Röntgen, Ressourcenverbrauch).
-- ökonomische Sinnhaftigkeit (Kosten-Nutzen-Verhältnis)
-- Falls zutreffend: erkläre auch, warum zuwenig Diagnostik unwirtschaftlich und nicht nachhaltig sein kann, bzw. wie zuviel Diangostik auch für Patienten schädlich sein kann. 
 """
 
     if diagnostik_setting_kongruent is False:
-        prompt += f"""
+        falldaten += f"""
 
 Zusatzhinweis zur Setting-Kongruenz aus der Diagnostikseite:
 - Es wurde eine Diskrepanz zwischen Versorgungssetting und vorgeschlagener Diagnostik erkannt.
@@ -207,33 +234,199 @@ Bitte berücksichtige diese Diskrepanz ausdrücklich in deiner abschließenden E
 """
 
     if amboss_context:
-        prompt += f"""
+        falldaten += f"""
 
 Zusätzliche Fachinformationen (AMBOSS):
 {amboss_context}
 """
 
+    # Die Rubrik nennt die Werte für Punkt 2 und 3 nicht mehr selbst, damit sie
+    # statisch bleibt. Sie stehen deshalb am Ende noch einmal ausdrücklich.
+    falldaten += f"""
+
+Bezugswerte für Punkt 2/3: Szenariodiagnose **{diagnose_szenario}**; erhobene Differentialdiagnosen **{user_ddx2}**.
+"""
+
+    return [
+        {"role": "system", "content": _FEEDBACK_RUBRIK},
+        {"role": "user", "content": falldaten},
+    ]
+
+
+def feedback_erzeugen(
+    client,
+    final_diagnose,
+    therapie_vorschlag,
+    user_ddx2,
+    diagnostik_eingaben,
+    gpt_befunde,
+    koerper_befund,
+    user_verlauf,
+    anzahl_termine,
+    diagnose_szenario,
+    therapie_setting_verdacht="",
+    therapie_setting_final="",
+    amboss_payload=None,
+    patient_alter=None,
+    status_updater=None,
+    on_text: Callable[[str], None] | None = None,
+    engine: Optional[str] = None,
+):
+    """Generiert das Abschlussfeedback anhand eines einzigen konsistenten Prompts.
+
+    Mit ``on_text`` wird gestreamt: Der Aufruf läuft im Hintergrund (bzw. ein
+    passender Vorablauf von Seite 5 wird übernommen), und ``on_text`` erhält
+    fortlaufend den bisher empfangenen Gesamttext. Unterbricht ein Rerun die
+    Seite, hängt sich der nächste Durchlauf an denselben Aufruf an.
+
+    ``engine`` übersteuert die im Adminbereich gewählte Engine (z. B. im
+    Benchmark). Mit ``FEEDBACK_ENGINE_PIPELINE`` entsteht jeder Unterpunkt in
+    einem eigenen, parallelen Aufruf; das Ergebnis hat dasselbe Format.
+    """
+    # Hinweis: Die Parameter ``amboss_payload`` und ``status_updater`` werden
+    # aktuell nicht im Prompt verwendet, bleiben aber als Schnittstelle für
+    # Admin-Ansichten erhalten. ``patient_alter`` nutzt nur die Pipeline.
+
+    # Der Modus entscheidet, ob zusätzlich AMBOSS-Ergebnisse in die Bewertung
+    # einbezogen werden dürfen. Bei Bedarf kann hier zur Fehlersuche der Modus
+    # geloggt werden.
+    feedback_mode = determine_feedback_mode()
+
+    # Die Settings werden bewusst unverändert weitergegeben, damit leere oder
+    # fehlende Angaben im Prompt sichtbar bleiben.
+    # Debug-Hinweis: Bei Unklarheiten kann hier temporär
+    # `st.write(therapie_setting_verdacht, therapie_setting_final)` aktiviert
+    # werden, um die rohen Session-State-Werte zu prüfen.
+    # Debug-Hinweis (beschriftet): Für die Nachverfolgung im App-Verlauf kann
+    # zusätzlich dieser Block aktiviert werden, um Quelle und Übergabe klar zu
+    # trennen:
+    # TODO: Debug-Ausgaben später entfernen.
+    # st.write("Debug Feedbackmodul > Param verdacht:", therapie_setting_verdacht)
+    # st.write("Debug Feedbackmodul > Param final:", therapie_setting_final)
+    # st.write("Debug Feedbackmodul > Session verdacht:", st.session_state.get("therapie_setting_verdacht"))
+    # st.write("Debug Feedbackmodul > Session final:", st.session_state.get("therapie_setting_final"))
+    # Im Offline-Modus wird eine vorbereitete Rückfallantwort genutzt. Weitere
+    # Fallbacks sind bewusst nicht vorhanden, um das Verhalten transparent zu
+    # halten.
+    if is_offline():
+        return get_offline_feedback(
+            diagnose_szenario,
+            therapie_setting_verdacht=therapie_setting_verdacht,
+            therapie_setting_final=therapie_setting_final,
+        )
+
+    if engine is None:
+        engine = aktive_feedback_engine()
+    if engine == FEEDBACK_ENGINE_PIPELINE:
+        try:
+            text = _feedback_per_pipeline(
+                client,
+                FeedbackContext(
+                    diagnose_szenario=diagnose_szenario,
+                    anzahl_termine=anzahl_termine,
+                    user_verlauf=user_verlauf,
+                    diagnostik_eingaben=diagnostik_eingaben,
+                    gpt_befunde=gpt_befunde,
+                    koerper_befund=koerper_befund,
+                    user_ddx2=user_ddx2,
+                    final_diagnose=final_diagnose,
+                    therapie_vorschlag=therapie_vorschlag,
+                    therapie_setting_verdacht=therapie_setting_verdacht,
+                    therapie_setting_final=therapie_setting_final,
+                    patient_forms_dativ="",
+                    patient_forms_genitiv="",
+                    patient_alter=patient_alter,
+                ),
+                feedback_mode,
+                on_text=on_text,
+            )
+        except Exception as exc:
+            # Fehlt ein Abschnitt, entsteht das Feedback wie bisher im
+            # Einzelprompt; Studierende bekommen so immer ein vollständiges Feedback.
+            # Debug-Hinweis: ``st.write("Pipeline fehlgeschlagen:", exc)`` zeigt die Ursache.
+            if status_updater is not None:
+                status_updater("Pipeline fehlgeschlagen – Einzelprompt wird genutzt.", "warning")
+        else:
+            st.session_state["feedback_engine_genutzt"] = FEEDBACK_ENGINE_PIPELINE
+            return text
+
+    st.session_state["feedback_engine_genutzt"] = FEEDBACK_ENGINE_EINZELPROMPT
+    messages = baue_feedback_nachrichten(
+        final_diagnose,
+        therapie_vorschlag,
+        user_ddx2,
+        diagnostik_eingaben,
+        gpt_befunde,
+        koerper_befund,
+        user_verlauf,
+        anzahl_termine,
+        diagnose_szenario,
+        therapie_setting_verdacht=therapie_setting_verdacht,
+        therapie_setting_final=therapie_setting_final,
+        feedback_mode=feedback_mode,
+    )
+
+    # Wurde das Feedback zu exakt diesen Nachrichten bereits beim Absenden von
+    # Diagnose und Therapie (Seite 5) gestartet, wird dessen Ergebnis übernommen
+    # bzw. abgewartet. Jede spätere Änderung der Eingaben ändert den Digest.
+    # Beim Streaming wird der Aufruf sonst hier gestartet (gleicher Mechanismus).
+    if on_text is not None:
+        plane_vorab_feedback(messages, client)
+    vorab_text = uebernimm_vorab_feedback(messages, on_text=on_text)
+    if vorab_text is not None:
+        return vorab_text
+
     # Der Aufruf erfolgt bewusst sequentiell mit einem einzelnen Prompt. Bei
     # Fehlermeldungen kann der Prompt-Inhalt beispielsweise über `st.write` zur
     # Analyse ausgegeben werden.
     # Das Abschlussfeedback enthält viele Prüfregeln und muss didaktisch
     # konsistent bleiben. Dafür nutzen wir ein Modell mit höherer
-    # Instruktionsstabilität.
-    response = messe_gpt_aktion(
-        lambda: client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.4,
-        ),
-        kontext="Abschlussfeedback",
-    )
-
-    # Tokenverbrauch erfassen, um die Nutzung nachvollziehen zu können. Für
+    # Instruktionsstabilität (Profil "abschlussfeedback"). Antwortet gpt-4.1 nicht
+    # innerhalb des Profil-Timeouts, weicht das Gateway auf das schnellere
+    # Ausweichmodell aus. Tokenverbrauch und Laufzeit verbucht das Gateway; für
     # Debugging kann bei Bedarf zusätzlich `response` inspiziert werden.
-    add_usage(
-        prompt_tokens=response.usage.prompt_tokens,
-        completion_tokens=response.usage.completion_tokens,
-        total_tokens=response.usage.total_tokens,
+    response = chat_completion(
+        "abschlussfeedback",
+        messages,
+        client=client,
+        kontext="Abschlussfeedback",
     )
 
     return response.choices[0].message.content
+
+
+def _feedback_per_pipeline(
+    client,
+    context: FeedbackContext,
+    feedback_mode: str,
+    *,
+    on_text: Callable[[str], None] | None = None,
+) -> str:
+    """Erzeugt das Feedback abschnittsweise über ``run_feedback_pipeline``.
+
+    Ergänzt Patientenformen und (im AMBOSS-Modus) den AMBOSS-Kontext aus dem
+    Session-State; läuft deshalb im Hauptthread. Die Modelle je Abschnitt
+    stammen aus ``FeedbackTask.model`` bzw. dem Profil "feedback_abschnitt".
+    """
+
+    patient_forms = get_patient_forms()
+    context.patient_forms_dativ = patient_forms.phrase("dat", article="indefinite")
+    context.patient_forms_genitiv = patient_forms.phrase("gen")
+    if feedback_mode == FEEDBACK_MODE_AMBOSS_CHATGPT:
+        context.amboss_zusammenfassung = _build_amboss_context()
+    return combine_sections(run_feedback_pipeline(client, context, on_text=on_text))
+
+
+def starte_vorab_feedback(client) -> bool:
+    """Startet das Abschlussfeedback spekulativ im Hintergrund (Seite 5).
+
+    Die Nachrichten werden hier im Hauptthread gebaut; der Hintergrundaufruf
+    greift nicht auf den Session-State zu. Rückgabe ``True``, wenn ein neuer
+    Lauf gestartet wurde. Bei der Pipeline-Engine entfällt der Vorablauf; ein
+    spekulativer Einzelprompt würde nur zusätzliche Tokens kosten.
+    """
+
+    if is_offline() or aktive_feedback_engine() == FEEDBACK_ENGINE_PIPELINE:
+        return False
+    messages = baue_feedback_nachrichten(**sammle_feedback_eingaben())
+    return plane_vorab_feedback(messages, client)
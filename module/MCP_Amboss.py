@@ -6,6 +6,8 @@ Zweck
 - Gibt das unveränderte JSON-Ergebnis zurück, damit andere Module flexibel darauf
   zugreifen können.
 - Hinterlegt sowohl die Anfrage als auch das Ergebnis im ``st.session_state``.
+  Außerhalb eines Streamlit-Skriptlaufs (Hintergrund-Pool, Kommandozeile)
+  entfallen diese Einträge; das Ergebnis wird dann nur zurückgegeben.
 
 Anwendung
 ---------
@@ -21,13 +23,45 @@ zusätzliche ``st.write``-Ausgaben aktiviert werden, die aktuell aus Gründen de
 
 from __future__ import annotations
 import json
-from typing import Optional, Dict, Any, Tuple
+import re
+from typing import Optional, Dict, Any, Iterable, Iterator, List, MutableMapping, Tuple
 import time
 
 import requests
 import streamlit as st
 
+from module.amboss_cache import FORMAT_INHALT, lies_amboss_cache, schreibe_amboss_cache
+
+try:  # pragma: no cover - abhängig von der Streamlit-Version
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # pragma: no cover
+    get_script_run_ctx = None  # type: ignore[assignment]
+
 AMBOSS_URL: str = "https://content-mcp.de.production.amboss.com/mcp"
+_TOOL_NAME = "search_article_sections"
+# Lesegröße beim inkrementellen Parsen des Event-Streams.
+_STREAM_CHUNK_BYTES = 16 * 1024
+# Obergrenze des für die Debug-Sicherung mitgeschriebenen Rohtexts.
+_ROHTEXT_MAX_ZEICHEN = 2_000_000
+
+# Hilfsmuster für ``_recover_partial_json``: Rest eines Strings bis zum
+# schließenden Anführungszeichen (Escapes eingeschlossen) bzw. eine Zahl oder ein
+# Literal bis zum nächsten Trennzeichen.
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_SKALAR = re.compile(r'[^\s,:\[\]{}"]+')
+_SCHLIESSENDE_KLAMMER = {"{": "}", "[": "]"}
+
+
+def _sitzungsspeicher() -> MutableMapping[str, Any]:
+    """Session State des laufenden Skripts, sonst ein verworfenes Dictionary.
+
+    Hintergrund-Threads haben keinen Skriptkontext; Streamlit würde Zugriffe auf
+    ``st.session_state`` dort nur mit Warnungen quittieren.
+    """
+
+    if get_script_run_ctx is not None and get_script_run_ctx() is not None:
+        return st.session_state
+    return {}
 
 
 def _build_payload(query: str, *, language: str = "de") -> Dict[str, Any]:
@@ -37,7 +71,7 @@ def _build_payload(query: str, *, language: str = "de") -> Dict[str, Any]:
         "id": 1,
         "method": "tools/call",
         "params": {
-            "name": "search_article_sections",
+            "name": _TOOL_NAME,
             "arguments": {"query": query, "language": language},
         },
     }
@@ -60,26 +94,94 @@ def _looks_like_json(value: str) -> bool:
 
 
 def _recover_partial_json(fragment: str) -> Optional[Any]:
-    """Versucht, aus einem abgeschnittenen JSON-Fragment einen verwertbaren Teil zu extrahieren."""
+    """Versucht, aus einem abgeschnittenen JSON-Fragment einen verwertbaren Teil zu extrahieren.
+
+    Ein einziger Durchlauf verfolgt Verschachtelung und String-Zustand und merkt
+    sich die letzte Stelle, an der ein Wert vollständig vorlag (bzw. ein Container
+    gerade geöffnet wurde). Das Fragment wird dort abgeschnitten, die offenen
+    Container werden geschlossen und das Ergebnis einmal geparst. Ein
+    abgebrochener Schlüssel, String oder Zahlwert fällt dabei weg; Inhalt
+    hinter einem vollständigen Dokument wird ignoriert.
+
+    Rückgabe ``None``, wenn das Fragment nicht mit ``{`` oder ``[`` beginnt oder
+    kein gültiges JSON-Präfix ist. Laufzeit linear in der Fragmentlänge (bisher
+    wurde jeder Präfix bis zu einem ``}``/``]`` einzeln geparst).
+    """
 
-    # Wir prüfen ausschließlich Fragmente, die mit ``}`` oder ``]`` enden. Nur dann
-    # besteht eine realistische Chance, dass zumindest ein Teilobjekt vollständig
-    # vorliegt. Der längste, gültige Präfix wird beibehalten, kürzere Varianten
-    # dienen als Fallback für stark fragmentierte Antworten.
     stripped = fragment.strip()
-    if not stripped:
+    if not stripped or stripped[0] not in "{[":
         return None
 
-    candidate_indices = [
-        index for index, char in enumerate(stripped) if char in {"}", "]"}
-    ]
-    for index in reversed(candidate_indices):
-        candidate = stripped[: index + 1]
-        parsed = _try_parse_json(candidate)
-        if parsed is not None:
-            return parsed
+    # Je offener Container: Klammer und – bei Objekten – ob als Nächstes ein
+    # Schlüssel (True) oder ein Wert (False) folgt.
+    klammern: list[str] = []
+    erwartet_schluessel: list[bool] = []
+    # Letzte gültige Schnittstelle: Position (exklusiv) und Anzahl der dort offenen
+    # Container. Schließt sich danach ein Container unterhalb dieser Tiefe, entsteht
+    # sofort eine neue Schnittstelle; die offenen Container an der letzten
+    # Schnittstelle sind daher stets ``klammern[:schnitt_tiefe]``.
+    schnitt_pos = 0
+    schnitt_tiefe = 0
+
+    def wert_endet(position: int) -> None:
+        nonlocal schnitt_pos, schnitt_tiefe
+        if klammern and not (klammern[-1] == "{" and erwartet_schluessel[-1]):
+            schnitt_pos, schnitt_tiefe = position, len(klammern)
+
+    laenge = len(stripped)
+    index = 0
+    while index < laenge:
+        zeichen = stripped[index]
+        if zeichen == '"':
+            treffer = _STRING_REST.match(stripped, index + 1)
+            if treffer is None:
+                break  # String abgeschnitten
+            index = treffer.end()
+            if klammern and klammern[-1] == "{" and erwartet_schluessel[-1]:
+                continue  # Schlüssel – erst der zugehörige Wert ist ein Schnittpunkt
+            wert_endet(index)
+            continue
+        if zeichen in "{[":
+            klammern.append(zeichen)
+            erwartet_schluessel.append(zeichen == "{")
+            index += 1
+            schnitt_pos, schnitt_tiefe = index, len(klammern)
+            continue
+        if zeichen in "}]":
+            if not klammern or _SCHLIESSENDE_KLAMMER[klammern[-1]] != zeichen:
+                break  # Kein gültiges JSON-Präfix mehr
+            klammern.pop()
+            erwartet_schluessel.pop()
+            index += 1
+            if not klammern:
+                # Vollständiges Dokument; etwaiger Rest wird ignoriert.
+                return _try_parse_json(stripped[:index])
+            wert_endet(index)
+            continue
+        if zeichen == ":":
+            if klammern and klammern[-1] == "{":
+                erwartet_schluessel[-1] = False
+            index += 1
+            continue
+        if zeichen == ",":
+            if klammern and klammern[-1] == "{":
+                erwartet_schluessel[-1] = True
+            index += 1
+            continue
+        if zeichen in " \t\r\n":
+            index += 1
+            continue
+        # Zahl oder Literal: Nur vollständig, wenn danach noch ein Trennzeichen folgt.
+        treffer = _SKALAR.match(stripped, index)
+        if treffer is None:
+            break
+        index = treffer.end()
+        if index >= laenge:
+            break
+        wert_endet(index)
 
-    return None
+    schliessend = "".join(_SCHLIESSENDE_KLAMMER[klammer] for klammer in reversed(klammern[:schnitt_tiefe]))
+    return _try_parse_json(stripped[:schnitt_pos] + schliessend)
 
 
 def _peel_json(obj_or_str: Any, *, max_depth: int = 4) -> Tuple[Any, int]:
@@ -118,154 +220,192 @@ def _normalise_endpoint_url(url: str) -> str:
     return cleaned.rstrip("/") + "/"
 
 
+def _iter_stream_zeilen(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Zerlegt den Byte-Stream inkrementell in Zeilen (CRLF, LF oder CR).
+
+    ``requests.Response.iter_lines`` würde ein über zwei Chunks verteiltes
+    ``\\r\\n`` als zusätzliche Leerzeile melden – im SSE-Format ein
+    Ereignisende mitten im Event. Eine abschließende ``\\r``-Zeile bleibt deshalb
+    bis zum nächsten Chunk im Puffer. SSE ist per Definition UTF-8-kodiert.
+    """
+
+    # Teile der noch unvollständigen Zeile; lange ``data:``-Zeilen (eine ganze
+    # JSON-Antwort) werden so nicht bei jedem Chunk erneut kopiert.
+    offen: list[bytes] = []
+    for chunk in chunks:
+        if not chunk:
+            continue
+        offen.append(chunk)
+        if b"\n" not in chunk and b"\r" not in chunk:
+            continue
+        zeilen = b"".join(offen).splitlines(keepends=True)
+        offen = []
+        if not zeilen[-1].endswith(b"\n"):
+            offen.append(zeilen.pop())
+        for zeile in zeilen:
+            yield zeile.rstrip(b"\r\n").decode("utf-8", errors="replace")
+    if offen:
+        yield b"".join(offen).rstrip(b"\r\n").decode("utf-8", errors="replace")
+
+
+def _iter_sse_ereignisse(zeilen: Iterable[str], rohzeilen: List[str]) -> Iterator[str]:
+    """Setzt mehrzeilige ``data:``-Felder zu Ereignissen zusammen (inkrementell).
+
+    Viele SSE-Server stückeln ein einzelnes Event auf mehrere ``data:``-Zeilen
+    und trennen Events durch Leerzeilen. Kommentar-/Keep-Alive-Zeilen werden
+    ignoriert. Jede gelesene Zeile landet (bis ``_ROHTEXT_MAX_ZEICHEN``) in
+    ``rohzeilen`` für die Debug-Sicherung. Für Debugging kann hier temporär ein
+    ``st.write(line)`` ergänzt werden, um den Stream vollständig sichtbar zu machen.
+    """
+
+    buffer: list[str] = []
+    rohzeichen = 0
+    for line in zeilen:
+        if rohzeichen < _ROHTEXT_MAX_ZEICHEN:
+            rohzeilen.append(line)
+            rohzeichen += len(line) + 1
+        if line == "":
+            if buffer:
+                yield "\n".join(buffer)
+                buffer = []
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("data:"):
+            buffer.append(line[len("data:") :].lstrip())
+            continue
+        # Andere SSE-Felder wie ``event:`` benötigen wir hier nicht explizit, sie
+        # werden für die JSON-Extraktion ignoriert.
+    if buffer:
+        yield "\n".join(buffer)
+
+
 def _parse_response(resp: requests.Response) -> dict:
     """Wertet die Antwort des MCP aus und verarbeitet klassische JSON- sowie SSE-Antworten.
 
-    Hinweis zur Synchronität: ``requests`` liest den Body bei ``resp.text`` blockierend
-    ein. Erst wenn der Server die komplette Antwort übertragen hat, wird diese Funktion
-    aktiv. Eine vermeintlich „halbierte“ Nutzlast entsteht daher nicht durch zu frühes
-    Parsen, sondern allenfalls durch einen Abbruch auf Serverseite. Für solche Fälle
-    empfehlen sich die unten erwähnten Debug-Helfer, um den Rohtext zu untersuchen.
+    Event-Streams werden inkrementell gelesen (``stream=True`` beim Request):
+    Sobald das erste vollständige JSON-RPC-Ergebnis (``result``) eingetroffen
+    ist, kehrt die Funktion zurück; der Aufrufer schließt dann die Verbindung.
+    Der Rest des Streams wird weder abgewartet noch gepuffert. Endet der Stream
+    ohne ``result`` (Abbruch auf Serverseite), greift wie bisher die Rekonstruktion
+    aus dem ersten Fragment samt Debug-Sicherung („amboss_result_raw“).
     """
+    state = _sitzungsspeicher()
     ctype = (resp.headers.get("Content-Type") or "").lower()
     if "application/json" in ctype and "event-stream" not in ctype:
         return resp.json()
 
-    # ``resp.text`` blockiert solange, bis der Server die Antwort vollständig übertragen
-    # hat. Damit beantworten wir die häufige Frage, ob der Stream eventuell „zu früh“
-    # verarbeitet wird: Nein, Requests liefert hier erst weiter, sobald alle Daten
-    # angekommen sind. Anschließend kann die SSE-Nutzlast in Ruhe ausgewertet werden.
-    # Dank des blockierenden Leseverhaltens erhalten wir hier stets den vollständigen
-    # Stream. Sollte der Server die Übertragung unerwartet abbrechen, wäre ``resp.text``
-    # bereits verkürzt. In so einem Fall lässt sich die Ursache über die Debug-Hilfen
-    # („amboss_result_raw“) nachvollziehen.
-    text_body = resp.text
-    if "event-stream" in ctype or "data:" in text_body or "event:" in text_body:
-        # Viele SSE-Server stückeln ein einzelnes Event auf mehrere ``data:``-Zeilen
-        # und trennen Events durch Leerzeilen. Deshalb puffern wir jede Sequenz von
-        # ``data:``-Zeilen, fügen sie vor dem Parsen zusammen und ignorieren
-        # Kommentar-/Keep-Alive-Zeilen. Für Debugging kann hier temporär ein
-        # ``st.write(raw_line)`` ergänzt werden, um den Stream vollständig sichtbar
-        # zu machen.
-        events: list[str] = []
-        buffer: list[str] = []
-        for raw_line in text_body.splitlines():
-            line = raw_line.rstrip("\r\n")
-            if line == "":
-                if buffer:
-                    events.append("\n".join(buffer))
-                    buffer = []
-                continue
-            if line.startswith(":"):
-                continue
-            if line.startswith("data:"):
-                buffer.append(line[len("data:") :].lstrip())
-                continue
-            # Andere SSE-Felder wie ``event:`` benötigen wir hier nicht explizit, sie
-            # werden für die JSON-Extraktion ignoriert.
-        if buffer:
-            events.append("\n".join(buffer))
-
-        result_object: Optional[dict] = None
-        for payload in events:
-            if not payload or payload == "[DONE]":
-                continue
-
-            # Erste Dekodierungsstufe: Direkt versuchen, den Payload zu laden.
-            current: Any = _try_parse_json(payload)
-            if current is None:
-                current = payload
-
-            # Weitere Dekodierungsstufen: Manche Antworten enthalten JSON in JSON.
-            current, _ = _peel_json(current)
-
-            if isinstance(current, dict):
-                if "error" in current:
-                    raise RuntimeError(f"MCP error: {current.get('error')}")
-                if "result" in current:
-                    result_object = current
-
-        if result_object is None:
-            # Sicherung: Wir bewahren das erste verwertbare Fragment auf, damit die
-            # Anwendung trotz abgebrochener Serverantwort weiterarbeiten kann. Das
-            # Ergebnis wird klar als unvollständig markiert, sodass nachgelagerte
-            # Schritte reagieren können.
-            fallback_payload: Optional[str] = next(
-                (payload for payload in events if payload and payload != "[DONE]"),
-                None,
-            )
-            partial_object = (
-                _recover_partial_json(fallback_payload) if fallback_payload else None
-            )
-
-            fallback_result: Dict[str, Any] = {
-                "jsonrpc": "2.0",
-                "id": None,
-                "result": {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": (
-                                partial_object
-                                if partial_object is not None
-                                else fallback_payload
-                                if fallback_payload is not None
-                                else ""
-                            ),
-                        }
-                    ]
-                },
-                "meta": {
-                    "hinweis": "Fragment aus abgebrochener SSE-Antwort rekonstruiert.",
-                    "unvollstaendig": True,
-                },
-            }
-
-            st.session_state["amboss_result_raw"] = {
-                "hinweis": "Keine vollständige JSON-RPC-Nutzlast in der SSE-Antwort gefunden.",
+    rohzeilen: list[str] = []
+    if "event-stream" in ctype:
+        zeilen: Iterable[str] = _iter_stream_zeilen(resp.iter_content(chunk_size=_STREAM_CHUNK_BYTES))
+    else:
+        # Unbekannter Content-Type: Nur anhand des vollständigen Texts lässt sich
+        # erkennen, ob dennoch SSE geliefert wurde.
+        text_body = resp.text
+        if "data:" not in text_body and "event:" not in text_body:
+            # Alle anderen Content-Types werden explizit abgefangen, um unerwartete Antworten
+            # früh zu erkennen. Auch hier landet der Rohtext im Session State für Debugging.
+            state["amboss_result_raw"] = {
+                "hinweis": "Unerwarteter Content-Type beim MCP-Aufruf.",
+                "content_type": ctype,
                 "rohtext": text_body,
-                "fragment": fallback_payload,
-                "fragment_teilobjekt": partial_object,
-            }
-            st.session_state["amboss_result_unvollstaendig"] = True
-            st.session_state["amboss_result_sicherung"] = {
-                "hinweis": "Teilantwort aufgrund eines Verbindungsabbruchs gespeichert.",
-                "fragment_quelle": "sse_event",
-                "fragment_text": fallback_payload,
-                "fragment_teilobjekt": partial_object,
             }
-            return fallback_result
+            raise ValueError(f"Unerwarteter Content-Type: {ctype}")
+        zeilen = text_body.splitlines()
 
-        # Falls die eigentliche Information nochmals als String vorliegt, versuchen
-        # wir auch diese Ebene zu entpacken, damit nachgelagerte Module direkt mit
-        # Python-Strukturen arbeiten können.
-        try:
-            content_entries = result_object.get("result", {}).get("content", [])
-            for entry in content_entries:
-                if entry.get("type") == "text" and isinstance(entry.get("text"), str):
-                    unpacked, depth = _peel_json(entry["text"], max_depth=3)
-                    if depth > 0 and isinstance(unpacked, (dict, list)):
-                        entry["text"] = unpacked
-            st.session_state["amboss_result_inner"] = result_object
-        except Exception:
-            # Sollte das Entpacken wider Erwarten scheitern, kann durch temporäre
-            # ``st.write(entry)``-Ausgaben oberhalb geprüft werden, welche Struktur
-            # genau vorliegt. Wir lassen in diesem Fall den Originaltext unangetastet.
-            pass
-
-        st.session_state.pop("amboss_result_unvollstaendig", None)
-        st.session_state.pop("amboss_result_sicherung", None)
-        st.session_state.pop("amboss_result_raw", None)
-        return result_object
-
-    # Alle anderen Content-Types werden explizit abgefangen, um unerwartete Antworten
-    # früh zu erkennen. Auch hier landet der Rohtext im Session State für Debugging.
-    st.session_state["amboss_result_raw"] = {
-        "hinweis": "Unerwarteter Content-Type beim MCP-Aufruf.",
-        "content_type": ctype,
-        "rohtext": text_body,
-    }
-    raise ValueError(f"Unerwarteter Content-Type: {ctype}")
+    result_object: Optional[dict] = None
+    fallback_payload: Optional[str] = None
+    for payload in _iter_sse_ereignisse(zeilen, rohzeilen):
+        if not payload or payload == "[DONE]":
+            continue
+        if fallback_payload is None:
+            fallback_payload = payload
+
+        # Erste Dekodierungsstufe: Direkt versuchen, den Payload zu laden.
+        current: Any = _try_parse_json(payload)
+        if current is None:
+            current = payload
+
+        # Weitere Dekodierungsstufen: Manche Antworten enthalten JSON in JSON.
+        current, _ = _peel_json(current)
+
+        if isinstance(current, dict):
+            if "error" in current:
+                raise RuntimeError(f"MCP error: {current.get('error')}")
+            if "result" in current:
+                # Frühzeitiger Abschluss: Weitere Events (Fortschritt, Keep-Alive)
+                # werden nicht mehr gelesen.
+                result_object = current
+                break
+
+    if result_object is None:
+        # Sicherung: Wir bewahren das erste verwertbare Fragment auf, damit die
+        # Anwendung trotz abgebrochener Serverantwort weiterarbeiten kann. Das
+        # Ergebnis wird klar als unvollständig markiert, sodass nachgelagerte
+        # Schritte reagieren können.
+        partial_object = (
+            _recover_partial_json(fallback_payload) if fallback_payload else None
+        )
+
+        fallback_result: Dict[str, Any] = {
+            "jsonrpc": "2.0",
+            "id": None,
+            "result": {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": (
+                            partial_object
+                            if partial_object is not None
+                            else fallback_payload
+                            if fallback_payload is not None
+                            else ""
+                        ),
+                    }
+                ]
+            },
+            "meta": {
+                "hinweis": "Fragment aus abgebrochener SSE-Antwort rekonstruiert.",
+                "unvollstaendig": True,
+            },
+        }
+
+        state["amboss_result_raw"] = {
+            "hinweis": "Keine vollständige JSON-RPC-Nutzlast in der SSE-Antwort gefunden.",
+            "rohtext": "\n".join(rohzeilen),
+            "fragment": fallback_payload,
+            "fragment_teilobjekt": partial_object,
+        }
+        state["amboss_result_unvollstaendig"] = True
+        state["amboss_result_sicherung"] = {
+            "hinweis": "Teilantwort aufgrund eines Verbindungsabbruchs gespeichert.",
+            "fragment_quelle": "sse_event",
+            "fragment_text": fallback_payload,
+            "fragment_teilobjekt": partial_object,
+        }
+        return fallback_result
+
+    # Falls die eigentliche Information nochmals als String vorliegt, versuchen
+    # wir auch diese Ebene zu entpacken, damit nachgelagerte Module direkt mit
+    # Python-Strukturen arbeiten können.
+    try:
+        content_entries = result_object.get("result", {}).get("content", [])
+        for entry in content_entries:
+            if entry.get("type") == "text" and isinstance(entry.get("text"), str):
+                unpacked, depth = _peel_json(entry["text"], max_depth=3)
+                if depth > 0 and isinstance(unpacked, (dict, list)):
+                    entry["text"] = unpacked
+        state["amboss_result_inner"] = result_object
+    except Exception:
+        # Sollte das Entpacken wider Erwarten scheitern, kann durch temporäre
+        # ``st.write(entry)``-Ausgaben oberhalb geprüft werden, welche Struktur
+        # genau vorliegt. Wir lassen in diesem Fall den Originaltext unangetastet.
+        pass
+
+    state.pop("amboss_result_unvollstaendig", None)
+    state.pop("amboss_result_sicherung", None)
+    state.pop("amboss_result_raw", None)
+    return result_object
 
 
 def call_amboss_search(
@@ -278,6 +418,7 @@ def call_amboss_search(
     extra_headers: Optional[Dict[str, str]] = None,
     max_retries: int = 0,
     retry_delay_seconds: float = 0.0,
+    cache_lesen: bool = True,
 ) -> dict:
     """Ruft ``search_article_sections`` auf und legt das Roh-JSON im Session State ab.
 
@@ -289,13 +430,35 @@ def call_amboss_search(
     oder unerwartete Antwortformate auftreten. Mit ``retry_delay_seconds`` kann eine
     Wartezeit zwischen den Versuchen hinterlegt werden, um den Server nicht sofort
     erneut zu belasten. Bei ``max_retries=0`` bleibt das bisherige Verhalten unverändert.
+
+    Vollständige Antworten landen im Festplatten-Cache (``module/amboss_cache.py``).
+    Mit ``cache_lesen=False`` wird trotzdem neu abgerufen (z. B. von der
+    Vorberechnung, die Inhaltsänderungen erkennen soll); der Cache wird dann
+    aufgefrischt. ``st.session_state["amboss_result_quelle"]`` zeigt, ob das
+    Ergebnis aus dem Cache oder vom MCP stammt.
     """
     token = token or st.secrets.get("Amboss_Token")
     if not token:
         raise ValueError("Amboss_Token not found. Please set in st.secrets or pass as argument.")
 
+    state = _sitzungsspeicher()
     payload = _build_payload(query, language=language)
-    st.session_state["amboss_input_mcp"] = payload
+    state["amboss_input_mcp"] = payload
+
+    if cache_lesen:
+        gespeichert = lies_amboss_cache(_TOOL_NAME, query, language, antwortformat=FORMAT_INHALT)
+        if isinstance(gespeichert, dict):
+            for key in (
+                "amboss_letzter_fehlversuch",
+                "amboss_result_unvollstaendig",
+                "amboss_result_sicherung",
+                "amboss_result_raw",
+            ):
+                state.pop(key, None)
+            state["amboss_result_inner"] = gespeichert
+            state["amboss_result"] = gespeichert
+            state["amboss_result_quelle"] = "cache"
+            return gespeichert
 
     headers = {
         "Authorization": f"Bearer {token}",
@@ -307,10 +470,9 @@ def call_amboss_search(
 
     # Debug-Hinweis: Bei Bedarf kann hier ``st.write(headers, payload)`` aktiviert werden,
     # um die Anfrage im Detail zu inspizieren.
-    # Der Aufruf blockiert bis zur vollständigen Antwort; erst danach geht es in der
-    # Verarbeitung weiter. Wer experimentell live im Stream mitlesen möchte, kann
-    # ``stream=True`` ergänzen und in ``_parse_response`` auf ``resp.iter_lines``
-    # umstellen. Für die reguläre Nutzung ist das vollständige Puffern jedoch stabiler.
+    # Die Antwort wird gestreamt (``stream=True``): ``_parse_response`` liest den
+    # Event-Stream zeilenweise und kehrt beim ersten vollständigen Ergebnis zurück;
+    # danach wird die Verbindung sofort geschlossen.
     attempts_total = max(0, int(max_retries)) + 1
     delay_seconds = max(0.0, float(retry_delay_seconds))
 
@@ -324,7 +486,7 @@ def call_amboss_search(
     # Wir merken uns die abgerufene URL zusätzlich im Session State. So lässt sich im
     # Adminbereich nachvollziehen, ob eine Normalisierung stattgefunden hat und wohin
     # eine eventuell auftretende Weiterleitung ursprünglich führen wollte.
-    st.session_state["amboss_aufgerufener_endpunkt"] = {
+    state["amboss_aufgerufener_endpunkt"] = {
         "original": url,
         "verwendet": request_url,
     }
@@ -336,14 +498,18 @@ def call_amboss_search(
                 headers=headers,
                 data=json.dumps(payload),
                 timeout=timeout,
+                stream=True,
             )
-            resp.raise_for_status()
-            result = _parse_response(resp)
+            try:
+                resp.raise_for_status()
+                result = _parse_response(resp)
+            finally:
+                resp.close()
         except requests.TooManyRedirects as exc:
             # Dieser Sonderfall tritt auf, wenn der Server wiederholt zwischen zwei
             # Varianten derselben URL pendelt. Wir geben eine verständliche Meldung
             # zurück und halten im Session State fest, welche URL betroffen war.
-            st.session_state["amboss_letzter_fehlversuch"] = {
+            state["amboss_letzter_fehlversuch"] = {
                 "versuch": attempt_index,
                 "max_versuche": attempts_total,
                 "fehlertyp": type(exc).__name__,
@@ -362,7 +528,7 @@ def call_amboss_search(
                 "fehlertyp": type(exc).__name__,
                 "fehlermeldung": str(exc),
             }
-            st.session_state["amboss_letzter_fehlversuch"] = last_error_info
+            state["amboss_letzter_fehlversuch"] = last_error_info
 
             if attempt_index < attempts_total:
                 # Bei Bedarf kann hier temporär ``st.write(last_error_info)``
@@ -379,8 +545,14 @@ def call_amboss_search(
         else:
             # Erfolgreicher Durchlauf: Wir räumen eventuelle Fehlereinträge wieder auf,
             # damit andere Module ausschließlich gültige Ergebnisse vorfinden.
-            st.session_state.pop("amboss_letzter_fehlversuch", None)
-            st.session_state["amboss_result"] = result
+            state.pop("amboss_letzter_fehlversuch", None)
+            state["amboss_result"] = result
+            state["amboss_result_quelle"] = "mcp"
+            # Teilantworten aus abgebrochenen Streams werden nicht zwischengespeichert.
+            if isinstance(result, dict) and not (result.get("meta") or {}).get("unvollstaendig"):
+                schreibe_amboss_cache(
+                    _TOOL_NAME, query, language, result, antwortformat=FORMAT_INHALT
+                )
             return result
 
     # Defensive Rückgabe, sollte der Kontrollfluss unerwartet hier landen. Durch die
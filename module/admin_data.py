@@ -8,7 +8,9 @@ from typing import Dict, Iterable, Tuple
 import pandas as pd
 import streamlit as st
 from cryptography.fernet import Fernet, InvalidToken
-from supabase import Client, create_client
+from supabase import Client
+
+from module.supabase_client import SupabaseKonfigurationsFehler, get_supabase_client
 
 
 class FeedbackExportError(Exception):
@@ -16,31 +18,17 @@ class FeedbackExportError(Exception):
 
 
 def _get_supabase_client() -> Client:
-    """Create and return a Supabase client using Streamlit secrets.
+    """Return the shared Supabase client (see ``module/supabase_client.py``).
 
     Raises:
         FeedbackExportError: If Supabase credentials are missing or invalid.
-
-    Returns:
-        Client: An authenticated Supabase client instance.
     """
 
-    supabase_config = st.secrets.get("supabase")
-    if not supabase_config:
-        raise FeedbackExportError("Supabase-Konfiguration fehlt in st.secrets.")
-
-    try:
-        url = supabase_config["url"]
-        key = supabase_config["key"]
-    except KeyError as exc:
-        raise FeedbackExportError("Supabase-Zugangsdaten sind unvollständig.") from exc
-
     try:
-        client = create_client(url, key)
-    except Exception as exc:  # pragma: no cover - defensive
-        raise FeedbackExportError(f"Supabase-Verbindung fehlgeschlagen: {exc!r}") from exc
+        return get_supabase_client()
+    except SupabaseKonfigurationsFehler as exc:
+        raise FeedbackExportError(str(exc)) from exc
 
-    return client
 
 
 def _get_matrikel_fernet() -> Fernet:
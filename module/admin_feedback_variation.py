@@ -23,7 +23,7 @@ from typing import Any, Dict, Iterable, List
 # Export-Funktion mit ausführlicher Validierung separat ergänzt werden.
 
 import streamlit as st
-from supabase import Client, create_client
+from supabase import Client
 
 from feedbackmodul import feedback_erzeugen
 from module.feedback_mode import (
@@ -41,6 +41,8 @@ from module.feedback_detail import (
 )
 from module.llm_state import ensure_llm_client
 from module.offline import is_offline
+from module.supabase_client import SupabaseKonfigurationsFehler, get_supabase_client
+from module.supabase_schema import insert_mit_optionalen_spalten
 
 # Name der Supabase-Tabelle, in der die wiederholten Feedback-Durchläufe
 # gespeichert werden. Der SQL-Entwurf befindet sich in der README und kann bei
@@ -106,23 +108,6 @@ class FeedbackRunResult:
     detail_feedback: List[Dict[str, Any]]
 
 
-def _variation_spalte_verfuegbar(client: Client, spaltenname: str) -> bool:
-    """Prüft robust, ob eine optionale Spalte im Variations-Table existiert.
-
-    Die Admin-Funktion soll auch dann weiterhin nutzbar bleiben, wenn ein
-    Deployment die neuen Spalten noch nicht migriert hat. Die Prüfung erfolgt
-    daher mit einem leichten ``select(...).limit(0)``, analog zum bestehenden
-    Feedback-Speicherpfad.
-    """
-
-    try:
-        probe = client.table(_TABLE_VARIATIONS).select(spaltenname).limit(0).execute()
-    except Exception:
-        return False
-
-    return not getattr(probe, "error", None)
-
-
 def _erzeuge_detail_feedback_automatisch(feedback_text: str) -> List[Dict[str, Any]]:
     """Erzeugt für jeden Unterpunkt automatisch einen Detail-Feedback-Block.
 
@@ -173,27 +158,17 @@ def _detail_feedback_als_markdown(detail_feedback: List[Dict[str, Any]]) -> str:
 
 
 def _get_supabase_client() -> Client:
-    """Stellt einen authentifizierten Supabase-Client bereit.
+    """Stellt den geteilten Supabase-Client bereit (siehe ``module/supabase_client.py``).
 
-    Der Zugriff basiert auf den Einträgen in ``st.secrets['supabase']``. Alle
-    relevanten Fehlermeldungen werden auf Deutsch formuliert, damit Admins bei
-    der Einrichtung schnell nachvollziehen können, welche Angaben fehlen.
+    Konfigurationsfehler werden als ``FeedbackVariationError`` weitergereicht,
+    damit die Adminseite sie wie bisher anzeigen kann.
     """
 
-    supabase_config = st.secrets.get("supabase")
-    if not supabase_config:
-        raise FeedbackVariationError("Supabase-Konfiguration fehlt in st.secrets.")
-
     try:
-        url = supabase_config["url"]
-        key = supabase_config["key"]
-    except KeyError as exc:
-        raise FeedbackVariationError("Supabase-Zugangsdaten sind unvollständig.") from exc
+        return get_supabase_client()
+    except SupabaseKonfigurationsFehler as exc:
+        raise FeedbackVariationError(str(exc)) from exc
 
-    try:
-        return create_client(url, key)
-    except Exception as exc:  # pragma: no cover - Netzwerkaussetzer schwer zu simulieren
-        raise FeedbackVariationError(f"Supabase-Verbindung fehlgeschlagen: {exc!r}") from exc
 
 
 def lade_feedback_fall(fall_id: int) -> FeedbackCaseData:
@@ -437,19 +412,6 @@ def speichere_durchlaeufe_in_supabase(ergebnisse: List[FeedbackRunResult]) -> No
 
     client = _get_supabase_client()
 
-    # Optionale Spalten nur dann befüllen, wenn das Supabase-Schema bereits
-    # aktualisiert wurde. So bleibt der Insert kompatibel mit älteren Ständen,
-    # und Admins erhalten gleichzeitig eine klare Migrationswarnung.
-    detail_json_verfuegbar = _variation_spalte_verfuegbar(client, "detail_feedback_json")
-    detail_md_verfuegbar = _variation_spalte_verfuegbar(client, "detail_feedback_markdown")
-
-    if not detail_json_verfuegbar or not detail_md_verfuegbar:
-        st.warning(
-            "⚠️ Für vollständige Detail-Rekonstruktion bitte die neuen Spalten "
-            "'detail_feedback_json' und 'detail_feedback_markdown' in "
-            "feedback_gpt_variationen anlegen (siehe README-SQL)."
-        )
-
     payload = []
     for e in ergebnisse:
         row_payload = {
@@ -461,22 +423,34 @@ def speichere_durchlaeufe_in_supabase(ergebnisse: List[FeedbackRunResult]) -> No
             "lauf_index": e.lauf_index,
             "feedback_text": e.feedback_text,
             "fehlende_variablen": ", ".join(sorted(set(e.fehlende_variablen))) if e.fehlende_variablen else None,
+            "detail_feedback_json": e.detail_feedback,
+            "detail_feedback_markdown": _detail_feedback_als_markdown(e.detail_feedback),
         }
-
-        if detail_json_verfuegbar:
-            row_payload["detail_feedback_json"] = e.detail_feedback
-        if detail_md_verfuegbar:
-            row_payload["detail_feedback_markdown"] = _detail_feedback_als_markdown(e.detail_feedback)
-
         payload.append(row_payload)
 
+    # Optionale Spalten werden nur befüllt, wenn das Supabase-Schema bereits
+    # aktualisiert wurde (Prüfung über den prozessweiten Schema-Cache). So
+    # bleibt der Insert kompatibel mit älteren Ständen, und Admins erhalten
+    # gleichzeitig eine klare Migrationswarnung.
     try:
-        client.table(_TABLE_VARIATIONS).insert(payload).execute()
+        _, fehlende_spalten = insert_mit_optionalen_spalten(
+            client,
+            _TABLE_VARIATIONS,
+            payload,
+            ("detail_feedback_json", "detail_feedback_markdown"),
+        )
     except Exception as exc:  # pragma: no cover - Netzfehler schwer abbildbar
         raise FeedbackVariationError(
             f"Speichern der Feedback-Durchläufe fehlgeschlagen: {exc!r}"
         ) from exc
 
+    if fehlende_spalten:
+        st.warning(
+            "⚠️ Für vollständige Detail-Rekonstruktion bitte die neuen Spalten "
+            "'detail_feedback_json' und 'detail_feedback_markdown' in "
+            "feedback_gpt_variationen anlegen (siehe README-SQL)."
+        )
+
 
 __all__ = [
     "FeedbackCaseData",
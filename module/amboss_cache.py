@@ -0,0 +1,268 @@
+"""Prozessübergreifender Festplatten-Cache für AMBOSS-MCP-Antworten.
+
+Bisher hat jeder Aufruf von ``call_amboss_search`` bzw.
+``AmbossToolClient.call_tool`` den MCP-Endpunkt kontaktiert – auch wenn
+dasselbe Szenario wenige Minuten zuvor schon abgefragt wurde. Die Antworten
+(mehrere hundert Kilobyte Artikelabschnitte) landen jetzt in einer
+SQLite-Datei, die alle Sitzungen und Prozesse auf demselben Rechner teilen:
+
+- Schlüssel ist der SHA-256 über Toolname, Suchbegriff (Leerraum normalisiert),
+  Sprache und Antwortformat. ``call_amboss_search`` speichert den bereits
+  ausgepackten Inhalt (``FORMAT_INHALT``), ``AmbossToolClient.call_tool`` die
+  rohe JSON-RPC-Antwort (``FORMAT_JSONRPC``); ohne das Format im Schlüssel
+  bekäme der eine Aufrufer die Form des anderen zurück.
+- Gespeichert wird das JSON zlib-komprimiert.
+- Einträge verfallen nach ``AMBOSS_CACHE_TTL_SEK`` Sekunden (Standard 7 Tage);
+  ``0`` schaltet den Cache ab.
+- Überschreitet die Summe der komprimierten Einträge ``AMBOSS_CACHE_MAX_MB``
+  (Standard 64), werden die am längsten nicht genutzten Einträge verdrängt (LRU).
+- Der Pfad lässt sich über ``AMBOSS_CACHE_PFAD`` setzen (Standard
+  ``.cache/amboss_mcp.sqlite3`` im Projektverzeichnis).
+- Treffer, Fehlschläge und Verdrängungen werden prozessweit gezählt und im
+  Adminbereich angezeigt.
+
+Unvollständige oder fehlerhafte Antworten werden nie gespeichert. Fehler beim
+Zugriff auf die Datei gelten als Fehlschlag; der MCP-Abruf läuft dann wie
+bisher.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+__all__ = [
+    "FORMAT_INHALT",
+    "FORMAT_JSONRPC",
+    "get_amboss_cache_status",
+    "leere_amboss_cache",
+    "lies_amboss_cache",
+    "schreibe_amboss_cache",
+]
+
+# Antwortformate; Teil des Schlüssels.
+FORMAT_INHALT = "inhalt"
+FORMAT_JSONRPC = "jsonrpc"
+
+_STANDARD_PFAD = Path(__file__).resolve().parent.parent / ".cache" / "amboss_mcp.sqlite3"
+_STANDARD_TTL_SEK = 7 * 24 * 3600.0
+_STANDARD_MAX_MB = 64.0
+# Wartezeit auf Sperren anderer Prozesse, bevor ein Zugriff als Fehler gilt.
+_SQLITE_TIMEOUT_SEK = 5.0
+
+_SCHEMA = """
+create table if not exists antworten (
+    schluessel text primary key,
+    tool text not null,
+    query text not null,
+    sprache text not null,
+    daten blob not null,
+    groesse integer not null,
+    erstellt real not null,
+    zuletzt_genutzt real not null
+);
+create index if not exists antworten_zuletzt_genutzt on antworten (zuletzt_genutzt);
+"""
+
+_LOCK = threading.Lock()
+_INITIALISIERT: set[str] = set()
+_ZAEHLER: Dict[str, int] = {
+    "treffer": 0,
+    "fehlschlaege": 0,
+    "abgelaufen": 0,
+    "geschrieben": 0,
+    "verdraengt": 0,
+    "fehler": 0,
+}
+
+
+def _lese_zahl(name: str, standard: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, "") or standard))
+    except ValueError:
+        return standard
+
+
+def _pfad() -> Path:
+    return Path(os.getenv("AMBOSS_CACHE_PFAD") or _STANDARD_PFAD)
+
+
+def _ttl_sek() -> float:
+    return _lese_zahl("AMBOSS_CACHE_TTL_SEK", _STANDARD_TTL_SEK)
+
+
+def _max_bytes() -> int:
+    return int(_lese_zahl("AMBOSS_CACHE_MAX_MB", _STANDARD_MAX_MB) * 1024 * 1024)
+
+
+def _zaehle(name: str, anzahl: int = 1) -> None:
+    with _LOCK:
+        _ZAEHLER[name] += anzahl
+
+
+def _schluessel(tool: str, query: str, sprache: str, antwortformat: str) -> str:
+    normalisiert = " ".join(str(query).split())
+    roh = json.dumps([tool, normalisiert, sprache, antwortformat], ensure_ascii=False)
+    return hashlib.sha256(roh.encode("utf-8")).hexdigest()
+
+
+def _verbinde() -> sqlite3.Connection:
+    pfad = _pfad()
+    pfad.parent.mkdir(parents=True, exist_ok=True)
+    verbindung = sqlite3.connect(str(pfad), timeout=_SQLITE_TIMEOUT_SEK, isolation_level=None)
+    schluessel = str(pfad)
+    if schluessel not in _INITIALISIERT:
+        # WAL erlaubt gleichzeitiges Lesen, während ein anderer Prozess schreibt.
+        verbindung.execute("pragma journal_mode=wal")
+        verbindung.executescript(_SCHEMA)
+        with _LOCK:
+            _INITIALISIERT.add(schluessel)
+    return verbindung
+
+
+def lies_amboss_cache(tool: str, query: str, sprache: str, *, antwortformat: str) -> Optional[Any]:
+    """Liefert die gespeicherte Antwort oder ``None`` (abgelaufen, fehlend, Fehler)."""
+
+    ttl = _ttl_sek()
+    if ttl <= 0:
+        return None
+    schluessel = _schluessel(tool, query, sprache, antwortformat)
+    jetzt = time.time()
+    try:
+        verbindung = _verbinde()
+        try:
+            zeile = verbindung.execute(
+                "select daten, erstellt from antworten where schluessel = ?", (schluessel,)
+            ).fetchone()
+            if zeile is None:
+                _zaehle("fehlschlaege")
+                return None
+            daten, erstellt = zeile
+            if jetzt - erstellt > ttl:
+                verbindung.execute("delete from antworten where schluessel = ?", (schluessel,))
+                _zaehle("abgelaufen")
+                _zaehle("fehlschlaege")
+                return None
+            verbindung.execute(
+                "update antworten set zuletzt_genutzt = ? where schluessel = ?", (jetzt, schluessel)
+            )
+        finally:
+            verbindung.close()
+        ergebnis = json.loads(zlib.decompress(daten).decode("utf-8"))
+    except (sqlite3.Error, OSError, zlib.error, ValueError):
+        # Debug-Hinweis: ``st.write(get_amboss_cache_status())`` zeigt den Fehlerzähler.
+        _zaehle("fehler")
+        _zaehle("fehlschlaege")
+        return None
+    _zaehle("treffer")
+    return ergebnis
+
+
+def _verdraenge(verbindung: sqlite3.Connection, jetzt: float, ttl: float) -> int:
+    """Löscht abgelaufene und – bei Überschreitung der Größe – älteste Einträge."""
+
+    geloescht = verbindung.execute("delete from antworten where erstellt < ?", (jetzt - ttl,)).rowcount
+    max_bytes = _max_bytes()
+    (gesamt,) = verbindung.execute("select coalesce(sum(groesse), 0) from antworten").fetchone()
+    if gesamt <= max_bytes:
+        return geloescht
+    zu_loeschen = []
+    for schluessel, groesse in verbindung.execute(
+        "select schluessel, groesse from antworten order by zuletzt_genutzt"
+    ):
+        if gesamt <= max_bytes:
+            break
+        zu_loeschen.append((schluessel,))
+        gesamt -= groesse
+    verbindung.executemany("delete from antworten where schluessel = ?", zu_loeschen)
+    return geloescht + len(zu_loeschen)
+
+
+def schreibe_amboss_cache(
+    tool: str, query: str, sprache: str, antwort: Any, *, antwortformat: str
+) -> bool:
+    """Speichert eine vollständige MCP-Antwort; Rückgabe ``True`` bei Erfolg."""
+
+    ttl = _ttl_sek()
+    if ttl <= 0:
+        return False
+    try:
+        daten = zlib.compress(
+            json.dumps(antwort, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        )
+    except (TypeError, ValueError):
+        _zaehle("fehler")
+        return False
+    if len(daten) > _max_bytes():
+        return False
+    jetzt = time.time()
+    try:
+        verbindung = _verbinde()
+        try:
+            verbindung.execute("begin immediate")
+            verbindung.execute(
+                "insert or replace into antworten"
+                " (schluessel, tool, query, sprache, daten, groesse, erstellt, zuletzt_genutzt)"
+                " values (?, ?, ?, ?, ?, ?, ?, ?)",
+                (_schluessel(tool, query, sprache, antwortformat), tool, str(query), sprache, daten, len(daten), jetzt, jetzt),
+            )
+            verdraengt = _verdraenge(verbindung, jetzt, ttl)
+            verbindung.execute("commit")
+        finally:
+            verbindung.close()
+    except (sqlite3.Error, OSError):
+        _zaehle("fehler")
+        return False
+    _zaehle("geschrieben")
+    if verdraengt:
+        _zaehle("verdraengt", verdraengt)
+    return True
+
+
+def leere_amboss_cache() -> int:
+    """Löscht alle Einträge; Rückgabe ist die Anzahl gelöschter Einträge."""
+
+    try:
+        verbindung = _verbinde()
+        try:
+            return verbindung.execute("delete from antworten").rowcount
+        finally:
+            verbindung.close()
+    except (sqlite3.Error, OSError) as exc:
+        raise RuntimeError(f"AMBOSS-Cache konnte nicht geleert werden: {exc}") from exc
+
+
+def get_amboss_cache_status() -> Dict[str, Any]:
+    """Momentaufnahme für die Adminanzeige (Zähler seit Prozessstart, Dateiinhalt)."""
+
+    with _LOCK:
+        status: Dict[str, Any] = dict(_ZAEHLER)
+    anfragen = status["treffer"] + status["fehlschlaege"]
+    status.update(
+        {
+            "trefferquote": (status["treffer"] / anfragen) if anfragen else 0.0,
+            "pfad": str(_pfad()),
+            "ttl_sek": _ttl_sek(),
+            "max_bytes": _max_bytes(),
+            "eintraege": None,
+            "bytes": None,
+        }
+    )
+    try:
+        verbindung = _verbinde()
+        try:
+            status["eintraege"], status["bytes"] = verbindung.execute(
+                "select count(*), coalesce(sum(groesse), 0) from antworten"
+            ).fetchone()
+        finally:
+            verbindung.close()
+    except (sqlite3.Error, OSError):
+        pass
+    return status
@@ -0,0 +1,160 @@
+"""Mikro-Benchmark für die Rekonstruktion abgeschnittener AMBOSS-JSON-Fragmente.
+
+Vergleicht :func:`module.MCP_Amboss._recover_partial_json` (ein Durchlauf)
+mit dem bisherigen Verfahren, das jeden Präfix bis zu einem ``}``/``]`` von
+hinten einzeln mit ``json.loads`` prüfte. Die Nutzlasten ähneln einer
+``search_article_sections``-Antwort (Artikel mit Abschnitten, Escapes und
+Umlauten) und werden an mehreren Stellen abgeschnitten.
+
+Aufruf::
+
+    python -m module.amboss_json_benchmark
+    python -m module.amboss_json_benchmark --groessen-kb 64 512 2048 --referenz-bis-kb 128
+
+Ausgegeben werden je Größe die Median-Laufzeiten und ob ein Teilobjekt
+zurückkam.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Any, Callable, List, Optional, Sequence
+
+from module.MCP_Amboss import _recover_partial_json, _try_parse_json
+
+__all__ = ["erzeuge_payload", "miss_rekonstruktion"]
+
+_STANDARD_GROESSEN_KB = (16, 64, 256, 1024)
+# Schnittstellen relativ zur Länge der vollständigen Nutzlast.
+_SCHNITTE = (0.37, 0.73, 0.99)
+# Das bisherige Verfahren wächst quadratisch; darüber wird es standardmäßig übersprungen.
+_STANDARD_REFERENZ_BIS_KB = 256
+
+_WOERTER = (
+    "Ileus", "Peritonitis", "Sonographie", "Röntgen", "Abdomen", "Übelkeit",
+    "Erbrechen", "Laktat", "CRP", "Laparotomie", "Darmgeräusche", "„klingend“",
+)
+
+
+def _referenz_quadratisch(fragment: str) -> Optional[Any]:
+    """Bisheriges Verfahren (zum Vergleich): jeden Präfix von hinten parsen."""
+
+    stripped = fragment.strip()
+    if not stripped:
+        return None
+    candidate_indices = [index for index, char in enumerate(stripped) if char in {"}", "]"}]
+    for index in reversed(candidate_indices):
+        parsed = _try_parse_json(stripped[: index + 1])
+        if parsed is not None:
+            return parsed
+    return None
+
+
+def _absatz(zufall: random.Random, woerter: int) -> str:
+    text = " ".join(zufall.choice(_WOERTER) for _ in range(woerter))
+    return text + ' (siehe "Leitlinie")\n'
+
+
+def erzeuge_payload(ziel_bytes: int, *, seed: int = 0) -> str:
+    """Synthetische MCP-Antwort mit etwa ``ziel_bytes`` Bytes (UTF-8)."""
+
+    zufall = random.Random(seed)
+    artikel: List[dict] = []
+    groesse = 0
+    while groesse < ziel_bytes:
+        eintrag = {
+            "article_id": f"A{len(artikel):05d}",
+            "title": " ".join(zufall.choice(_WOERTER) for _ in range(3)),
+            "score": round(zufall.random(), 4),
+            "sections": [
+                {
+                    "section_id": f"S{len(artikel):05d}-{nummer}",
+                    "title": zufall.choice(_WOERTER),
+                    "content": _absatz(zufall, zufall.randint(20, 120)),
+                    "tags": [zufall.choice(_WOERTER) for _ in range(3)],
+                    "is_key_section": zufall.random() < 0.3,
+                }
+                for nummer in range(zufall.randint(2, 6))
+            ],
+        }
+        artikel.append(eintrag)
+        groesse += len(json.dumps(eintrag, ensure_ascii=False).encode("utf-8"))
+    return json.dumps(
+        {"jsonrpc": "2.0", "id": 1, "result": {"content": [{"type": "text", "text": {"results": artikel}}]}},
+        ensure_ascii=False,
+    )
+
+
+def _median_ms(funktion: Callable[[str], Any], fragment: str, wiederholungen: int) -> tuple[float, Any]:
+    dauern: List[float] = []
+    ergebnis: Any = None
+    for _ in range(wiederholungen):
+        start = time.perf_counter()
+        ergebnis = funktion(fragment)
+        dauern.append((time.perf_counter() - start) * 1000)
+    return statistics.median(dauern), ergebnis
+
+
+def miss_rekonstruktion(
+    groessen_kb: Sequence[int] = _STANDARD_GROESSEN_KB,
+    *,
+    wiederholungen: int = 3,
+    referenz_bis_kb: int = _STANDARD_REFERENZ_BIS_KB,
+) -> List[dict]:
+    """Misst beide Verfahren je Größe und Schnittstelle; liefert eine Zeile je Messung."""
+
+    zeilen: List[dict] = []
+    for groesse_kb in groessen_kb:
+        payload = erzeuge_payload(groesse_kb * 1024, seed=groesse_kb)
+        for anteil in _SCHNITTE:
+            fragment = payload[: int(len(payload) * anteil)]
+            neu_ms, neu = _median_ms(_recover_partial_json, fragment, wiederholungen)
+            zeile = {
+                "kb": groesse_kb,
+                "schnitt": anteil,
+                "zeichen": len(fragment),
+                "einpass_ms": neu_ms,
+                "einpass_objekt": neu is not None,
+                "referenz_ms": None,
+                "referenz_objekt": None,
+            }
+            if groesse_kb <= referenz_bis_kb:
+                zeile["referenz_ms"], referenz = _median_ms(_referenz_quadratisch, fragment, 1)
+                zeile["referenz_objekt"] = referenz is not None
+            zeilen.append(zeile)
+    return zeilen
+
+
+def _main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark der JSON-Fragment-Rekonstruktion.")
+    parser.add_argument("--groessen-kb", type=int, nargs="+", default=list(_STANDARD_GROESSEN_KB))
+    parser.add_argument("--wiederholungen", type=int, default=3)
+    parser.add_argument(
+        "--referenz-bis-kb",
+        type=int,
+        default=_STANDARD_REFERENZ_BIS_KB,
+        help="Bisheriges Verfahren nur bis zu dieser Größe messen (quadratische Laufzeit).",
+    )
+    args = parser.parse_args(argv)
+
+    print(f"{'KB':>6} {'Schnitt':>7} {'Zeichen':>9} {'Einpass ms':>11} {'Objekt':>6} {'Bisher ms':>10} {'Objekt':>6}")
+    for zeile in miss_rekonstruktion(
+        args.groessen_kb,
+        wiederholungen=max(1, args.wiederholungen),
+        referenz_bis_kb=args.referenz_bis_kb,
+    ):
+        referenz_ms = "–" if zeile["referenz_ms"] is None else f"{zeile['referenz_ms']:.1f}"
+        referenz_objekt = "–" if zeile["referenz_objekt"] is None else ("ja" if zeile["referenz_objekt"] else "nein")
+        print(
+            f"{zeile['kb']:>6} {zeile['schnitt']:>7.0%} {zeile['zeichen']:>9} {zeile['einpass_ms']:>11.1f} "
+            f"{'ja' if zeile['einpass_objekt'] else 'nein':>6} {referenz_ms:>10} {referenz_objekt:>6}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_main())
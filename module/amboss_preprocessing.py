@@ -8,8 +8,7 @@ from typing import Any, Optional
 
 import streamlit as st
 
-from module.token_counter import add_usage, init_token_counters
-from module.gpt_timing import messe_gpt_aktion
+from module.llm_gateway import LLMMessung, chat_completion, rufe_profil_auf
 
 # Session-State-Schlüssel, unter denen die verdichteten Informationen abgelegt werden.
 _SUMMARY_KEY = "amboss_payload_summary"
@@ -38,6 +37,58 @@ def _build_digest(serialized_payload: str, diagnose_szenario: str, patient_age:
     return hasher.hexdigest()
 
 
+def amboss_payload_digest(payload: Any, diagnose_szenario: str, patient_age: int) -> str:
+    """Digest einer AMBOSS-Nutzlast samt Fallkontext (auch ohne Session nutzbar).
+
+    Die Vorberechnung (``module/amboss_vorberechnung.py``) speichert ihn in
+    ``fallbeispiele.amboss_digest``, um unveränderte Inhalte zu überspringen.
+    """
+
+    return _build_digest(_serialize_payload(payload), diagnose_szenario, patient_age)
+
+
+def _build_summary_messages(serialized_payload: str, diagnose_szenario: str, patient_age: int) -> list[dict[str, str]]:
+    """Baut die Nachrichten für die Verdichtung der AMBOSS-Nutzlast."""
+
+    prompt = (
+        "Du bist medizinische*r Content-Kurator*in. Verdichte die folgenden AMBOSS-Daten "
+        "für einen digitalen Prüfer. Konzentriere dich auf anamnestische, diagnostische "
+        "und therapeutische Kernaussagen sowie auf die wichtigsten Differentialdiagnosen "
+        "mit ihrer Abgrenzung zur Hauptdiagnose."
+        "\n\n"
+        f"Fallkontext Szenario = {diagnose_szenario}. Nur zur Information, nicht in Antwort übernehmen: Alter = {patient_age} Jahre."
+        "\n\n"
+        "Erstelle fünf kurze Abschnitte mit fett formatierten Überschriften:"
+        "\n1. Anamnese & Klinik"
+        "\n2. Diagnostik"
+        "\n3. Therapie"
+        "\n4. Kontraindizierte Diagnostik und Therapie, typische Fehler bei Diagnostik und Therapie"
+        "\n5. Differentialdiagnosen"
+        "\nNutze Stichpunkte oder komprimierte Sätze, "
+        "ohne inhaltliche Details zu streichen."
+        "\n\nAMBOSS-JSON:"
+        f"\n{serialized_payload}"
+    )
+    return [{"role": "user", "content": prompt}]
+
+
+def fasse_amboss_payload_zusammen(
+    client,
+    payload: Any,
+    *,
+    diagnose_szenario: str,
+    patient_age: int,
+) -> tuple[str, LLMMessung]:
+    """Verdichtet eine AMBOSS-Nutzlast ohne Session-Zugriffe (threadsicher).
+
+    Tokens und Laufzeit verbucht der Aufrufer anhand der gelieferten Messung.
+    """
+
+    messages = _build_summary_messages(_serialize_payload(payload), diagnose_szenario, patient_age)
+    response, messung = rufe_profil_auf("amboss_summary", messages, client=client)
+    return (response.choices[0].message.content or "").strip(), messung
+
+
 def clear_cached_summary() -> None:
     """Entfernt gespeicherte Zusammenfassungen aus dem Session State."""
 
@@ -71,40 +122,12 @@ def ensure_amboss_summary(
     if cached_digest == digest:
         return st.session_state.get(_SUMMARY_KEY)
 
-    prompt = (
-        "Du bist medizinische*r Content-Kurator*in. Verdichte die folgenden AMBOSS-Daten "
-        "für einen digitalen Prüfer. Konzentriere dich auf anamnestische, diagnostische "
-        "und therapeutische Kernaussagen sowie auf die wichtigsten Differentialdiagnosen "
-        "mit ihrer Abgrenzung zur Hauptdiagnose."
-        "\n\n"
-        f"Fallkontext Szenario = {diagnose_szenario}. Nur zur Information, nicht in Antwort übernehmen: Alter = {patient_age} Jahre."
-        "\n\n"
-        "Erstelle fünf kurze Abschnitte mit fett formatierten Überschriften:"
-        "\n1. Anamnese & Klinik"
-        "\n2. Diagnostik"
-        "\n3. Therapie"
-        "\n4. Kontraindizierte Diagnostik und Therapie, typische Fehler bei Diagnostik und Therapie"
-        "\n5. Differentialdiagnosen"
-        "\nNutze Stichpunkte oder komprimierte Sätze, "
-        "ohne inhaltliche Details zu streichen."
-        "\n\nAMBOSS-JSON:"
-        f"\n{serialized}"
-    )
-
-    init_token_counters()
-    response = messe_gpt_aktion(
-        lambda: client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-        ),
+    response = chat_completion(
+        "amboss_summary",
+        _build_summary_messages(serialized, diagnose_szenario, patient_age),
+        client=client,
         kontext="AMBOSS-Summary",
     )
-    add_usage(
-        prompt_tokens=response.usage.prompt_tokens,
-        completion_tokens=response.usage.completion_tokens,
-        total_tokens=response.usage.total_tokens,
-    )
 
     summary = response.choices[0].message.content.strip()
     st.session_state[_SUMMARY_KEY] = summary
@@ -113,7 +136,9 @@ def ensure_amboss_summary(
 
 
 __all__ = [
+    "amboss_payload_digest",
     "clear_cached_summary",
     "ensure_amboss_summary",
+    "fasse_amboss_payload_zusammen",
     "get_cached_summary",
 ]
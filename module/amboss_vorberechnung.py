@@ -0,0 +1,285 @@
+"""Vorberechnung der AMBOSS-Zusammenfassungen für alle Fallbeispiele.
+
+Bisher entstand ``amboss_input`` ausschließlich beim Sitzungsstart: Je nach
+Abrufmodus ruft ``fallauswahl_prompt`` den AMBOSS-MCP ab und verdichtet die
+Antwort anschließend per GPT, während die Studierenden auf der Startseite
+warten. Dieser Job erledigt das vorab und ohne Streamlit-Oberfläche:
+
+- Er geht alle Zeilen der Tabelle ``fallbeispiele`` durch (oder nur die per
+  ``--fall-id`` gewählten) und ruft den MCP mit begrenzter Parallelität ab
+  (``--worker``, Standard 4).
+- Über die Antwort wird derselbe Digest gebildet wie in
+  ``module/amboss_preprocessing.py`` (Nutzlast, Szenario, Alter). Stimmt er mit
+  ``fallbeispiele.amboss_digest`` überein und ist ``amboss_input`` gefüllt,
+  entfällt die GPT-Zusammenfassung.
+- Sonst wird zusammengefasst und ``amboss_input`` samt Digest direkt (nicht über
+  die Write-behind-Warteschlange) geschrieben, damit beim Prozessende nichts
+  verloren geht. Laufende App-Prozesse übernehmen den neuen Text über den
+  Fallbeispiel-Cache (``updated_at``-Signatur) spätestens nach zwei Minuten.
+- Unvollständige MCP-Antworten (abgebrochener Stream) überschreiben nie einen
+  vorhandenen Text.
+
+Aufruf aus dem Projektverzeichnis (liest ``.streamlit/secrets.toml`` sowie
+``OPENAI_API_KEY``)::
+
+    python -m module.amboss_vorberechnung --worker 4
+    python -m module.amboss_vorberechnung --fall-id 12 --fall-id 15 --erzwingen
+    python -m module.amboss_vorberechnung --trocken
+
+Fehlt die Spalte ``amboss_digest`` noch, wird bei jedem Lauf neu
+zusammengefasst (siehe SQL im README).
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from module.amboss_preprocessing import amboss_payload_digest, fasse_amboss_payload_zusammen
+from module.MCP_Amboss import call_amboss_search
+from module.openai_client import get_openai_client
+from module.supabase_client import get_supabase_client
+from module.supabase_schema import get_tabellenspalten
+
+__all__ = [
+    "VorberechnungsErgebnis",
+    "aktualisiere_amboss_fall",
+    "berechne_amboss_vor",
+]
+
+_FALL_TABLE_NAME = "fallbeispiele"
+_DIGEST_SPALTE = "amboss_digest"
+_STANDARD_WORKER = 4
+
+# Statuswerte je Fall; die Reihenfolge bestimmt die Ausgabe der Zusammenfassung.
+STATUS_AKTUALISIERT = "aktualisiert"
+STATUS_UNVERAENDERT = "unveraendert"
+STATUS_TROCKEN = "trocken"
+STATUS_UEBERSPRUNGEN = "uebersprungen"
+STATUS_FEHLER = "fehler"
+_STATUS_REIHENFOLGE = (
+    STATUS_AKTUALISIERT,
+    STATUS_UNVERAENDERT,
+    STATUS_TROCKEN,
+    STATUS_UEBERSPRUNGEN,
+    STATUS_FEHLER,
+)
+
+
+@dataclass
+class VorberechnungsErgebnis:
+    """Ergebnis der Vorberechnung für genau einen Fall."""
+
+    fall_id: Any
+    szenario: str
+    status: str
+    hinweis: str
+    dauer_sek: float = 0.0
+    gpt_sek: float = 0.0
+
+
+def _lade_faelle(client: Any, fall_ids: Iterable[int], mit_digest: bool) -> List[Dict[str, Any]]:
+    spalten = "id, szenario, alter, amboss_input"
+    if mit_digest:
+        spalten += f", {_DIGEST_SPALTE}"
+    abfrage = client.table(_FALL_TABLE_NAME).select(spalten).order("id")
+    ids = sorted({int(fall_id) for fall_id in fall_ids})
+    if ids:
+        abfrage = abfrage.in_("id", ids)
+    response = abfrage.execute()
+    if getattr(response, "error", None):
+        raise RuntimeError(f"Supabase meldet einen Fehler: {response.error}")
+    return list(response.data or [])
+
+
+def _ist_unvollstaendig(payload: Any) -> bool:
+    meta = payload.get("meta") if isinstance(payload, dict) else None
+    return bool(isinstance(meta, dict) and meta.get("unvollstaendig"))
+
+
+def _bearbeite_fall(
+    zeile: Dict[str, Any],
+    *,
+    supabase: Any,
+    openai_client: Any,
+    token: Optional[str],
+    mit_digest: bool,
+    erzwingen: bool,
+    trocken: bool,
+    cache_lesen: bool,
+) -> VorberechnungsErgebnis:
+    """Worker: Abruf, Digest-Vergleich, Zusammenfassung und Speichern eines Falls."""
+
+    start = time.monotonic()
+    fall_id = zeile.get("id")
+    szenario = str(zeile.get("szenario") or "").strip()
+
+    def ergebnis(status: str, hinweis: str, gpt_sek: float = 0.0) -> VorberechnungsErgebnis:
+        return VorberechnungsErgebnis(fall_id, szenario, status, hinweis, time.monotonic() - start, gpt_sek)
+
+    if not szenario:
+        return ergebnis(STATUS_UEBERSPRUNGEN, "Kein Szenariotext hinterlegt.")
+    try:
+        alter = int(float(zeile.get("alter")))
+    except (TypeError, ValueError):
+        # Wie beim Sitzungsstart: ohne Alter keine Zusammenfassung.
+        return ergebnis(STATUS_UEBERSPRUNGEN, "Kein Alter hinterlegt.")
+
+    try:
+        payload = call_amboss_search(query=szenario, token=token, cache_lesen=cache_lesen)
+    except Exception as exc:
+        return ergebnis(STATUS_FEHLER, f"MCP-Abruf fehlgeschlagen: {exc}")
+    if not payload or _ist_unvollstaendig(payload):
+        return ergebnis(STATUS_FEHLER, "MCP-Antwort leer oder unvollständig – vorhandener Text bleibt erhalten.")
+
+    digest = amboss_payload_digest(payload, szenario, alter)
+    vorhanden = str(zeile.get("amboss_input") or "").strip()
+    if not erzwingen and vorhanden and zeile.get(_DIGEST_SPALTE) == digest:
+        return ergebnis(STATUS_UNVERAENDERT, "AMBOSS-Inhalt unverändert.")
+
+    try:
+        text, messung = fasse_amboss_payload_zusammen(
+            openai_client,
+            payload,
+            diagnose_szenario=szenario,
+            patient_age=alter,
+        )
+    except Exception as exc:
+        return ergebnis(STATUS_FEHLER, f"GPT-Zusammenfassung fehlgeschlagen: {exc}")
+    if not text:
+        return ergebnis(STATUS_FEHLER, "GPT lieferte keinen Text.", messung.dauer_sek)
+    if trocken:
+        return ergebnis(STATUS_TROCKEN, f"{len(text)} Zeichen erzeugt, nicht gespeichert.", messung.dauer_sek)
+
+    aenderung: Dict[str, Any] = {"amboss_input": text}
+    if mit_digest:
+        aenderung[_DIGEST_SPALTE] = digest
+    try:
+        response = supabase.table(_FALL_TABLE_NAME).update(aenderung).eq("id", fall_id).execute()
+    except Exception as exc:
+        return ergebnis(STATUS_FEHLER, f"Speichern in Supabase fehlgeschlagen: {exc}", messung.dauer_sek)
+    if getattr(response, "error", None):
+        return ergebnis(STATUS_FEHLER, f"Supabase meldet einen Fehler: {response.error}", messung.dauer_sek)
+    return ergebnis(STATUS_AKTUALISIERT, f"{len(text)} Zeichen gespeichert.", messung.dauer_sek)
+
+
+def _digest_spalte_vorhanden(supabase: Any) -> bool:
+    spalten = get_tabellenspalten(supabase, _FALL_TABLE_NAME)
+    # Unbekanntes Schema: lieber ohne Digest arbeiten als am Select scheitern.
+    return spalten is not None and _DIGEST_SPALTE in spalten
+
+
+def aktualisiere_amboss_fall(zeile: Dict[str, Any], *, erzwingen: bool = False) -> VorberechnungsErgebnis:
+    """Aktualisiert ``amboss_input`` eines einzelnen Falls (z. B. aus dem Hintergrund-Pool).
+
+    ``zeile`` enthält die Supabase-Spalten ``id``, ``szenario``, ``alter``,
+    ``amboss_input`` und – falls vorhanden – ``amboss_digest``. Die MCP-Antwort
+    darf aus dem Festplatten-Cache stammen.
+    """
+
+    supabase = get_supabase_client()
+    return _bearbeite_fall(
+        zeile,
+        supabase=supabase,
+        openai_client=get_openai_client(),
+        token=None,
+        mit_digest=_digest_spalte_vorhanden(supabase),
+        erzwingen=erzwingen,
+        trocken=False,
+        cache_lesen=True,
+    )
+
+
+def berechne_amboss_vor(
+    *,
+    fall_ids: Iterable[int] = (),
+    worker: int = _STANDARD_WORKER,
+    erzwingen: bool = False,
+    trocken: bool = False,
+    cache_lesen: bool = False,
+    token: Optional[str] = None,
+    fortschritt: Optional[Callable[[VorberechnungsErgebnis], None]] = None,
+) -> List[VorberechnungsErgebnis]:
+    """Berechnet ``amboss_input`` für alle (bzw. die gewählten) Fälle vor.
+
+    Standardmäßig wird der MCP unabhängig vom Festplatten-Cache neu abgefragt,
+    damit geänderte Inhalte auffallen (der Cache wird dabei aufgefrischt).
+    ``fortschritt`` erhält jedes Einzelergebnis, sobald es vorliegt. Ein
+    Streamlit-Skriptlauf ist nicht nötig; die Session-State-Einträge von
+    ``call_amboss_search`` bleiben dann wirkungslos.
+    """
+
+    supabase = get_supabase_client()
+    openai_client = get_openai_client()
+    mit_digest = _digest_spalte_vorhanden(supabase)
+    faelle = _lade_faelle(supabase, fall_ids, mit_digest)
+
+    ergebnisse: List[VorberechnungsErgebnis] = []
+    with ThreadPoolExecutor(max_workers=max(1, int(worker)), thread_name_prefix="amboss-vorberechnung") as executor:
+        futures = [
+            executor.submit(
+                _bearbeite_fall,
+                zeile,
+                supabase=supabase,
+                openai_client=openai_client,
+                token=token,
+                mit_digest=mit_digest,
+                erzwingen=erzwingen,
+                trocken=trocken,
+                cache_lesen=cache_lesen,
+            )
+            for zeile in faelle
+        ]
+        for future in as_completed(futures):
+            ergebnis = future.result()
+            ergebnisse.append(ergebnis)
+            if fortschritt is not None:
+                fortschritt(ergebnis)
+    return ergebnisse
+
+
+def _main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(
+        description="Berechnet die AMBOSS-Zusammenfassungen (fallbeispiele.amboss_input) für alle Fälle vor."
+    )
+    parser.add_argument("--fall-id", type=int, action="append", default=[], help="Nur diesen Fall bearbeiten (mehrfach möglich).")
+    parser.add_argument("--worker", type=int, default=_STANDARD_WORKER, help="Anzahl gleichzeitiger Fälle.")
+    parser.add_argument("--erzwingen", action="store_true", help="Auch bei unverändertem Digest neu zusammenfassen.")
+    parser.add_argument("--trocken", action="store_true", help="Zusammenfassen, aber nichts speichern.")
+    parser.add_argument("--cache", action="store_true", help="MCP-Antworten aus dem Festplatten-Cache verwenden.")
+    parser.add_argument("--token", default=os.environ.get("Amboss_Token"), help="AMBOSS Bearer token (sonst st.secrets).")
+    args = parser.parse_args(argv)
+
+    def melde(ergebnis: VorberechnungsErgebnis) -> None:
+        print(
+            f"[{ergebnis.status:<13}] #{ergebnis.fall_id} {ergebnis.szenario} "
+            f"({ergebnis.dauer_sek:.1f} s) – {ergebnis.hinweis}",
+            flush=True,
+        )
+
+    start = time.monotonic()
+    ergebnisse = berechne_amboss_vor(
+        fall_ids=args.fall_id,
+        worker=args.worker,
+        erzwingen=args.erzwingen,
+        trocken=args.trocken,
+        cache_lesen=args.cache,
+        token=args.token,
+        fortschritt=melde,
+    )
+    zaehler = {status: 0 for status in _STATUS_REIHENFOLGE}
+    for ergebnis in ergebnisse:
+        zaehler[ergebnis.status] = zaehler.get(ergebnis.status, 0) + 1
+    teile = [f"{status}: {anzahl}" for status, anzahl in zaehler.items() if anzahl]
+    teile.append(f"GPT gesamt {sum(ergebnis.gpt_sek for ergebnis in ergebnisse):.1f} s")
+    print(f"{len(ergebnisse)} Fälle in {time.monotonic() - start:.1f} s ({', '.join(teile)})")
+    return 1 if zaehler[STATUS_FEHLER] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_main())
@@ -0,0 +1,201 @@
+"""Verlaufsverwaltung für lange Anamnese-Gespräche.
+
+Der Anamnese-Chat schickt bei jeder Frage den kompletten Nachrichtenverlauf an
+das Sprachmodell. Bei langen Sitzungen wachsen die Prompt-Tokens dadurch
+quadratisch. Dieses Modul baut deshalb eine kompakte Anfrage: Der
+``SYSTEM_PROMPT`` und die letzten Gesprächsrunden bleiben wörtlich erhalten,
+ältere Runden werden in eine laufende Zusammenfassung der bereits genannten
+Patientenangaben überführt. Der vollständige Verlauf in
+``st.session_state.messages`` bleibt unverändert, damit Anzeige, Feedback und
+Supabase-Speicherung weiterhin alle Aussagen sehen.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import streamlit as st
+
+from module.llm_gateway import chat_completion
+from module.token_counter import add_saved_tokens
+
+__all__ = [
+    "ANAMNESE_TOKEN_BUDGET",
+    "ANAMNESE_VERBATIM_RUNDEN",
+    "baue_kompakten_verlauf",
+]
+
+# Obergrenze (geschätzte Tokens) für die Anfrage an das Chatmodell. Erst wenn der
+# Verlauf diese Grenze überschreitet, werden ältere Runden zusammengefasst.
+ANAMNESE_TOKEN_BUDGET = 3000
+# Anzahl der Frage-Antwort-Runden, die immer wörtlich mitgeschickt werden.
+ANAMNESE_VERBATIM_RUNDEN = 6
+
+# Beide Schlüssel werden beim Fallwechsel über ``_FALL_SESSION_KEYS`` in
+# ``module/fallverwaltung.py`` entfernt.
+_SESSION_KEY_SUMMARY = "anamnese_zusammenfassung"
+_SESSION_KEY_SUMMARY_BIS = "anamnese_zusammenfassung_bis"
+# Fehlschläge der Zusammenfassung gelten für die ganze Sitzung (nicht pro Fall),
+# weil sie meist auf ein gestörtes Modell bzw. Rate-Limits zurückgehen.
+_SESSION_KEY_FEHLSCHLAEGE = "anamnese_zusammenfassung_fehlschlaege"
+_SESSION_KEY_PAUSE_BIS = "anamnese_zusammenfassung_pause_bis"
+
+# Wartezeit nach dem ersten Fehlschlag; verdoppelt sich bis zur Obergrenze.
+_PAUSE_BASIS_SEK = 30.0
+_PAUSE_MAX_SEK = 600.0
+
+_SUMMARY_PROMPT = (
+    "Du fasst ein laufendes Anamnesegespräch zwischen Medizinstudierenden und einer "
+    "simulierten Patientin bzw. einem simulierten Patienten zusammen. Halte stichpunktartig "
+    "alle Fakten fest, die die Patientenrolle bereits genannt hat (Beschwerden, Verlauf, "
+    "Vorerkrankungen, Medikamente, Sozialanamnese usw.), sowie die bereits gestellten Fragen. "
+    "Erfinde nichts hinzu und bewerte nichts. Ergänze eine vorhandene Zusammenfassung, "
+    "statt sie zu verwerfen."
+)
+
+
+def _schaetze_tokens(text: str) -> int:
+    """Grobe Token-Schätzung (ca. vier Zeichen pro Token für deutsche Texte)."""
+
+    return max(1, len(text) // 4) if text else 0
+
+
+def _schaetze_nachrichten(nachrichten: list[dict[str, Any]]) -> int:
+    # Pro Nachricht kommen einige Tokens für Rolle und Trennzeichen hinzu.
+    return sum(_schaetze_tokens(str(msg.get("content", ""))) + 4 for msg in nachrichten)
+
+
+def _formatiere_runden(nachrichten: list[dict[str, Any]]) -> str:
+    patient_name = st.session_state.get("patient_name", "Patient")
+    return "\n".join(
+        f"Studierende: {msg['content']}" if msg["role"] == "user" else f"{patient_name}: {msg['content']}"
+        for msg in nachrichten
+    )
+
+
+def _aktualisiere_zusammenfassung(
+    client: Any, bisherige_zusammenfassung: str, neue_runden: list[dict[str, Any]]
+) -> str:
+    """Ergänzt die laufende Zusammenfassung um weitere Gesprächsrunden."""
+
+    inhalt = (
+        f"Bisherige Zusammenfassung:\n{bisherige_zusammenfassung or '(noch keine)'}\n\n"
+        f"Neue Gesprächsrunden:\n{_formatiere_runden(neue_runden)}"
+    )
+    response = chat_completion(
+        "anamnese_zusammenfassung",
+        [
+            {"role": "system", "content": _SUMMARY_PROMPT},
+            {"role": "user", "content": inhalt},
+        ],
+        client=client,
+        kontext="Anamnese-Zusammenfassung",
+    )
+    return (response.choices[0].message.content or "").strip()
+
+
+def _baue_anfrage(
+    system_nachricht: dict[str, Any], zusammenfassung: str, offen: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    anfrage = [system_nachricht]
+    if zusammenfassung:
+        anfrage.append(
+            {
+                "role": "system",
+                "content": (
+                    "Zusammenfassung des bisherigen Gesprächs (bereits genannte Angaben, "
+                    "bleibe konsistent dazu):\n" + zusammenfassung
+                ),
+            }
+        )
+    anfrage.extend(offen)
+    return anfrage
+
+
+def _merke_fehlschlag() -> None:
+    """Verlängert die Pause bis zum nächsten Zusammenfassungsversuch exponentiell."""
+
+    fehlschlaege = int(st.session_state.get(_SESSION_KEY_FEHLSCHLAEGE, 0) or 0) + 1
+    pause = min(_PAUSE_MAX_SEK, _PAUSE_BASIS_SEK * 2 ** (fehlschlaege - 1))
+    st.session_state[_SESSION_KEY_FEHLSCHLAEGE] = fehlschlaege
+    st.session_state[_SESSION_KEY_PAUSE_BIS] = time.monotonic() + pause
+
+
+def _notfall_anfrage(
+    nachrichten: list[dict[str, Any]],
+    system_nachricht: dict[str, Any],
+    zusammenfassung: str,
+    letzte_runden: list[dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """Anfrage ohne neue Zusammenfassung: ältere, noch offene Runden entfallen."""
+
+    anfrage = _baue_anfrage(system_nachricht, zusammenfassung, letzte_runden)
+    add_saved_tokens(_schaetze_nachrichten(nachrichten) - _schaetze_nachrichten(anfrage))
+    return anfrage
+
+
+def baue_kompakten_verlauf(
+    client: Any,
+    nachrichten: list[dict[str, Any]],
+    *,
+    token_budget: int = ANAMNESE_TOKEN_BUDGET,
+    verbatim_runden: int = ANAMNESE_VERBATIM_RUNDEN,
+) -> list[dict[str, Any]]:
+    """Liefert die Nachrichtenliste, die tatsächlich an das Chatmodell geht.
+
+    Solange der Verlauf unter ``token_budget`` bleibt, wird er unverändert
+    verwendet. Andernfalls werden alle Runden vor den letzten
+    ``verbatim_runden`` in die Zusammenfassung übernommen. Die Zusammenfassung
+    wird im Session-State zwischengespeichert und nur um neu herausfallende
+    Runden ergänzt. Schlägt das fehl, gehen nur Zusammenfassung und die
+    letzten Runden an das Modell, und weitere Versuche pausieren mit
+    wachsendem Abstand. Die eingesparten Tokens werden über
+    :func:`module.token_counter.add_saved_tokens` protokolliert.
+
+    Debug-Hinweis: ``st.write(baue_kompakten_verlauf(client, st.session_state.messages))``
+    zeigt die tatsächlich gesendete Anfrage an.
+    """
+
+    if not nachrichten:
+        return nachrichten
+
+    system_nachricht, verlauf = nachrichten[0], nachrichten[1:]
+    zusammenfassung = str(st.session_state.get(_SESSION_KEY_SUMMARY, "") or "")
+    bis = int(st.session_state.get(_SESSION_KEY_SUMMARY_BIS, 0) or 0)
+    if bis > len(verlauf):
+        # Der Verlauf wurde zurückgesetzt – die alte Zusammenfassung ist ungültig.
+        zusammenfassung, bis = "", 0
+
+    anfrage = _baue_anfrage(system_nachricht, zusammenfassung, verlauf[bis:])
+    if _schaetze_nachrichten(anfrage) > token_budget:
+        neues_bis = len(verlauf) - 2 * max(1, verbatim_runden)
+        if neues_bis > bis:
+            if time.monotonic() < float(st.session_state.get(_SESSION_KEY_PAUSE_BIS, 0.0) or 0.0):
+                # Nach einem Fehlschlag wird die Zusammenfassung eine Weile nicht
+                # erneut versucht, damit nicht jede Chatantwort auf einen weiteren
+                # blockierenden Aufruf wartet.
+                return _notfall_anfrage(nachrichten, system_nachricht, zusammenfassung, verlauf[neues_bis:])
+            try:
+                zusammenfassung = _aktualisiere_zusammenfassung(
+                    client, zusammenfassung, verlauf[bis:neues_bis]
+                )
+            except Exception:
+                # Schlägt die Zusammenfassung fehl, bleibt die Anfrage trotzdem im
+                # Budget: bisherige Zusammenfassung plus die letzten Runden. Die
+                # noch nicht zusammengefassten Runden werden beim nächsten Versuch
+                # nachgeholt. Für Debugging kann hier ``st.write(...)`` mit der
+                # Exception aktiviert werden.
+                _merke_fehlschlag()
+                return _notfall_anfrage(nachrichten, system_nachricht, zusammenfassung, verlauf[neues_bis:])
+            st.session_state.pop(_SESSION_KEY_FEHLSCHLAEGE, None)
+            st.session_state.pop(_SESSION_KEY_PAUSE_BIS, None)
+            bis = neues_bis
+            st.session_state[_SESSION_KEY_SUMMARY] = zusammenfassung
+            st.session_state[_SESSION_KEY_SUMMARY_BIS] = bis
+            anfrage = _baue_anfrage(system_nachricht, zusammenfassung, verlauf[bis:])
+
+    if bis:
+        add_saved_tokens(_schaetze_nachrichten(nachrichten) - _schaetze_nachrichten(anfrage))
+    return anfrage
+
@@ -0,0 +1,235 @@
+"""Vorabruf der Feedback-Detailtexte im Hintergrund (opt-in).
+
+Ohne Vorabruf entsteht ein Detailtext erst, wenn Studierende auf „Mehr
+Details“ klicken – jeder Klick kostet dann mehrere Sekunden. Ist der Vorabruf
+im Adminbereich aktiviert, erzeugt ein prozessweit begrenzter Thread-Pool die
+Texte aller Unterpunkte direkt nach dem kompakten Feedback.
+
+Abgrenzung der Zuständigkeiten:
+- Prompts werden im Hauptthread gebaut (``module/feedback_detail.py``); die
+  Worker greifen nie auf den Session-State zu.
+- Aufrufe laufen über das LLM-Gateway in der Spur ``hintergrund`` des
+  Ratenbegrenzers und verdrängen damit weder Chat noch Abschlussfeedback.
+- Fertige Ergebnisse holt der Hauptthread beim nächsten Rerun über
+  :meth:`DetailVorabruf.fertige_ergebnisse` ab und verbucht dort Tokens und
+  Laufzeiten.
+- :meth:`DetailVorabruf.abbrechen` verwirft noch nicht gestartete Aufrufe und
+  überspringt wartende (z. B. bei Fallwechsel oder deaktiviertem Vorabruf).
+
+Prozessweite Kennzahlen (erzeugt, geöffnet, Tokens) zeigt der Adminbereich;
+daraus lässt sich ablesen, wie viel die zusätzlichen Tokens tatsächlich nützen.
+Die Aufrufe laufen im prozessweiten Hintergrund-Pool
+(``module/hintergrund_pool.py``) in dessen Spur ``hintergrund``; Pipeline und
+spekulatives Abschlussfeedback werden dort zuerst bedient.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import CancelledError, Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from module.hintergrund_pool import aktueller_absender, get_hintergrund_pool
+from module.llm_gateway import LLMMessung, LLMProfil, rufe_profil_auf
+from module.rate_limiter import LANE_HINTERGRUND
+from module.token_counter import lese_cached_tokens
+
+__all__ = [
+    "DetailVorabruf",
+    "VorabrufErgebnis",
+    "get_vorabruf_status",
+]
+
+_STATISTIK_LOCK = threading.Lock()
+_STATISTIK: Dict[str, int] = {
+    "geplant": 0,
+    "erzeugt": 0,
+    "aus_cache": 0,
+    "fehler": 0,
+    "abgebrochen": 0,
+    "geoeffnet": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+}
+
+
+class _Abgebrochen(Exception):
+    """Der Vorabruf wurde vor dem Modellaufruf abgebrochen."""
+
+
+@dataclass
+class VorabrufErgebnis:
+    """Fertiger Detailtext samt Verbrauchsdaten für die Verbuchung im Hauptthread."""
+
+    text: str
+    messung: LLMMessung
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cached_tokens: int = 0
+
+
+def _zaehle(**werte: int) -> None:
+    with _STATISTIK_LOCK:
+        for name, wert in werte.items():
+            _STATISTIK[name] += wert
+
+
+def _erzeuge(
+    profil: LLMProfil,
+    messages: List[Dict[str, Any]],
+    abbruch: threading.Event,
+    bei_erfolg: Optional[Callable[[str], None]],
+) -> VorabrufErgebnis:
+    """Worker: erzeugt einen Detailtext ohne Session-Zugriffe."""
+
+    if abbruch.is_set():
+        raise _Abgebrochen()
+    response, messung = rufe_profil_auf(profil, messages)
+    text = (response.choices[0].message.content or "").strip()
+    usage = getattr(response, "usage", None)
+    ergebnis = VorabrufErgebnis(
+        text=text,
+        messung=messung,
+        prompt_tokens=int(getattr(usage, "prompt_tokens", 0) or 0),
+        completion_tokens=int(getattr(usage, "completion_tokens", 0) or 0),
+        total_tokens=int(getattr(usage, "total_tokens", 0) or 0),
+        cached_tokens=lese_cached_tokens(usage) if usage is not None else 0,
+    )
+    _zaehle(erzeugt=1, prompt_tokens=ergebnis.prompt_tokens, completion_tokens=ergebnis.completion_tokens)
+    if text and bei_erfolg is not None:
+        # z. B. Supabase-Cache schreiben; Fehler dürfen das Ergebnis nicht verwerfen.
+        try:
+            bei_erfolg(text)
+        except Exception:
+            pass
+    return ergebnis
+
+
+class DetailVorabruf:
+    """Vorabruf einer Sitzung für genau ein Feedback (identifiziert über ``signatur``)."""
+
+    def __init__(self, signatur: Tuple[str, ...]) -> None:
+        self.signatur = signatur
+        self._abbruch = threading.Event()
+        self._futures: Dict[str, Future] = {}
+        self._abgeholt: Set[str] = set()
+        self._vorab: Set[str] = set()
+        self._geoeffnet: Set[str] = set()
+
+    def plane(
+        self,
+        cache_key: str,
+        profil: LLMProfil,
+        messages: List[Dict[str, Any]],
+        *,
+        bei_erfolg: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """Reiht die Erzeugung eines Detailtexts in den Pool ein."""
+
+        if self._abbruch.is_set() or cache_key in self._futures:
+            return
+        self._futures[cache_key] = get_hintergrund_pool().submit(
+            _erzeuge,
+            profil,
+            list(messages),
+            self._abbruch,
+            bei_erfolg,
+            absender=aktueller_absender(),
+            spur=LANE_HINTERGRUND,
+            art="detail_vorabruf",
+        )
+        self._vorab.add(cache_key)
+        _zaehle(geplant=1)
+
+    def markiere_aus_cache(self, cache_key: str) -> None:
+        """Vermerkt einen Text, der ohne Modellaufruf aus dem Supabase-Cache kam."""
+
+        if cache_key not in self._vorab:
+            self._vorab.add(cache_key)
+            _zaehle(aus_cache=1)
+
+    def ist_vorab(self, cache_key: str) -> bool:
+        return cache_key in self._vorab
+
+    def ist_ausstehend(self, cache_key: str) -> bool:
+        future = self._futures.get(cache_key)
+        return future is not None and cache_key not in self._abgeholt and not future.cancelled()
+
+    def markiere_geoeffnet(self, cache_key: str) -> None:
+        """Zählt einmalig, dass ein vorab geladener Text tatsächlich geöffnet wurde."""
+
+        if cache_key in self._vorab and cache_key not in self._geoeffnet:
+            self._geoeffnet.add(cache_key)
+            _zaehle(geoeffnet=1)
+
+    def _abholen(self, cache_key: str, future: Future) -> Optional[VorabrufErgebnis]:
+        self._abgeholt.add(cache_key)
+        try:
+            return future.result(timeout=0)
+        except CancelledError:
+            self._vorab.discard(cache_key)
+            return None
+        except _Abgebrochen:
+            self._vorab.discard(cache_key)
+            _zaehle(abgebrochen=1)
+            return None
+        except Exception:
+            # Der Klick erzeugt den Text dann regulär im Vordergrund.
+            self._vorab.discard(cache_key)
+            _zaehle(fehler=1)
+            return None
+
+    def fertige_ergebnisse(self) -> Dict[str, VorabrufErgebnis]:
+        """Liefert alle seit dem letzten Aufruf fertig gewordenen Texte (je Key genau einmal)."""
+
+        fertig: Dict[str, VorabrufErgebnis] = {}
+        for cache_key, future in self._futures.items():
+            if cache_key in self._abgeholt or not future.done():
+                continue
+            ergebnis = self._abholen(cache_key, future)
+            if ergebnis is not None and ergebnis.text:
+                fertig[cache_key] = ergebnis
+        return fertig
+
+    def warte_auf(self, cache_key: str, timeout: float) -> Optional[VorabrufErgebnis]:
+        """Wartet auf einen bereits laufenden Vorabruf, statt doppelt zu erzeugen."""
+
+        future = self._futures.get(cache_key)
+        if future is None or cache_key in self._abgeholt:
+            return None
+        try:
+            future.exception(timeout=timeout)
+        except CancelledError:
+            pass
+        except FutureTimeoutError:
+            return None
+        ergebnis = self._abholen(cache_key, future)
+        return ergebnis if ergebnis is not None and ergebnis.text else None
+
+    def abbrechen(self) -> None:
+        """Verwirft wartende Aufrufe; bereits laufende werden noch beendet, aber nicht genutzt."""
+
+        if self._abbruch.is_set():
+            return
+        self._abbruch.set()
+        abgebrochen = sum(1 for future in self._futures.values() if future.cancel())
+        if abgebrochen:
+            _zaehle(abgebrochen=abgebrochen)
+
+    @property
+    def laufend(self) -> int:
+        return sum(1 for future in self._futures.values() if not future.done())
+
+
+def get_vorabruf_status() -> Dict[str, Any]:
+    """Momentaufnahme für die Adminanzeige."""
+
+    with _STATISTIK_LOCK:
+        statistik = dict(_STATISTIK)
+    vorab = statistik["erzeugt"] + statistik["aus_cache"]
+    statistik["nutzungsquote"] = (statistik["geoeffnet"] / vorab) if vorab else 0.0
+    statistik["worker"] = get_hintergrund_pool().max_worker
+    return statistik
@@ -6,7 +6,8 @@ from datetime import datetime, timezone
 from typing import Any, Dict, Optional, Tuple
 
 import streamlit as st
-from supabase import Client, create_client
+
+from module.supabase_client import get_supabase_client
 
 __all__ = [
     "get_fall_fix_state",
@@ -22,10 +23,22 @@ __all__ = [
     "get_amboss_fetch_preferences",
     "set_amboss_fetch_mode",
     "set_amboss_random_probability",
+    "get_amboss_refresh_im_hintergrund",
+    "set_amboss_refresh_im_hintergrund",
     "get_all_persisted_parameters",
+    "get_detail_prefetch_enabled",
+    "set_detail_prefetch_enabled",
+    "get_detail_cache_policy",
+    "set_detail_cache_policy",
+    "get_feedback_engine",
+    "set_feedback_engine",
     "AMBOSS_FETCH_ALWAYS",
     "AMBOSS_FETCH_IF_EMPTY",
     "AMBOSS_FETCH_RANDOM",
+    "DETAIL_CACHE_AUS",
+    "DETAIL_CACHE_KONTEXT",
+    "FEEDBACK_ENGINE_EINZELPROMPT",
+    "FEEDBACK_ENGINE_PIPELINE",
 ]
 
 # Name der Supabase-Tabelle, in der alle Fixierungen persistiert werden.
@@ -37,6 +50,21 @@ AMBOSS_FETCH_ALWAYS = "always"
 AMBOSS_FETCH_IF_EMPTY = "if_empty"
 AMBOSS_FETCH_RANDOM = "random"
 
+# Wiederverwendung von Detailtexten über Feedbacks hinweg (geteilte Cache-Ebene):
+# - "aus": nur der bisherige Cache je Feedback.
+# - "kontext": Detailtexte entstehen ohne Daten der Studierenden aus dem
+#   Szenario-Kontext und werden über Feedbacks hinweg wiederverwendet.
+DETAIL_CACHE_AUS = "aus"
+DETAIL_CACHE_KONTEXT = "kontext"
+_DEFAULT_DETAIL_CACHE_POLICY = DETAIL_CACHE_KONTEXT
+
+# Erzeugung des Abschlussfeedbacks:
+# - "einzelprompt": ein gemeinsamer Aufruf für alle Abschnitte (bisheriges Verhalten).
+# - "pipeline": je Abschnitt ein paralleler Aufruf (``module/feedback_pipeline.py``).
+FEEDBACK_ENGINE_EINZELPROMPT = "einzelprompt"
+FEEDBACK_ENGINE_PIPELINE = "pipeline"
+_DEFAULT_FEEDBACK_ENGINE = FEEDBACK_ENGINE_EINZELPROMPT
+
 # Standardwerte für den AMBOSS-Zufallsmodus. Sie greifen, wenn noch kein Eintrag
 # in Supabase existiert oder ein Datensatz unvollständig ist.
 _DEFAULT_AMBOSS_MODE = AMBOSS_FETCH_RANDOM
@@ -48,35 +76,10 @@ _DEFAULT_AMBOSS_RANDOM_PROBABILITY = 0.2
 _STATE_CACHE: Dict[str, Dict[str, Any]] | None = None
 
 
-def _get_supabase_client() -> Client:
-    """Erstellt einen Supabase-Client anhand der Streamlit-Secrets."""
-
-    supabase_config = st.secrets.get("supabase")
-    if not supabase_config:
-        raise RuntimeError(
-            "Supabase-Konfiguration fehlt in st.secrets. Bitte prüfe den Abschnitt 'supabase' im Streamlit-Backend."
-        )
-
-    try:
-        url = supabase_config["url"]
-        key = supabase_config["key"]
-    except KeyError as exc:  # pragma: no cover - defensive Absicherung
-        raise RuntimeError(
-            "Supabase-Zugangsdaten sind unvollständig. Erwartet werden 'url' und 'key'."
-        ) from exc
-
-    try:
-        return create_client(url, key)
-    except Exception as exc:  # pragma: no cover - defensive Absicherung
-        raise RuntimeError(
-            "Supabase-Verbindung konnte nicht hergestellt werden. Hinweise siehe Kommentare im Code."
-        ) from exc
-
-
 def _refresh_cache() -> Dict[str, Dict[str, Any]]:
     """Lädt sämtliche Fixierungen aus Supabase und gibt sie als Wörterbuch zurück."""
 
-    client = _get_supabase_client()
+    client = get_supabase_client()
     try:
         response = client.table(_TABLE_NAME).select("*").execute()
     except Exception as exc:  # pragma: no cover - defensive Absicherung
@@ -178,7 +181,7 @@ def _persist_fixation(
 ) -> None:
     """Schreibt eine Fixierung in Supabase und aktualisiert anschließend den Cache."""
 
-    client = _get_supabase_client()
+    client = get_supabase_client()
     payload: Dict[str, Any] = {
         "fix_key": fix_key,
         "is_active": is_active,
@@ -346,6 +349,74 @@ def set_amboss_random_probability(probability: float) -> None:
     )
 
 
+def get_amboss_refresh_im_hintergrund() -> bool:
+    """Gibt zurück, ob fällige AMBOSS-Refreshes im Hintergrund laufen (Standard: ja).
+
+    Dann startet die Sitzung sofort mit dem gespeicherten ``amboss_input``; die
+    neue Zusammenfassung steht erst der nächsten Sitzung zur Verfügung.
+    """
+
+    entry = _get_entry("amboss_refresh_hintergrund")
+    return bool(entry.get("is_active")) if entry else True
+
+
+def set_amboss_refresh_im_hintergrund(enabled: bool) -> None:
+    """Schaltet den Hintergrund-Refresh der AMBOSS-Zusammenfassung dauerhaft ein oder aus."""
+
+    _persist_fixation("amboss_refresh_hintergrund", is_active=bool(enabled))
+
+
+def get_detail_prefetch_enabled() -> bool:
+    """Gibt zurück, ob Detailtexte nach dem Feedback im Hintergrund vorab erzeugt werden."""
+
+    entry = _get_entry("detail_prefetch")
+    return bool(entry.get("is_active")) if entry else False
+
+
+def set_detail_prefetch_enabled(enabled: bool) -> None:
+    """Schaltet den Vorabruf der Detailtexte dauerhaft ein oder aus."""
+
+    _persist_fixation("detail_prefetch", is_active=bool(enabled))
+
+
+def get_detail_cache_policy() -> str:
+    """Liefert die Wiederverwendungsregel für geteilte Detailtexte."""
+
+    entry = _get_entry("detail_cache_policy")
+    policy = str(entry.get("value_text", "")).strip().lower() if entry else ""
+    if policy not in {DETAIL_CACHE_AUS, DETAIL_CACHE_KONTEXT}:
+        return _DEFAULT_DETAIL_CACHE_POLICY
+    return policy
+
+
+def set_detail_cache_policy(policy: str) -> None:
+    """Persistiert die Wiederverwendungsregel für geteilte Detailtexte."""
+
+    policy_clean = str(policy).strip().lower()
+    if policy_clean not in {DETAIL_CACHE_AUS, DETAIL_CACHE_KONTEXT}:
+        raise ValueError(f"Unbekannte Cache-Regel: {policy}")
+    _persist_fixation("detail_cache_policy", is_active=True, value_text=policy_clean)
+
+
+def get_feedback_engine() -> str:
+    """Liefert die Engine, mit der das Abschlussfeedback erzeugt wird."""
+
+    entry = _get_entry("feedback_engine")
+    engine = str(entry.get("value_text", "")).strip().lower() if entry else ""
+    if engine not in {FEEDBACK_ENGINE_EINZELPROMPT, FEEDBACK_ENGINE_PIPELINE}:
+        return _DEFAULT_FEEDBACK_ENGINE
+    return engine
+
+
+def set_feedback_engine(engine: str) -> None:
+    """Persistiert die Engine für das Abschlussfeedback."""
+
+    engine_clean = str(engine).strip().lower()
+    if engine_clean not in {FEEDBACK_ENGINE_EINZELPROMPT, FEEDBACK_ENGINE_PIPELINE}:
+        raise ValueError(f"Unbekannte Feedback-Engine: {engine}")
+    _persist_fixation("feedback_engine", is_active=True, value_text=engine_clean)
+
+
 def get_all_persisted_parameters() -> Dict[str, Dict[str, Any]]:
     """Liefert eine lesbare Übersicht aller aktuell gespeicherten Parameter."""
 
@@ -1,16 +1,25 @@
 # """Hilfsfunktionen zur Verwaltung und Auswahl der Fallszenarien."""
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Future
 import random
+import threading
+import time
 from typing import Any, Iterable, Mapping
 
 import pandas as pd
 import streamlit as st
-from supabase import Client, create_client
+from supabase import Client
 
+from module.supabase_client import get_supabase_client
+from module.supabase_writer import get_schreibprobleme, schreibe_spaeter
 from module.patient_language import get_patient_forms
 from module.MCP_Amboss import call_amboss_search
 from module.amboss_preprocessing import ensure_amboss_summary, clear_cached_summary
+from module.amboss_vorberechnung import STATUS_AKTUALISIERT, VorberechnungsErgebnis, aktualisiere_amboss_fall
+from module.hintergrund_pool import aktueller_absender, get_hintergrund_pool
+from module.rate_limiter import LANE_HINTERGRUND
 from module.loading_indicator import task_spinner
 from module.fall_config import (
     AMBOSS_FETCH_ALWAYS,
@@ -18,6 +27,7 @@ from module.fall_config import (
     AMBOSS_FETCH_RANDOM,
     clear_fixed_behavior,
     get_amboss_fetch_preferences,
+    get_amboss_refresh_im_hintergrund,
     get_behavior_fix_state,
 )
 from module.supabase_content import BehaviorEntry, SupabaseContentError, get_behavior_options
@@ -81,6 +91,9 @@ _FALL_SESSION_KEYS: set[str] = {
     "diagnostik_aktiv",
     "diagnostik_runden_gesamt",
     "messages",
+    # Laufende Zusammenfassung älterer Anamnese-Runden (siehe module/anamnese_verlauf.py).
+    "anamnese_zusammenfassung",
+    "anamnese_zusammenfassung_bis",
     "koerper_befund",
     "user_ddx2",
     "user_diagnostics",
@@ -104,8 +117,21 @@ _FALL_SESSION_KEYS: set[str] = {
     "final_feedback",
     "feedback_prompt_final",
     "feedback_row_id",
+    "feedback_row_handle",
+    # Laufender Vorabruf der Detailtexte wird beim Reset zusätzlich abgebrochen.
+    "feedback_detail_vorabruf",
+    # Spekulativ gestartetes Abschlussfeedback (Seite 5) ebenfalls verwerfen.
+    "final_feedback_vorab",
+    # Laufende Abschnitte der Feedback-Pipeline (Reattach nach Rerun).
+    "feedback_pipeline_lauf",
     "student_evaluation_done",
     "token_sums",
+    # Aufschlüsselung nach Modell/Kontext (module/token_counter.py); Grundlage
+    # für ``token_nutzung`` und ``kosten_usd`` der Feedbackzeile.
+    "token_nutzung",
+    # GPT-Einzelmessungen (module/gpt_timing.py) gehören wie ``token_sums`` zum
+    # Fall, sonst enthält ``gpt_latenzen`` ab dem zweiten Fall auch alte Aufrufe.
+    "gpt_messungen",
     # Diagnose/Therapie-Edit-Modus erzeugt zusätzliche Session-Keys, die beim Fall-Reset
     # entfernt werden müssen, damit bei neuen Fällen keine alten Edit-Daten hängen bleiben.
     "diagnose_therapie_edit",
@@ -129,30 +155,31 @@ _FALL_SESSION_PREFIXES: tuple[str, ...] = (
     "befunde_runde_",
 )
 
-
-def _get_supabase_client() -> Client:
-    """Erstellt einen authentifizierten Supabase-Client aus den Streamlit-Secrets."""
-
-    supabase_config = st.secrets.get("supabase")
-    if not supabase_config:
-        raise RuntimeError(
-            "Supabase-Konfiguration fehlt in st.secrets. Bitte die Sektion 'supabase' ergänzen."
-        )
-
-    try:
-        url = supabase_config["url"]
-        key = supabase_config["key"]
-    except KeyError as exc:
-        raise RuntimeError(
-            "Supabase-Zugangsdaten unvollständig. Erwartet werden Schlüssel 'url' und 'key'."
-        ) from exc
-
-    try:
-        return create_client(url, key)
-    except Exception as exc:  # pragma: no cover - Netzwerkkonnektivität lässt sich schlecht testen
-        raise RuntimeError(
-            "Verbindung zu Supabase konnte nicht aufgebaut werden. Hinweise siehe Kommentare im Code."
-        ) from exc
+# Prozessweiter Cache der Falltabelle. Alle Sitzungen teilen sich denselben
+# Stand, sodass nicht jede neue Sitzung die komplette Tabelle (inkl. der großen
+# Spalte ``amboss_input``) lädt. Innerhalb von ``_FALL_CACHE_TTL_SEK`` wird der
+# Cache ohne Supabase-Anfrage genutzt; danach genügt eine schlanke Abfrage von
+# Anzahl und ``max(updated_at)``, um zu entscheiden, ob neu geladen werden muss.
+# Schreibzugriffe dieses Prozesses (``speichere_fallbeispiel``,
+# ``_persist_amboss_input``) leeren den Cache sofort.
+#
+# Für die Fallauswahl genügt ein schlanker Index (``id``, ``Szenario``,
+# ``updated_at``); die Textspalten werden nur für den gezogenen Fall geladen
+# und je ``id``/``updated_at`` zwischengespeichert.
+_FALL_CACHE_TTL_SEK = 120.0
+_FALL_CACHE_LOCK = threading.Lock()
+# Schlüssel "index" bzw. "voll" -> {"df", "signatur", "geprueft"}
+_FALL_CACHE: dict[str, dict[str, Any]] = {}
+# Fall-ID -> (updated_at, Fallzeile)
+_FALL_ZEILEN_CACHE: dict[int, tuple[Any, pd.Series]] = {}
+_FALL_INDEX_SPALTEN = "id, szenario, updated_at"
+
+# Stale-while-revalidate für ``amboss_input``: Fälle, deren Refresh gerade im
+# Hintergrund-Pool wartet oder läuft (je Prozess höchstens einer pro Fall), und
+# die letzten Ergebnisse für die Adminanzeige.
+_AMBOSS_REFRESH_LOCK = threading.Lock()
+_AMBOSS_REFRESH_LAUFEND: set[int] = set()
+_AMBOSS_REFRESH_HISTORIE: deque[VorberechnungsErgebnis] = deque(maxlen=20)
 
 
 def _extract_amboss_input(fall: pd.Series) -> str:
@@ -183,7 +210,11 @@ def _should_refresh_amboss_input(*, stored_value: str, mode: str, probability: f
 
 
 def _persist_amboss_input(*, row_id: Any, value: str) -> tuple[bool, str | None]:
-    """Schreibt die generierte Zusammenfassung in die Supabase-Tabelle."""
+    """Reiht die generierte Zusammenfassung zum Speichern in Supabase ein.
+
+    ``True`` heißt nur „eingereiht“; ob das Update einen Datensatz traf, zeigt
+    :func:`get_amboss_speicherprobleme`.
+    """
 
     if not value:
         return False, "Kein Text vorhanden – es wurde nichts gespeichert."
@@ -197,7 +228,8 @@ def _persist_amboss_input(*, row_id: Any, value: str) -> tuple[bool, str | None]
         return False, "Fehler: Die Fall-ID ist ungültig oder fehlt."
 
     try:
-        client = _get_supabase_client()
+        # Nur Konfigurationsprüfung; geschrieben wird im Hintergrund.
+        get_supabase_client()
     except RuntimeError as exc:
         st.error(f"❌ Supabase nicht erreichbar: {exc}")
         st.info(
@@ -205,32 +237,99 @@ def _persist_amboss_input(*, row_id: Any, value: str) -> tuple[bool, str | None]
         )
         return False, "Supabase-Verbindung fehlgeschlagen."
 
-    payload = {"amboss_input": value}
+    # Das Update läuft über die Write-behind-Warteschlange, damit der Fallstart
+    # nicht auf Supabase wartet. Netzaussetzer werden dort wiederholt; der
+    # Fallbeispiel-Cache wird erst nach erfolgreichem Schreiben geleert.
+    # Debug-Hinweis: ``st.write(get_amboss_speicherprobleme())`` zeigt
+    # verworfene Updates und solche ohne Treffer (ID unbekannt).
+    schreibe_spaeter(
+        _FALL_TABLE_NAME,
+        {"amboss_input": value},
+        art="update",
+        filter={"id": fall_id},
+        bei_erfolg=clear_fallbeispiele_cache,
+    )
+    return True, "Zusammenfassung wird im Hintergrund gespeichert."
 
+
+def _amboss_refresh_im_hintergrund() -> bool:
     try:
-        response = client.table(_FALL_TABLE_NAME).update(payload).eq("id", fall_id).execute()
-    except Exception as exc:  # pragma: no cover - Netzwerkaussetzer lassen sich schwer simulieren
-        st.error(f"❌ Aktualisierung der Supabase-Tabelle fehlgeschlagen: {exc}")
-        st.info(
-            "Debug-Hinweis: Überprüfe die Tabellenberechtigungen und die Netzwerklatenz."
-        )
-        return False, "Fehler beim Schreiben in die Supabase-Tabelle."
+        return get_amboss_refresh_im_hintergrund()
+    except RuntimeError:
+        return True
 
-    if getattr(response, "error", None):
-        st.error(
-            "❌ Supabase meldet einen Fehler bei der Aktualisierung: {err}.".format(
-                err=response.error
-            )
-        )
-        return False, "Supabase hat den Update-Vorgang mit einer Fehlermeldung abgebrochen."
 
-    if not response.data:
-        st.warning(
-            "⚠️ Supabase meldete keinen aktualisierten Datensatz. Bitte kontrolliere, ob die ID existiert."
-        )
-        return False, "Kein Datensatz mit der angegebenen ID gefunden."
+def _amboss_refresh_beendet(fall_id: int, future: Future) -> None:
+    """Callback im Worker-Thread: gibt den Fall frei und leert bei Erfolg den Cache."""
+
+    with _AMBOSS_REFRESH_LOCK:
+        _AMBOSS_REFRESH_LAUFEND.discard(fall_id)
+    if future.cancelled():
+        return
+    fehler = future.exception()
+    if fehler is not None:
+        ergebnis = VorberechnungsErgebnis(fall_id, "", "fehler", f"Refresh fehlgeschlagen: {fehler}")
+    else:
+        ergebnis = future.result()
+    with _AMBOSS_REFRESH_LOCK:
+        _AMBOSS_REFRESH_HISTORIE.appendleft(ergebnis)
+    if ergebnis.status == STATUS_AKTUALISIERT:
+        clear_fallbeispiele_cache()
+
+
+def _plane_amboss_refresh(fall: pd.Series, fall_id: Any, stored_value: str) -> bool:
+    """Reiht MCP-Abruf, Zusammenfassung und Speicherung für künftige Sitzungen ein.
+
+    Rückgabe ``False``, wenn für den Fall bereits ein Refresh aussteht. Die
+    Tokens des Hintergrundaufrufs werden keiner Sitzung zugerechnet.
+    """
 
-    return True, "Zusammenfassung erfolgreich gespeichert."
+    try:
+        schluessel = int(fall_id)
+    except (TypeError, ValueError):
+        return False
+    with _AMBOSS_REFRESH_LOCK:
+        if schluessel in _AMBOSS_REFRESH_LAUFEND:
+            return False
+        _AMBOSS_REFRESH_LAUFEND.add(schluessel)
+
+    digest = fall.get("amboss_digest")
+    zeile = {
+        "id": schluessel,
+        "szenario": fall.get("Szenario", ""),
+        "alter": fall.get("Alter"),
+        "amboss_input": stored_value,
+        "amboss_digest": None if pd.isna(digest) else digest,
+    }
+    future = get_hintergrund_pool().submit(
+        aktualisiere_amboss_fall,
+        zeile,
+        absender=aktueller_absender(),
+        spur=LANE_HINTERGRUND,
+        art="amboss_refresh",
+    )
+    future.add_done_callback(lambda f: _amboss_refresh_beendet(schluessel, f))
+    return True
+
+
+def get_amboss_speicherprobleme() -> list[dict[str, Any]]:
+    """AMBOSS-Sicherungen, die die Schreibwarteschlange nicht speichern konnte.
+
+    Enthält endgültig verworfene Updates und solche ohne passenden Datensatz
+    (unbekannte Fall-ID) seit Prozessstart, jeweils mit ``filter`` und ``fehler``.
+    """
+
+    return get_schreibprobleme(_FALL_TABLE_NAME, spalte="amboss_input")
+
+
+def get_amboss_refresh_status() -> dict[str, Any]:
+    """Ausstehende Hintergrund-Refreshes und die letzten Ergebnisse (Adminanzeige)."""
+
+    with _AMBOSS_REFRESH_LOCK:
+        return {
+            "laufend": sorted(_AMBOSS_REFRESH_LAUFEND),
+            "letzte": list(_AMBOSS_REFRESH_HISTORIE),
+        }
 
 
 def _clear_amboss_session_cache() -> None:
@@ -241,6 +340,7 @@ def _clear_amboss_session_cache() -> None:
     st.session_state.pop("amboss_result_raw", None)
     st.session_state.pop("amboss_result_unvollstaendig", None)
     st.session_state.pop("amboss_result_sicherung", None)
+    st.session_state.pop("amboss_result_quelle", None)
     clear_cached_summary()
     st.session_state.pop("amboss_summary_source", None)
 
@@ -277,41 +377,105 @@ def get_verhaltensoptionen() -> dict[str, BehaviorEntry]:
         # inspizieren und etwaige Tippfehler bei den Spaltennamen aufzuspüren.
         return {}
 
-def lade_fallbeispiele() -> pd.DataFrame:
-    """Liest alle Fallbeispiele aus der Supabase-Tabelle ein."""
+def clear_fallbeispiele_cache() -> None:
+    """Verwirft den prozessweiten Cache der Falltabelle (Index, Volltabelle, Einzelfälle)."""
 
-    try:
-        client = _get_supabase_client()
-    except RuntimeError as exc:
-        st.error(f"❌ Supabase nicht erreichbar: {exc}")
-        st.info(
-            "Debug-Hinweis: Bitte prüfe die Supabase-Konfiguration in st.secrets sowie die Netzwerkverbindung."
-        )
-        return pd.DataFrame(columns=list(_SUPABASE_TO_DF.values()))
+    with _FALL_CACHE_LOCK:
+        _FALL_CACHE.clear()
+        _FALL_ZEILEN_CACHE.clear()
+
+
+def _lese_fall_signatur(client: Client) -> tuple[Any, Any] | None:
+    """Liest Anzahl und jüngstes ``updated_at`` der Falltabelle (eine kleine Anfrage).
+
+    Die Kombination erkennt neue, geänderte und gelöschte Fälle, ohne die
+    Textspalten zu übertragen. ``None`` bedeutet, dass die Prüfung fehlschlug.
+    """
 
     try:
         response = (
             client.table(_FALL_TABLE_NAME)
-            .select('*')
-            .order('szenario', desc=False)
+            .select("updated_at", count="exact")
+            .order("updated_at", desc=True)
+            .limit(1)
             .execute()
         )
-    except Exception as exc:  # pragma: no cover - Netzwerkaussetzer lassen sich schwer simulieren
-        st.error(f"❌ Abruf der Supabase-Tabelle '{_FALL_TABLE_NAME}' fehlgeschlagen: {exc}")
+    except Exception:  # pragma: no cover - Netzwerkaussetzer lassen sich schwer simulieren
+        return None
+    if getattr(response, "error", None):
+        return None
+    rows = response.data or []
+    return getattr(response, "count", None), (rows[0].get("updated_at") if rows else None)
+
+
+def _lade_mit_cache(schluessel: str, spalten: str) -> pd.DataFrame:
+    """Liefert die Falltabelle (``spalten`` als Projektion) aus dem Prozess-Cache.
+
+    Der Rückgabewert ist eine Kopie, Änderungen durch Aufrufer wirken sich also
+    nicht auf andere Sitzungen aus.
+    Debug-Hinweis: ``st.write(_FALL_CACHE)`` zeigt die zuletzt geprüften
+    Tabellenstände; ``clear_fallbeispiele_cache()`` erzwingt ein Neuladen.
+    """
+
+    with _FALL_CACHE_LOCK:
+        eintrag = _FALL_CACHE.get(schluessel) or {}
+        df_cache = eintrag.get("df")
+        if df_cache is not None and time.monotonic() - eintrag["geprueft"] < _FALL_CACHE_TTL_SEK:
+            return df_cache.copy()
+        signatur_cache = eintrag.get("signatur")
+
+    try:
+        client = get_supabase_client()
+    except RuntimeError as exc:
+        if df_cache is not None:
+            # Lieber den letzten bekannten Stand liefern als eine leere Tabelle.
+            return df_cache.copy()
+        st.error(f"❌ Supabase nicht erreichbar: {exc}")
         st.info(
-            "Debug-Hinweis: Nutze bei Bedarf die Supabase-Konsole, um Logs und Berechtigungen zu kontrollieren."
+            "Debug-Hinweis: Bitte prüfe die Supabase-Konfiguration in st.secrets sowie die Netzwerkverbindung."
         )
         return pd.DataFrame(columns=list(_SUPABASE_TO_DF.values()))
 
-    if getattr(response, 'error', None):
-        st.error(
-            "❌ Supabase meldet einen Fehler beim Laden der Fallliste: {err}.".format(
-                err=response.error
-            )
-        )
+    signatur = _lese_fall_signatur(client)
+    if df_cache is not None and (signatur is None or signatur == signatur_cache):
+        # Unverändert (oder Prüfung gescheitert): Cache weiter nutzen und erst
+        # nach Ablauf der nächsten TTL erneut prüfen.
+        with _FALL_CACHE_LOCK:
+            if (_FALL_CACHE.get(schluessel) or {}).get("df") is df_cache:
+                _FALL_CACHE[schluessel]["geprueft"] = time.monotonic()
+        return df_cache.copy()
+
+    df = _lade_fallbeispiele_aus_supabase(client, spalten)
+    if df is None:
+        if df_cache is not None:
+            return df_cache.copy()
         return pd.DataFrame(columns=list(_SUPABASE_TO_DF.values()))
 
-    rows = response.data or []
+    with _FALL_CACHE_LOCK:
+        _FALL_CACHE[schluessel] = {"df": df, "signatur": signatur, "geprueft": time.monotonic()}
+    return df.copy()
+
+
+def lade_fallbeispiele() -> pd.DataFrame:
+    """Liefert alle Fallbeispiele mit sämtlichen Spalten (z. B. für den Adminbereich)."""
+
+    return _lade_mit_cache("voll", "*")
+
+
+def lade_fallindex() -> pd.DataFrame:
+    """Liefert nur ``id``, ``Szenario`` und ``updated_at`` aller Fälle.
+
+    Für die Fallauswahl reicht dieser Index; ``fallauswahl_prompt`` lädt die
+    Textspalten anschließend nur für den gezogenen Fall nach. Fehlende Spalten
+    sind im DataFrame mit ``None`` vorhanden.
+    """
+
+    return _lade_mit_cache("index", _FALL_INDEX_SPALTEN)
+
+
+def _zu_fall_dataframe(rows: list[dict[str, Any]]) -> pd.DataFrame:
+    """Wandelt Supabase-Zeilen in das gewohnte DataFrame-Format um."""
+
     if not rows:
         # Leere Tabelle: Wir geben ein strukturiertes, aber leeres DataFrame zurück.
         return pd.DataFrame(columns=list(_SUPABASE_TO_DF.values()))
@@ -341,7 +505,79 @@ def lade_fallbeispiele() -> pd.DataFrame:
     return df
 
 
+def _lade_fallbeispiele_aus_supabase(client: Client, spalten: str = "*") -> pd.DataFrame | None:
+    """Liest die Fallbeispiele aus der Supabase-Tabelle ein (``None`` bei Fehlern)."""
+
+    try:
+        response = (
+            client.table(_FALL_TABLE_NAME)
+            .select(spalten)
+            .order('szenario', desc=False)
+            .execute()
+        )
+    except Exception as exc:  # pragma: no cover - Netzwerkaussetzer lassen sich schwer simulieren
+        st.error(f"❌ Abruf der Supabase-Tabelle '{_FALL_TABLE_NAME}' fehlgeschlagen: {exc}")
+        st.info(
+            "Debug-Hinweis: Nutze bei Bedarf die Supabase-Konsole, um Logs und Berechtigungen zu kontrollieren."
+        )
+        return None
+
+    if getattr(response, 'error', None):
+        st.error(
+            "❌ Supabase meldet einen Fehler beim Laden der Fallliste: {err}.".format(
+                err=response.error
+            )
+        )
+        return None
+
+    return _zu_fall_dataframe(response.data or [])
+
+
+def _lade_fallzeile(fall_id: Any, updated_at: Any = None) -> pd.Series | None:
+    """Lädt alle Spalten eines einzelnen Falls (mit Cache je ``id``/``updated_at``).
+
+    Stimmt ``updated_at`` mit dem zwischengespeicherten Stand überein, entfällt
+    die Supabase-Anfrage. Bei Fehlern wird ``None`` geliefert und im UI gemeldet.
+    """
+
+    try:
+        schluessel = int(fall_id)
+    except (TypeError, ValueError):
+        st.error("❌ Der Fall konnte nicht geladen werden: Ungültige Fall-ID.")
+        return None
+
+    with _FALL_CACHE_LOCK:
+        treffer = _FALL_ZEILEN_CACHE.get(schluessel)
+    if treffer is not None and updated_at is not None and treffer[0] == updated_at:
+        return treffer[1].copy()
+
+    try:
+        client = get_supabase_client()
+        response = (
+            client.table(_FALL_TABLE_NAME)
+            .select('*')
+            .eq('id', schluessel)
+            .limit(1)
+            .execute()
+        )
+    except Exception as exc:  # pragma: no cover - Netzwerkaussetzer lassen sich schwer simulieren
+        st.error(f"❌ Der Fall konnte nicht aus Supabase geladen werden: {exc}")
+        st.info(
+            "Debug-Hinweis: Bitte prüfe die Supabase-Konfiguration in st.secrets sowie die Netzwerkverbindung."
+        )
+        return None
+
+    if getattr(response, 'error', None) or not response.data:
+        st.error(
+            "❌ Supabase lieferte keinen Datensatz für Fall-ID {fall_id}.".format(fall_id=schluessel)
+        )
+        # Debug-Hinweis: ``st.write(response)`` zeigt die Rohantwort.
+        return None
 
+    fall = _zu_fall_dataframe(response.data).iloc[0]
+    with _FALL_CACHE_LOCK:
+        _FALL_ZEILEN_CACHE[schluessel] = (fall.get("updated_at"), fall)
+    return fall.copy()
 
 
 def speichere_fallbeispiel(
@@ -350,7 +586,7 @@ def speichere_fallbeispiel(
     """Speichert ein neues Fallszenario in Supabase und liefert die aktualisierte Tabelle."""
 
     try:
-        client = _get_supabase_client()
+        client = get_supabase_client()
     except RuntimeError as exc:
         return None, f"Supabase-Verbindung fehlgeschlagen: {exc}"
 
@@ -388,7 +624,9 @@ def speichere_fallbeispiel(
     if getattr(response, 'error', None):
         return None, f"Supabase meldet einen Fehler: {response.error}"
 
-    # Nach erfolgreichem Insert wird die aktuelle Tabelle erneut geladen, damit Admin-UI und Session-State synchron bleiben.
+    # Nach erfolgreichem Insert wird der Cache verworfen und die aktuelle Tabelle erneut geladen,
+    # damit Admin-UI und Session-State synchron bleiben.
+    clear_fallbeispiele_cache()
     return lade_fallbeispiele(), None
 
 
@@ -402,10 +640,12 @@ def fallauswahl_prompt(
 
     Zusätzlich wird der AMBOSS-Input gepflegt. Wenn bereits eine Zusammenfassung in
     Supabase hinterlegt ist, wird sie aus der Spalte ``Amboss_Input`` übernommen
-    und kein erneuter MCP-Aufruf ausgelöst. Fehlt der Eintrag oder wurde per
-    Admin-Einstellung ein Refresh erzwungen, erfolgt ein Abruf inklusive erneuter
-    GPT-Zusammenfassung. Das Ergebnis landet anschließend wieder in Supabase,
-    damit zukünftige Sitzungen ohne MCP-Aufruf starten können.
+    und kein erneuter MCP-Aufruf ausgelöst. Fehlt der Eintrag, erfolgt ein Abruf
+    inklusive erneuter GPT-Zusammenfassung. Das Ergebnis landet anschließend
+    wieder in Supabase, damit zukünftige Sitzungen ohne MCP-Aufruf starten können.
+    Ist per Admin-Einstellung ein Refresh fällig, obwohl ein Text vorliegt, nutzt
+    die Sitzung den gespeicherten Text sofort und der Refresh läuft im
+    Hintergrund-Pool (abschaltbar, dann wie bisher im Vordergrund).
     """
 
     if df.empty:
@@ -420,6 +660,19 @@ def fallauswahl_prompt(
     try:
         fall = _waehle_fall(df, szenario)
         fall_id = fall.get('id', fall.name)
+        # Stammt ``df`` aus ``lade_fallindex``, fehlen die Textspalten noch
+        # (``beschreibung`` ist in Supabase NOT NULL, leer heißt also "nicht
+        # geladen"). Dann wird ausschließlich der gezogene Fall vollständig geholt.
+        if pd.isna(fall.get("Beschreibung")):
+            vollstaendiger_fall = _lade_fallzeile(fall_id, fall.get("updated_at"))
+            if vollstaendiger_fall is None:
+                _protokolliere_amboss_status(
+                    status="fehler",
+                    hinweis="Falldaten konnten nicht nachgeladen werden – siehe Fehlermeldung.",
+                    quelle="keine",
+                )
+                return
+            fall = vollstaendiger_fall
     except (IndexError, KeyError, ValueError) as exc:
         st.error(f"❌ Fehler beim Auswählen des Falls: {exc}")
         _protokolliere_amboss_status(
@@ -482,6 +735,19 @@ def fallauswahl_prompt(
             probability=fetch_probability,
         )
 
+        # Stale-while-revalidate: Liegt bereits ein Text vor, wartet die Sitzung
+        # nicht auf MCP und GPT. Der Refresh wirkt erst ab der nächsten Sitzung.
+        refresh_im_hintergrund = bool(
+            fetch_required
+            and stored_amboss_input
+            and st.session_state.diagnose_szenario
+            and _amboss_refresh_im_hintergrund()
+        )
+        refresh_eingereiht = False
+        if refresh_im_hintergrund:
+            refresh_eingereiht = _plane_amboss_refresh(fall, fall_id, stored_amboss_input)
+            fetch_required = False
+
         fetch_successful = False
         persist_status: str | None = None
         persist_hint: str | None = None
@@ -539,8 +805,8 @@ def fallauswahl_prompt(
                         value=summary_text,
                     )
                     if erfolg:
-                        persist_status = "gespeichert"
-                        persist_hint = "Neue AMBOSS-Zusammenfassung via MCP erzeugt und in Supabase gesichert."
+                        persist_status = "eingereiht"
+                        persist_hint = "Neue AMBOSS-Zusammenfassung via MCP erzeugt; Sicherung in Supabase läuft im Hintergrund."
                         persist_source = "mcp"
                     else:
                         persist_status = "fehler"
@@ -558,6 +824,22 @@ def fallauswahl_prompt(
                 "MCP-Antwort vorhanden, aber fehlender OpenAI-Client oder kein Alter hinterlegt – Zusammenfassung nicht erstellt."
             )
             persist_source = "mcp"
+        elif refresh_im_hintergrund:
+            clear_cached_summary()
+            st.session_state["amboss_payload_summary"] = stored_amboss_input
+            st.session_state["amboss_summary_source"] = "supabase"
+            persist_status = "eingereiht"
+            if refresh_eingereiht:
+                persist_hint = (
+                    "Gespeicherte Supabase-Zusammenfassung sofort genutzt; MCP-Abruf und Aktualisierung"
+                    " für künftige Sitzungen wurden im Hintergrund eingereiht (nicht abgewartet)."
+                )
+            else:
+                persist_hint = (
+                    "Gespeicherte Supabase-Zusammenfassung sofort genutzt; für diesen Fall läuft bereits"
+                    " eine Aktualisierung im Hintergrund."
+                )
+            persist_source = "supabase"
         elif not fetch_required and stored_amboss_input:
             # Sobald wir ausschließlich auf die Supabase-Daten zurückgreifen,
             # säubern wir den Session-State-Digest und setzen die Zusammenfassung
@@ -594,7 +876,7 @@ def fallauswahl_prompt(
             clear_cached_summary()
             st.session_state["amboss_payload_summary"] = summary_text
             st.session_state["amboss_summary_source"] = "supabase_fallback"
-            if persist_status != "gespeichert":
+            if persist_status != "eingereiht":
                 persist_status = "fallback"
                 persist_hint = (
                     persist_hint
@@ -758,11 +1040,19 @@ def prepare_fall_session_state(
         f"Du arbeitest als {st.session_state.patient_job}."
     )
 
+    # Reihenfolge von allgemein nach fallspezifisch: Die feste Hauptanweisung
+    # und das (nur wenige Varianten umfassende) Verhalten stehen vorne, Szenario,
+    # Personenbeschreibung und Fallmerkmale am Ende. So bleibt der Anfang des
+    # Prompts zwischen Sitzungen gleich und kann vom Prompt-Cache des Anbieters
+    # wiederverwendet werden.
     st.session_state.SYSTEM_PROMPT = f"""
-Patientensimulation – {st.session_state.diagnose_szenario}
+Patientensimulation
+
+{st.session_state.patient_hauptanweisung}.
+{st.session_state.patient_verhalten}.
 
+Szenario: {st.session_state.diagnose_szenario}
 {patient_beschreibung}
-{st.session_state.patient_verhalten}. {st.session_state.patient_hauptanweisung}.
 
 {st.session_state.diagnose_features}
 """
@@ -782,7 +1072,11 @@ def reset_fall_session_state(keep_keys: Iterable[str] | None = None) -> None:
             # versehentlich gelöscht werden.
             if key in {"therapie_setting_verdacht", "therapie_setting_final"}:
                 st.write("Debug Reset > Entferne Key:", key, "Wert:", st.session_state.get(key))
-            st.session_state.pop(key, None)
+            wert = st.session_state.pop(key, None)
+            # Hintergrundarbeiten (z. B. Detail-Vorabruf) nicht weiterlaufen lassen.
+            abbrechen = getattr(wert, "abbrechen", None)
+            if callable(abbrechen):
+                abbrechen()
 
 
 def _waehle_fall(df: pd.DataFrame, szenario: str | None) -> pd.Series:
@@ -822,10 +1116,14 @@ def _waehle_fall(df: pd.DataFrame, szenario: str | None) -> pd.Series:
 
 
 __all__ = [
+    "clear_fallbeispiele_cache",
     "fallauswahl_prompt",
     "lade_fallbeispiele",
+    "lade_fallindex",
     "prepare_fall_session_state",
     "reset_fall_session_state",
     "get_verhaltensoptionen",
     "speichere_fallbeispiel",
+    "get_amboss_refresh_status",
+    "get_amboss_speicherprobleme",
 ]
@@ -0,0 +1,274 @@
+"""Vergleich der Feedback-Engines (Einzelprompt vs. Pipeline) an gespeicherten Fällen.
+
+Beide Engines erzeugen das Abschlussfeedback für dieselben Datensätze aus
+``feedback_gpt`` mehrfach. Je Lauf werden gemessen:
+
+- End-to-End-Latenz (Aufruf von ``feedback_erzeugen`` bis zum fertigen Text),
+- Tokenverbrauch und Kosten als Differenz der Sitzungszählung vorher/nachher
+  (``get_token_nutzung`` / ``berechne_kosten_usd``),
+- Formatkompatibilität: erkennt ``split_feedback_sections`` alle sechs Unterpunkte?
+- Abschnittsvarianz über die Wiederholungen je Fall: Standardabweichung der
+  Wortanzahl und mittlere paarweise Jaccard-Distanz der Wortmengen.
+
+Alle Aufrufe laufen nacheinander im Hauptthread des Adminbereichs; die
+Pipeline parallelisiert intern wie im Produktivbetrieb. Die Tokens fallen
+tatsächlich an und erscheinen deshalb auch in der Tokenübersicht der Sitzung.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from itertools import combinations
+import re
+import statistics
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import streamlit as st
+
+from feedbackmodul import feedback_erzeugen
+from module.admin_feedback_variation import (
+    FeedbackVariationError,
+    _setze_feedback_modus,
+    _uebernehme_in_session_state,
+    lade_feedback_fall,
+)
+from module.fall_config import FEEDBACK_ENGINE_EINZELPROMPT, FEEDBACK_ENGINE_PIPELINE
+from module.feedback_detail import SECTION_TITLES, split_feedback_sections
+from module.feedback_mode import FEEDBACK_MODE_CHATGPT, SESSION_KEY_EFFECTIVE_MODE, set_mode_override
+from module.gpt_timing import perzentil
+from module.llm_state import ensure_llm_client
+from module.offline import is_offline
+from module.token_counter import berechne_kosten_usd, get_token_nutzung
+
+__all__ = [
+    "BenchmarkLauf",
+    "EngineAuswertung",
+    "fuehre_engine_benchmark_aus",
+    "werte_benchmark_aus",
+]
+
+_ENGINES: Tuple[str, ...] = (FEEDBACK_ENGINE_EINZELPROMPT, FEEDBACK_ENGINE_PIPELINE)
+_WORT = re.compile(r"\w+")
+
+
+@dataclass
+class BenchmarkLauf:
+    """Ein einzelner Feedback-Lauf einer Engine für einen Fall."""
+
+    engine: str
+    fall_id: int
+    wiederholung: int
+    dauer_sek: float
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    aufrufe: int = 0
+    kosten_usd: float = 0.0
+    unbepreist: List[str] = field(default_factory=list)
+    formatkompatibel: bool = False
+    abschnitte: Dict[str, str] = field(default_factory=dict)
+    fehler: Optional[str] = None
+
+
+@dataclass
+class EngineAuswertung:
+    """Zusammenfassung aller Läufe einer Engine."""
+
+    engine: str
+    laeufe: int
+    fehler: int
+    latenz_mittel_sek: Optional[float]
+    latenz_p50_sek: Optional[float]
+    latenz_p95_sek: Optional[float]
+    prompt_tokens_mittel: float
+    completion_tokens_mittel: float
+    kosten_mittel_usd: float
+    formatquote: float
+    # Abschnitt -> {"woerter_std": …, "jaccard_distanz": …}, gemittelt über die Fälle.
+    abschnittsvarianz: Dict[str, Dict[str, float]]
+
+
+def _nutzungsdifferenz(
+    vorher: Dict[str, Dict[str, Dict[str, int]]],
+    nachher: Dict[str, Dict[str, Dict[str, int]]],
+) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """Tokenverbrauch, der zwischen zwei Momentaufnahmen angefallen ist."""
+
+    differenz: Dict[str, Dict[str, Dict[str, int]]] = {}
+    for model, kontexte in nachher.items():
+        for kontext, werte in kontexte.items():
+            alt = vorher.get(model, {}).get(kontext, {})
+            delta = {name: int(wert) - int(alt.get(name, 0)) for name, wert in werte.items()}
+            if any(delta.values()):
+                differenz.setdefault(model, {})[kontext] = delta
+    return differenz
+
+
+def _summiere(nutzung: Dict[str, Dict[str, Dict[str, int]]], name: str) -> int:
+    return sum(werte.get(name, 0) for kontexte in nutzung.values() for werte in kontexte.values())
+
+
+def _abschnitte(feedback_text: str) -> Tuple[bool, Dict[str, str]]:
+    _, sections = split_feedback_sections(feedback_text)
+    abschnitte = {section.key: section.body for section in sections}
+    return set(abschnitte) == set(SECTION_TITLES), abschnitte
+
+
+def _fuehre_lauf_aus(client: Any, engine: str, fall_id: int, wiederholung: int) -> BenchmarkLauf:
+    vorher = get_token_nutzung()
+    start = time.perf_counter()
+    fehler: Optional[str] = None
+    text = ""
+    try:
+        text = feedback_erzeugen(
+            client,
+            st.session_state.get("final_diagnose", ""),
+            st.session_state.get("therapie_vorschlag", ""),
+            st.session_state.get("user_ddx2", ""),
+            st.session_state.get("diagnostik_eingaben_kumuliert", ""),
+            st.session_state.get("gpt_befunde_kumuliert", ""),
+            st.session_state.get("koerper_befund", ""),
+            st.session_state.get("user_verlauf", ""),
+            int(st.session_state.get("diagnostik_runden_gesamt", 1) or 1),
+            st.session_state.get("diagnose_szenario", ""),
+            st.session_state.get("therapie_setting_verdacht", ""),
+            st.session_state.get("therapie_setting_final", ""),
+            patient_alter=st.session_state.get("patient_age"),
+            engine=engine,
+        ) or ""
+    except Exception as exc:
+        # Debug-Hinweis: ``st.write(engine, fall_id, exc)`` zeigt den Fehler im UI.
+        fehler = str(exc) or exc.__class__.__name__
+    dauer = time.perf_counter() - start
+
+    nutzung = _nutzungsdifferenz(vorher, get_token_nutzung())
+    kosten = berechne_kosten_usd(nutzung)
+    formatkompatibel, abschnitte = _abschnitte(text)
+    # Fällt die Pipeline auf den Einzelprompt zurück, zählt der Lauf als Fehler
+    # der Pipeline, damit der Vergleich nicht unbemerkt verfälscht wird.
+    if fehler is None and st.session_state.get("feedback_engine_genutzt") != engine:
+        fehler = f"Rückfall auf {st.session_state.get('feedback_engine_genutzt')}"
+    return BenchmarkLauf(
+        engine=engine,
+        fall_id=fall_id,
+        wiederholung=wiederholung,
+        dauer_sek=round(dauer, 3),
+        prompt_tokens=_summiere(nutzung, "prompt"),
+        cached_tokens=_summiere(nutzung, "cached"),
+        completion_tokens=_summiere(nutzung, "completion"),
+        aufrufe=_summiere(nutzung, "aufrufe"),
+        kosten_usd=float(kosten["gesamt_usd"]),
+        unbepreist=list(kosten["unbepreist"]),
+        formatkompatibel=formatkompatibel,
+        abschnitte=abschnitte,
+        fehler=fehler,
+    )
+
+
+def fuehre_engine_benchmark_aus(
+    fall_ids: Iterable[int],
+    wiederholungen: int,
+    *,
+    engines: Iterable[str] = _ENGINES,
+    modus: str = FEEDBACK_MODE_CHATGPT,
+    fortschritt: Optional[Callable[[int, int], None]] = None,
+) -> List[BenchmarkLauf]:
+    """Erzeugt für jeden Fall ``wiederholungen`` Feedbacks je Engine.
+
+    Engines wechseln sich je Wiederholung ab, damit zeitliche Schwankungen der
+    API beide gleichermaßen treffen. ``fortschritt(erledigt, gesamt)`` wird nach
+    jedem Lauf aufgerufen. Moduseinstellungen der Sitzung werden anschließend
+    wiederhergestellt.
+    """
+
+    if is_offline():
+        raise FeedbackVariationError("Offline-Modus aktiv – der Benchmark benötigt GPT-Aufrufe.")
+    client = ensure_llm_client()
+    if client is None:
+        raise FeedbackVariationError("Kein GPT-Client verfügbar. Bitte API-Konfiguration prüfen.")
+
+    fall_ids = list(dict.fromkeys(int(fall_id) for fall_id in fall_ids))
+    engines = [engine for engine in engines if engine in _ENGINES]
+    faelle = [lade_feedback_fall(fall_id) for fall_id in fall_ids]
+    gesamt = len(faelle) * len(engines) * max(0, wiederholungen)
+
+    urspruenglicher_modus = st.session_state.get(SESSION_KEY_EFFECTIVE_MODE)
+    urspruengliche_override = st.session_state.get("feedback_mode_override")
+    urspruengliche_engine = st.session_state.get("feedback_engine_genutzt")
+
+    laeufe: List[BenchmarkLauf] = []
+    try:
+        _setze_feedback_modus(modus)
+        for fall in faelle:
+            _uebernehme_in_session_state(fall.rohwerte)
+            for wiederholung in range(1, wiederholungen + 1):
+                for engine in engines:
+                    laeufe.append(_fuehre_lauf_aus(client, engine, fall.id, wiederholung))
+                    if fortschritt is not None:
+                        fortschritt(len(laeufe), gesamt)
+    finally:
+        set_mode_override(urspruengliche_override)
+        if urspruenglicher_modus:
+            st.session_state[SESSION_KEY_EFFECTIVE_MODE] = urspruenglicher_modus
+        if urspruengliche_engine is None:
+            st.session_state.pop("feedback_engine_genutzt", None)
+        else:
+            st.session_state["feedback_engine_genutzt"] = urspruengliche_engine
+    return laeufe
+
+
+def _jaccard_distanz(a: str, b: str) -> float:
+    woerter_a = set(_WORT.findall(a.lower()))
+    woerter_b = set(_WORT.findall(b.lower()))
+    vereinigung = woerter_a | woerter_b
+    if not vereinigung:
+        return 0.0
+    return 1.0 - len(woerter_a & woerter_b) / len(vereinigung)
+
+
+def _abschnittsvarianz(laeufe: List[BenchmarkLauf]) -> Dict[str, Dict[str, float]]:
+    """Varianz je Unterpunkt über die Wiederholungen eines Falls, gemittelt über die Fälle."""
+
+    je_fall: Dict[Tuple[int, str], List[str]] = {}
+    for lauf in laeufe:
+        for key, text in lauf.abschnitte.items():
+            je_fall.setdefault((lauf.fall_id, key), []).append(text)
+
+    gesammelt: Dict[str, Dict[str, List[float]]] = {}
+    for (_, key), texte in je_fall.items():
+        if len(texte) < 2:
+            continue
+        werte = gesammelt.setdefault(key, {"woerter_std": [], "jaccard_distanz": []})
+        werte["woerter_std"].append(statistics.pstdev(len(_WORT.findall(text)) for text in texte))
+        werte["jaccard_distanz"].append(
+            statistics.fmean(_jaccard_distanz(a, b) for a, b in combinations(texte, 2))
+        )
+    return {
+        key: {name: round(statistics.fmean(liste), 3) for name, liste in werte.items()}
+        for key, werte in gesammelt.items()
+    }
+
+
+def werte_benchmark_aus(laeufe: List[BenchmarkLauf]) -> Dict[str, EngineAuswertung]:
+    """Fasst die Läufe je Engine zusammen (nur fehlerfreie Läufe fließen in die Mittelwerte)."""
+
+    auswertung: Dict[str, EngineAuswertung] = {}
+    for engine in dict.fromkeys(lauf.engine for lauf in laeufe):
+        alle = [lauf for lauf in laeufe if lauf.engine == engine]
+        ok = [lauf for lauf in alle if lauf.fehler is None]
+        dauern = sorted(lauf.dauer_sek for lauf in ok)
+        auswertung[engine] = EngineAuswertung(
+            engine=engine,
+            laeufe=len(alle),
+            fehler=len(alle) - len(ok),
+            latenz_mittel_sek=round(statistics.fmean(dauern), 3) if dauern else None,
+            latenz_p50_sek=perzentil(dauern, 0.50),
+            latenz_p95_sek=perzentil(dauern, 0.95),
+            prompt_tokens_mittel=round(statistics.fmean(l.prompt_tokens for l in ok), 1) if ok else 0.0,
+            completion_tokens_mittel=round(statistics.fmean(l.completion_tokens for l in ok), 1) if ok else 0.0,
+            kosten_mittel_usd=round(statistics.fmean(l.kosten_usd for l in ok), 6) if ok else 0.0,
+            formatquote=(sum(1 for l in ok if l.formatkompatibel) / len(ok)) if ok else 0.0,
+            abschnittsvarianz=_abschnittsvarianz(ok),
+        )
+    return auswertung
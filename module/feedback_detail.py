@@ -4,6 +4,13 @@ Dieses Modul ergänzt die kompakte Feedback-Ausgabe um optionale, ausklappbare
 Details pro Unterpunkt. Die Details werden nur bei Klick generiert,
 um Token zu sparen. Zusätzlich werden Nutzung und Text in Supabase protokolliert
 (Option A: Ereignis-Tabelle) und gecachte Detailtexte nach 3 Monaten erneuert.
+
+Neben dem Cache je Feedback gibt es eine geteilte Cache-Ebene. Ist sie aktiv,
+entsteht der Detailtext ohne Daten der Studierenden (nur Szenario, Unterpunkt,
+Feedback-Modus und AMBOSS-Zusammenfassung); sein Key setzt sich aus genau diesen
+kanonisierten Werten zusammen, sodass alle Studierenden eines Szenarios denselben
+Text nutzen. Ob die Ebene aktiv ist, regelt der Adminbereich
+(``get_detail_cache_policy``).
 """
 
 from __future__ import annotations
@@ -13,12 +20,29 @@ from datetime import datetime, timedelta, timezone
 import hashlib
 import json
 import re
+import threading
+import unicodedata
 from typing import Any, Dict, List, Tuple
 
 import streamlit as st
-from supabase import Client, create_client
-
+from supabase import Client
+
+from module.detail_prefetch import DetailVorabruf, VorabrufErgebnis
+from module.fall_config import (
+    DETAIL_CACHE_AUS,
+    DETAIL_CACHE_KONTEXT,
+    get_detail_cache_policy,
+    get_detail_prefetch_enabled,
+)
+from module.gpt_feedback import feedback_speicherung_angestossen, get_feedback_row_id
+from module.gpt_timing import GptMessung, registriere_gpt_messung
+from module.supabase_client import get_supabase_client
+from module.supabase_schema import get_tabellenspalten
+from module.supabase_writer import schreibe_spaeter
 from module.offline import is_offline
+from module.llm_gateway import chat_completion, get_llm_profil
+from module.rate_limiter import LANE_HINTERGRUND
+from module.token_counter import add_usage
 
 # Modellentscheidung für die Detailtexte:
 # - gpt-4.1-mini ist im Vergleich zu größeren Modellen meist schneller,
@@ -42,6 +66,37 @@ DETAIL_OUTPUT_STYLE_VERSION = "v3_fliesstext_mit_fetthebungen"
 # Ein Cache-Eintrag gilt 90 Tage (~3 Monate) als frisch.
 CACHE_TTL_DAYS = 90
 
+# Höchstwartezeit auf die ID des im Hintergrund gespeicherten Hauptfeedbacks,
+# sobald ein Unterpunkt geöffnet wird.
+_FEEDBACK_ID_WARTEZEIT_SEK = 5.0
+
+# Session-State-Memos: Ergebnis der gebündelten Cache-Abfrage und Stand des
+# Default-Event-Abgleichs (feedback_id, Abschnittsschlüssel).
+_SESSION_KEY_SUPABASE_CACHE = "feedback_detail_supabase_cache"
+_SESSION_KEY_EVENTS_SYNCED = "feedback_detail_events_synced"
+
+# Laufender Vorabruf der Detailtexte (``module/detail_prefetch.py``). Beim
+# Öffnen eines Unterpunkts, dessen Text gerade vorab erzeugt wird, wird
+# höchstens so lange gewartet, bevor regulär im Vordergrund generiert wird.
+_SESSION_KEY_VORABRUF = "feedback_detail_vorabruf"
+_VORABRUF_WARTEZEIT_SEK = 45.0
+
+# Geteilte Cache-Ebene: Einträge liegen in derselben Tabelle
+# ``feedback_detail_cache`` (``feedback_id`` leer) und sind am Präfix erkennbar.
+_SHARED_KEY_PREFIX = "geteilt:"
+# Felder des Abschnittskontexts, die nicht von den Studierenden stammen und
+# deshalb in den geteilten Prompt dürfen. Befunde fehlen bewusst: Sie werden je
+# Sitzung aus der angeforderten Diagnostik erzeugt.
+_GETEILTE_KONTEXTFELDER = ("feedback_mode", "section_key", "diagnose_szenario", "amboss_kontext")
+# Felder, die nicht in den kanonischen Kontext-Digest einfließen, weil sie
+# bereits separat im Key stehen.
+_FLUECHTIGE_KONTEXTFELDER = frozenset({"feedback_mode", "section_key", "diagnose_szenario"})
+
+# Prozessweite Trefferstatistik: Woher kam der Text beim Öffnen eines Unterpunkts?
+_CACHE_QUELLEN = ("laufzeit", "vorabruf", "feedback", "geteilt", "neu")
+_CACHE_STATISTIK_LOCK = threading.Lock()
+_CACHE_STATISTIK: Dict[str, int] = {quelle: 0 for quelle in _CACHE_QUELLEN}
+
 # Erwartete Unterpunkte von Variante 2.
 SECTION_TITLES: Dict[str, str] = {
     "anamnese": "Anamnese",
@@ -56,6 +111,8 @@ SECTION_TITLES: Dict[str, str] = {
 _SECTION_PATTERN = re.compile(
     r"(?ms)^\s*(?P<number>[1-6])\.\s*\*\*(?P<title>[^*]+)\*\*:?\s*(?P<body>.*?)(?=^\s*[1-6]\.\s*\*\*|\Z)"
 )
+# Nur die Überschrift eines Unterpunkts (für das inkrementelle Zerlegen beim Streaming).
+_SECTION_HEADER_PATTERN = re.compile(r"(?m)^\s*(?P<number>[1-6])\.\s*\*\*(?P<title>[^*]+)\*\*:?")
 
 
 @dataclass
@@ -68,18 +125,25 @@ class FeedbackSection:
     key: str
 
 
-def _get_supabase_client() -> Client:
-    """Erzeugt einen Supabase-Client aus ``st.secrets``.
+@dataclass(frozen=True)
+class _SectionCacheKeys:
+    """Kontext und Cache-Keys eines Unterpunkts (je Feedback und geteilt).
 
-    Debug-Hinweis:
-    Bei Verbindungsproblemen kann temporär `st.write(st.secrets.get("supabase"))`
-    aktiviert werden, um zu prüfen, ob URL/Key korrekt geladen wurden.
+    Mit ``shared_key`` ist ``context`` der geteilte Kontext ohne Daten der
+    Studierenden, und der Prompt entsteht ohne Kernaussage.
     """
 
-    cfg = st.secrets.get("supabase")
-    if not cfg:
-        raise RuntimeError("Supabase-Konfiguration fehlt in st.secrets['supabase'].")
-    return create_client(cfg["url"], cfg["key"])
+    context: Dict[str, Any]
+    cache_key: str
+    shared_key: str | None = None
+
+    @property
+    def geteilt(self) -> bool:
+        return self.shared_key is not None
+
+    @property
+    def lookup_keys(self) -> Tuple[str, ...]:
+        return (self.cache_key,) if self.shared_key is None else (self.cache_key, self.shared_key)
 
 
 def _normalize_title_to_key(title: str, number: int) -> str:
@@ -137,6 +201,139 @@ def split_feedback_sections(feedback_text: str) -> Tuple[str, List[FeedbackSecti
     return prefix, sections
 
 
+class _StreamSectionParser:
+    """Zerlegt den wachsenden Feedbacktext beim Streaming in fertige Abschnitte.
+
+    Ein Abschnitt gilt als fertig, sobald die Überschrift des nächsten erscheint;
+    der letzte erst mit dem vollständigen Text. Gesucht wird jeweils nur ab dem
+    Anfang der letzten, noch unvollständigen Zeile, sodass der Aufwand über den
+    gesamten Stream linear bleibt (statt ``split_feedback_sections`` bei jedem
+    Fragment erneut über den ganzen Text laufen zu lassen).
+    """
+
+    # Länge des Textfensters, an dem ein Neustart des Streams erkannt wird.
+    _ABGLEICH_ZEICHEN = 64
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._block_start = 0
+        self._header_start: int | None = None
+        self._suche_ab = 0
+
+    def setzt_fort(self, text: str) -> bool:
+        """``False``, wenn der Stream neu begonnen hat (Wiederholung/Ausweichmodell)."""
+
+        bekannt = len(self._text)
+        if len(text) < bekannt:
+            return False
+        fenster = max(0, bekannt - self._ABGLEICH_ZEICHEN)
+        return text[fenster:bekannt] == self._text[fenster:]
+
+    def _schliesse_block(self, text: str, ende: int) -> str | FeedbackSection:
+        if self._header_start is None:
+            return text[:ende].strip()
+        header = _SECTION_HEADER_PATTERN.match(text, self._header_start)
+        assert header is not None
+        number = int(header.group("number"))
+        title = header.group("title").strip()
+        return FeedbackSection(
+            number=number,
+            title=title,
+            body=text[header.end():ende].strip(),
+            key=_normalize_title_to_key(title, number),
+        )
+
+    def fuettere(self, text: str) -> List[str | FeedbackSection]:
+        """Liefert alle seit dem letzten Aufruf fertig gewordenen Blöcke.
+
+        Ein ``str`` ist die Einleitung vor dem ersten Unterpunkt.
+        """
+
+        self._text = text
+        fertig: List[str | FeedbackSection] = []
+        while True:
+            header = _SECTION_HEADER_PATTERN.search(text, self._suche_ab)
+            if header is None:
+                break
+            block = self._schliesse_block(text, header.start())
+            if block:
+                fertig.append(block)
+            self._block_start = self._header_start = header.start()
+            self._suche_ab = header.end()
+        self._suche_ab = max(self._suche_ab, text.rfind("\n", self._suche_ab) + 1)
+        return fertig
+
+    def offener_text(self) -> str:
+        return self._text[self._block_start:].strip()
+
+
+def _merke_detail_vor(section_key: str) -> None:
+    st.session_state[f"detail_open_{section_key}"] = True
+
+
+class FeedbackStreamAnzeige:
+    """Zeigt das entstehende Abschlussfeedback abschnittsweise an.
+
+    Jeder Unterpunkt erscheint, sobald er vollständig ist, samt aktivem
+    Detail-Button. Ein Klick merkt den Unterpunkt als geöffnet vor; der
+    Detailtext lädt in :func:`render_feedback_with_details`, sobald das Feedback
+    vollständig ist (erst dann stehen Feedback-ID und Cache-Keys fest).
+    Nach :meth:`schliesse` übernimmt die reguläre Darstellung.
+
+    Debug-Hinweis: ``st.write(anzeige._parser.offener_text())`` zeigt den
+    gerade entstehenden Abschnitt.
+    """
+
+    def __init__(self) -> None:
+        self._platzhalter = st.empty()
+        self._durchgang = 0
+        self._beginne()
+
+    def _beginne(self) -> None:
+        # Eigener Durchgang je (Neu-)Start, damit Button-Keys im selben Lauf eindeutig bleiben.
+        self._durchgang += 1
+        self._parser = _StreamSectionParser()
+        self._box = self._platzhalter.container()
+        self._slot = self._box.empty()
+
+    def aktualisiere(self, text: str) -> None:
+        """Callback für ``feedback_erzeugen(on_text=...)`` mit dem bisherigen Gesamttext."""
+
+        if not self._parser.setzt_fort(text):
+            self._platzhalter.empty()
+            self._beginne()
+        for block in self._parser.fuettere(text):
+            self._zeige_fertig(block)
+        offen = self._parser.offener_text()
+        if offen:
+            self._slot.markdown(f"{offen} ▌")
+
+    def _zeige_fertig(self, block: str | FeedbackSection) -> None:
+        with self._slot.container():
+            if isinstance(block, str):
+                st.markdown(block)
+            else:
+                st.markdown(f"**{block.number}. {block.title}**")
+                if block.body:
+                    st.markdown(block.body)
+                if st.session_state.get(f"detail_open_{block.key}"):
+                    st.caption("⏳ Details werden geladen, sobald das Feedback vollständig ist.")
+                else:
+                    st.button(
+                        f"Mehr Details zu {block.title}",
+                        key=f"detail_stream_btn_{self._durchgang}_{block.number}_{block.key}",
+                        on_click=_merke_detail_vor,
+                        args=(block.key,),
+                    )
+        # Der nächste (noch offene) Abschnitt erscheint darunter.
+        self._slot = self._box.empty()
+
+    def schliesse(self) -> None:
+        """Entfernt die Streaming-Ansicht zugunsten der regulären Darstellung."""
+
+        self._platzhalter.empty()
+
+
 def _make_cache_key(
     section_key: str,
     section_body: str,
@@ -182,6 +379,61 @@ def _make_cache_key(
     return digest
 
 
+def _kanonisiere(wert: Any) -> Any:
+    """Normalisiert Kontextwerte für den geteilten Key.
+
+    Texte werden Unicode-normalisiert (NFKC), kleingeschrieben, Satzzeichen
+    entfernt und Leerraum zusammengefasst; leere Felder entfallen. So führen
+    z. B. "Fieber, Husten." und "fieber  husten" zum selben Digest.
+    """
+
+    if isinstance(wert, dict):
+        kanonisch = {str(k): _kanonisiere(v) for k, v in sorted(wert.items(), key=lambda item: str(item[0]))}
+        return {k: v for k, v in kanonisch.items() if v not in ("", None, [], {})}
+    if isinstance(wert, (list, tuple)):
+        return [_kanonisiere(v) for v in wert]
+    if isinstance(wert, str):
+        text = unicodedata.normalize("NFKC", wert).casefold()
+        text = re.sub(r"[^\w\s]", " ", text)
+        return " ".join(text.split())
+    return wert
+
+
+def _build_shared_section_context(section_context: Dict[str, Any], szenario: str | None) -> Dict[str, Any]:
+    """Reduziert den Abschnittskontext auf Felder ohne Daten der Studierenden."""
+
+    context = {k: section_context[k] for k in _GETEILTE_KONTEXTFELDER if section_context.get(k)}
+    if szenario:
+        context["diagnose_szenario"] = szenario
+    return context
+
+
+def _make_shared_cache_key(section_key: str, shared_context: Dict[str, Any]) -> str:
+    """Baut den feedbackübergreifenden Key aus dem geteilten Kontext.
+
+    Anders als :func:`_make_cache_key` fließen weder ``feedback_id`` noch
+    Kernaussage oder Eingaben der Studierenden ein: Der geteilte Prompt enthält
+    sie nicht (siehe :func:`_build_shared_section_context`). Alle Studierenden
+    eines Szenarios mit gleicher AMBOSS-Zusammenfassung teilen damit den Text.
+    Debug-Hinweis: ``st.write(_kanonisiere(shared_context))`` zeigt die
+    tatsächlich gehashten Werte.
+    """
+
+    felder = {k: v for k, v in shared_context.items() if k not in _FLUECHTIGE_KONTEXTFELDER}
+    context_digest = hashlib.sha256(
+        json.dumps(_kanonisiere(felder), ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+    key_input = (
+        f"szenario={_kanonisiere(shared_context.get('diagnose_szenario', ''))}|"
+        f"section={section_key}|"
+        f"feedback_mode={shared_context.get('feedback_mode')}|"
+        f"output_style={DETAIL_OUTPUT_STYLE_VERSION}|"
+        f"context={context_digest}"
+    )
+    return _SHARED_KEY_PREFIX + hashlib.sha256(key_input.encode("utf-8")).hexdigest()
+
+
 def _parse_iso_datetime(value: str | None) -> datetime | None:
     if not value:
         return None
@@ -296,33 +548,45 @@ def _build_section_context(section: FeedbackSection) -> Dict[str, Any]:
     return context
 
 
-def _generate_detail_text(section: FeedbackSection, context: Dict[str, Any]) -> str:
-    """Generiert einen nicht-personalisierten, praxisnahen Detailtext je Unterpunkt."""
+def _kernaussage(section: FeedbackSection) -> str:
+    """Teil des kompakten Feedbacks, der als Kernaussage in den Prompt geht.
 
-    if is_offline():
-        raise RuntimeError("Detailtext-Generierung ist im Offline-Modus nicht verfügbar.")
+    Für "Therapiekonzept und Setting" nur der therapeutische Kernteil ohne den
+    Block zu ökologischen/ökonomischen Aspekten.
+    Debug-Hilfe bei Bedarf: ``st.write(_kernaussage(section))``.
+    """
 
-    client = st.session_state.get("openai_client")
-    if client is None:
-        raise RuntimeError("OpenAI-Client fehlt im Session-State (openai_client).")
+    if section.key == "therapie_setting":
+        eco_marker = re.search(
+            r"(?im)^\s*(?:\*\*)?\s*ökologische\s*/\s*ökonomische\s+aspekte\s*:?(?:\*\*)?\s*$",
+            section.body,
+        )
+        if eco_marker:
+            return section.body[: eco_marker.start()].strip()
+    return section.body
+
+
+def _build_detail_prompt(section: FeedbackSection, context: Dict[str, Any], *, geteilt: bool = False) -> str:
+    """Baut den Prompt für den Detailtext (ohne Modellaufruf, auch für den Vorabruf).
+
+    Mit ``geteilt=True`` entfällt die Kernaussage aus dem kompakten Feedback;
+    der Text darf dann über Feedbacks hinweg wiederverwendet werden.
+    """
 
     # Abschnittsspezifische Leitplanke für Punkt 6:
     # Im Detailtext zu "Therapiekonzept und Setting" sollen Ökologie/Ökonomie
     # ausdrücklich außen vor bleiben. Dafür nutzen wir zwei Mechanismen:
     # 1) Wir geben dem Modell nur den therapeutischen Kernteil als Kernaussage.
     # 2) Wir ergänzen eine explizite Negativregel im Prompt.
-    #
-    # Debug-Hilfe bei Bedarf (temporär aktivieren):
-    # st.write("DEBUG therapie_setting core", detail_core_statement)
-    detail_core_statement = section.body
+    if geteilt:
+        bezug = (
+            "Bezug: Szenario und Unterpunkt, nicht die Bearbeitung einzelner Studierender.\n"
+            "Beschreibe, worauf es bei diesem Unterpunkt im Szenario fachlich ankommt."
+        )
+    else:
+        bezug = f"Kernaussage aus dem kompakten Feedback:\n{_kernaussage(section)}"
     section_specific_rules = ""
     if section.key == "therapie_setting":
-        eco_marker = re.search(
-            r"(?im)^\s*(?:\*\*)?\s*ökologische\s*/\s*ökonomische\s+aspekte\s*:?(?:\*\*)?\s*$",
-            section.body,
-        )
-        if eco_marker:
-            detail_core_statement = section.body[: eco_marker.start()].strip()
         section_specific_rules = (
             "- Für diesen Unterpunkt keine Aussagen zu ökologischen oder ökonomischen Aspekten "
             "machen; Fokus ausschließlich auf Therapieansatz und Versorgungssetting."
@@ -332,8 +596,7 @@ def _generate_detail_text(section: FeedbackSection, context: Dict[str, Any]) ->
 Erstelle eine praxisnahe, nicht-personalisierte Vertiefung auf Deutsch für einen Feedback-Unterpunkt.
 
 Unterpunkt: {section.title}
-Kernaussage aus dem kompakten Feedback:
-{detail_core_statement}
+{bezug}
 
 Strukturierter Abschnittskontext (nur erlaubte Felder):
 {context}
@@ -350,70 +613,204 @@ Verbindliche Ausgabe-Regeln:
 {section_specific_rules}
 - Umfang kompakt halten (ca. 120–170 Wörter).
 """.strip()
+    return prompt
+
+
+def _generate_detail_text(section: FeedbackSection, context: Dict[str, Any], *, geteilt: bool = False) -> str:
+    """Generiert einen nicht-personalisierten, praxisnahen Detailtext je Unterpunkt."""
+
+    if is_offline():
+        raise RuntimeError("Detailtext-Generierung ist im Offline-Modus nicht verfügbar.")
+
+    prompt = _build_detail_prompt(section, context, geteilt=geteilt)
 
-    response = client.chat.completions.create(
+    # Profil "feedback_detail" nutzt DETAIL_MODEL; der Client wird prozessweit geteilt.
+    response = chat_completion(
+        "feedback_detail",
+        [{"role": "user", "content": prompt}],
         model=DETAIL_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
+        kontext="Feedback-Detail",
     )
     return (response.choices[0].message.content or "").strip()
 
 
-def _load_cached_detail(supabase: Client, cache_key: str) -> Tuple[str | None, bool]:
-    """Lädt vorhandenen Cache-Eintrag und markiert, ob er noch frisch ist."""
+def _load_cached_details(supabase: Client, cache_keys: List[str]) -> Dict[str, Tuple[str | None, bool]]:
+    """Lädt alle angefragten Cache-Einträge in *einer* Anfrage.
+
+    Rückgabe je Key: ``(detail_text, ist_frisch)``; nicht vorhandene Keys
+    werden als ``(None, False)`` geliefert, damit sie ebenfalls memoisiert
+    werden können.
+    """
 
+    if not cache_keys:
+        return {}
     response = (
         supabase.table("feedback_detail_cache")
-        .select("detail_text, updated_at")
-        .eq("cache_key", cache_key)
-        .limit(1)
+        .select("cache_key, detail_text, updated_at")
+        .in_("cache_key", cache_keys)
         .execute()
     )
-    rows = response.data or []
-    if not rows:
-        return None, False
+    treffer: Dict[str, Tuple[str | None, bool]] = {key: (None, False) for key in cache_keys}
+    for row in response.data or []:
+        key = row.get("cache_key")
+        if key in treffer:
+            treffer[key] = (row.get("detail_text"), _cache_is_fresh(row.get("updated_at")))
+    return treffer
 
-    row = rows[0]
-    return row.get("detail_text"), _cache_is_fresh(row.get("updated_at"))
+
+def _prefetch_cached_details(supabase: Client, cache_keys: List[str]) -> Dict[str, Tuple[str | None, bool]]:
+    """Memoisiert den Supabase-Cache im Session-State und lädt nur fehlende Keys nach.
+
+    Dadurch verursacht das Auf- und Zuklappen eines Unterpunkts keine weiteren
+    Leseanfragen. Debug-Hinweis: ``st.write(st.session_state.get("feedback_detail_supabase_cache"))``
+    zeigt, welche Keys bereits geprüft wurden.
+    """
+
+    memo = st.session_state.setdefault(_SESSION_KEY_SUPABASE_CACHE, {})
+    fehlend = [key for key in dict.fromkeys(cache_keys) if key not in memo]
+    if fehlend:
+        memo.update(_load_cached_details(supabase, fehlend))
+    return memo
+
+
+def _detail_cache_policy() -> str:
+    try:
+        return get_detail_cache_policy()
+    except Exception:
+        # Ohne lesbare Einstellung (z. B. offline) keine geteilte Wiederverwendung.
+        return DETAIL_CACHE_AUS
+
+
+def _compute_section_cache_keys(
+    sections: List[FeedbackSection], feedback_id: int | None
+) -> Dict[str, _SectionCacheKeys]:
+    """Berechnet Kontext und Cache-Keys aller Unterpunkte vorab (section.key -> Keys)."""
+
+    fall_id = st.session_state.get("fall_id")
+    feedback_mode = str(st.session_state.get("feedback_mode", "")).strip() or None
+    szenario = str(st.session_state.get("diagnose_szenario", "")).strip() or None
+    policy = _detail_cache_policy() if not is_offline() else DETAIL_CACHE_AUS
+    ergebnis: Dict[str, _SectionCacheKeys] = {}
+    for section in sections:
+        section_context = _build_section_context(section)
+        shared_key = None
+        if policy == DETAIL_CACHE_KONTEXT:
+            section_context = _build_shared_section_context(section_context, szenario)
+            shared_key = _make_shared_cache_key(section.key, section_context)
+        ergebnis[section.key] = _SectionCacheKeys(
+            context=section_context,
+            cache_key=_make_cache_key(
+                section.key,
+                section.body,
+                int(feedback_id) if feedback_id is not None else None,
+                fall_id=fall_id,
+                feedback_mode=feedback_mode,
+                section_context=section_context,
+            ),
+            shared_key=shared_key,
+        )
+    return ergebnis
+
+
+def _finde_im_supabase_cache(
+    supabase_cache: Dict[str, Tuple[str | None, bool]], keys: _SectionCacheKeys
+) -> Tuple[str | None, str | None]:
+    """Sucht einen frischen Text zuerst je Feedback, dann in der geteilten Ebene.
+
+    Rückgabe ist ``(Text, Quelle)`` mit Quelle "feedback" oder "geteilt".
+    """
+
+    for key, quelle in ((keys.cache_key, "feedback"), (keys.shared_key, "geteilt")):
+        if key is None:
+            continue
+        cached_text, is_fresh = supabase_cache.get(key, (None, False))
+        if cached_text and is_fresh:
+            return cached_text, quelle
+    return None, None
+
+
+def _zaehle_cache_quelle(quelle: str) -> None:
+    with _CACHE_STATISTIK_LOCK:
+        _CACHE_STATISTIK[quelle] = _CACHE_STATISTIK.get(quelle, 0) + 1
+
+
+def get_detail_cache_statistik() -> Dict[str, Any]:
+    """Momentaufnahme der Cache-Treffer beim Öffnen von Unterpunkten (Adminanzeige).
+
+    ``trefferquote`` bezieht alle Cache-Ebenen ein, ``geteilt_quote`` nur die
+    Fälle, die ohne geteilte Ebene neu erzeugt worden wären.
+    """
+
+    with _CACHE_STATISTIK_LOCK:
+        statistik: Dict[str, Any] = dict(_CACHE_STATISTIK)
+    gesamt = sum(statistik[quelle] for quelle in _CACHE_QUELLEN)
+    statistik["gesamt"] = gesamt
+    statistik["trefferquote"] = ((gesamt - statistik["neu"]) / gesamt) if gesamt else 0.0
+    geteilt_basis = statistik["geteilt"] + statistik["neu"]
+    statistik["geteilt_quote"] = (statistik["geteilt"] / geteilt_basis) if geteilt_basis else 0.0
+    return statistik
 
 
 def _save_cache_detail(
-    supabase: Client,
     cache_key: str,
     section_key: str,
     detail_text: str,
     feedback_id: int | None,
     fall_id: str | int | None,
     feedback_mode: str | None,
+    shared_key: str | None = None,
 ) -> None:
-    """Schreibt/aktualisiert den generierten Detailtext in den Cache."""
-
-    supabase.table("feedback_detail_cache").upsert(
-        {
-            "cache_key": cache_key,
-            "section_key": section_key,
-            "feedback_id": feedback_id,
-            "fall_id": None if fall_id is None else str(fall_id),
-            "feedback_modus": feedback_mode,
-            "detail_text": detail_text,
-            "model": DETAIL_MODEL,
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-        },
+    """Schreibt/aktualisiert den generierten Detailtext im Hintergrund in den Cache.
+
+    Mit ``shared_key`` entsteht im selben Upsert zusätzlich der geteilte
+    Eintrag (ohne ``feedback_id``), den spätere Feedbacks wiederverwenden.
+    """
+
+    zeile = {
+        "cache_key": cache_key,
+        "section_key": section_key,
+        "feedback_id": feedback_id,
+        "fall_id": None if fall_id is None else str(fall_id),
+        "feedback_modus": feedback_mode,
+        "detail_text": detail_text,
+        "model": DETAIL_MODEL,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    zeilen = [zeile]
+    if shared_key is not None:
+        zeilen.append({**zeile, "cache_key": shared_key, "feedback_id": None})
+    schreibe_spaeter(
+        "feedback_detail_cache",
+        zeilen,
+        art="upsert",
         on_conflict="cache_key",
-    ).execute()
+    )
 
 
-def _sync_default_events(supabase: Client, feedback_id: int, sections: List[FeedbackSection]) -> None:
+def _sync_default_events(
+    supabase: Client,
+    feedback_id: int,
+    sections: List[FeedbackSection],
+    vorab_geladen: bool | None = None,
+) -> None:
     """Legt pro Unterpunkt einen Default-Event mit `opened=false` an.
 
     Damit wird in Supabase explizit sichtbar, dass ein Feld vorhanden war, aber
     nicht geöffnet wurde ("Nein"). Bei späterem Öffnen wird derselbe Datensatz
-    auf `opened=true` aktualisiert.
+    auf `opened=true` aktualisiert. ``vorab_geladen`` markiert, ob der
+    Vorabruf aktiv war (``None`` = Spalte noch nicht migriert).
     """
 
     # WICHTIG:
     # Diese Funktion darf bei Streamlit-Reruns bereits geöffnete Punkte NICHT
     # zurücksetzen. Daher werden nur fehlende Einträge neu angelegt.
+    #
+    # Pro Feedback und Abschnittsmenge genügt ein Abgleich je Sitzung; spätere
+    # Reruns (z. B. Auf-/Zuklappen) überspringen Select und Upsert.
+    sync_signatur = (int(feedback_id), tuple(section.key for section in sections))
+    if st.session_state.get(_SESSION_KEY_EVENTS_SYNCED) == sync_signatur:
+        return
+
     defaults = []
     for section in sections:
         # Meta-Informationen werden bereits beim Default-Insert gespeichert,
@@ -435,6 +832,8 @@ def _sync_default_events(supabase: Client, feedback_id: int, sections: List[Feed
                 "context_snapshot": section_context,
             }
         )
+        if vorab_geladen is not None:
+            defaults[-1]["vorab_geladen"] = vorab_geladen
     if not defaults:
         return
 
@@ -452,6 +851,7 @@ def _sync_default_events(supabase: Client, feedback_id: int, sections: List[Feed
 
     missing_defaults = [row for row in defaults if row["section_key"] not in existing_keys]
     if not missing_defaults:
+        st.session_state[_SESSION_KEY_EVENTS_SYNCED] = sync_signatur
         return
 
     # Nur fehlende Default-Zeilen einfügen.
@@ -462,20 +862,30 @@ def _sync_default_events(supabase: Client, feedback_id: int, sections: List[Feed
     # entstanden sein. Mit ``ignore_duplicates=True`` wird dann kein 23505-Fehler
     # mehr ausgelöst, sondern der bereits vorhandene Datensatz unverändert
     # beibehalten.
-    supabase.table("feedback_detail_events").upsert(
+    #
+    # Der Upsert läuft über die Write-behind-Warteschlange. Sie schreibt in
+    # Eingangsreihenfolge, ein späteres Öffnungs-Event überholt die
+    # Default-Zeile also nie.
+    schreibe_spaeter(
+        "feedback_detail_events",
         missing_defaults,
+        art="upsert",
         on_conflict="feedback_id,section_key",
         ignore_duplicates=True,
-    ).execute()
+    )
+    st.session_state[_SESSION_KEY_EVENTS_SYNCED] = sync_signatur
 
 
 def _save_open_event(
-    supabase: Client,
     feedback_id: int,
     section: FeedbackSection,
     detail_text: str,
+    vorab_geladen: bool | None = None,
 ) -> None:
-    """Aktualisiert den Event-Eintrag auf `opened=true` und speichert den Text."""
+    """Aktualisiert den Event-Eintrag auf `opened=true` und speichert den Text.
+
+    ``vorab_geladen`` hält fest, ob der angezeigte Text aus dem Vorabruf stammt.
+    """
 
     # Kontext wird explizit hier neu aufgebaut, damit der gespeicherte Snapshot
     # exakt den Zustand zum Zeitpunkt des Öffnens widerspiegelt. Falls Inhalte
@@ -483,24 +893,29 @@ def _save_open_event(
     # transparent nachvollziehbar.
     section_context = _build_section_context(section)
 
-    supabase.table("feedback_detail_events").upsert(
-        {
-            "feedback_id": feedback_id,
-            "section_key": section.key,
-            "section_title": section.title,
-            "opened": True,
-            "generated_text": detail_text,
-            "model": DETAIL_MODEL,
-            "feedback_modus": _get_feedback_modus(),
-            "amboss_mcp_genutzt": _is_amboss_mcp_genutzt(),
-            "zusaetzliche_infos_abgerufen": _has_zusaetzliche_infos(),
-            "zusaetzliche_infos_quellen": _build_zusaetzliche_infos_quellen(section_context),
-            "context_snapshot": section_context,
-            "opened_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-        },
+    event = {
+        "feedback_id": feedback_id,
+        "section_key": section.key,
+        "section_title": section.title,
+        "opened": True,
+        "generated_text": detail_text,
+        "model": DETAIL_MODEL,
+        "feedback_modus": _get_feedback_modus(),
+        "amboss_mcp_genutzt": _is_amboss_mcp_genutzt(),
+        "zusaetzliche_infos_abgerufen": _has_zusaetzliche_infos(),
+        "zusaetzliche_infos_quellen": _build_zusaetzliche_infos_quellen(section_context),
+        "context_snapshot": section_context,
+        "opened_at": datetime.now(timezone.utc).isoformat(),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if vorab_geladen is not None:
+        event["vorab_geladen"] = vorab_geladen
+    schreibe_spaeter(
+        "feedback_detail_events",
+        event,
+        art="upsert",
         on_conflict="feedback_id,section_key",
-    ).execute()
+    )
 
 
 def _get_feedback_modus() -> str:
@@ -550,6 +965,144 @@ def _build_zusaetzliche_infos_quellen(section_context: Dict[str, Any]) -> Dict[s
     }
 
 
+def _prefetch_or_warn(
+    supabase: Client | None, section_cache_keys: Dict[str, _SectionCacheKeys]
+) -> Dict[str, Tuple[str | None, bool]]:
+    if supabase is None:
+        return {}
+    try:
+        return _prefetch_cached_details(supabase, [key for keys in section_cache_keys.values() for key in keys.lookup_keys])
+    except Exception as exc:
+        st.warning(f"⚠️ Lesen des Detail-Caches fehlgeschlagen: {exc}")
+        return {}
+
+
+def _vorabruf_aktiviert() -> bool:
+    """Vorabruf nur, wenn im Adminbereich aktiviert und nicht offline."""
+
+    if is_offline():
+        return False
+    try:
+        return get_detail_prefetch_enabled()
+    except Exception:
+        # Ohne lesbare Einstellung bleibt es beim Standard (kein Vorabruf).
+        return False
+
+
+def _event_spalte_verfuegbar(supabase: Client, spalte: str) -> bool:
+    spalten = get_tabellenspalten(supabase, "feedback_detail_events")
+    return spalten is not None and spalte in spalten
+
+
+def _vorabruf_signatur(section_cache_keys: Dict[str, _SectionCacheKeys]) -> Tuple[str, ...]:
+    return tuple(keys.cache_key for keys in section_cache_keys.values())
+
+
+def _verbuche_vorabruf(ergebnis: VorabrufErgebnis) -> None:
+    """Verbucht Tokens und Messung eines Vorabrufs im Hauptthread."""
+
+    kontext = "Feedback-Detail (Vorabruf)"
+    add_usage(
+        prompt_tokens=ergebnis.prompt_tokens,
+        completion_tokens=ergebnis.completion_tokens,
+        total_tokens=ergebnis.total_tokens,
+        model=ergebnis.messung.model,
+        kontext=kontext,
+        cached_tokens=ergebnis.cached_tokens,
+    )
+    registriere_gpt_messung(
+        GptMessung(
+            kontext=kontext,
+            dauer_sek=ergebnis.messung.dauer_sek,
+            erfolg=ergebnis.messung.erfolg,
+            model=ergebnis.messung.model,
+            profil=ergebnis.messung.profil,
+            prompt_tokens=ergebnis.prompt_tokens,
+            completion_tokens=ergebnis.completion_tokens,
+            cached_tokens=ergebnis.cached_tokens,
+        )
+    )
+
+
+def _hole_vorabruf_ab(
+    section_cache_keys: Dict[str, _SectionCacheKeys],
+    detail_cache_state: Dict[str, str],
+    supabase_cache: Dict[str, Tuple[str | None, bool]],
+    aktiv: bool,
+) -> DetailVorabruf | None:
+    """Übernimmt fertige Vorabrufe in die Caches; bricht veraltete Vorabrufe ab."""
+
+    vorabruf = st.session_state.get(_SESSION_KEY_VORABRUF)
+    if vorabruf is None:
+        return None
+    if not aktiv or vorabruf.signatur != _vorabruf_signatur(section_cache_keys):
+        vorabruf.abbrechen()
+        st.session_state.pop(_SESSION_KEY_VORABRUF, None)
+        return None
+    for cache_key, ergebnis in vorabruf.fertige_ergebnisse().items():
+        detail_cache_state.setdefault(cache_key, ergebnis.text)
+        supabase_cache[cache_key] = (ergebnis.text, True)
+        _verbuche_vorabruf(ergebnis)
+    return vorabruf
+
+
+def _starte_vorabruf(
+    sections: List[FeedbackSection],
+    section_cache_keys: Dict[str, _SectionCacheKeys],
+    detail_cache_state: Dict[str, str],
+    supabase_cache: Dict[str, Tuple[str | None, bool]],
+    feedback_id: int | None,
+    mit_supabase: bool,
+) -> DetailVorabruf:
+    """Plant alle noch fehlenden Detailtexte im Hintergrund ein.
+
+    Frische Supabase-Treffer (auch aus der geteilten Ebene) landen direkt im
+    Laufzeit-Cache; nur echte Lücken
+    werden erzeugt (Spur ``hintergrund`` des Ratenbegrenzers). Erzeugte Texte
+    schreibt der Worker selbst in den Supabase-Cache.
+    Debug-Hinweis: ``st.write(get_vorabruf_status())`` zeigt die Kennzahlen.
+    """
+
+    vorabruf = DetailVorabruf(_vorabruf_signatur(section_cache_keys))
+    profil = get_llm_profil("feedback_detail", model=DETAIL_MODEL, lane=LANE_HINTERGRUND)
+    fall_id = st.session_state.get("fall_id")
+    feedback_mode = str(st.session_state.get("feedback_mode", "")).strip() or None
+    cache_feedback_id = int(feedback_id) if feedback_id is not None else None
+
+    for section in sections:
+        keys = section_cache_keys[section.key]
+        cache_key = keys.cache_key
+        if cache_key in detail_cache_state:
+            continue
+        cached_text, _ = _finde_im_supabase_cache(supabase_cache, keys)
+        if cached_text:
+            detail_cache_state[cache_key] = cached_text
+            vorabruf.markiere_aus_cache(cache_key)
+            continue
+
+        bei_erfolg = None
+        if mit_supabase:
+            def bei_erfolg(
+                text: str,
+                cache_key: str = cache_key,
+                section_key: str = section.key,
+                shared_key: str | None = keys.shared_key,
+            ) -> None:
+                _save_cache_detail(
+                    cache_key, section_key, text, cache_feedback_id, fall_id, feedback_mode, shared_key=shared_key
+                )
+
+        vorabruf.plane(
+            cache_key,
+            profil,
+            [{"role": "user", "content": _build_detail_prompt(section, keys.context, geteilt=keys.geteilt)}],
+            bei_erfolg=bei_erfolg,
+        )
+
+    st.session_state[_SESSION_KEY_VORABRUF] = vorabruf
+    return vorabruf
+
+
 def render_feedback_with_details(feedback_text: str) -> None:
     """Rendert das kompakte Feedback + On-Demand-Aufklapper je Unterpunkt.
 
@@ -564,12 +1117,24 @@ def render_feedback_with_details(feedback_text: str) -> None:
         st.markdown(feedback_text)
         return
 
-    feedback_id = st.session_state.get("feedback_row_id")
+    # Der Feedback-Insert läuft im Hintergrund. Solange seine ID noch fehlt,
+    # wird hier nicht gewartet; die Default-Events folgen beim nächsten Rerun.
+    feedback_id = get_feedback_row_id()
+    vorabruf_aktiv = _vorabruf_aktiviert()
     supabase = None
-    if not is_offline() and feedback_id:
+    # ``vorab_geladen`` wird nur geschrieben, wenn die Spalte migriert ist.
+    vorab_spalte = False
+    if not is_offline() and (feedback_id or feedback_speicherung_angestossen()):
         try:
-            supabase = _get_supabase_client()
-            _sync_default_events(supabase, int(feedback_id), sections)
+            supabase = get_supabase_client()
+            vorab_spalte = _event_spalte_verfuegbar(supabase, "vorab_geladen")
+            if feedback_id:
+                _sync_default_events(
+                    supabase,
+                    int(feedback_id),
+                    sections,
+                    vorab_geladen=vorabruf_aktiv if vorab_spalte else None,
+                )
         except Exception as exc:
             st.warning(f"⚠️ Supabase-Sync für Detail-Events fehlgeschlagen: {exc}")
 
@@ -582,6 +1147,12 @@ def render_feedback_with_details(feedback_text: str) -> None:
 
     detail_cache_state = st.session_state.setdefault("feedback_detail_runtime_cache", {})
 
+    # Alle Cache-Keys vorab berechnen und den Supabase-Cache in einer einzigen
+    # ``in_``-Anfrage laden; das Ergebnis ist im Session-State memoisiert.
+    section_cache_keys = _compute_section_cache_keys(sections, feedback_id)
+    supabase_cache = _prefetch_or_warn(supabase, section_cache_keys)
+    vorabruf = _hole_vorabruf_ab(section_cache_keys, detail_cache_state, supabase_cache, vorabruf_aktiv)
+
     for section in sections:
         st.markdown(f"**{section.number}. {section.title}**")
 
@@ -671,43 +1242,53 @@ def render_feedback_with_details(feedback_text: str) -> None:
         # })
 
         detail_rendered_in_this_run = False
+        if current_open_state and supabase is not None and feedback_id is None:
+            # Erst beim Öffnen wird die ID tatsächlich gebraucht (Cache-Key,
+            # Öffnungs-Event); dann kurz auf den Hintergrund-Insert warten.
+            feedback_id = get_feedback_row_id(warte_sek=_FEEDBACK_ID_WARTEZEIT_SEK)
+            if feedback_id is not None:
+                section_cache_keys = _compute_section_cache_keys(sections, feedback_id)
+                supabase_cache = _prefetch_or_warn(supabase, section_cache_keys)
+
         fall_id = st.session_state.get("fall_id")
         feedback_mode = str(st.session_state.get("feedback_mode", "")).strip() or None
-        section_context = _build_section_context(section)
-        cache_key = _make_cache_key(
-            section.key,
-            section.body,
-            int(feedback_id) if feedback_id is not None else None,
-            fall_id=fall_id,
-            feedback_mode=feedback_mode,
-            section_context=section_context,
-        )
+        keys = section_cache_keys[section.key]
+        section_context, cache_key = keys.context, keys.cache_key
 
         if current_open_state:
             # 1) Laufzeit-Cache in Streamlit-Session prüfen (schnellster Pfad).
             detail_text = detail_cache_state.get(cache_key)
-
-            # 2) Persistenten Supabase-Cache prüfen.
-            from_supabase_cache = False
-            if detail_text is None and supabase is not None:
-                try:
-                    cached_text, is_fresh = _load_cached_detail(supabase, cache_key)
-                    if cached_text and is_fresh:
-                        detail_text = cached_text
-                        from_supabase_cache = True
-                except Exception as exc:
-                    st.warning(f"⚠️ Lesen des Detail-Caches fehlgeschlagen: {exc}")
+            cache_quelle = "laufzeit"
+
+            # 1b) Läuft der Vorabruf für diesen Unterpunkt noch, auf ihn warten,
+            # statt denselben Text ein zweites Mal zu erzeugen.
+            if detail_text is None and vorabruf is not None and vorabruf.ist_ausstehend(cache_key):
+                with st.spinner("⏳ Details werden vorbereitet..."):
+                    vorab_ergebnis = vorabruf.warte_auf(cache_key, _VORABRUF_WARTEZEIT_SEK)
+                if vorab_ergebnis is not None:
+                    detail_text = vorab_ergebnis.text
+                    cache_quelle = "vorabruf"
+                    supabase_cache[cache_key] = (detail_text, True)
+                    _verbuche_vorabruf(vorab_ergebnis)
+
+            # 2) Persistenten Supabase-Cache prüfen (vorab gebündelt geladen):
+            # erst der Eintrag dieses Feedbacks, dann die geteilte Ebene.
+            if detail_text is None:
+                detail_text, supabase_quelle = _finde_im_supabase_cache(supabase_cache, keys)
+                if detail_text is not None:
+                    cache_quelle = supabase_quelle or "feedback"
 
             # 3) Falls kein frischer Cache vorliegt: neu generieren.
             if detail_text is None:
+                cache_quelle = "neu"
                 try:
                     with st.spinner("⏳ KI lädt zusätzliche Details..."):
-                        detail_text = _generate_detail_text(section, section_context)
+                        detail_text = _generate_detail_text(section, section_context, geteilt=keys.geteilt)
                 except Exception as exc:
                     # Debug-Hinweis:
                     # Wenn diese Meldung häufiger auftritt, temporär
                     # `st.write("offline:", is_offline())` und
-                    # `st.write("openai_client vorhanden:", bool(st.session_state.get("openai_client")))`
+                    # `st.write("GPT-Messungen:", st.session_state.get("gpt_messungen"))`
                     # aktivieren, um den Zustand direkt im UI zu prüfen.
                     st.warning(f"⚠️ Details konnten nicht erzeugt werden: {exc}")
                     st.info("ℹ️ Bitte später erneut versuchen oder Offline-Modus prüfen.")
@@ -715,22 +1296,32 @@ def render_feedback_with_details(feedback_text: str) -> None:
                 if supabase is not None:
                     try:
                         _save_cache_detail(
-                            supabase,
                             cache_key,
                             section.key,
                             detail_text,
                             int(feedback_id) if feedback_id is not None else None,
                             fall_id,
                             feedback_mode,
+                            shared_key=keys.shared_key,
                         )
                     except Exception as exc:
                         st.warning(f"⚠️ Schreiben des Detail-Caches fehlgeschlagen: {exc}")
+                    # Memo aktualisieren, damit spätere Reruns nicht erneut lesen.
+                    supabase_cache[cache_key] = (detail_text, True)
+                    if keys.shared_key is not None:
+                        supabase_cache[keys.shared_key] = (detail_text, True)
 
             # Laufzeit-Cache immer aktualisieren.
             detail_cache_state[cache_key] = detail_text
 
-            if from_supabase_cache:
+            # Trefferstatistik nur je Öffnen zählen, nicht je Rerun.
+            if selection_just_activated:
+                _zaehle_cache_quelle(cache_quelle)
+
+            if cache_quelle == "feedback":
                 st.caption("♻️ Aus Supabase-Cache geladen (jünger als 3 Monate).")
+            elif cache_quelle == "geteilt":
+                st.caption("♻️ Aus geteiltem Supabase-Cache geladen (gleiches Szenario, jünger als 3 Monate).")
 
             st.markdown(detail_text)
             detail_rendered_in_this_run = True
@@ -738,9 +1329,19 @@ def render_feedback_with_details(feedback_text: str) -> None:
             # Öffnungs-Event nur bei *neuer* Aktivierung speichern.
             # Dadurch bleibt opened_at semantisch stabil und unnötige Supabase-Last
             # durch wiederholte Upserts bei normalen Reruns wird vermieden.
+            # Beim Vorabruf wird zusätzlich festgehalten, ob der vorab erzeugte
+            # Text tatsächlich geöffnet wurde (Nutzen der zusätzlichen Tokens).
+            aus_vorabruf = vorabruf is not None and vorabruf.ist_vorab(cache_key)
+            if aus_vorabruf and selection_just_activated:
+                vorabruf.markiere_geoeffnet(cache_key)
             if supabase is not None and feedback_id and selection_just_activated:
                 try:
-                    _save_open_event(supabase, int(feedback_id), section, detail_text)
+                    _save_open_event(
+                        int(feedback_id),
+                        section,
+                        detail_text,
+                        vorab_geladen=aus_vorabruf if vorab_spalte else None,
+                    )
                 except Exception as exc:
                     st.warning(f"⚠️ Speichern des Öffnungs-Events fehlgeschlagen: {exc}")
 
@@ -767,3 +1368,21 @@ def render_feedback_with_details(feedback_text: str) -> None:
         # Debug-Hinweis bei Bedarf:
         # st.write("Detail-Open-State vorher/aktuell", previous_open_state, current_open_state)
         st.session_state[previous_open_state_key] = current_open_state
+
+    # Vorabruf erst nach dem kompakten Feedback starten, damit die Seite
+    # sofort sichtbar ist. Die Feedback-ID fließt in die Cache-Keys ein und
+    # wird deshalb (kurz) abgewartet, falls der Insert noch läuft.
+    if vorabruf_aktiv and vorabruf is None:
+        if feedback_id is None and supabase is not None:
+            feedback_id = get_feedback_row_id(warte_sek=_FEEDBACK_ID_WARTEZEIT_SEK)
+            if feedback_id is not None:
+                section_cache_keys = _compute_section_cache_keys(sections, feedback_id)
+                supabase_cache = _prefetch_or_warn(supabase, section_cache_keys)
+        _starte_vorabruf(
+            sections,
+            section_cache_keys,
+            detail_cache_state,
+            supabase_cache,
+            feedback_id,
+            mit_supabase=supabase is not None,
+        )
@@ -2,17 +2,33 @@
 
 from __future__ import annotations
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, as_completed
 from dataclasses import dataclass
-import time
 import json
-from typing import Dict, Iterable, List, Optional, Tuple, Union
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import streamlit as st
 
 from module.feedback_tasks import FeedbackTask, get_default_feedback_tasks
-from module.token_counter import add_usage, init_token_counters
-from module.gpt_timing import add_gpt_duration, messe_gpt_aktion
+from module.token_counter import add_usage, init_token_counters, lese_cached_tokens
+from module.gpt_timing import GptMessung, add_gpt_duration, registriere_gpt_messung
+from module.feedback_vorab import eingabe_digest
+from module.hintergrund_pool import aktueller_absender, get_hintergrund_pool
+from module.llm_gateway import LLMMessung, chat_completion, get_llm_profil, rufe_profil_auf, verbuche_aufruf
+from module.rate_limiter import LANE_FEEDBACK
+
+# Überschrift, die Modelle trotz Anweisung gern voranstellen ("### Anamnese",
+# "**Anamnese:**" …). Sie wird entfernt, weil ``combine_sections`` die
+# Überschrift selbst setzt.
+_FUEHRENDE_UEBERSCHRIFT = re.compile(r"\A\s*(?:#{1,6}\s*[^\n]*|\*\*[^*\n]+\*\*:?)\s*\n")
+# Zeilen im Stil "2. **…**" würde ``split_feedback_sections`` als eigenen
+# Unterpunkt lesen; innerhalb eines Abschnitts werden sie zu Spiegelstrichen.
+_UNTERPUNKT_ZEILE = re.compile(r"(?m)^(\s*)[1-6]\.(\s*\*\*)")
+
+# Laufende Pipeline der Sitzung; wird beim Fallwechsel über ``_FALL_SESSION_KEYS``
+# in ``module/fallverwaltung.py`` entfernt und abgebrochen.
+_SESSION_KEY_LAUF = "feedback_pipeline_lauf"
 
 
 @dataclass
@@ -91,25 +107,36 @@ class FeedbackContext:
 
 SYSTEM_PROMPT = (
     "Du agierst als prüfungserfahrene:r Fachärzt:in. Du sprichst die Studierenden in der "
-    "zweiten Person an, formulierst wertschätzend und gibst klare Empfehlungen."
+    "zweiten Person an, formulierst wertschätzend und gibst klare Empfehlungen.\n\n"
+    "Ein Medizinstudierender hat eine virtuelle Fallbesprechung mit einer simulierten "
+    "Person durchgeführt. Du bewertest ausschließlich die Eingaben und Entscheidungen "
+    "des Studierenden – nicht die Antworten der simulierten Person oder automatisch "
+    "erzeugte Inhalte. Du erstellst jeweils genau einen Abschnitt des Feedbacks: "
+    "Schreibe höchstens fünf prägnante Sätze und verwende dabei konkrete Beobachtungen "
+    "aus dem Kontext. Die Falldaten folgen in der Nutzernachricht, die Aufgabe für den "
+    "Abschnitt steht an deren Ende."
 )
 
 
 def _build_messages(context: FeedbackContext, task: FeedbackTask) -> List[Dict[str, str]]:
-    """Erzeugt das Nachrichtenformat für den jeweiligen Abschnitt."""
+    """Erzeugt das Nachrichtenformat für den jeweiligen Abschnitt.
+
+    Die Reihenfolge ist auf das Prompt-Caching des Anbieters ausgelegt: Der
+    statische ``SYSTEM_PROMPT`` ist für alle Sitzungen identisch, der Fallkontext
+    ist für alle Abschnitte einer Sitzung identisch, und erst ganz am Ende folgt
+    die abschnittsspezifische Aufgabe. So teilen sich alle Abschnitte den
+    längstmöglichen gemeinsamen Präfix.
+    """
 
     basistext = (
-        "Ein Medizinstudierender hat eine virtuelle Fallbesprechung mit "
-        f"{context.patient_forms_dativ} durchgeführt. Du bewertest ausschließlich die "
-        f"Eingaben und Entscheidungen des Studierenden – nicht die Antworten {context.patient_forms_genitiv} "
-        "oder automatisch erzeugte Inhalte.\n\n"
+        f"Die Fallbesprechung fand mit {context.patient_forms_dativ} statt. Bewerte nicht "
+        f"die Antworten {context.patient_forms_genitiv}.\n\n"
         f"{context.build_context_block()}"
     )
 
     aufgabe = (
-        f"Erstelle den Abschnitt \"{task.title}\". {task.instruction} "
-        "Schreibe höchstens fünf prägnante Sätze, verwende dabei konkrete Beobachtungen "
-        "aus dem Kontext."
+        f"### Aufgabe\nErstelle den Abschnitt \"{task.title}\". {task.instruction} "
+        "Beginne direkt mit dem Inhalt, ohne Überschrift."
     )
 
     return [
@@ -124,26 +151,114 @@ def _run_single_task(
     messages: Iterable[Dict[str, str]],
     *,
     temperature: float,
-) -> Tuple[FeedbackTask, str, Dict[str, int], float]:
+) -> Tuple[FeedbackTask, str, Dict[str, int], LLMMessung]:
     """Führt einen einzelnen Modellaufruf aus und sammelt die Tokenwerte."""
 
-    # Standardmäßig setzen wir auf ein ausgewogenes Modell, das klare,
-    # prüfungsnahe Rückmeldungen liefert, ohne unnötig hohe Kosten zu erzeugen.
-    model_name = task.model or getattr(client, "default_model", "gpt-4o")
-    start = time.perf_counter()
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=list(messages),
+    # Standardmäßig setzt das Profil "feedback_abschnitt" auf ein ausgewogenes
+    # Modell, das klare, prüfungsnahe Rückmeldungen liefert, ohne unnötig hohe
+    # Kosten zu erzeugen. Ein abschnittsspezifisches Modell übersteuert das Profil.
+    # Der Aufruf läuft im Worker-Thread und greift daher nicht auf den
+    # Session-State zu.
+    profil = get_llm_profil(
+        "feedback_abschnitt",
+        model=task.model or getattr(client, "default_model", None),
         temperature=temperature,
     )
-    dauer = time.perf_counter() - start
+    response, messung = rufe_profil_auf(profil, list(messages), client=client)
     usage = {
         "prompt": int(getattr(response.usage, "prompt_tokens", 0) or 0),
         "completion": int(getattr(response.usage, "completion_tokens", 0) or 0),
         "total": int(getattr(response.usage, "total_tokens", 0) or 0),
+        "cached": lese_cached_tokens(response.usage),
     }
     content = response.choices[0].message.content
-    return task, content, usage, dauer
+    return task, content, usage, messung
+
+
+def _bereinige_abschnitt(text: Optional[str]) -> str:
+    """Entfernt eine vorangestellte Überschrift und entschärft Unterpunkt-Zeilen."""
+
+    bereinigt = _FUEHRENDE_UEBERSCHRIFT.sub("", (text or "").strip() + "\n", count=1).strip()
+    return _UNTERPUNKT_ZEILE.sub(r"\1-\2", bereinigt)
+
+
+def _fertiger_anfang(
+    tasks: List[FeedbackTask], ergebnisse: Dict[str, Tuple[FeedbackTask, str]]
+) -> List[Tuple[FeedbackTask, str]]:
+    """Ergebnisse vom ersten Abschnitt an, bis zur ersten noch offenen Lücke."""
+
+    anfang: List[Tuple[FeedbackTask, str]] = []
+    for task in tasks:
+        if task.identifier not in ergebnisse:
+            break
+        anfang.append(ergebnisse[task.identifier])
+    return anfang
+
+
+class _PipelineLauf:
+    """Abschnitte einer Sitzung für genau einen Eingabe-Digest.
+
+    Bleibt im Session-State, bis alle Abschnitte übernommen sind. Unterbricht
+    ein Rerun das Warten, hängt sich der nächste Aufruf mit gleichem Digest an
+    die laufenden Futures an, statt alle Abschnitte erneut zu bezahlen (wie
+    ``module/feedback_vorab.py`` für den Einzelprompt).
+    """
+
+    def __init__(self, digest: str) -> None:
+        self.digest = digest
+        self.futures: Dict[str, Future] = {}
+        # Bereits verbuchte Ergebnisse (identifier -> (Task, Text)).
+        self.ergebnisse: Dict[str, Tuple[FeedbackTask, str]] = {}
+
+    def abbrechen(self) -> None:
+        """Verwirft noch wartende Abschnitte; laufende enden ungenutzt."""
+
+        for future in self.futures.values():
+            future.cancel()
+
+
+def _lauf_digest(
+    tasks: List[FeedbackTask], nachrichten: Dict[str, List[Dict[str, str]]], temperature: float
+) -> str:
+    return eingabe_digest(
+        [
+            {
+                "task": task.identifier,
+                "model": task.model or "",
+                "temperature": temperature,
+                "messages": nachrichten[task.identifier],
+            }
+            for task in tasks
+        ]
+    )
+
+
+def _verbuche_abschnitt(kontext: str, usage: Dict[str, int], messung: LLMMessung) -> None:
+    # Die Token-Auswertung wird zentral im Hauptthread fortgeschrieben,
+    # um Race-Conditions mit dem Streamlit-Session-State zu vermeiden.
+    add_usage(
+        prompt_tokens=usage["prompt"],
+        completion_tokens=usage["completion"],
+        total_tokens=usage["total"],
+        model=messung.model,
+        kontext=kontext,
+        cached_tokens=usage["cached"],
+    )
+    # Die Laufzeit wird ebenfalls im Hauptthread addiert, damit der
+    # Session-State nicht von Background-Threads angefasst wird.
+    add_gpt_duration(messung.dauer_sek, kontext=kontext)
+    registriere_gpt_messung(
+        GptMessung(
+            kontext=kontext,
+            dauer_sek=messung.dauer_sek,
+            erfolg=messung.erfolg,
+            model=messung.model,
+            profil=messung.profil,
+            prompt_tokens=usage["prompt"],
+            completion_tokens=usage["completion"],
+            cached_tokens=usage["cached"],
+        )
+    )
 
 
 def run_feedback_pipeline(
@@ -152,42 +267,91 @@ def run_feedback_pipeline(
     *,
     tasks: Optional[List[FeedbackTask]] = None,
     temperature: float = 0.4,
+    on_text: Optional[Callable[[str], None]] = None,
 ) -> List[Tuple[FeedbackTask, str]]:
-    """Startet alle Feedback-Aufgaben parallel und liefert sortierte Ergebnisse."""
+    """Startet alle Feedback-Aufgaben parallel und liefert sortierte Ergebnisse.
+
+    Mit ``on_text`` erhält der Aufrufer (im Hauptthread) nach jedem fertigen
+    Abschnitt den zusammengesetzten Text aller lückenlos fertigen Abschnitte –
+    dasselbe Format wie beim Streaming des Einzelprompts.
+
+    Die Futures liegen unter einem Digest über alle Abschnittsnachrichten im
+    Session-State. Ein Rerun während der Erzeugung übernimmt laufende und
+    fertige Abschnitte; nur geänderte Eingaben starten neu.
+    Debug-Hinweis: ``st.write(st.session_state.get("feedback_pipeline_lauf").digest)``.
+    """
 
     init_token_counters()
     tasks = tasks or get_default_feedback_tasks()
-    ergebnisse: Dict[str, Tuple[FeedbackTask, str]] = {}
-
-    with ThreadPoolExecutor(max_workers=max(1, len(tasks))) as executor:
-        # Jeder Abschnitt wird als eigenständige Future gestartet. Dadurch lassen
-        # sich Laufzeiten deutlich reduzieren, wenn mehrere Kerne zur Verfügung
-        # stehen.
-        futures = {
-            executor.submit(
+    nachrichten = {task.identifier: _build_messages(context, task) for task in tasks}
+    digest = _lauf_digest(tasks, nachrichten, temperature)
+
+    lauf = st.session_state.get(_SESSION_KEY_LAUF)
+    if lauf is None or lauf.digest != digest:
+        if lauf is not None:
+            lauf.abbrechen()
+        lauf = _PipelineLauf(digest)
+        st.session_state[_SESSION_KEY_LAUF] = lauf
+    ergebnisse = lauf.ergebnisse
+
+    # Jeder Abschnitt wird als eigener Auftrag im prozessweiten Hintergrund-Pool
+    # eingereiht. Der Pool begrenzt die Parallelität über alle Sitzungen und
+    # bedient Sitzungen reihum, statt je Aufruf eigene Threads zu starten.
+    pool = get_hintergrund_pool()
+    absender = aktueller_absender()
+    futures: Dict[Future, FeedbackTask] = {}
+    for task in tasks:
+        if task.identifier in ergebnisse:
+            continue
+        future = lauf.futures.get(task.identifier)
+        if future is None or future.cancelled():
+            future = pool.submit(
                 _run_single_task,
                 client,
                 task,
-                _build_messages(context, task),
+                nachrichten[task.identifier],
                 temperature=temperature,
-            ): task
-            for task in tasks
-        }
-
-        for future in as_completed(futures):
-            task = futures[future]
-            result_task, content, usage, dauer = future.result()
-            ergebnisse[result_task.identifier] = (result_task, content)
-            # Die Token-Auswertung wird zentral im Hauptthread fortgeschrieben,
-            # um Race-Conditions mit dem Streamlit-Session-State zu vermeiden.
-            add_usage(
-                prompt_tokens=usage["prompt"],
-                completion_tokens=usage["completion"],
-                total_tokens=usage["total"],
+                absender=absender,
+                spur=LANE_FEEDBACK,
+                art="feedback_abschnitt",
             )
-            # Die Laufzeit wird ebenfalls im Hauptthread addiert, damit der
-            # Session-State nicht von Background-Threads angefasst wird.
-            add_gpt_duration(dauer, kontext=result_task.identifier)
+            lauf.futures[task.identifier] = future
+        futures[future] = task
+
+    angezeigt = 0
+    if on_text is not None and ergebnisse:
+        anfang = _fertiger_anfang(tasks, ergebnisse)
+        if anfang:
+            angezeigt = len(anfang)
+            on_text(combine_sections(anfang))
+
+    # Bricht der Skriptlauf hier ab (z. B. Rerun), bleibt ``lauf`` im
+    # Session-State und der nächste Aufruf setzt an derselben Stelle fort.
+    for future in as_completed(futures):
+        task = futures[future]
+        kontext = f"Feedback-Abschnitt {task.identifier}"
+        try:
+            result_task, content, usage, messung = future.result()
+        except Exception as exc:
+            # Angefallene Tokens eines gescheiterten Abschnitts trotzdem
+            # verbuchen; der fehlende Abschnitt wird unten gemeldet.
+            # Debug-Hinweis: ``st.write(task.identifier, exc)`` zeigt die Ursache.
+            lauf.futures.pop(task.identifier, None)
+            fehl_messung = getattr(exc, "llm_messung", None)
+            if fehl_messung is not None:
+                verbuche_aufruf(kontext, fehl_messung)
+            continue
+        ergebnisse[result_task.identifier] = (result_task, _bereinige_abschnitt(content))
+        _verbuche_abschnitt(kontext, usage, messung)
+        if on_text is not None:
+            anfang = _fertiger_anfang(tasks, ergebnisse)
+            if len(anfang) > angezeigt:
+                angezeigt = len(anfang)
+                on_text(combine_sections(anfang))
+
+    # Alle Abschnitte sind übernommen oder endgültig gescheitert.
+    if st.session_state.get(_SESSION_KEY_LAUF) is lauf:
+        del st.session_state[_SESSION_KEY_LAUF]
 
     sortierte_ergebnisse = [
         ergebnisse[task.identifier]
@@ -206,11 +370,25 @@ def run_feedback_pipeline(
 
 
 def combine_sections(sections: List[Tuple[FeedbackTask, str]]) -> str:
-    """Setzt die Modellantworten in der vorgesehenen Reihenfolge zusammen."""
-
-    # Durch das einfache Aneinanderfügen bleibt das Layout der einzelnen
-    # Abschnitte erhalten und kann bei Bedarf im UI weiterverarbeitet werden.
-    return "\n\n".join(text for _, text in sections)
+    """Setzt die Modellantworten im Format des Einzelprompts zusammen.
+
+    Nummerierte Abschnitte erscheinen als ``N. **Titel:** Text`` und werden so
+    von ``split_feedback_sections`` erkannt. Abschnitte ohne Nummer stehen vor
+    dem ersten Unterpunkt als Einleitung oder danach als eigener Block
+    ``**Titel:**`` im vorangehenden Unterpunkt (z. B. Ökologie/Ökonomie in 6.).
+    """
+
+    bloecke: List[str] = []
+    nummeriert = False
+    for task, text in sections:
+        if task.nummer is not None:
+            nummeriert = True
+            bloecke.append(f"{task.nummer}. **{task.title}:** {text}")
+        elif nummeriert:
+            bloecke.append(f"**{task.title}:**\n{text}")
+        else:
+            bloecke.append(text)
+    return "\n\n".join(bloecke)
 
 
 def preprocess_amboss_payload(
@@ -232,40 +410,38 @@ def preprocess_amboss_payload(
         if patient_alter not in (None, ""):
             patient_alter_text = str(patient_alter)
 
-        response = messe_gpt_aktion(
-            lambda: client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Du extrahierst als medizinische:r Fachexpert:in die wichtigsten Fakten aus "
-                            "einem AMBOSS-JSON. Konzentriere dich auf anamnestische, diagnostische und "
-                            "therapeutische Kernaussagen. Ergänze besonders relevante "
-                            "Differentialdiagnosen und erkläre kurz, wie sie sich von der Hauptdiagnose "
-                            "abgrenzen lassen."
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": (
-                            "Szenario: "
-                            f"{diagnose_szenario or 'unbekannt'}\n"
-                            "Alter der simulierten Person: "
-                            f"{patient_alter_text}\n"
-                            "Bitte fasse folgende Aspekte strukturiert zusammen:\n"
-                            "1. Wichtigste anamnestische Hinweise.\n"
-                            "2. Diagnostische Schlüsselbefunde und geplante Schritte.\n"
-                            "3. Kernaussagen zur Therapie oder empfohlenen Maßnahmen.\n"
-                            "4. Entscheidende Differentialdiagnosen mit kurzer Abgrenzung.\n"
-                            "Nutze Stichpunkte oder kurze Absätze und verzichte auf Floskeln.\n\n"
-                            "JSON-Inhalt:\n"
-                            f"{json.dumps(payload, ensure_ascii=False)}"
-                        ),
-                    },
-                ],
-                temperature=0.1,
-            ),
+        response = chat_completion(
+            "amboss_preprocessing",
+            [
+                {
+                    "role": "system",
+                    "content": (
+                        "Du extrahierst als medizinische:r Fachexpert:in die wichtigsten Fakten aus "
+                        "einem AMBOSS-JSON. Konzentriere dich auf anamnestische, diagnostische und "
+                        "therapeutische Kernaussagen. Ergänze besonders relevante "
+                        "Differentialdiagnosen und erkläre kurz, wie sie sich von der Hauptdiagnose "
+                        "abgrenzen lassen."
+                    ),
+                },
+                {
+                    "role": "user",
+                    "content": (
+                        "Szenario: "
+                        f"{diagnose_szenario or 'unbekannt'}\n"
+                        "Alter der simulierten Person: "
+                        f"{patient_alter_text}\n"
+                        "Bitte fasse folgende Aspekte strukturiert zusammen:\n"
+                        "1. Wichtigste anamnestische Hinweise.\n"
+                        "2. Diagnostische Schlüsselbefunde und geplante Schritte.\n"
+                        "3. Kernaussagen zur Therapie oder empfohlenen Maßnahmen.\n"
+                        "4. Entscheidende Differentialdiagnosen mit kurzer Abgrenzung.\n"
+                        "Nutze Stichpunkte oder kurze Absätze und verzichte auf Floskeln.\n\n"
+                        "JSON-Inhalt:\n"
+                        f"{json.dumps(payload, ensure_ascii=False)}"
+                    ),
+                },
+            ],
+            client=client,
             kontext="AMBOSS-Preprocessing",
         )
     except Exception as exc:  # pragma: no cover - reine Laufzeitfehler
@@ -276,17 +452,6 @@ def preprocess_amboss_payload(
         # Optionales Debugging: ``st.write('AMBOSS-Preprocessing fehlgeschlagen:', exc)``.
         return ""
 
-    usage = {
-        "prompt": int(getattr(response.usage, "prompt_tokens", 0) or 0),
-        "completion": int(getattr(response.usage, "completion_tokens", 0) or 0),
-        "total": int(getattr(response.usage, "total_tokens", 0) or 0),
-    }
-    add_usage(
-        prompt_tokens=usage["prompt"],
-        completion_tokens=usage["completion"],
-        total_tokens=usage["total"],
-    )
-
     return response.choices[0].message.content
 
 
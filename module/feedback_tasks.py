@@ -22,12 +22,21 @@ class FeedbackTask:
     model: Optional[str] = None
     """Optionales Spezialmodell, falls ein Abschnitt mit einem anderen Modell laufen soll."""
 
+    nummer: Optional[int] = None
+    """Nummer des Unterpunkts im Ausgabeformat (1–6, wie beim Einzelprompt).
+
+    Abschnitte ohne Nummer werden vor dem ersten Unterpunkt als Einleitung bzw.
+    danach als eigener Block im vorangehenden Unterpunkt ausgegeben.
+    """
+
 
 def get_default_feedback_tasks() -> List[FeedbackTask]:
     """Stellt die Feedbackabschnitte in der gewünschten Reihenfolge bereit."""
 
     # Die Liste ist bewusst modular aufgebaut, damit zukünftige Abschnitte
-    # einfach ergänzt oder ausgetauscht werden können.
+    # einfach ergänzt oder ausgetauscht werden können. Titel und Nummern
+    # entsprechen ``SECTION_TITLES`` in ``module/feedback_detail.py``, damit
+    # ``split_feedback_sections`` das Ergebnis wie beim Einzelprompt zerlegt.
     return [
         FeedbackTask(
             identifier="intro",
@@ -42,6 +51,7 @@ def get_default_feedback_tasks() -> List[FeedbackTask]:
         FeedbackTask(
             identifier="anamnese",
             title="Anamnese",
+            nummer=1,
             instruction=(
                 "Bewerte, ob die anamnestischen Fragen vollständig, strukturiert und "
                 "patientenorientiert gestellt wurden. Gehe auf verpasste Kernfragen ein "
@@ -52,7 +62,8 @@ def get_default_feedback_tasks() -> List[FeedbackTask]:
         # Stichpunkte ab, damit das Endfeedback vertraut bleibt.
         FeedbackTask(
             identifier="diagnostik_szenario",
-            title="Diagnostik für das Szenario",
+            title="Diagnostik – Szenario",
+            nummer=2,
             instruction=(
                 "Analysiere die diagnostischen Maßnahmen im Hinblick auf die vorgegebene "
                 "Szenariodiagnose. Erläutere, welche Schritte sinnvoll waren und wo "
@@ -61,7 +72,8 @@ def get_default_feedback_tasks() -> List[FeedbackTask]:
         ),
         FeedbackTask(
             identifier="diagnostik_ddx",
-            title="Diagnostik für Differentialdiagnosen",
+            title="Diagnostik – Differentialdiagnosen",
+            nummer=3,
             instruction=(
                 "Prüfe, ob die gewählte Diagnostik den angegebenen Differentialdiagnosen "
                 "gerecht wird. Benenne Lücken sowie besonders treffende Entscheidungen."
@@ -69,7 +81,8 @@ def get_default_feedback_tasks() -> List[FeedbackTask]:
         ),
         FeedbackTask(
             identifier="strategie",
-            title="Struktur der Diagnostik",
+            title="Diagnostische Strategie",
+            nummer=4,
             instruction=(
                 "Beurteile Aufbau und Reihenfolge der Termine. Erwähne unnötige Doppeluntersuchungen, "
                 "sinnvolle Eskalationen und fehlende Folgeuntersuchungen. Berücksichtige dabei das "
@@ -81,6 +94,7 @@ def get_default_feedback_tasks() -> List[FeedbackTask]:
         FeedbackTask(
             identifier="diagnose",
             title="Finale Diagnose",
+            nummer=5,
             instruction=(
                 "Erkläre, ob die finale Diagnose anhand der vorliegenden Informationen plausibel ist "
                 "und wie gut andere Optionen abgegrenzt wurden."
@@ -88,14 +102,17 @@ def get_default_feedback_tasks() -> List[FeedbackTask]:
         ),
         FeedbackTask(
             identifier="therapie",
-            title="Therapiekonzept",
+            title="Therapiekonzept und Setting",
+            nummer=6,
             instruction=(
-                "Bewerte das Therapiekonzept hinsichtlich Leitlinien, Plausibilität und praktischer Umsetzung."
+                "Bewerte das Therapiekonzept hinsichtlich Leitlinien, Plausibilität und praktischer Umsetzung. "
+                "Beurteile außerdem, ob das gewählte Versorgungssetting angemessen ist."
             ),
         ),
         FeedbackTask(
             identifier="nachhaltigkeit",
-            title="Nachhaltigkeit & Ökonomie",
+            # Ohne Nummer: erscheint wie beim Einzelprompt als Block am Ende von Unterpunkt 6.
+            title="Ökologische / ökonomische Aspekte",
             instruction=(
                 "Analysiere ökologische sowie ökonomische Aspekte. Hebe unnötige Ressourcenbelastungen "
                 "oder Einsparpotenziale hervor und begründe, falls zu wenig Diagnostik ebenfalls nachteilig ist."
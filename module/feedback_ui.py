@@ -1,13 +1,12 @@
 import streamlit as st
 from datetime import datetime
-from supabase import create_client, Client
 from cryptography.fernet import Fernet, InvalidToken
 from module.offline import is_offline
+from module.supabase_client import get_supabase_client
+from module.gpt_feedback import get_feedback_row_id
 
-# Supabase initialisieren (Erwartung: in st.secrets definiert)
-supabase_url = st.secrets["supabase"]["url"]
-supabase_key = st.secrets["supabase"]["key"]
-supabase: Client = create_client(supabase_url, supabase_key)
+# Höchstwartezeit auf die ID des im Hintergrund gespeicherten Feedbacks.
+_FEEDBACK_ID_WARTEZEIT_SEK = 15.0
 
 
 def _encrypt_matrikel(matrikel: str) -> str | None:
@@ -192,10 +191,12 @@ def student_feedback():
         }
 
         try:
-            row_id = st.session_state.get("feedback_row_id")
+            # Der Feedback-Insert läuft im Hintergrund; in aller Regel ist er
+            # längst abgeschlossen, sonst wird hier kurz auf die ID gewartet.
+            row_id = get_feedback_row_id(warte_sek=_FEEDBACK_ID_WARTEZEIT_SEK)
             
             if row_id is not None:
-                supabase.table("feedback_gpt").update(eintrag).eq("ID", row_id).execute()
+                get_supabase_client().table("feedback_gpt").update(eintrag).eq("ID", row_id).execute()
                 st.success("✅ Vielen Dank! Ihr Feedback wurde gespeichert.")
                 st.session_state["student_evaluation_done"] = True
                 st.rerun()
@@ -0,0 +1,216 @@
+"""Spekulatives Abschlussfeedback, gestartet beim Absenden von Diagnose und Therapie.
+
+Der gpt-4.1-Aufruf für das Abschlussfeedback dauert typischerweise mehrere
+zehn Sekunden. Bisher begann er erst beim Laden der Feedback-Seite. Jetzt
+startet Seite 5 ihn im Hintergrund, sobald die finalen Angaben übernommen sind;
+die Feedback-Seite übernimmt das laufende bzw. fertige Ergebnis.
+
+Abgrenzung der Zuständigkeiten:
+- Die Nachrichten baut der Hauptthread (``feedbackmodul.baue_feedback_nachrichten``);
+  der Worker ruft nur :func:`rufe_profil_stream_auf` auf und greift nie auf den
+  Session-State zu.
+- Ein SHA-256-Digest über die vollständigen Nachrichten identifiziert den
+  Lauf. Ändert sich danach irgendeine Eingabe (Diagnose, Therapie, Setting,
+  AMBOSS-Kontext, Modus …), passt der Digest nicht mehr: Der alte Lauf wird
+  verworfen und regulär neu erzeugt.
+- Der Aufruf wird gestreamt; der bisher empfangene Text steht über
+  :meth:`VorabFeedback.teiltext` bereit. So kann die Feedback-Seite fertige
+  Abschnitte schon anzeigen, während der Rest noch entsteht.
+- Der Aufruf läuft im prozessweiten Hintergrund-Pool
+  (``module/hintergrund_pool.py``, Spur ``feedback``).
+- Der Lauf bleibt bis zur Übernahme im Session-State. Unterbricht ein Rerun
+  (z. B. ein Klick) das Warten, hängt sich der nächste Durchlauf wieder an.
+- Tokens und Laufzeiten werden beim Übernehmen (oder Verwerfen) im Hauptthread
+  verbucht.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import CancelledError, Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import streamlit as st
+
+from module.gpt_streaming import StreamErgebnis
+from module.hintergrund_pool import aktueller_absender, get_hintergrund_pool
+from module.llm_gateway import LLMMessung, rufe_profil_stream_auf, verbuche_aufruf
+from module.rate_limiter import LANE_FEEDBACK
+
+__all__ = [
+    "VorabFeedback",
+    "eingabe_digest",
+    "plane_vorab_feedback",
+    "uebernimm_vorab_feedback",
+    "verwerfe_vorab_feedback",
+]
+
+_SESSION_KEY = "final_feedback_vorab"
+_PROFIL = "abschlussfeedback"
+_KONTEXT = "Abschlussfeedback"
+
+# Höchstwartezeit der Feedback-Seite auf einen noch laufenden Vorablauf.
+# Danach wird regulär (im Vordergrund) erzeugt.
+_WARTEZEIT_SEK = 240.0
+# Abstand, in dem beim Warten der Teiltext an die Anzeige weitergegeben wird.
+_ANZEIGE_INTERVALL_SEK = 0.15
+
+
+class _Abgebrochen(Exception):
+    """Der Vorablauf wurde verworfen (vor oder während des Streams)."""
+
+
+def eingabe_digest(messages: List[Dict[str, Any]]) -> str:
+    """Stabiler Digest über alle Nachrichten des Feedback-Aufrufs."""
+
+    payload = json.dumps(messages, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VorabFeedback:
+    """Ein laufender oder fertiger Vorablauf für genau einen Eingabe-Digest."""
+
+    def __init__(self, digest: str) -> None:
+        self.digest = digest
+        self.future: Future | None = None
+        self._abbruch = threading.Event()
+        self._lock = threading.Lock()
+        self._teiltext = ""
+
+    def _empfange(self, _fragment: str, gesamt: str) -> None:
+        # Läuft im Worker; ein verworfener Lauf beendet den Stream vorzeitig.
+        if self._abbruch.is_set():
+            raise _Abgebrochen()
+        with self._lock:
+            self._teiltext = gesamt
+
+    def teiltext(self) -> str:
+        """Bisher empfangener Text (beginnt bei einem erneuten Versuch von vorn)."""
+
+        with self._lock:
+            return self._teiltext
+
+    def abbrechen(self) -> None:
+        """Verwirft den Lauf; ein laufender Stream endet beim nächsten Fragment."""
+
+        self._abbruch.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+def _erzeuge(messages: List[Dict[str, Any]], client: Any, vorab: VorabFeedback) -> Tuple[StreamErgebnis, LLMMessung]:
+    """Worker: streamt das Profil ohne Session-Zugriffe."""
+
+    if vorab._abbruch.is_set():
+        raise _Abgebrochen()
+    return rufe_profil_stream_auf(_PROFIL, messages, on_text=vorab._empfange, client=client)
+
+
+def _verbuche_fertigen(vorab: VorabFeedback, kontext: str) -> None:
+    """Verbucht einen bereits abgeschlossenen Lauf; die Tokens sind angefallen."""
+
+    if vorab.future is None or not vorab.future.done() or vorab.future.cancelled():
+        return
+    try:
+        ergebnis, messung = vorab.future.result(timeout=0)
+    except Exception as exc:
+        messung = getattr(exc, "llm_messung", None)
+        if messung is not None:
+            verbuche_aufruf(kontext, messung)
+        return
+    verbuche_aufruf(kontext, messung, ergebnis)
+
+
+def verwerfe_vorab_feedback() -> None:
+    """Verwirft den Vorablauf der Sitzung (z. B. nach geänderten Eingaben)."""
+
+    vorab = st.session_state.pop(_SESSION_KEY, None)
+    if vorab is None:
+        return
+    vorab.abbrechen()
+    _verbuche_fertigen(vorab, f"{_KONTEXT} (verworfen)")
+
+
+def plane_vorab_feedback(messages: List[Dict[str, Any]], client: Any) -> bool:
+    """Startet den Feedback-Aufruf im Hintergrund, falls er nicht schon läuft.
+
+    Rückgabe ``True``, wenn ein neuer Lauf gestartet wurde. Ein Lauf mit
+    anderem Digest wird vorher verworfen.
+    Debug-Hinweis: ``st.write(st.session_state.get("final_feedback_vorab").digest)``
+    zeigt den aktuellen Digest.
+    """
+
+    digest = eingabe_digest(messages)
+    bestehend = st.session_state.get(_SESSION_KEY)
+    if bestehend is not None and bestehend.digest == digest:
+        return False
+    verwerfe_vorab_feedback()
+    vorab = VorabFeedback(digest)
+    vorab.future = get_hintergrund_pool().submit(
+        _erzeuge,
+        list(messages),
+        client,
+        vorab,
+        absender=aktueller_absender(),
+        spur=LANE_FEEDBACK,
+        art="feedback_vorab",
+    )
+    st.session_state[_SESSION_KEY] = vorab
+    return True
+
+
+def uebernimm_vorab_feedback(
+    messages: List[Dict[str, Any]],
+    *,
+    on_text: Callable[[str], None] | None = None,
+) -> str | None:
+    """Liefert den Text eines passenden Vorablaufs, sonst ``None``.
+
+    Ein noch laufender Aufruf wird höchstens ``_WARTEZEIT_SEK`` abgewartet; ein
+    fertiger wird sofort übernommen. Währenddessen erhält ``on_text`` den jeweils
+    bisher empfangenen Gesamttext. Bei abweichendem Digest oder Fehler wird der
+    Vorablauf verworfen und der Aufrufer erzeugt regulär.
+    """
+
+    vorab = st.session_state.get(_SESSION_KEY)
+    if vorab is None or vorab.future is None:
+        return None
+    if vorab.digest != eingabe_digest(messages):
+        verwerfe_vorab_feedback()
+        return None
+
+    frist = time.monotonic() + _WARTEZEIT_SEK
+    angezeigt: str | None = None
+    while True:
+        rest = frist - time.monotonic()
+        if rest <= 0:
+            verwerfe_vorab_feedback()
+            return None
+        try:
+            ergebnis, messung = vorab.future.result(
+                timeout=min(rest, _ANZEIGE_INTERVALL_SEK) if on_text is not None else rest
+            )
+            break
+        except FutureTimeoutError:
+            if on_text is not None:
+                teiltext = vorab.teiltext()
+                if teiltext != angezeigt:
+                    on_text(teiltext)
+                    angezeigt = teiltext
+        except (CancelledError, _Abgebrochen):
+            st.session_state.pop(_SESSION_KEY, None)
+            return None
+        except Exception as exc:
+            st.session_state.pop(_SESSION_KEY, None)
+            messung = getattr(exc, "llm_messung", None)
+            if messung is not None:
+                verbuche_aufruf(_KONTEXT, messung)
+            return None
+
+    st.session_state.pop(_SESSION_KEY, None)
+    verbuche_aufruf(_KONTEXT, messung, ergebnis)
+    return ergebnis.text or None
@@ -1,9 +1,20 @@
 from datetime import datetime
 import streamlit as st
-from supabase import create_client
 # import json
-from module.token_counter import init_token_counters, get_token_sums
+from module.token_counter import (
+    berechne_kosten_usd,
+    get_cached_tokens,
+    get_token_nutzung,
+    get_token_sums,
+    init_token_counters,
+)
 from module.offline import is_offline
+from module.supabase_client import get_supabase_client
+from module.supabase_schema import fehlende_optionale_spalten
+from module.supabase_writer import schreibe_spaeter
+from module.gpt_timing import get_session_latenzen
+
+_SESSION_KEY_HANDLE = "feedback_row_handle"
 
 
 def _get_feedback_modus() -> str:
@@ -74,27 +85,41 @@ def _build_main_feedback_meta() -> tuple[bool, dict, dict]:
     return zusaetzliche_infos_abgerufen, zusaetzliche_infos_quellen, context_snapshot
 
 
-def _spalte_verfuegbar(supabase, spaltenname: str) -> bool:
-    """Prüft, ob eine Spalte in ``feedback_gpt`` vorhanden ist.
+def feedback_speicherung_angestossen() -> bool:
+    """True, sobald das Feedback gespeichert wurde oder im Hintergrund gespeichert wird."""
+
+    return "feedback_row_id" in st.session_state or _SESSION_KEY_HANDLE in st.session_state
+
 
-    Der leichte ``select``-Check vermeidet Insert-Fehler, wenn Deployments die
-    neuen optionalen Felder (z. B. ``diagnostik_runden_gesamt``) noch nicht
-    migriert haben. Für tiefergehende Analysen kann temporär
-    ``st.write(spaltenname, probe)`` aktiviert werden, um die Server-Antwort zu
-    inspizieren.
+def get_feedback_row_id(warte_sek: float = 0.0):
+    """Liefert die ``ID`` des Feedback-Datensatzes oder ``None``.
+
+    Solange der Insert noch in der Write-behind-Warteschlange liegt, wird
+    höchstens ``warte_sek`` Sekunden gewartet. Ist er endgültig gescheitert,
+    wird der Handle entfernt, damit der nächste Seitenaufruf erneut speichert.
+    Debug-Hinweis: ``st.write(st.session_state.get("feedback_row_handle"))``
+    zeigt den Stand des Inserts.
     """
 
-    try:
-        probe = supabase.table("feedback_gpt").select(spaltenname).limit(0).execute()
-    except Exception:
-        return False
+    row_id = st.session_state.get("feedback_row_id")
+    if row_id is not None:
+        return row_id
+    handle = st.session_state.get(_SESSION_KEY_HANDLE)
+    if handle is None or not handle.warte(warte_sek):
+        return None
+    st.session_state.pop(_SESSION_KEY_HANDLE, None)
+    if handle.fehler is not None or not handle.daten:
+        st.error(f"🚫 Fehler beim Speichern in Supabase: {handle.fehler!r}")
+        return None
+    st.session_state["feedback_row_id"] = handle.daten[0]["ID"]
+    return st.session_state["feedback_row_id"]
 
-    return not getattr(probe, "error", None)
 
 def speichere_gpt_feedback_in_supabase():
     if is_offline():
         st.info("🔌 Offline-Modus: Feedback wird nicht in Supabase gespeichert.")
         st.session_state.pop("feedback_row_id", None)
+        st.session_state.pop(_SESSION_KEY_HANDLE, None)
         return
 
     jetzt = datetime.now()
@@ -161,7 +186,7 @@ def speichere_gpt_feedback_in_supabase():
     }
 
     try:
-        supabase = create_client(st.secrets["supabase"]["url"], st.secrets["supabase"]["key"])
+        supabase = get_supabase_client()
 
         # Debug-Hinweis (beschriftet): Aktivieren, um den Weg der Settings bis
         # zur Supabase-Speicherung nachvollziehen zu können. So lässt sich
@@ -175,6 +200,9 @@ def speichere_gpt_feedback_in_supabase():
             # `feedback_detail_events`, damit Hauptfeedback und Detail-Feedback
             # später mit identischen Kennzahlen ausgewertet werden können.
             "feedback_modus": _get_feedback_modus(),
+            # Engine des Abschlussfeedbacks ("einzelprompt" oder "pipeline"),
+            # damit beide Varianten im Produktivbetrieb vergleichbar bleiben.
+            "feedback_engine": st.session_state.get("feedback_engine_genutzt"),
             "amboss_mcp_genutzt": _is_amboss_mcp_genutzt(),
             "zusaetzliche_infos_abgerufen": zusaetzliche_infos_abgerufen,
             "zusaetzliche_infos_quellen": zusaetzliche_infos_quellen,
@@ -203,23 +231,44 @@ def speichere_gpt_feedback_in_supabase():
                 float(st.session_state.get("gpt_aktionsdauer_gesamt_sek", 0.0)),
                 2,
             ),
+            # Latenzverteilung je Kontext (Anzahl, p50/p95/p99, TTFT). Die
+            # Summe oben bleibt für ältere Auswertungen erhalten.
+            # Debug-Hinweis: `st.write(get_session_latenzen())` zeigt die Werte vor dem Insert.
+            "gpt_latenzen": get_session_latenzen(),
+            # Tokenverbrauch je Modell und Kontext samt gecachter Prompt-Tokens
+            # sowie die daraus berechneten Kosten für die Kapazitätsplanung.
+            # Debug-Hinweis: `st.write(get_token_nutzung(), berechne_kosten_usd())`
+            # zeigt Aufschlüsselung und Preisberechnung vor dem Insert.
+            "cached_prompt_tokens_sum": get_cached_tokens(),
+            "token_nutzung": get_token_nutzung(),
+            "kosten_usd": berechne_kosten_usd(),
         }
 
         # Debug-Hinweis: Falls in Supabase weiterhin "EMPTY" auftaucht, kann hier
         # temporär `st.write(optionale_spalten)` aktiviert werden. So lässt sich
         # prüfen, ob die Werte bereits im Session-State oder erst beim Insert
         # verfälscht werden.
-        for spaltenname, wert in optionale_spalten.items():
-            if _spalte_verfuegbar(supabase, spaltenname):
-                gpt_row[spaltenname] = wert
-            else:
-                st.warning(
-                    f"⚠️ Supabase-Spalte '{spaltenname}' fehlt. Bitte den README-SQL-Block "
-                    "zur Schema-Aktualisierung ausführen."
-                )
-
-        res = supabase.table("feedback_gpt").insert(gpt_row).execute()
-        st.session_state["feedback_row_id"] = res.data[0]["ID"]
+        # Welche optionalen Spalten das Schema kennt, entscheidet der
+        # prozessweite Schema-Cache (``module/supabase_schema.py``).
+        fehlende_spalten = fehlende_optionale_spalten(supabase, "feedback_gpt", optionale_spalten)
+        for spaltenname in fehlende_spalten:
+            st.warning(
+                f"⚠️ Supabase-Spalte '{spaltenname}' fehlt. Bitte den README-SQL-Block "
+                "zur Schema-Aktualisierung ausführen."
+            )
+        gpt_row.update(
+            {k: v for k, v in optionale_spalten.items() if k not in fehlende_spalten}
+        )
+
+        # Der Insert läuft im Hintergrund (``module/supabase_writer.py``), die
+        # Seite wird sofort weiter gerendert. Die Datensatz-ID wird erst bei
+        # Bedarf über ``get_feedback_row_id`` aus dem Handle gelesen.
+        st.session_state[_SESSION_KEY_HANDLE] = schreibe_spaeter(
+            "feedback_gpt",
+            gpt_row,
+            optionale_spalten=tuple(k for k in optionale_spalten if k not in fehlende_spalten),
+            mit_handle=True,
+        )
         # gpt_row_serialisiert = json.loads(json.dumps(gpt_row, default=str))
         # supabase.table("feedback_gpt").insert(gpt_row_serialisiert).execute()
         # DEBUG 
@@ -0,0 +1,84 @@
+"""Hilfsfunktionen für gestreamte GPT-Antworten.
+
+Das Modul kapselt das Einlesen eines ``stream=True``-Aufrufs der OpenAI-API.
+Aufrufer erhalten die Textfragmente über einen Callback (z. B. um einen
+Streamlit-Platzhalter fortlaufend zu aktualisieren) und nach Abschluss ein
+kompaktes Ergebnisobjekt mit Volltext, Token-Verbrauch und der Zeit bis zum
+ersten Token (Time-to-first-Token, TTFT). Die Messung der Gesamtdauer bleibt
+bewusst bei :func:`module.gpt_timing.messe_gpt_aktion`, damit alle Aufrufe
+weiterhin gleich summiert werden.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from module.token_counter import lese_cached_tokens
+
+__all__ = ["StreamErgebnis", "streame_chat_antwort"]
+
+
+@dataclass
+class StreamErgebnis:
+    """Ergebnis eines vollständig konsumierten Chat-Streams."""
+
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cached_tokens: int = 0
+    ttft_sek: Optional[float] = None
+
+
+def streame_chat_antwort(
+    client: Any,
+    *,
+    on_text: Callable[[str, str], None] | None = None,
+    **create_kwargs: Any,
+) -> StreamErgebnis:
+    """Startet einen gestreamten Chat-Aufruf und sammelt das Ergebnis ein.
+
+    ``on_text`` wird nach jedem empfangenen Fragment mit ``(fragment, bisheriger
+    Gesamttext)`` aufgerufen. Über ``stream_options`` fordern wir die
+    Usage-Angaben im letzten Chunk an, damit die Token-Zählung auch im
+    Streaming-Modus vollständig bleibt.
+
+    Debug-Hinweis: Bei fehlenden Token-Werten kann temporär
+    ``st.write(chunk)`` in der Schleife aktiviert werden, um zu prüfen, ob der
+    abschließende Usage-Chunk vom Server geliefert wird.
+    """
+
+    create_kwargs["stream"] = True
+    create_kwargs.setdefault("stream_options", {"include_usage": True})
+
+    start = time.perf_counter()
+    stream = client.chat.completions.create(**create_kwargs)
+
+    teile: list[str] = []
+    ergebnis = StreamErgebnis(text="")
+    for chunk in stream:
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            ergebnis.prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+            ergebnis.completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+            ergebnis.total_tokens = int(getattr(usage, "total_tokens", 0) or 0)
+            ergebnis.cached_tokens = lese_cached_tokens(usage)
+
+        choices = getattr(chunk, "choices", None) or []
+        if not choices:
+            # Der Usage-Chunk am Ende enthält keine Auswahl mehr.
+            continue
+        fragment = getattr(choices[0].delta, "content", None) or ""
+        if not fragment:
+            continue
+
+        if ergebnis.ttft_sek is None:
+            ergebnis.ttft_sek = time.perf_counter() - start
+        teile.append(fragment)
+        if on_text is not None:
+            on_text(fragment, "".join(teile))
+
+    ergebnis.text = "".join(teile)
+    return ergebnis
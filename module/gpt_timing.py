@@ -1,14 +1,51 @@
-"""Hilfsfunktionen zum Messen der kumulierten GPT-Laufzeiten."""
+"""Hilfsfunktionen zum Messen der kumulierten GPT-Laufzeiten.
+
+Neben der kumulierten Session-Summe werden je Aufrufkontext (z. B.
+"Körperbefund", "Abschlussfeedback") einzelne Messungen mit Dauer,
+Time-to-first-Token, Tokenzahlen, Modell und Erfolg festgehalten. Diese landen
+sowohl im Session-State (für die Speicherung am ``feedback_gpt``-Datensatz) als
+auch in einem prozessweiten Puffer, aus dem der Adminbereich p50/p95/p99-Werte
+über alle Sitzungen berechnet.
+"""
 
 from __future__ import annotations
 
+from collections import deque
+from dataclasses import dataclass, field
+import math
+import threading
 import time
-from typing import Callable, TypeVar
+from typing import Any, Callable, Deque, Dict, List, Optional, TypeVar
 
 import streamlit as st
 
 T = TypeVar("T")
 
+# Anzahl der Messungen, die pro Kontext prozessweit vorgehalten werden. Ältere
+# Einträge fallen heraus, sodass die Perzentile die jüngste Last widerspiegeln.
+_PROZESS_PUFFER_JE_KONTEXT = 500
+# Wird beim Fallwechsel über ``_FALL_SESSION_KEYS`` in ``module/fallverwaltung.py`` entfernt.
+_SESSION_KEY_MESSUNGEN = "gpt_messungen"
+
+_PROZESS_MESSUNGEN: Dict[str, Deque["GptMessung"]] = {}
+_PROZESS_LOCK = threading.Lock()
+
+
+@dataclass
+class GptMessung:
+    """Einzelmessung eines GPT-Aufrufs."""
+
+    kontext: str
+    dauer_sek: float
+    erfolg: bool = True
+    model: str = ""
+    profil: str = ""
+    ttft_sek: Optional[float] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    zeitpunkt: float = field(default_factory=time.time)
+
 
 def messe_gpt_aktion(aktion: Callable[[], T], *, kontext: str = "") -> T:
     """Misst die Dauer einer GPT-Aktion und addiert sie im Session-State.
@@ -44,3 +81,87 @@ def add_gpt_duration(dauer: float, *, kontext: str = "") -> None:
     st.session_state["gpt_aktionsdauer_gesamt_sek"] = bisher + float(dauer)
     # Debug-Hinweis: Bei Bedarf kann ``st.write(kontext, dauer)`` ergänzt werden,
     # um zeitintensive Abschnitte zu identifizieren.
+
+
+
+def registriere_gpt_messung(messung: GptMessung, *, in_session: bool = True) -> None:
+    """Speichert eine Messung prozessweit und (optional) im Session-State.
+
+    ``in_session=False`` ist für Hintergrund-Threads gedacht, die keinen Zugriff
+    auf ``st.session_state`` haben; die Session-Zuordnung erfolgt dann im
+    Hauptthread.
+    """
+
+    with _PROZESS_LOCK:
+        puffer = _PROZESS_MESSUNGEN.get(messung.kontext)
+        if puffer is None:
+            puffer = deque(maxlen=_PROZESS_PUFFER_JE_KONTEXT)
+            _PROZESS_MESSUNGEN[messung.kontext] = puffer
+        puffer.append(messung)
+    if in_session:
+        st.session_state.setdefault(_SESSION_KEY_MESSUNGEN, []).append(messung)
+    # Debug-Hinweis: ``st.write(messung)`` zeigt die einzelne Messung an.
+
+
+def perzentil(sortierte_werte: List[float], anteil: float) -> Optional[float]:
+    """Nearest-Rank-Perzentil auf einer bereits sortierten Liste.
+
+    Wird auch von ``module/hintergrund_pool.py`` und
+    ``module/feedback_benchmark.py`` verwendet.
+    """
+
+    if not sortierte_werte:
+        return None
+    index = min(len(sortierte_werte) - 1, max(0, math.ceil(anteil * len(sortierte_werte)) - 1))
+    return sortierte_werte[index]
+
+
+def _fasse_zusammen(messungen: List[GptMessung]) -> Dict[str, Any]:
+    dauern = sorted(m.dauer_sek for m in messungen if m.erfolg)
+    ttfts = sorted(m.ttft_sek for m in messungen if m.erfolg and m.ttft_sek is not None)
+    fehler = sum(1 for m in messungen if not m.erfolg)
+    # Prompt-Caching: Anteil der gecachten Prompt-Tokens und Median-Latenz mit
+    # bzw. ohne Cache-Treffer, um die Wirkung des Präfix-Layouts zu prüfen.
+    prompt_tokens = sum(m.prompt_tokens for m in messungen)
+    cached_tokens = sum(m.cached_tokens for m in messungen)
+    mit_cache = sorted(m.dauer_sek for m in messungen if m.erfolg and m.cached_tokens > 0)
+    ohne_cache = sorted(m.dauer_sek for m in messungen if m.erfolg and m.cached_tokens == 0)
+    return {
+        "anzahl": len(messungen),
+        "fehler": fehler,
+        "p50_sek": perzentil(dauern, 0.50),
+        "p95_sek": perzentil(dauern, 0.95),
+        "p99_sek": perzentil(dauern, 0.99),
+        "ttft_p50_sek": perzentil(ttfts, 0.50),
+        "ttft_p95_sek": perzentil(ttfts, 0.95),
+        "dauer_summe_sek": round(sum(m.dauer_sek for m in messungen), 3),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": sum(m.completion_tokens for m in messungen),
+        "cached_tokens": cached_tokens,
+        "cache_trefferquote": round(cached_tokens / prompt_tokens, 3) if prompt_tokens else None,
+        "cache_treffer_aufrufe": sum(1 for m in messungen if m.cached_tokens > 0),
+        "p50_mit_cache_sek": perzentil(mit_cache, 0.50),
+        "p50_ohne_cache_sek": perzentil(ohne_cache, 0.50),
+        "modelle": sorted({m.model for m in messungen if m.model}),
+    }
+
+
+def get_prozess_latenzen() -> Dict[str, Dict[str, Any]]:
+    """Liefert p50/p95/p99 je Kontext über alle Sitzungen dieses Prozesses."""
+
+    with _PROZESS_LOCK:
+        kopie = {kontext: list(puffer) for kontext, puffer in _PROZESS_MESSUNGEN.items()}
+    return {kontext: _fasse_zusammen(messungen) for kontext, messungen in sorted(kopie.items())}
+
+
+def get_session_latenzen() -> Dict[str, Dict[str, Any]]:
+    """Fasst die Messungen der aktuellen Sitzung je Kontext zusammen.
+
+    Das Ergebnis ist JSON-serialisierbar und wird mit dem ``feedback_gpt``-
+    Datensatz gespeichert.
+    """
+
+    je_kontext: Dict[str, List[GptMessung]] = {}
+    for messung in st.session_state.get(_SESSION_KEY_MESSUNGEN, []):
+        je_kontext.setdefault(messung.kontext, []).append(messung)
+    return {kontext: _fasse_zusammen(messungen) for kontext, messungen in sorted(je_kontext.items())}
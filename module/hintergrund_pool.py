@@ -0,0 +1,256 @@
+"""Prozessweiter, begrenzter Thread-Pool für LLM- und I/O-Arbeiten im Hintergrund.
+
+Bisher startete jede Feedback-Pipeline einen eigenen Pool mit einem Thread je
+Abschnitt; dazu kamen getrennte Pools für das spekulative Abschlussfeedback
+und den Detail-Vorabruf. Fordert eine ganze Kohorte gleichzeitig Feedback an,
+entstanden so Hunderte Threads, die die API zeitgleich ansprachen.
+
+Jetzt teilen sich alle Hintergrundarbeiten einen Pool:
+- Höchstens ``HINTERGRUND_WORKER`` Threads (Standard 16) laufen gleichzeitig;
+  sie werden bei Bedarf gestartet und bleiben danach bestehen.
+- Aufträge gehören zu einer Spur des Ratenbegrenzers (``feedback`` vor
+  ``hintergrund``, siehe ``module/rate_limiter.py``). Ein freier Worker
+  bedient immer zuerst die höchste Spur mit wartenden Aufträgen.
+- Innerhalb einer Spur werden die Absender (je Streamlit-Sitzung) reihum
+  bedient. Eine Sitzung mit vielen Aufträgen (z. B. acht Pipeline-Abschnitte)
+  verdrängt damit nicht die erste Anfrage einer anderen Sitzung.
+- Warteschlangenlänge, aktive Worker sowie Warte- und Laufzeiten je Auftragsart
+  werden mitgeschrieben und im Adminbereich angezeigt.
+
+Die Aufträge dürfen nicht auf den Session-State zugreifen; den Absender
+ermittelt :func:`aktueller_absender` deshalb beim Einreihen im Hauptthread.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import os
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from module.gpt_timing import perzentil
+from module.rate_limiter import LANE_FEEDBACK, LANE_HINTERGRUND, LANE_INTERAKTIV
+
+try:  # pragma: no cover - abhängig von der Streamlit-Version
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # pragma: no cover
+    get_script_run_ctx = None  # type: ignore[assignment]
+
+__all__ = [
+    "HintergrundPool",
+    "aktueller_absender",
+    "get_hintergrund_pool",
+    "get_hintergrund_status",
+]
+
+_STANDARD_WORKER = 16
+# Reihenfolge = Priorität (kleiner Index wird zuerst bedient), wie im Ratenbegrenzer.
+_SPUREN = (LANE_INTERAKTIV, LANE_FEEDBACK, LANE_HINTERGRUND)
+# Anzahl der gespeicherten Warte- und Laufzeiten je Auftragsart.
+_ZEIT_HISTORIE = 200
+
+
+def _lese_worker_anzahl() -> int:
+    try:
+        return max(1, int(os.getenv("HINTERGRUND_WORKER", "") or _STANDARD_WORKER))
+    except ValueError:
+        return _STANDARD_WORKER
+
+
+def aktueller_absender() -> str:
+    """Kennung der aufrufenden Streamlit-Sitzung (für die faire Verteilung)."""
+
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    if ctx is not None:
+        return str(ctx.session_id)
+    return threading.current_thread().name
+
+
+@dataclass
+class _Auftrag:
+    future: Future
+    aufruf: Callable[[], Any]
+    art: str
+    eingereiht: float
+
+
+@dataclass
+class _ArtStatistik:
+    eingereicht: int = 0
+    erledigt: int = 0
+    fehler: int = 0
+    abgebrochen: int = 0
+    wartezeiten: Deque[float] = field(default_factory=lambda: deque(maxlen=_ZEIT_HISTORIE))
+    laufzeiten: Deque[float] = field(default_factory=lambda: deque(maxlen=_ZEIT_HISTORIE))
+
+
+class HintergrundPool:
+    """Begrenzter Pool mit priorisierten Spuren und Round-Robin je Absender."""
+
+    def __init__(self, max_worker: int) -> None:
+        self.max_worker = max_worker
+        self._bedingung = threading.Condition()
+        # Spur -> Absender -> wartende Aufträge. Die Reihenfolge der Absender ist
+        # die Bedienreihenfolge; ein bedienter Absender rückt ans Ende.
+        self._warteschlangen: Dict[str, "OrderedDict[str, Deque[_Auftrag]]"] = {
+            spur: OrderedDict() for spur in _SPUREN
+        }
+        self._threads: List[threading.Thread] = []
+        self._leerlauf = 0
+        # Eingereihte, noch von keinem Worker abgeholte Aufträge.
+        self._eingereiht = 0
+        self._aktiv = 0
+        self._statistik: Dict[str, _ArtStatistik] = {}
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        /,
+        *args: Any,
+        absender: str,
+        spur: str = LANE_FEEDBACK,
+        art: str = "",
+        **kwargs: Any,
+    ) -> Future:
+        """Reiht ``fn(*args, **kwargs)`` ein und liefert das zugehörige Future.
+
+        Ein Future, das vor dem Start abgebrochen wird (``cancel()``), wird
+        übersprungen.
+        """
+
+        if spur not in self._warteschlangen:
+            spur = LANE_HINTERGRUND
+        future: Future = Future()
+        auftrag = _Auftrag(future, lambda: fn(*args, **kwargs), art or getattr(fn, "__name__", "auftrag"), time.monotonic())
+        with self._bedingung:
+            self._warteschlangen[spur].setdefault(absender, deque()).append(auftrag)
+            self._statistik.setdefault(auftrag.art, _ArtStatistik()).eingereicht += 1
+            self._eingereiht += 1
+            # Ein wartender Worker nimmt nur einen Auftrag; werden mehrere
+            # Aufträge eingereiht, bevor er aufwacht, braucht es weitere Threads.
+            if self._eingereiht > self._leerlauf and len(self._threads) < self.max_worker:
+                thread = threading.Thread(
+                    target=self._arbeite,
+                    name=f"hintergrund-{len(self._threads) + 1}",
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+            self._bedingung.notify()
+        return future
+
+    def _naechster(self) -> Optional[_Auftrag]:
+        # Nur unter ``self._bedingung`` aufrufen.
+        for spur in _SPUREN:
+            absender_schlangen = self._warteschlangen[spur]
+            while absender_schlangen:
+                absender, schlange = next(iter(absender_schlangen.items()))
+                auftrag = schlange.popleft()
+                self._eingereiht -= 1
+                if schlange:
+                    absender_schlangen.move_to_end(absender)
+                else:
+                    del absender_schlangen[absender]
+                return auftrag
+        return None
+
+    def _arbeite(self) -> None:
+        while True:
+            with self._bedingung:
+                auftrag = self._naechster()
+                while auftrag is None:
+                    self._leerlauf += 1
+                    self._bedingung.wait()
+                    self._leerlauf -= 1
+                    auftrag = self._naechster()
+                statistik = self._statistik[auftrag.art]
+                if not auftrag.future.set_running_or_notify_cancel():
+                    statistik.abgebrochen += 1
+                    continue
+                self._aktiv += 1
+                start = time.monotonic()
+                statistik.wartezeiten.append(start - auftrag.eingereiht)
+
+            fehler: Optional[BaseException] = None
+            try:
+                ergebnis = auftrag.aufruf()
+            except BaseException as exc:
+                # Wie bei ThreadPoolExecutor landet jeder Fehler im Future.
+                fehler = exc
+            dauer = time.monotonic() - start
+
+            with self._bedingung:
+                self._aktiv -= 1
+                statistik.laufzeiten.append(dauer)
+                if fehler is None:
+                    statistik.erledigt += 1
+                else:
+                    statistik.fehler += 1
+            # Außerhalb der Sperre: Callbacks des Futures laufen in diesem Thread.
+            if fehler is None:
+                auftrag.future.set_result(ergebnis)
+            else:
+                auftrag.future.set_exception(fehler)
+
+    def status(self) -> Dict[str, Any]:
+        """Momentaufnahme für die Adminanzeige."""
+
+        with self._bedingung:
+            wartend_je_spur = {
+                spur: sum(
+                    1
+                    for schlange in absender_schlangen.values()
+                    for auftrag in schlange
+                    if not auftrag.future.cancelled()
+                )
+                for spur, absender_schlangen in self._warteschlangen.items()
+            }
+            absender_wartend = len(
+                {absender for absender_schlangen in self._warteschlangen.values() for absender in absender_schlangen}
+            )
+            arten = {}
+            for art, statistik in self._statistik.items():
+                wartezeiten = sorted(statistik.wartezeiten)
+                laufzeiten = sorted(statistik.laufzeiten)
+                arten[art] = {
+                    "eingereicht": statistik.eingereicht,
+                    "erledigt": statistik.erledigt,
+                    "fehler": statistik.fehler,
+                    "abgebrochen": statistik.abgebrochen,
+                    "wartezeit_p50_sek": perzentil(wartezeiten, 0.50),
+                    "wartezeit_p95_sek": perzentil(wartezeiten, 0.95),
+                    "laufzeit_p50_sek": perzentil(laufzeiten, 0.50),
+                    "laufzeit_p95_sek": perzentil(laufzeiten, 0.95),
+                }
+            return {
+                "max_worker": self.max_worker,
+                "threads": len(self._threads),
+                "aktiv": self._aktiv,
+                "wartend": sum(wartend_je_spur.values()),
+                "wartend_je_spur": wartend_je_spur,
+                "absender_wartend": absender_wartend,
+                "arten": arten,
+            }
+
+
+_POOL: Optional[HintergrundPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_hintergrund_pool() -> HintergrundPool:
+    """Liefert den prozessweiten Pool (wird beim ersten Aufruf erzeugt)."""
+
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = HintergrundPool(_lese_worker_anzahl())
+        return _POOL
+
+
+def get_hintergrund_status() -> Dict[str, Any]:
+    """Kurzform für die Adminseite."""
+
+    return get_hintergrund_pool().status()
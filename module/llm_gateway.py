@@ -0,0 +1,410 @@
+"""Zentrales Gateway für alle Chat-Aufrufe an das Sprachmodell.
+
+Bisher waren Modellnamen, Temperaturen und Fehlerbehandlung an jeder Aufrufstelle
+separat hinterlegt; keine Stelle setzte ``max_tokens`` oder ein Timeout. Dieses
+Modul bündelt die Aufrufe: Jede Aufrufstelle verweist auf ein benanntes
+:class:`LLMProfil` mit Modell, Tokenlimit, Timeout, Wiederholungsstrategie und
+optionalem Ausweichmodell. Antwortet das Hauptmodell nicht rechtzeitig, wird
+auf das (schnellere) Ausweichmodell gewechselt, statt Studierende minutenlang
+warten zu lassen.
+
+Vor jedem Versuch reserviert das Gateway Kapazität beim prozessweiten
+Ratenbegrenzer (``module/rate_limiter.py``); die Spur (Priorität) ist Teil des
+Profils.
+
+Zeitmessung (``messe_gpt_aktion``), Tokenzählung (``add_usage``) und die
+Einzelmessung je Kontext (``registriere_gpt_messung``) erfolgen ebenfalls hier, damit die Aufrufstellen nur
+noch Prompt und Profilname liefern müssen. Für Hintergrund-Threads ohne
+Streamlit-Kontext steht :func:`rufe_profil_auf` ohne Session-Zugriffe bereit.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import streamlit as st
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from module.gpt_streaming import StreamErgebnis, streame_chat_antwort
+from module.gpt_timing import GptMessung, messe_gpt_aktion, registriere_gpt_messung
+from module.openai_client import get_openai_client
+from module.rate_limiter import (
+    LANE_FEEDBACK,
+    LANE_HINTERGRUND,
+    LANE_INTERAKTIV,
+    get_rate_limiter,
+)
+from module.token_counter import add_usage, init_token_counters, lese_cached_tokens
+
+__all__ = [
+    "LLMMessung",
+    "LLMProfil",
+    "LLM_PROFILE",
+    "chat_completion",
+    "chat_stream",
+    "get_llm_profil",
+    "rufe_profil_auf",
+    "rufe_profil_stream_auf",
+    "verbuche_aufruf",
+]
+
+# Fehler, bei denen sich ein erneuter Versuch (bzw. ein Modellwechsel) lohnt.
+_WIEDERHOLBARE_FEHLER = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
+
+@dataclass(frozen=True)
+class LLMProfil:
+    """Beschreibt Modell und Laufzeitgrenzen einer Aufrufstelle."""
+
+    name: str
+    model: str
+    temperature: float
+    max_tokens: int
+    timeout_sek: float
+    #: Anzahl Versuche je Modell (1 = kein erneuter Versuch).
+    max_versuche: int = 2
+    #: Wartezeit vor dem zweiten Versuch; verdoppelt sich bei jedem weiteren.
+    backoff_sek: float = 1.0
+    #: Modell, auf das nach erschöpften Versuchen oder einem Timeout gewechselt wird.
+    fallback_model: Optional[str] = None
+    #: Prioritätsspur beim Ratenbegrenzer.
+    lane: str = LANE_INTERAKTIV
+
+
+@dataclass
+class LLMMessung:
+    """Ergebnis der Profilmessung eines einzelnen Gateway-Aufrufs."""
+
+    profil: str
+    model: str
+    dauer_sek: float
+    versuche: int
+    erfolg: bool
+    fallback_genutzt: bool = False
+
+
+# Die Profile bilden die bisher an den Aufrufstellen hinterlegten Modelle und
+# Temperaturen ab. Tokenlimits und Timeouts orientieren sich an der typischen
+# Antwortlänge; bei abgeschnittenen Antworten kann ``max_tokens`` hier zentral
+# angehoben werden.
+LLM_PROFILE: Dict[str, LLMProfil] = {
+    profil.name: profil
+    for profil in (
+        LLMProfil("anamnese_chat", "gpt-4o-mini", 0.6, 600, 30.0, fallback_model="gpt-4.1-mini"),
+        LLMProfil("anamnese_zusammenfassung", "gpt-4o-mini", 0.2, 800, 30.0),
+        LLMProfil("koerperbefund", "gpt-4o", 0.5, 1200, 45.0, backoff_sek=1.5, fallback_model="gpt-4o-mini"),
+        LLMProfil("sonderuntersuchung", "gpt-4o", 0.4, 600, 30.0, backoff_sek=1.5, fallback_model="gpt-4o-mini"),
+        LLMProfil("untersuchung_intent", "gpt-4o-mini", 0.0, 5, 10.0, max_versuche=1),
+        LLMProfil("diagnostik_befund", "gpt-4o", 0.4, 1500, 45.0, backoff_sek=1.5, fallback_model="gpt-4o-mini"),
+        LLMProfil("setting_kongruenz", "gpt-4.1-mini", 0.0, 300, 20.0, max_versuche=1),
+        LLMProfil("sprachcheck", "gpt-4o-mini", 0.3, 800, 20.0),
+        LLMProfil(
+            "abschlussfeedback", "gpt-4.1", 0.4, 3000, 90.0,
+            backoff_sek=2.0, fallback_model="gpt-4.1-mini", lane=LANE_FEEDBACK,
+        ),
+        LLMProfil(
+            "feedback_abschnitt", "gpt-4o", 0.4, 600, 60.0,
+            fallback_model="gpt-4o-mini", lane=LANE_FEEDBACK,
+        ),
+        LLMProfil(
+            "feedback_detail", "gpt-4.1-mini", 0.2, 600, 40.0,
+            fallback_model="gpt-4o-mini", lane=LANE_FEEDBACK,
+        ),
+        LLMProfil("amboss_summary", "gpt-4o-mini", 0.2, 1500, 60.0, backoff_sek=2.0, lane=LANE_HINTERGRUND),
+        LLMProfil("amboss_preprocessing", "gpt-4o-mini", 0.1, 1500, 60.0, backoff_sek=2.0, lane=LANE_HINTERGRUND),
+    )
+}
+
+
+def get_llm_profil(name: str, **abweichungen: Any) -> LLMProfil:
+    """Liefert ein Profil; einzelne Felder (z. B. ``model``) lassen sich übersteuern."""
+
+    try:
+        profil = LLM_PROFILE[name]
+    except KeyError as exc:
+        raise KeyError(f"Unbekanntes LLM-Profil: {name}") from exc
+    abweichungen = {key: wert for key, wert in abweichungen.items() if wert is not None}
+    return replace(profil, **abweichungen) if abweichungen else profil
+
+
+def _schaetze_tokens(messages: List[Dict[str, Any]], profil: LLMProfil) -> int:
+    """Grobe Vorab-Schätzung für den TPM-Bucket (ca. vier Zeichen pro Token)."""
+
+    zeichen = sum(len(str(msg.get("content", ""))) for msg in messages)
+    return zeichen // 4 + profil.max_tokens
+
+
+def _verbrauchte_tokens(ergebnis: Any) -> Optional[int]:
+    usage = getattr(ergebnis, "usage", None)
+    if usage is not None:
+        return int(getattr(usage, "total_tokens", 0) or 0)
+    total = getattr(ergebnis, "total_tokens", None)
+    return int(total) if total else None
+
+
+def _retry_after_sek(exc: Exception, standard: float) -> float:
+    """Liest ``retry-after`` aus der API-Antwort, sonst gilt der Profil-Backoff."""
+
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", standard))
+    except (TypeError, ValueError):
+        return standard
+
+
+def _mit_fallback(
+    profil: LLMProfil, aufruf: Callable[[str], Any], geschaetzte_tokens: int
+) -> Tuple[Any, LLMMessung]:
+    """Führt ``aufruf(model)`` gemäß Wiederholungs- und Fallbackstrategie aus.
+
+    Vor jedem Versuch wird Kapazität beim Ratenbegrenzer reserviert; scheitert
+    der Versuch, wird die Reservierung wieder freigegeben. Meldet die
+    API selbst ein Limit, pausiert der Begrenzer alle Spuren für die von der API
+    genannte Dauer.
+    """
+
+    modelle = [profil.model]
+    if profil.fallback_model and profil.fallback_model != profil.model:
+        modelle.append(profil.fallback_model)
+
+    limiter = get_rate_limiter()
+    start = time.perf_counter()
+    versuche = 0
+    letzter_fehler: Exception | None = None
+    for index, model in enumerate(modelle):
+        for versuch in range(max(1, profil.max_versuche)):
+            versuche += 1
+            reservierung = limiter.erwerben(profil.lane, geschaetzte_tokens)
+            try:
+                ergebnis = aufruf(model)
+            except _WIEDERHOLBARE_FEHLER as exc:
+                # Gescheiterte Versuche geben ihre Token-Reservierung zurück,
+                # sonst leert eine Störung den TPM-Bucket für alle anderen.
+                reservierung.melde_verbrauch(0)
+                letzter_fehler = exc
+                if isinstance(exc, RateLimitError):
+                    limiter.pausiere(_retry_after_sek(exc, profil.backoff_sek))
+                if isinstance(exc, APITimeoutError):
+                    # Ein Timeout wird nicht mit demselben Modell wiederholt –
+                    # das Ausweichmodell ist hier die schnellere Option.
+                    break
+                if versuch + 1 < profil.max_versuche:
+                    time.sleep(profil.backoff_sek * (2 ** versuch))
+                continue
+            except BaseException:
+                reservierung.melde_verbrauch(0)
+                raise
+            verbrauch = _verbrauchte_tokens(ergebnis)
+            if verbrauch is not None:
+                reservierung.melde_verbrauch(verbrauch)
+            messung = LLMMessung(
+                profil=profil.name,
+                model=model,
+                dauer_sek=time.perf_counter() - start,
+                versuche=versuche,
+                erfolg=True,
+                fallback_genutzt=index > 0,
+            )
+            return ergebnis, messung
+
+    # Debug-Hinweis: ``st.write(profil, letzter_fehler)`` zeigt, welches Profil
+    # mit welchem Fehler endgültig gescheitert ist.
+    assert letzter_fehler is not None
+    letzter_fehler.llm_messung = LLMMessung(  # type: ignore[attr-defined]
+        profil=profil.name,
+        model=modelle[-1],
+        dauer_sek=time.perf_counter() - start,
+        versuche=versuche,
+        erfolg=False,
+        fallback_genutzt=len(modelle) > 1,
+    )
+    raise letzter_fehler
+
+
+def _mit_profil_optionen(client: Any, profil: LLMProfil) -> Any:
+    """Setzt Timeout und SDK-Retries für den Aufruf, sofern der Client das unterstützt.
+
+    Wiederholungen steuert das Gateway selbst, daher keine SDK-internen Retries.
+    Eigene Client-Wrapper (z. B. aus ``module/mcp_client.py``) besitzen kein
+    ``with_options`` und werden unverändert verwendet.
+    """
+
+    with_options = getattr(client, "with_options", None)
+    if with_options is None:
+        return client
+    return with_options(timeout=profil.timeout_sek, max_retries=0)
+
+
+def _erstelle_kwargs(profil: LLMProfil, model: str, messages: List[Dict[str, Any]], extra: Dict[str, Any]) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "temperature": profil.temperature,
+        "max_tokens": profil.max_tokens,
+    }
+    kwargs.update(extra)
+    return kwargs
+
+
+def rufe_profil_auf(
+    profil: LLMProfil | str,
+    messages: List[Dict[str, Any]],
+    *,
+    client: Any = None,
+    **extra: Any,
+) -> Tuple[Any, LLMMessung]:
+    """Führt einen Chat-Aufruf ohne Session-Zugriffe aus (threadsicher).
+
+    Tokenzählung und Zeitmessung übernimmt der Aufrufer im Hauptthread, z. B.
+    über ``add_usage`` und ``add_gpt_duration``.
+    """
+
+    if isinstance(profil, str):
+        profil = get_llm_profil(profil)
+    profil_client = _mit_profil_optionen(client or get_openai_client(), profil)
+    return _mit_fallback(
+        profil,
+        lambda model: profil_client.chat.completions.create(
+            **_erstelle_kwargs(profil, model, list(messages), extra)
+        ),
+        _schaetze_tokens(messages, profil),
+    )
+
+
+def rufe_profil_stream_auf(
+    profil: LLMProfil | str,
+    messages: List[Dict[str, Any]],
+    *,
+    on_text: Callable[[str, str], None] | None = None,
+    client: Any = None,
+    **extra: Any,
+) -> Tuple[StreamErgebnis, LLMMessung]:
+    """Gestreamte Variante von :func:`rufe_profil_auf` ohne Session-Zugriffe.
+
+    Bei einem erneuten Versuch (bzw. dem Ausweichmodell) beginnt ``on_text``
+    wieder mit leerem Gesamttext.
+    """
+
+    if isinstance(profil, str):
+        profil = get_llm_profil(profil)
+    profil_client = _mit_profil_optionen(client or get_openai_client(), profil)
+    return _mit_fallback(
+        profil,
+        lambda model: streame_chat_antwort(
+            profil_client,
+            on_text=on_text,
+            **_erstelle_kwargs(profil, model, list(messages), extra),
+        ),
+        _schaetze_tokens(messages, profil),
+    )
+
+
+def _verbuche(kontext: str, messung: LLMMessung, ergebnis: Any = None) -> None:
+    """Verbucht Tokens und Messung eines abgeschlossenen Aufrufs im Hauptthread."""
+
+    usage = getattr(ergebnis, "usage", None)
+    if usage is not None:
+        prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+        completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+        total_tokens = int(getattr(usage, "total_tokens", 0) or 0)
+        cached_tokens = lese_cached_tokens(usage)
+    else:
+        prompt_tokens = int(getattr(ergebnis, "prompt_tokens", 0) or 0)
+        completion_tokens = int(getattr(ergebnis, "completion_tokens", 0) or 0)
+        total_tokens = int(getattr(ergebnis, "total_tokens", 0) or 0)
+        cached_tokens = int(getattr(ergebnis, "cached_tokens", 0) or 0)
+    if ergebnis is not None:
+        add_usage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=total_tokens,
+            model=messung.model,
+            kontext=kontext,
+            cached_tokens=cached_tokens,
+        )
+    registriere_gpt_messung(
+        GptMessung(
+            kontext=kontext,
+            dauer_sek=messung.dauer_sek,
+            erfolg=messung.erfolg,
+            model=messung.model,
+            profil=messung.profil,
+            ttft_sek=getattr(ergebnis, "ttft_sek", None),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+        )
+    )
+    # Debug-Hinweis: ``st.write(messung)`` zeigt zusätzlich Versuche und Fallback an.
+
+
+def verbuche_aufruf(kontext: str, messung: LLMMessung, ergebnis: Any = None) -> None:
+    """Verbucht einen über :func:`rufe_profil_auf` im Hintergrund gelaufenen Aufruf.
+
+    Muss im Hauptthread aufgerufen werden (Session-State).
+    """
+
+    init_token_counters()
+    _verbuche(kontext, messung, ergebnis)
+
+
+def _fuehre_mit_protokoll_aus(aufruf: Callable[[], Tuple[Any, LLMMessung]], kontext: str) -> Any:
+    init_token_counters()
+    try:
+        ergebnis, messung = messe_gpt_aktion(aufruf, kontext=kontext)
+    except Exception as exc:
+        messung = getattr(exc, "llm_messung", None)
+        if messung is not None:
+            _verbuche(kontext, messung)
+        raise
+    _verbuche(kontext, messung, ergebnis)
+    return ergebnis
+
+
+def chat_completion(
+    profil_name: str,
+    messages: List[Dict[str, Any]],
+    *,
+    client: Any = None,
+    kontext: str = "",
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    **extra: Any,
+) -> Any:
+    """Führt einen Chat-Aufruf gemäß Profil aus und verbucht Zeit und Tokens.
+
+    Gibt die unveränderte OpenAI-Antwort zurück. Wiederholbare Fehler werden
+    nach Ausschöpfen aller Versuche und des Ausweichmodells weitergereicht.
+    """
+
+    profil = get_llm_profil(profil_name, model=model, temperature=temperature)
+    return _fuehre_mit_protokoll_aus(
+        lambda: rufe_profil_auf(profil, messages, client=client, **extra),
+        kontext or profil.name,
+    )
+
+
+def chat_stream(
+    profil_name: str,
+    messages: List[Dict[str, Any]],
+    *,
+    on_text: Callable[[str, str], None] | None = None,
+    client: Any = None,
+    kontext: str = "",
+    **extra: Any,
+) -> StreamErgebnis:
+    """Gestreamter Chat-Aufruf gemäß Profil inklusive TTFT-Messung.
+
+    Bricht ein Stream ab, beginnt ``on_text`` beim nächsten Versuch (bzw. beim
+    Ausweichmodell) wieder mit leerem Text, sodass Platzhalter überschrieben
+    statt doppelt befüllt werden.
+    """
+
+    profil = get_llm_profil(profil_name)
+    return _fuehre_mit_protokoll_aus(
+        lambda: rufe_profil_stream_auf(profil, messages, on_text=on_text, client=client, **extra),
+        kontext or profil.name,
+    )
@@ -12,6 +12,8 @@ import requests
 
 import streamlit as st
 
+from module.amboss_cache import FORMAT_JSONRPC, lies_amboss_cache, schreibe_amboss_cache
+
 try:  # pragma: no cover - optional dependency
     from openai import (
         OpenAI,
@@ -172,7 +174,20 @@ class AmbossToolClient:
         *,
         query: str,
         language: str = "de",
+        use_cache: bool = True,
     ) -> Dict[str, Any]:
+        """Call ``tool_name`` and return the parsed JSON-RPC response.
+
+        Successful responses are stored in the on-disk cache
+        (``module/amboss_cache.py``); ``use_cache=False`` forces a fresh
+        request and refreshes the cached entry.
+        """
+
+        if use_cache:
+            cached = lies_amboss_cache(tool_name, query, language, antwortformat=FORMAT_JSONRPC)
+            if isinstance(cached, dict):
+                return cached
+
         payload = _build_tool_payload(tool_name, query, language=language)
         headers = _load_amboss_headers(self.api_key)
         headers.update(self.extra_headers)
@@ -198,6 +213,7 @@ class AmbossToolClient:
                 "AMBOSS MCP server returned an error: "
                 + json.dumps(parsed.get("error"), ensure_ascii=False)
             )
+        schreibe_amboss_cache(tool_name, query, language, parsed, antwortformat=FORMAT_JSONRPC)
         return parsed
 
 
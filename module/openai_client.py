@@ -0,0 +1,90 @@
+"""Prozessweit geteilter OpenAI-Client.
+
+Bisher hat jede Browser-Sitzung einen eigenen ``OpenAI``-Client mit eigenem
+HTTP-Verbindungspool erzeugt. Bei vielen gleichzeitigen Studierenden entstehen
+dadurch zahlreiche parallele Pools und TLS-Handshakes. Dieses Modul stellt
+stattdessen genau einen Client pro Prozess bereit, der über
+``st.cache_resource`` zwischen allen Sitzungen geteilt wird. Der darunterliegende
+``httpx``-Client hält Verbindungen offen (Keep-Alive) und nutzt HTTP/2; das
+dafür nötige Paket ``h2`` kommt über ``httpx[http2]`` aus der
+``requirements.txt``. Welches Protokoll tatsächlich ausgehandelt wurde, zählt
+:func:`get_openai_verbindungsstatus` für die Adminseite mit.
+
+Der Client ist threadsicher und kann daher auch aus Hintergrund-Threads (z. B.
+der Feedback-Pipeline) verwendet werden. ``st.session_state["openai_client"]``
+verweist weiterhin auf dieselbe Instanz, damit bestehende Seitenlogik
+unverändert bleibt.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+import streamlit as st
+from openai import OpenAI
+
+__all__ = ["get_openai_client", "get_openai_verbindungsstatus"]
+
+# Verbindungspool-Parameter. Die Werte sind bewusst großzügig gewählt, weil sich
+# alle Sitzungen eines Prozesses denselben Pool teilen.
+_MAX_CONNECTIONS = 100
+_MAX_KEEPALIVE_CONNECTIONS = 40
+_KEEPALIVE_EXPIRY_SEK = 60.0
+_CONNECT_TIMEOUT_SEK = 10.0
+_REQUEST_TIMEOUT_SEK = 120.0
+
+_PROTOKOLL_LOCK = threading.Lock()
+# Anzahl der Antworten je ausgehandeltem Protokoll ("HTTP/1.1", "HTTP/2").
+_PROTOKOLLE: Dict[str, int] = {}
+_LETZTES_PROTOKOLL: Optional[str] = None
+
+
+def _http2_verfuegbar() -> bool:
+    """Prüft, ob ``h2`` installiert ist (Voraussetzung für HTTP/2 in httpx)."""
+
+    return importlib.util.find_spec("h2") is not None
+
+
+def _merke_protokoll(response: httpx.Response) -> None:
+    global _LETZTES_PROTOKOLL
+
+    protokoll = str(getattr(response, "http_version", "") or "unbekannt")
+    with _PROTOKOLL_LOCK:
+        _PROTOKOLLE[protokoll] = _PROTOKOLLE.get(protokoll, 0) + 1
+        _LETZTES_PROTOKOLL = protokoll
+
+
+def get_openai_verbindungsstatus() -> Dict[str, Any]:
+    """Momentaufnahme für die Adminanzeige: HTTP/2-Unterstützung und Protokolle."""
+
+    with _PROTOKOLL_LOCK:
+        return {
+            "http2_verfuegbar": _http2_verfuegbar(),
+            "letztes_protokoll": _LETZTES_PROTOKOLL,
+            "protokolle": dict(_PROTOKOLLE),
+        }
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client() -> OpenAI:
+    """Liefert den prozessweit geteilten OpenAI-Client.
+
+    Debug-Hinweis: Mit ``st.write(id(get_openai_client()))`` lässt sich in zwei
+    Browser-Tabs prüfen, ob tatsächlich dieselbe Instanz verwendet wird.
+    """
+
+    http_client = httpx.Client(
+        http2=_http2_verfuegbar(),
+        limits=httpx.Limits(
+            max_connections=_MAX_CONNECTIONS,
+            max_keepalive_connections=_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=_KEEPALIVE_EXPIRY_SEK,
+        ),
+        timeout=httpx.Timeout(_REQUEST_TIMEOUT_SEK, connect=_CONNECT_TIMEOUT_SEK),
+        event_hooks={"response": [_merke_protokoll]},
+    )
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
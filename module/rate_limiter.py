@@ -0,0 +1,254 @@
+"""Prozessweiter Ratenbegrenzer für OpenAI-Aufrufe mit Prioritätsspuren.
+
+Wenn eine ganze Kohorte gleichzeitig das Feedback anfordert, konkurrieren
+Chat, Abschlussfeedback und Hintergrundarbeiten (AMBOSS-Zusammenfassungen,
+Detail-Vorabruf) um dieselben Limits der OpenAI-API. Statt Studierenden einen
+``RateLimitError`` anzuzeigen, reiht dieser Begrenzer die Aufrufe vor dem
+Versand ein.
+
+Funktionsweise:
+- Zwei Token-Buckets bilden die Budgets für Anfragen pro Minute (RPM) und
+  Tokens pro Minute (TPM) ab; beide füllen sich kontinuierlich wieder auf.
+- Jede Anfrage gehört zu einer Spur (``interaktiv`` > ``feedback`` >
+  ``hintergrund``). Eine Anfrage darf erst starten, wenn keine Anfrage einer
+  höher priorisierten Spur wartet und sie innerhalb ihrer Spur vorne steht
+  (FIFO). So bleibt die Reihenfolge fair und der Chat reaktionsschnell.
+- Damit niedrige Spuren unter Dauerlast nicht verhungern, steigt eine wartende
+  Anfrage je ``_ALTERUNG_SEK`` Wartezeit um eine Prioritätsstufe auf. Bei
+  gleicher Stufe gewinnt die ältere Anfrage. Garantie: Die vorderste Anfrage
+  jeder Spur ist spätestens nach ``2 * _ALTERUNG_SEK`` gleichrangig mit dem
+  Chat und wird danach vor allen später eingereihten Anfragen bedient.
+- Warteschlangenlänge und Wartezeiten werden je Spur mitgeschrieben und im
+  Adminbereich angezeigt.
+
+Die Budgets lassen sich über die Umgebungsvariablen ``OPENAI_LIMIT_RPM`` und
+``OPENAI_LIMIT_TPM`` an das eigene API-Tier anpassen.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+import itertools
+import os
+import threading
+import time
+from typing import Deque, Dict, Optional
+
+__all__ = [
+    "LANE_FEEDBACK",
+    "LANE_HINTERGRUND",
+    "LANE_INTERAKTIV",
+    "RateLimitReservierung",
+    "get_rate_limiter",
+    "get_rate_limiter_status",
+]
+
+LANE_INTERAKTIV = "interaktiv"
+LANE_FEEDBACK = "feedback"
+LANE_HINTERGRUND = "hintergrund"
+
+# Reihenfolge = Priorität (kleiner Index wird zuerst bedient).
+_LANES = (LANE_INTERAKTIV, LANE_FEEDBACK, LANE_HINTERGRUND)
+
+_DEFAULT_RPM = 500
+_DEFAULT_TPM = 200_000
+# Maximale Wartezeit, bevor ein Aufruf trotzdem gestartet wird. Damit blockiert
+# ein falsch konfiguriertes Budget die Anwendung nie dauerhaft.
+_MAX_WARTEZEIT_SEK = 120.0
+# Wartezeit, nach der eine Anfrage eine Prioritätsstufe aufsteigt (Aging).
+_ALTERUNG_SEK = 15.0
+# Anzahl der gespeicherten Einzelwartezeiten je Spur für die Adminanzeige.
+_WARTEZEIT_HISTORIE = 200
+
+
+def _lese_budget(name: str, standard: int) -> int:
+    try:
+        wert = int(os.getenv(name, "") or standard)
+    except ValueError:
+        return standard
+    return max(1, wert)
+
+
+class _TokenBucket:
+    """Kontinuierlich auffüllender Bucket mit Kapazität ``pro_minute``."""
+
+    def __init__(self, pro_minute: int) -> None:
+        self.kapazitaet = float(pro_minute)
+        self.rate_pro_sek = pro_minute / 60.0
+        self.bestand = float(pro_minute)
+        self._zuletzt = time.monotonic()
+
+    def auffuellen(self) -> None:
+        jetzt = time.monotonic()
+        self.bestand = min(self.kapazitaet, self.bestand + (jetzt - self._zuletzt) * self.rate_pro_sek)
+        self._zuletzt = jetzt
+
+    def wartezeit_fuer(self, menge: float) -> float:
+        # Anfragen über der Kapazität werden auf die Kapazität gedeckelt,
+        # sonst könnten sie nie bedient werden.
+        menge = min(menge, self.kapazitaet)
+        if self.bestand >= menge:
+            return 0.0
+        return (menge - self.bestand) / self.rate_pro_sek
+
+
+@dataclass
+class _LaneStatistik:
+    bedient: int = 0
+    wartezeit_summe_sek: float = 0.0
+    wartezeit_max_sek: float = 0.0
+    wartezeiten: Deque[float] = field(default_factory=lambda: deque(maxlen=_WARTEZEIT_HISTORIE))
+
+
+@dataclass
+class RateLimitReservierung:
+    """Reservierte Kapazität eines Aufrufs; erlaubt die Korrektur der Tokenzahl."""
+
+    lane: str
+    geschaetzte_tokens: int
+    wartezeit_sek: float
+    _limiter: "PriorityRateLimiter"
+
+    def melde_verbrauch(self, tatsaechliche_tokens: int) -> None:
+        """Gleicht die Schätzung mit dem tatsächlichen Verbrauch ab."""
+
+        self._limiter._korrigiere_tokens(int(tatsaechliche_tokens) - self.geschaetzte_tokens)
+
+
+class PriorityRateLimiter:
+    """Threadsicherer RPM/TPM-Begrenzer mit priorisierten FIFO-Spuren."""
+
+    def __init__(self, rpm: int, tpm: int) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self._anfragen = _TokenBucket(rpm)
+        self._tokens = _TokenBucket(tpm)
+        self._bedingung = threading.Condition()
+        self._warteschlangen: Dict[str, Deque[int]] = {lane: deque() for lane in _LANES}
+        self._statistik: Dict[str, _LaneStatistik] = {lane: _LaneStatistik() for lane in _LANES}
+        self._ticket = itertools.count()
+        self._eingereiht: Dict[int, float] = {}
+        self._pause_bis = 0.0
+
+    def _stufe(self, lane_index: int, ticket: int, jetzt: float) -> tuple[int, float]:
+        """Effektive Priorität: Spurindex abzüglich der Alterungsstufen, dann Alter."""
+
+        eingereiht = self._eingereiht[ticket]
+        return max(0, lane_index - int((jetzt - eingereiht) // _ALTERUNG_SEK)), eingereiht
+
+    def _ist_an_der_reihe(self, lane: str, ticket: int) -> bool:
+        if self._warteschlangen[lane][0] != ticket:
+            return False
+        jetzt = time.monotonic()
+        eigene = self._stufe(_LANES.index(lane), ticket, jetzt)
+        for index, andere in enumerate(_LANES):
+            warteschlange = self._warteschlangen[andere]
+            if andere != lane and warteschlange and self._stufe(index, warteschlange[0], jetzt) < eigene:
+                return False
+        return True
+
+    def erwerben(self, lane: str, geschaetzte_tokens: int) -> RateLimitReservierung:
+        """Blockiert, bis die Anfrage gemäß Priorität und Budget starten darf."""
+
+        if lane not in self._warteschlangen:
+            lane = LANE_HINTERGRUND
+        start = time.monotonic()
+        ticket = next(self._ticket)
+        with self._bedingung:
+            self._warteschlangen[lane].append(ticket)
+            self._eingereiht[ticket] = start
+            try:
+                while True:
+                    wartezeit = max(0.0, self._pause_bis - time.monotonic())
+                    if self._ist_an_der_reihe(lane, ticket) and wartezeit <= 0:
+                        self._anfragen.auffuellen()
+                        self._tokens.auffuellen()
+                        wartezeit = max(
+                            self._anfragen.wartezeit_fuer(1),
+                            self._tokens.wartezeit_fuer(geschaetzte_tokens),
+                        )
+                        if wartezeit <= 0 or time.monotonic() - start >= _MAX_WARTEZEIT_SEK:
+                            self._anfragen.bestand -= 1
+                            self._tokens.bestand -= min(geschaetzte_tokens, self._tokens.kapazitaet)
+                            break
+                    # Ohne konkrete Wartezeit (andere Spur ist dran) wird periodisch
+                    # neu geprüft; ``notify_all`` weckt vorzeitig auf.
+                    self._bedingung.wait(timeout=min(wartezeit or 0.5, 1.0))
+            finally:
+                self._warteschlangen[lane].remove(ticket)
+                del self._eingereiht[ticket]
+                self._bedingung.notify_all()
+
+            gewartet = time.monotonic() - start
+            statistik = self._statistik[lane]
+            statistik.bedient += 1
+            statistik.wartezeit_summe_sek += gewartet
+            statistik.wartezeit_max_sek = max(statistik.wartezeit_max_sek, gewartet)
+            statistik.wartezeiten.append(gewartet)
+        return RateLimitReservierung(lane, geschaetzte_tokens, gewartet, self)
+
+    def _korrigiere_tokens(self, differenz: int) -> None:
+        with self._bedingung:
+            self._tokens.bestand = min(self._tokens.kapazitaet, self._tokens.bestand - differenz)
+            self._bedingung.notify_all()
+
+    def pausiere(self, sekunden: float) -> None:
+        """Hält alle Spuren an, z. B. nachdem die API selbst ein Limit gemeldet hat."""
+
+        with self._bedingung:
+            self._pause_bis = max(self._pause_bis, time.monotonic() + max(0.0, sekunden))
+            self._bedingung.notify_all()
+
+    def status(self) -> Dict[str, object]:
+        """Momentaufnahme für die Adminanzeige."""
+
+        with self._bedingung:
+            self._anfragen.auffuellen()
+            self._tokens.auffuellen()
+            spuren = {}
+            for lane in _LANES:
+                statistik = self._statistik[lane]
+                wartezeiten = sorted(statistik.wartezeiten)
+                spuren[lane] = {
+                    "wartend": len(self._warteschlangen[lane]),
+                    "bedient": statistik.bedient,
+                    "wartezeit_mittel_sek": (
+                        statistik.wartezeit_summe_sek / statistik.bedient if statistik.bedient else 0.0
+                    ),
+                    "wartezeit_p95_sek": (
+                        wartezeiten[int(0.95 * (len(wartezeiten) - 1))] if wartezeiten else 0.0
+                    ),
+                    "wartezeit_max_sek": statistik.wartezeit_max_sek,
+                }
+            return {
+                "rpm_budget": self.rpm,
+                "tpm_budget": self.tpm,
+                "rpm_verfuegbar": round(self._anfragen.bestand, 1),
+                "tpm_verfuegbar": round(self._tokens.bestand),
+                "pausiert_sek": round(max(0.0, self._pause_bis - time.monotonic()), 1),
+                "spuren": spuren,
+            }
+
+
+_LIMITER: Optional[PriorityRateLimiter] = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def get_rate_limiter() -> PriorityRateLimiter:
+    """Liefert den prozessweiten Begrenzer (wird beim ersten Aufruf erzeugt)."""
+
+    global _LIMITER
+    with _LIMITER_LOCK:
+        if _LIMITER is None:
+            _LIMITER = PriorityRateLimiter(
+                rpm=_lese_budget("OPENAI_LIMIT_RPM", _DEFAULT_RPM),
+                tpm=_lese_budget("OPENAI_LIMIT_TPM", _DEFAULT_TPM),
+            )
+        return _LIMITER
+
+
+def get_rate_limiter_status() -> Dict[str, object]:
+    """Kurzform für die Adminseite."""
+
+    return get_rate_limiter().status()
@@ -5,6 +5,8 @@ from pathlib import Path
 import streamlit as st
 from PIL import Image
 
+from module.supabase_client import starte_seitenmessung
+
 
 # Der Logo-Pfad wird zentral definiert, damit bei einem ersten Seitenaufruf
 # bewusst immer dasselbe Bild erscheint. So sehen Nutzerinnen und Nutzer sofort
@@ -21,6 +23,10 @@ SIDEBAR_BILD_BREITE = 220
 
 
 def show_sidebar():
+    # Jede Seite ruft ``show_sidebar`` zu Beginn auf. Deshalb beginnt hier die
+    # Zählung der Supabase-Anfragen für den aktuellen Seitenaufruf.
+    starte_seitenmessung()
+
     # DEBUG
     # st.sidebar.write("🧪 DEBUG: keys in session_state:", list(st.session_state.keys()))
 
@@ -0,0 +1,198 @@
+"""Prozessweit geteilter Supabase-Client mit Anfragezählung.
+
+Bisher hat nahezu jedes Modul (Fallverwaltung, Feedback, Adminbereich, ...)
+über eine eigene ``_get_supabase_client``-Kopie bei jedem Aufruf einen neuen
+Client samt eigener HTTP-Session erzeugt; allein beim Rendern der
+Feedbackseite entstanden so mehrere Clients und TLS-Handshakes. Dieses Modul
+stellt analog zu ``module/openai_client.py`` genau einen Client pro Prozess
+bereit (``st.cache_resource``). Der darunterliegende ``httpx``-Client hält
+Verbindungen offen (Keep-Alive) und nutzt einstellbare Timeouts
+(Umgebungsvariablen ``SUPABASE_TIMEOUT_SEK`` und ``SUPABASE_CONNECT_TIMEOUT_SEK``).
+
+Jede Anfrage wird gezählt: prozessweit gesamt und je Seitenaufruf der
+aktuellen Sitzung. ``starte_seitenmessung`` markiert den Beginn eines
+Seitenaufrufs (wird von ``show_sidebar`` aufgerufen); der Adminbereich zeigt
+die Verteilung über ``get_supabase_metriken``.
+
+Die modulspezifischen ``_get_supabase_client``-Funktionen bleiben als dünne
+Hüllen bestehen, damit jede Stelle ihre gewohnten Fehlertypen behält.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+import os
+import threading
+import time
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+import streamlit as st
+from supabase import Client, ClientOptions, create_client
+
+try:  # pragma: no cover - abhängig von der Streamlit-Version
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # pragma: no cover
+    get_script_run_ctx = None  # type: ignore[assignment]
+
+__all__ = [
+    "SupabaseKonfigurationsFehler",
+    "get_supabase_client",
+    "get_supabase_metriken",
+    "starte_seitenmessung",
+]
+
+_MAX_CONNECTIONS = 50
+_MAX_KEEPALIVE_CONNECTIONS = 20
+_KEEPALIVE_EXPIRY_SEK = 60.0
+_STANDARD_TIMEOUT_SEK = 20.0
+_STANDARD_CONNECT_TIMEOUT_SEK = 5.0
+# Anzahl der abgeschlossenen Seitenaufrufe, die prozessweit für die
+# Adminanzeige vorgehalten werden.
+_SEITENAUFRUF_HISTORIE = 500
+_SESSION_KEY_SEITE = "supabase_seitenmessung"
+
+_METRIK_LOCK = threading.Lock()
+_METRIKEN: Dict[str, Any] = {
+    "anfragen_gesamt": 0,
+    "anfragen_je_tabelle": {},
+    "seitenaufrufe": deque(maxlen=_SEITENAUFRUF_HISTORIE),
+}
+
+
+class SupabaseKonfigurationsFehler(RuntimeError):
+    """Supabase-Zugangsdaten fehlen oder der Client ließ sich nicht erzeugen."""
+
+
+def _lese_sekunden(name: str, standard: float) -> float:
+    try:
+        return max(0.5, float(os.getenv(name, "") or standard))
+    except ValueError:
+        return standard
+
+
+def _in_streamlit_lauf() -> bool:
+    """True, wenn der aktuelle Thread zu einem Streamlit-Skriptlauf gehört."""
+
+    return get_script_run_ctx is not None and get_script_run_ctx() is not None
+
+
+def _tabelle_aus_url(url: httpx.URL) -> str:
+    # PostgREST-Pfade haben die Form ``/rest/v1/<tabelle>``.
+    teile = [teil for teil in url.path.split("/") if teil]
+    return teile[-1] if teile else "?"
+
+
+def _zaehle_anfrage(request: httpx.Request) -> None:
+    """httpx-Event-Hook: zählt jede ausgehende Anfrage."""
+
+    tabelle = _tabelle_aus_url(request.url)
+    with _METRIK_LOCK:
+        _METRIKEN["anfragen_gesamt"] += 1
+        je_tabelle = _METRIKEN["anfragen_je_tabelle"]
+        je_tabelle[tabelle] = je_tabelle.get(tabelle, 0) + 1
+    # Hintergrund-Threads haben keinen Session-State; sie zählen nur prozessweit.
+    if _in_streamlit_lauf():
+        messung = st.session_state.get(_SESSION_KEY_SEITE)
+        if messung is not None:
+            messung["anfragen"] += 1
+            messung["tabellen"][tabelle] = messung["tabellen"].get(tabelle, 0) + 1
+
+
+def starte_seitenmessung() -> None:
+    """Schließt die Messung des vorherigen Seitenaufrufs ab und startet eine neue.
+
+    Debug-Hinweis: ``st.write(st.session_state.get("supabase_seitenmessung"))``
+    zeigt die Anfragen des laufenden Seitenaufrufs.
+    """
+
+    vorherige = st.session_state.get(_SESSION_KEY_SEITE)
+    if vorherige is not None:
+        with _METRIK_LOCK:
+            _METRIKEN["seitenaufrufe"].append(vorherige["anfragen"])
+        st.session_state["supabase_letzter_seitenaufruf"] = vorherige
+    st.session_state[_SESSION_KEY_SEITE] = {"anfragen": 0, "tabellen": {}, "start": time.time()}
+
+
+def get_supabase_metriken() -> Dict[str, Any]:
+    """Momentaufnahme der Anfragezahlen für die Adminanzeige."""
+
+    with _METRIK_LOCK:
+        aufrufe = sorted(_METRIKEN["seitenaufrufe"])
+        gesamt = _METRIKEN["anfragen_gesamt"]
+        je_tabelle = dict(_METRIKEN["anfragen_je_tabelle"])
+    return {
+        "anfragen_gesamt": gesamt,
+        "anfragen_je_tabelle": je_tabelle,
+        "seitenaufrufe": len(aufrufe),
+        "je_seitenaufruf_mittel": (sum(aufrufe) / len(aufrufe)) if aufrufe else 0.0,
+        "je_seitenaufruf_p95": aufrufe[int(0.95 * (len(aufrufe) - 1))] if aufrufe else 0,
+        "je_seitenaufruf_max": aufrufe[-1] if aufrufe else 0,
+        "letzter_seitenaufruf": st.session_state.get("supabase_letzter_seitenaufruf"),
+    }
+
+
+def _erzeuge_http_client(timeout: httpx.Timeout) -> httpx.Client:
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=_MAX_CONNECTIONS,
+            max_keepalive_connections=_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=_KEEPALIVE_EXPIRY_SEK,
+        ),
+        timeout=timeout,
+        event_hooks={"request": [_zaehle_anfrage]},
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_supabase_client() -> Client:
+    """Liefert den prozessweit geteilten Supabase-Client.
+
+    Fehlende Zugangsdaten führen zu :class:`SupabaseKonfigurationsFehler`;
+    Fehler werden von ``st.cache_resource`` nicht zwischengespeichert, sodass
+    ein späterer Aufruf nach korrigierter Konfiguration erneut versucht wird.
+    Debug-Hinweis: ``st.write(id(get_supabase_client()))`` zeigt, ob zwei
+    Sitzungen dieselbe Instanz nutzen.
+    """
+
+    supabase_config = st.secrets.get("supabase")
+    if not supabase_config:
+        raise SupabaseKonfigurationsFehler(
+            "Supabase-Konfiguration fehlt in st.secrets. Bitte die Sektion 'supabase' ergänzen."
+        )
+    try:
+        url = supabase_config["url"]
+        key = supabase_config["key"]
+    except KeyError as exc:
+        raise SupabaseKonfigurationsFehler(
+            "Supabase-Zugangsdaten unvollständig. Erwartet werden Schlüssel 'url' und 'key'."
+        ) from exc
+
+    gesamt_timeout = _lese_sekunden("SUPABASE_TIMEOUT_SEK", _STANDARD_TIMEOUT_SEK)
+    timeout = httpx.Timeout(
+        gesamt_timeout,
+        connect=_lese_sekunden("SUPABASE_CONNECT_TIMEOUT_SEK", _STANDARD_CONNECT_TIMEOUT_SEK),
+    )
+    http_client = _erzeuge_http_client(timeout)
+
+    try:
+        try:
+            # Neuere supabase-py-Versionen nehmen einen eigenen httpx-Client entgegen.
+            optionen = ClientOptions(httpx_client=http_client, postgrest_client_timeout=gesamt_timeout)
+        except TypeError:
+            optionen = ClientOptions(postgrest_client_timeout=gesamt_timeout)
+        client = create_client(url, key, options=optionen)
+    except Exception as exc:  # pragma: no cover - Netzwerkkonnektivität lässt sich schlecht testen
+        raise SupabaseKonfigurationsFehler(
+            "Verbindung zu Supabase konnte nicht aufgebaut werden. Hinweise siehe Kommentare im Code."
+        ) from exc
+
+    # Ältere Versionen: Der PostgREST-Client besitzt bereits eine eigene
+    # (ebenfalls poolende) httpx-Session; dort hängen wir nur den Zähler an.
+    session: Optional[httpx.Client] = getattr(getattr(client, "postgrest", None), "session", None)
+    if isinstance(session, httpx.Client) and session is not http_client:
+        hooks = session.event_hooks
+        hooks["request"] = list(hooks.get("request", [])) + [_zaehle_anfrage]
+        session.event_hooks = hooks
+        http_client.close()
+    return client
@@ -5,7 +5,9 @@ from dataclasses import dataclass
 from typing import Any, Dict
 
 import streamlit as st
-from supabase import Client, create_client
+from supabase import Client
+
+from module.supabase_client import SupabaseKonfigurationsFehler, get_supabase_client
 
 # ---------------------------------------------------------------------------
 # Konstanten für die gemeinsam genutzte Supabase-Tabelle.
@@ -32,28 +34,13 @@ class BehaviorEntry:
 
 
 def _get_supabase_client() -> Client:
-    """Erstellt einen Supabase-Client anhand der Streamlit-Secrets."""
-
-    supabase_config = st.secrets.get("supabase")
-    if not supabase_config:
-        raise SupabaseContentError(
-            "Supabase-Konfiguration fehlt in st.secrets. Bitte Abschnitt 'supabase' ergänzen."
-        )
+    """Liefert den geteilten Supabase-Client (siehe ``module/supabase_client.py``)."""
 
     try:
-        url = supabase_config["url"]
-        key = supabase_config["key"]
-    except KeyError as exc:  # pragma: no cover - defensive Absicherung
-        raise SupabaseContentError(
-            "Supabase-Zugangsdaten sind unvollständig. Erwartet werden 'url' und 'key'."
-        ) from exc
+        return get_supabase_client()
+    except SupabaseKonfigurationsFehler as exc:
+        raise SupabaseContentError(str(exc)) from exc
 
-    try:
-        return create_client(url, key)
-    except Exception as exc:  # pragma: no cover - Netzwerkfehler schwer testbar
-        raise SupabaseContentError(
-            "Verbindung zu Supabase fehlgeschlagen. Siehe Debug-Hinweise in den Kommentaren."
-        ) from exc
 
 
 def _parse_behavior_row(row: Dict[str, Any]) -> BehaviorEntry | None:
@@ -0,0 +1,176 @@
+"""Prozessweiter Cache der verfügbaren Spalten je Supabase-Tabelle.
+
+Optionale Spalten (z. B. ``gpt_latenzen`` in ``feedback_gpt``) sind nicht in
+jedem Deployment schon migriert. Bisher wurde deshalb vor jedem Insert jede
+optionale Spalte einzeln mit ``select(spalte).limit(0)`` geprüft – beim
+Speichern des Feedbacks über zehn zusätzliche Anfragen pro Studierendem.
+
+Dieses Modul lernt die Spalten aller Tabellen aus der OpenAPI-Beschreibung,
+die PostgREST unter ``/rest/v1/`` bereitstellt. Ist sie nicht abrufbar, genügt
+eine Beispielzeile (``select('*').limit(1)``). Gelernte Spalten gelten
+``_SCHEMA_TTL_SEK`` Sekunden; danach wird einmal neu gelesen, damit Spalten aus
+einer Migration bei laufender App auftauchen. Ein Insertfehler kann das nicht
+leisten, weil fehlende Spalten vorab aus dem Insert entfernt werden.
+:func:`insert_mit_optionalen_spalten` filtert optionale Spalten anhand dieses
+Wissens und reagiert auf Schemafehler beim Insert: Meldet Supabase eine
+unbekannte Spalte, wird der Cache verworfen, die Spalte entfernt und der Insert
+wiederholt. Im Normalfall kostet das Speichern damit genau einen Insert.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+__all__ = [
+    "fehlende_optionale_spalten",
+    "get_tabellenspalten",
+    "insert_mit_optionalen_spalten",
+    "verwerfe_schema_cache",
+]
+
+# Gültigkeit gelernter Spalten (eine OpenAPI-Abfrage je Prozess und Intervall).
+_SCHEMA_TTL_SEK = 300.0
+
+_SCHEMA_LOCK = threading.Lock()
+# Tabelle -> (Zeitpunkt, bekannte Spalten). ``None`` bedeutet "nicht ermittelbar".
+_SCHEMA_CACHE: Dict[str, Tuple[float, Optional[FrozenSet[str]]]] = {}
+# Zeitpunkt (``time.monotonic``) der letzten OpenAPI-Abfrage.
+_OPENAPI_GELADEN_UM: Optional[float] = None
+
+# PostgREST: "Could not find the 'x' column of 't' in the schema cache" (PGRST204),
+# Postgres: 'column "x" of relation "t" does not exist' (42703).
+_UNBEKANNTE_SPALTE = re.compile(r"the '([^']+)' column|column \"([^\"]+)\"")
+
+
+def verwerfe_schema_cache() -> None:
+    """Verwirft alle gelernten Spalten (z. B. nach einer Migration)."""
+
+    global _OPENAPI_GELADEN_UM
+    with _SCHEMA_LOCK:
+        _SCHEMA_CACHE.clear()
+        _OPENAPI_GELADEN_UM = None
+
+
+def _lade_openapi_spalten(client: Any) -> Dict[str, FrozenSet[str]]:
+    """Liest die Spalten aller Tabellen aus der PostgREST-OpenAPI-Beschreibung."""
+
+    session = getattr(getattr(client, "postgrest", None), "session", None)
+    if session is None:
+        return {}
+    try:
+        antwort = session.get("/", headers={"Accept": "application/openapi+json"})
+        antwort.raise_for_status()
+        definitionen = antwort.json().get("definitions") or {}
+    except Exception:
+        # Debug-Hinweis: ``st.write(antwort.text)`` zeigt, ob der Schlüssel die
+        # OpenAPI-Beschreibung lesen darf.
+        return {}
+    return {
+        tabelle: frozenset((definition.get("properties") or {}).keys())
+        for tabelle, definition in definitionen.items()
+        if isinstance(definition, dict)
+    }
+
+
+def _lade_spalten_per_beispielzeile(client: Any, tabelle: str) -> Optional[FrozenSet[str]]:
+    try:
+        antwort = client.table(tabelle).select("*").limit(1).execute()
+    except Exception:
+        return None
+    zeilen = getattr(antwort, "data", None) or []
+    if not zeilen:
+        # Leere Tabelle: Spalten lassen sich so nicht ermitteln.
+        return None
+    return frozenset(zeilen[0].keys())
+
+
+def get_tabellenspalten(client: Any, tabelle: str) -> Optional[FrozenSet[str]]:
+    """Liefert die bekannten Spalten einer Tabelle oder ``None``, falls unbekannt.
+
+    Einträge älter als ``_SCHEMA_TTL_SEK`` werden neu ermittelt.
+    """
+
+    global _OPENAPI_GELADEN_UM
+    jetzt = time.monotonic()
+    with _SCHEMA_LOCK:
+        eintrag = _SCHEMA_CACHE.get(tabelle)
+        if eintrag is not None and jetzt - eintrag[0] < _SCHEMA_TTL_SEK:
+            return eintrag[1]
+        openapi_aktuell = (
+            _OPENAPI_GELADEN_UM is not None and jetzt - _OPENAPI_GELADEN_UM < _SCHEMA_TTL_SEK
+        )
+
+    spalten: Optional[FrozenSet[str]] = None
+    if not openapi_aktuell:
+        alle = _lade_openapi_spalten(client)
+        with _SCHEMA_LOCK:
+            _SCHEMA_CACHE.update((name, (jetzt, werte)) for name, werte in alle.items())
+            _OPENAPI_GELADEN_UM = jetzt
+        spalten = alle.get(tabelle)
+    if spalten is None:
+        spalten = _lade_spalten_per_beispielzeile(client, tabelle)
+
+    with _SCHEMA_LOCK:
+        _SCHEMA_CACHE[tabelle] = (jetzt, spalten)
+    return spalten
+
+
+def fehlende_optionale_spalten(client: Any, tabelle: str, optionale_spalten: Iterable[str]) -> List[str]:
+    """Optionale Spalten, die laut Schema-Cache (noch) nicht existieren."""
+
+    bekannte = get_tabellenspalten(client, tabelle)
+    if bekannte is None:
+        return []
+    return sorted(spalte for spalte in optionale_spalten if spalte not in bekannte)
+
+
+def _unbekannte_spalte(exc: Exception, kandidaten: Iterable[str]) -> Optional[str]:
+    for treffer in _UNBEKANNTE_SPALTE.finditer(str(exc)):
+        spalte = treffer.group(1) or treffer.group(2)
+        if spalte in kandidaten:
+            return spalte
+    return None
+
+
+def insert_mit_optionalen_spalten(
+    client: Any,
+    tabelle: str,
+    zeilen: Dict[str, Any] | List[Dict[str, Any]],
+    optionale_spalten: Iterable[str],
+) -> Tuple[Any, List[str]]:
+    """Fügt Zeilen ein und lässt optionale Spalten weg, die im Schema fehlen.
+
+    ``zeilen`` enthält bereits alle Werte; ``optionale_spalten`` benennt die
+    Schlüssel, die bei fehlender Spalte entfallen dürfen. Rückgabe ist
+    ``(Supabase-Antwort, fehlende Spalten)``. Alle übrigen Fehler werden
+    unverändert weitergereicht.
+    """
+
+    optionale = set(optionale_spalten)
+    fehlend: List[str] = []
+    bekannte = get_tabellenspalten(client, tabelle)
+    if bekannte is not None:
+        fehlend = [spalte for spalte in optionale if spalte not in bekannte]
+
+    # Höchstens ein Wiederholungsversuch je optionaler Spalte.
+    for _ in range(len(optionale) + 1):
+        if isinstance(zeilen, list):
+            payload: Any = [{k: v for k, v in z.items() if k not in fehlend} for z in zeilen]
+        else:
+            payload = {k: v for k, v in zeilen.items() if k not in fehlend}
+        try:
+            antwort = client.table(tabelle).insert(payload).execute()
+        except Exception as exc:
+            spalte = _unbekannte_spalte(exc, optionale)
+            if spalte is None or spalte in fehlend:
+                raise
+            # Schema hat sich geändert (oder war unbekannt): beim nächsten
+            # Zugriff neu lernen und den Insert ohne die Spalte wiederholen.
+            verwerfe_schema_cache()
+            fehlend.append(spalte)
+            continue
+        return antwort, sorted(fehlend)
+    raise RuntimeError(f"Insert in '{tabelle}' nach Schemaanpassung weiterhin fehlgeschlagen.")
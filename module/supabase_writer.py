@@ -0,0 +1,574 @@
+"""Write-behind-Warteschlange für Supabase-Schreibzugriffe.
+
+Feedback-Inserts, Detail-Cache-Upserts, Öffnungs-Events und die Sicherung der
+AMBOSS-Zusammenfassung haben bisher das Streamlit-Skript blockiert, bis
+Supabase geantwortet hat. Dieses Modul nimmt solche Schreibaufträge entgegen
+und arbeitet sie in einem prozessweiten Hintergrund-Thread ab; die Oberfläche
+läuft sofort weiter.
+
+Funktionsweise:
+- Aufträge werden strikt in Eingangsreihenfolge (FIFO) geschrieben. Direkt
+  aufeinanderfolgende Inserts/Upserts derselben Tabelle mit identischen
+  Spalten werden zu einer Anfrage gebündelt.
+- Vorübergehende Fehler (Netzwerk, Timeouts, 5xx, 429) werden mit
+  exponentiellem Backoff wiederholt; alle anderen Fehler gelten sofort als
+  endgültig. Der Kopf der Warteschlange wartet dabei,
+  damit spätere Aufträge (z. B. ``opened=true``) nie vor früheren
+  (``opened=false``) landen.
+- Alle offenen Aufträge liegen zusätzlich in einer Spool-Datei
+  (Umgebungsvariable ``SUPABASE_SPOOL_DATEI``) und werden nach einem Neustart
+  erneut eingereiht. Die Datei ist ein JSONL-Journal: Einreihen hängt eine
+  Zeile an (``neu``), erledigte Aufträge eine Abschlusszeile (``fertig``).
+  Nur der Hintergrund-Thread schreibt das Journal gelegentlich kompakt neu,
+  sodass ein Schreibauftrag aus der Oberfläche unabhängig von der Länge der
+  Warteschlange nur eine Zeile kostet. Endgültig gescheiterte Aufträge landen in
+  ``<Spool-Datei>.fehler.jsonl``, damit nichts stillschweigend verloren geht.
+- Wer das Ergebnis braucht (z. B. die ``ID`` des Feedback-Datensatzes), erhält
+  ein :class:`SchreibHandle` und kann gezielt darauf warten.
+
+Hinweis: Die Spool-Datei gehört genau einem Prozess. Laufen mehrere
+App-Instanzen auf demselben Rechner, braucht jede eine eigene
+``SUPABASE_SPOOL_DATEI``.
+"""
+
+from __future__ import annotations
+
+import atexit
+from collections import deque
+from dataclasses import dataclass, field
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import uuid
+
+import httpx
+
+from module.supabase_client import get_supabase_client
+from module.supabase_schema import insert_mit_optionalen_spalten
+
+__all__ = [
+    "SchreibHandle",
+    "get_schreibprobleme",
+    "get_schreibwarteschlangen_status",
+    "leere_schreibwarteschlange",
+    "schreibe_spaeter",
+]
+
+_ARTEN = ("insert", "upsert", "update")
+_MAX_BUENDEL_ZEILEN = 100
+_MAX_VERSUCHE = 12
+_BACKOFF_START_SEK = 1.0
+_BACKOFF_MAX_SEK = 60.0
+# Beim Beenden des Prozesses wird höchstens so lange auf offene Aufträge
+# gewartet; der Rest bleibt in der Spool-Datei.
+_ABSCHLUSS_WARTEZEIT_SEK = 5.0
+# Das Journal wird kompaktiert, sobald es so viele Zeilen mehr enthält, als
+# Aufträge offen sind.
+_KOMPAKTIEREN_AB_ZEILEN = 500
+# Anzahl der zuletzt verworfenen oder ins Leere gelaufenen Aufträge, die für
+# gezielte Hinweise im Adminbereich vorgehalten werden.
+_PROBLEM_HISTORIE = 50
+_STANDARD_SPOOL_DATEI = os.path.join(tempfile.gettempdir(), "karina_supabase_spool.jsonl")
+
+
+class SchreibHandle:
+    """Ergebnis eines Schreibauftrags, auf das gewartet werden kann.
+
+    Nach Abschluss enthält ``daten`` die von Supabase zurückgelieferten Zeilen
+    bzw. ``fehler`` die endgültige Ausnahme.
+    Debug-Hinweis: ``st.write(handle.fertig, handle.daten, handle.fehler)``.
+    """
+
+    def __init__(self) -> None:
+        self._ereignis = threading.Event()
+        self.daten: Optional[List[Dict[str, Any]]] = None
+        self.fehler: Optional[BaseException] = None
+
+    @property
+    def fertig(self) -> bool:
+        return self._ereignis.is_set()
+
+    def warte(self, timeout: Optional[float] = None) -> bool:
+        """Wartet höchstens ``timeout`` Sekunden; True, sobald der Auftrag abgeschlossen ist."""
+
+        return self._ereignis.wait(timeout)
+
+    def _abschliessen(
+        self, daten: Optional[List[Dict[str, Any]]] = None, fehler: Optional[BaseException] = None
+    ) -> None:
+        self.daten = daten
+        self.fehler = fehler
+        self._ereignis.set()
+
+
+@dataclass
+class _Auftrag:
+    tabelle: str
+    art: str
+    zeilen: List[Dict[str, Any]]
+    on_conflict: Optional[str] = None
+    ignore_duplicates: bool = False
+    # Nur für ``update``: Gleichheitsfilter {spalte: wert}.
+    filter: Dict[str, Any] = field(default_factory=dict)
+    optionale_spalten: Tuple[str, ...] = ()
+    auftrag_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    erstellt: float = field(default_factory=time.time)
+    versuche: int = 0
+    letzter_fehler: str = ""
+    # Nicht persistiert: Handle und Rückruf existieren nur im laufenden Prozess.
+    handle: Optional[SchreibHandle] = None
+    bei_erfolg: Optional[Callable[[], None]] = None
+
+    def als_dict(self) -> Dict[str, Any]:
+        return {
+            "auftrag_id": self.auftrag_id,
+            "tabelle": self.tabelle,
+            "art": self.art,
+            "zeilen": self.zeilen,
+            "on_conflict": self.on_conflict,
+            "ignore_duplicates": self.ignore_duplicates,
+            "filter": self.filter,
+            "optionale_spalten": list(self.optionale_spalten),
+            "erstellt": self.erstellt,
+            "versuche": self.versuche,
+            "letzter_fehler": self.letzter_fehler,
+        }
+
+    @classmethod
+    def aus_dict(cls, daten: Dict[str, Any]) -> "_Auftrag":
+        return cls(
+            tabelle=daten["tabelle"],
+            art=daten["art"],
+            zeilen=list(daten.get("zeilen") or []),
+            on_conflict=daten.get("on_conflict"),
+            ignore_duplicates=bool(daten.get("ignore_duplicates")),
+            filter=dict(daten.get("filter") or {}),
+            optionale_spalten=tuple(daten.get("optionale_spalten") or ()),
+            auftrag_id=daten.get("auftrag_id") or uuid.uuid4().hex,
+            erstellt=float(daten.get("erstellt") or time.time()),
+            versuche=int(daten.get("versuche") or 0),
+            letzter_fehler=str(daten.get("letzter_fehler") or ""),
+        )
+
+    def buendel_schluessel(self) -> Optional[Tuple[Any, ...]]:
+        """Schlüssel für das Bündeln; ``None`` = Auftrag wird einzeln geschrieben."""
+
+        # Aufträge mit Handle brauchen ihre eigene Antwort, Updates haben je
+        # Auftrag einen eigenen Filter, optionale Spalten einen eigenen Retry.
+        if self.handle is not None or self.art == "update" or self.optionale_spalten:
+            return None
+        spalten = {frozenset(zeile) for zeile in self.zeilen}
+        if len(spalten) != 1:
+            return None
+        return (self.tabelle, self.art, self.on_conflict, self.ignore_duplicates, spalten.pop())
+
+
+def _ist_voruebergehend(exc: BaseException) -> bool:
+    """Unterscheidet wiederholbare Fehler von dauerhaften (Schema, Rechte, Daten)."""
+
+    if isinstance(exc, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    code = str(getattr(exc, "code", "") or "")
+    if not code:
+        # Fehler ohne PostgREST-Code (z. B. TypeError, KeyError, nicht
+        # serialisierbare Werte) bessern sich durch Warten nicht. Sie landen
+        # sofort im Fehlerprotokoll, statt den Kopf der FIFO-Warteschlange und
+        # damit alle anderen Sitzungen minutenlang zu blockieren.
+        return False
+    # HTTP 429/5xx sowie Postgres-Klassen 08 (Verbindung), 53 (Ressourcen),
+    # 57 (Betrieb unterbrochen) und PGRST00x (Datenbank nicht erreichbar).
+    return code in {"429"} or code.startswith(("5", "08", "53", "57", "PGRST00"))
+
+
+def _backoff_sek(versuche: int) -> float:
+    basis = min(_BACKOFF_MAX_SEK, _BACKOFF_START_SEK * (2 ** max(0, versuche - 1)))
+    return basis * random.uniform(0.8, 1.2)
+
+
+def _ohne_doppelte_konflikte(zeilen: List[Dict[str, Any]], on_conflict: Optional[str]) -> List[Dict[str, Any]]:
+    """Ein Upsert darf dieselbe Zeile nicht zweimal treffen – der jüngste Wert gewinnt."""
+
+    if not on_conflict:
+        return zeilen
+    spalten = [spalte.strip() for spalte in on_conflict.split(",")]
+    eindeutig: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for zeile in zeilen:
+        schluessel = tuple(json.dumps(zeile.get(spalte), default=str) for spalte in spalten)
+        eindeutig.pop(schluessel, None)
+        eindeutig[schluessel] = zeile
+    return list(eindeutig.values())
+
+
+class _SchreibWarteschlange:
+    """Prozessweiter Hintergrund-Schreiber mit Spool-Datei."""
+
+    def __init__(self, spool_datei: str) -> None:
+        self._spool_datei = spool_datei
+        # Sperrreihenfolge: erst ``_journal_lock``, dann ``_bedingung``.
+        self._journal_lock = threading.Lock()
+        self._journal_zeilen = 0
+        self._bedingung = threading.Condition()
+        self._ausstehend: Deque[_Auftrag] = deque()
+        self._naechster_versuch = 0.0
+        self._in_arbeit = False
+        self._spool_fehler: Optional[str] = None
+        self._statistik: Dict[str, Any] = {
+            "geschrieben": 0,
+            "anfragen": 0,
+            "wiederholungen": 0,
+            "verworfen": 0,
+            "ohne_treffer": 0,
+            "aus_spool": 0,
+            "letzter_fehler": "",
+        }
+        self._probleme: Deque[Dict[str, Any]] = deque(maxlen=_PROBLEM_HISTORIE)
+        self._lade_spool()
+        self._kompaktiere()
+        self._thread = threading.Thread(target=self._arbeite, name="supabase-write-behind", daemon=True)
+        self._thread.start()
+
+    # -- Spool ---------------------------------------------------------------
+
+    def _lade_spool(self) -> None:
+        try:
+            with open(self._spool_datei, "r", encoding="utf-8") as datei:
+                inhalt = datei.read()
+        except FileNotFoundError:
+            return
+        except OSError as exc:
+            self._spool_fehler = f"Spool nicht lesbar: {exc!r}"
+            return
+
+        offen: Dict[str, Dict[str, Any]] = {}
+        for zeile in inhalt.splitlines():
+            try:
+                eintrag = json.loads(zeile)
+            except ValueError:
+                # Unvollständige letzte Zeile nach einem Absturz.
+                continue
+            if not isinstance(eintrag, dict):
+                continue
+            if isinstance(eintrag.get("neu"), dict):
+                offen[str(eintrag["neu"].get("auftrag_id"))] = eintrag["neu"]
+            elif "fertig" in eintrag:
+                offen.pop(str(eintrag["fertig"]), None)
+
+        for eintrag in offen.values():
+            try:
+                auftrag = _Auftrag.aus_dict(eintrag)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if auftrag.art in _ARTEN:
+                self._ausstehend.append(auftrag)
+        self._statistik["aus_spool"] = len(self._ausstehend)
+
+    def _haenge_an(self, eintraege: List[Dict[str, Any]]) -> None:
+        """Hängt Journalzeilen an (muss unter ``_journal_lock`` laufen)."""
+
+        try:
+            with open(self._spool_datei, "a", encoding="utf-8") as datei:
+                datei.write("".join(json.dumps(eintrag, default=str) + "\n" for eintrag in eintraege))
+            self._journal_zeilen += len(eintraege)
+            self._spool_fehler = None
+        except OSError as exc:
+            # Ohne beschreibbares Dateisystem arbeitet die Warteschlange rein im
+            # Speicher weiter; der Adminbereich zeigt den Hinweis.
+            self._spool_fehler = f"Spool nicht beschreibbar: {exc!r}"
+
+    def _kompaktiere(self) -> None:
+        """Schreibt nur noch offene Aufträge atomar ins Journal (Hintergrund-Thread)."""
+
+        with self._journal_lock:
+            with self._bedingung:
+                offen = [{"neu": auftrag.als_dict()} for auftrag in self._ausstehend]
+            try:
+                if not offen:
+                    if os.path.exists(self._spool_datei):
+                        os.remove(self._spool_datei)
+                else:
+                    temp = f"{self._spool_datei}.tmp"
+                    with open(temp, "w", encoding="utf-8") as datei:
+                        datei.write("".join(json.dumps(eintrag, default=str) + "\n" for eintrag in offen))
+                    os.replace(temp, self._spool_datei)
+                self._journal_zeilen = len(offen)
+                self._spool_fehler = None
+            except OSError as exc:
+                self._spool_fehler = f"Spool nicht beschreibbar: {exc!r}"
+
+    def _journal_abschliessen(self, erledigt: List[_Auftrag]) -> None:
+        """Vermerkt erledigte Aufträge, bevor sie die Warteschlange verlassen."""
+
+        if erledigt:
+            with self._journal_lock:
+                self._haenge_an([{"fertig": auftrag.auftrag_id} for auftrag in erledigt])
+
+    def _kompaktiere_bei_bedarf(self) -> None:
+        with self._bedingung:
+            offen = len(self._ausstehend)
+        if (not offen and self._journal_zeilen) or self._journal_zeilen - offen > _KOMPAKTIEREN_AB_ZEILEN:
+            self._kompaktiere()
+
+    def _merke_problem(self, auftrag: _Auftrag, grund: str) -> None:
+        # Nur unter ``self._bedingung`` aufrufen.
+        self._probleme.append(
+            {
+                "tabelle": auftrag.tabelle,
+                "art": auftrag.art,
+                "spalten": sorted({spalte for zeile in auftrag.zeilen for spalte in zeile}),
+                "filter": dict(auftrag.filter),
+                "grund": grund,
+                "fehler": auftrag.letzter_fehler,
+                "zeitpunkt": time.time(),
+            }
+        )
+
+    def probleme(self) -> List[Dict[str, Any]]:
+        with self._bedingung:
+            return list(self._probleme)
+
+    def _protokolliere_verworfen(self, auftrag: _Auftrag) -> None:
+        try:
+            with open(f"{self._spool_datei}.fehler.jsonl", "a", encoding="utf-8") as datei:
+                datei.write(json.dumps(auftrag.als_dict(), default=str) + "\n")
+        except OSError:
+            pass
+
+    # -- Öffentliche Schnittstelle -------------------------------------------
+
+    def einreihen(self, auftrag: _Auftrag) -> None:
+        # Die Journalzeile entsteht vor dem Einreihen, damit ``fertig`` nie vor
+        # ``neu`` im Journal steht.
+        with self._journal_lock:
+            self._haenge_an([{"neu": auftrag.als_dict()}])
+            with self._bedingung:
+                self._ausstehend.append(auftrag)
+                self._bedingung.notify_all()
+
+    def leeren(self, timeout: float) -> bool:
+        """Wartet, bis alle Aufträge geschrieben sind; True bei leerer Warteschlange."""
+
+        ende = time.monotonic() + timeout
+        with self._bedingung:
+            while self._ausstehend or self._in_arbeit:
+                rest = ende - time.monotonic()
+                if rest <= 0:
+                    return False
+                self._bedingung.wait(timeout=min(rest, 0.5))
+            return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._bedingung:
+            aeltester = min((a.erstellt for a in self._ausstehend), default=None)
+            return {
+                **self._statistik,
+                "ausstehend": len(self._ausstehend),
+                "aeltester_auftrag_sek": round(time.time() - aeltester, 1) if aeltester else 0.0,
+                "naechster_versuch_in_sek": round(max(0.0, self._naechster_versuch - time.monotonic()), 1),
+                "spool_datei": self._spool_datei,
+                "spool_fehler": self._spool_fehler,
+            }
+
+    # -- Hintergrund-Thread --------------------------------------------------
+
+    def _naechstes_buendel(self) -> List[_Auftrag]:
+        kopf = self._ausstehend[0]
+        buendel = [kopf]
+        schluessel = kopf.buendel_schluessel()
+        if schluessel is None:
+            return buendel
+        zeilen = len(kopf.zeilen)
+        for auftrag in list(self._ausstehend)[1:]:
+            if auftrag.buendel_schluessel() != schluessel or zeilen + len(auftrag.zeilen) > _MAX_BUENDEL_ZEILEN:
+                break
+            buendel.append(auftrag)
+            zeilen += len(auftrag.zeilen)
+        return buendel
+
+    def _arbeite(self) -> None:
+        while True:
+            with self._bedingung:
+                while not self._ausstehend or time.monotonic() < self._naechster_versuch:
+                    warte = max(0.0, self._naechster_versuch - time.monotonic()) if self._ausstehend else None
+                    self._bedingung.wait(timeout=warte)
+                buendel = self._naechstes_buendel()
+                self._in_arbeit = True
+
+            try:
+                daten = self._schreibe(buendel)
+            except Exception as exc:  # pragma: no cover - Netzfehler schwer abbildbar
+                self._behandle_fehler(buendel, exc)
+            else:
+                self._behandle_erfolg(buendel, daten)
+            self._kompaktiere_bei_bedarf()
+
+    def _schreibe(self, buendel: List[_Auftrag]) -> List[Dict[str, Any]]:
+        kopf = buendel[0]
+        client = get_supabase_client()
+        tabelle = client.table(kopf.tabelle)
+        with self._bedingung:
+            self._statistik["anfragen"] += 1
+
+        if kopf.art == "update":
+            anfrage = tabelle.update(kopf.zeilen[0])
+            for spalte, wert in kopf.filter.items():
+                anfrage = anfrage.eq(spalte, wert)
+            antwort = anfrage.execute()
+        elif kopf.optionale_spalten:
+            zeilen: Any = kopf.zeilen[0] if len(kopf.zeilen) == 1 else kopf.zeilen
+            antwort, _ = insert_mit_optionalen_spalten(client, kopf.tabelle, zeilen, kopf.optionale_spalten)
+        else:
+            zeilen = [zeile for auftrag in buendel for zeile in auftrag.zeilen]
+            if kopf.art == "upsert":
+                antwort = tabelle.upsert(
+                    zeilen if kopf.ignore_duplicates else _ohne_doppelte_konflikte(zeilen, kopf.on_conflict),
+                    on_conflict=kopf.on_conflict or "",
+                    ignore_duplicates=kopf.ignore_duplicates,
+                ).execute()
+            else:
+                antwort = tabelle.insert(zeilen).execute()
+        return list(getattr(antwort, "data", None) or [])
+
+    def _behandle_erfolg(self, buendel: List[_Auftrag], daten: List[Dict[str, Any]]) -> None:
+        self._journal_abschliessen(buendel)
+        with self._bedingung:
+            for _ in buendel:
+                self._ausstehend.popleft()
+            self._statistik["geschrieben"] += len(buendel)
+            if buendel[0].art == "update" and not daten:
+                # Wie zuvor im UI-Pfad: kein Fehler, aber kein passender Datensatz.
+                self._statistik["ohne_treffer"] += 1
+                self._merke_problem(buendel[0], "ohne_treffer")
+            self._naechster_versuch = 0.0
+            self._in_arbeit = False
+            self._bedingung.notify_all()
+
+        for auftrag in buendel:
+            if auftrag.handle is not None:
+                auftrag.handle._abschliessen(daten=daten)
+            if auftrag.bei_erfolg is not None:
+                try:
+                    auftrag.bei_erfolg()
+                except Exception:
+                    pass
+
+    def _behandle_fehler(self, buendel: List[_Auftrag], exc: BaseException) -> None:
+        # Nur der Hintergrund-Thread verändert Versuche und Kopf der Warteschlange.
+        for auftrag in buendel:
+            auftrag.versuche += 1
+            auftrag.letzter_fehler = repr(exc)
+        wiederholen = _ist_voruebergehend(exc) and buendel[0].versuche < _MAX_VERSUCHE
+        endgueltig: List[_Auftrag] = [] if wiederholen else list(buendel)
+        self._journal_abschliessen(endgueltig)
+        with self._bedingung:
+            self._statistik["letzter_fehler"] = repr(exc)
+            if wiederholen:
+                self._statistik["wiederholungen"] += 1
+                self._naechster_versuch = time.monotonic() + _backoff_sek(buendel[0].versuche)
+            else:
+                for auftrag in endgueltig:
+                    self._ausstehend.popleft()
+                    self._merke_problem(auftrag, "verworfen")
+                self._statistik["verworfen"] += len(endgueltig)
+                self._naechster_versuch = 0.0
+            self._in_arbeit = False
+            self._bedingung.notify_all()
+
+        for auftrag in endgueltig:
+            self._protokolliere_verworfen(auftrag)
+            if auftrag.handle is not None:
+                auftrag.handle._abschliessen(fehler=exc)
+
+
+_WARTESCHLANGE: Optional[_SchreibWarteschlange] = None
+_WARTESCHLANGE_LOCK = threading.Lock()
+
+
+def _get_warteschlange() -> _SchreibWarteschlange:
+    global _WARTESCHLANGE
+    with _WARTESCHLANGE_LOCK:
+        if _WARTESCHLANGE is None:
+            _WARTESCHLANGE = _SchreibWarteschlange(os.getenv("SUPABASE_SPOOL_DATEI") or _STANDARD_SPOOL_DATEI)
+            atexit.register(_WARTESCHLANGE.leeren, _ABSCHLUSS_WARTEZEIT_SEK)
+        return _WARTESCHLANGE
+
+
+def schreibe_spaeter(
+    tabelle: str,
+    zeilen: Dict[str, Any] | List[Dict[str, Any]],
+    *,
+    art: str = "insert",
+    on_conflict: Optional[str] = None,
+    ignore_duplicates: bool = False,
+    filter: Optional[Dict[str, Any]] = None,
+    optionale_spalten: Tuple[str, ...] | List[str] = (),
+    bei_erfolg: Optional[Callable[[], None]] = None,
+    mit_handle: bool = False,
+) -> Optional[SchreibHandle]:
+    """Reiht einen Schreibauftrag ein und kehrt sofort zurück.
+
+    ``art`` ist ``insert``, ``upsert`` (mit ``on_conflict``/``ignore_duplicates``)
+    oder ``update`` (genau eine Zeile mit den neuen Werten plus ``filter``).
+    ``optionale_spalten`` werden wie bei
+    :func:`module.supabase_schema.insert_mit_optionalen_spalten` behandelt.
+    ``bei_erfolg`` läuft im Hintergrund-Thread nach erfolgreichem Schreiben und
+    darf daher keinen Session-State verwenden. Mit ``mit_handle=True`` wird ein
+    :class:`SchreibHandle` zurückgegeben, sonst ``None``.
+    """
+
+    if art not in _ARTEN:
+        raise ValueError(f"Unbekannte Schreibart: {art!r}")
+    zeilenliste = [dict(zeile) for zeile in (zeilen if isinstance(zeilen, list) else [zeilen])]
+    if art == "update" and (len(zeilenliste) != 1 or not filter):
+        raise ValueError("Ein Update braucht genau eine Zeile und einen Filter.")
+    if not zeilenliste:
+        return None
+
+    handle = SchreibHandle() if mit_handle else None
+    # Werte werden sofort JSON-normalisiert, damit Spool und Anfrage dieselben
+    # Daten sehen (z. B. datetime -> ISO-String).
+    zeilenliste = json.loads(json.dumps(zeilenliste, default=str))
+    _get_warteschlange().einreihen(
+        _Auftrag(
+            tabelle=tabelle,
+            art=art,
+            zeilen=zeilenliste,
+            on_conflict=on_conflict,
+            ignore_duplicates=ignore_duplicates,
+            filter=dict(filter or {}),
+            optionale_spalten=tuple(optionale_spalten),
+            handle=handle,
+            bei_erfolg=bei_erfolg,
+        )
+    )
+    return handle
+
+
+def leere_schreibwarteschlange(timeout: float = _ABSCHLUSS_WARTEZEIT_SEK) -> bool:
+    """Wartet höchstens ``timeout`` Sekunden, bis alle Aufträge geschrieben sind."""
+
+    return _get_warteschlange().leeren(timeout)
+
+
+def get_schreibprobleme(tabelle: str, spalte: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Verworfene oder ins Leere gelaufene Aufträge einer Tabelle seit Prozessstart.
+
+    Mit ``spalte`` nur Aufträge, die diese Spalte schreiben. ``grund`` ist
+    ``verworfen`` (endgültiger Fehler, siehe ``<Spool-Datei>.fehler.jsonl``)
+    oder ``ohne_treffer`` (Update ohne passenden Datensatz). Neueste zuletzt.
+    """
+
+    return [
+        problem
+        for problem in _get_warteschlange().probleme()
+        if problem["tabelle"] == tabelle and (spalte is None or spalte in problem["spalten"])
+    ]
+
+
+def get_schreibwarteschlangen_status() -> Dict[str, Any]:
+    """Momentaufnahme für die Adminanzeige."""
+
+    return _get_warteschlange().status()
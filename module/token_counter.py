@@ -1,17 +1,99 @@
+"""Token-Zählung je Session inklusive Aufschlüsselung nach Modell und Kontext.
+
+Neben den drei Gesamtsummen (``prompt``/``completion``/``total``) wird unter
+``token_nutzung`` festgehalten, welches Modell in welchem Aufrufkontext wie
+viele Tokens verbraucht hat – einschließlich der von der API als gecacht
+gemeldeten Prompt-Tokens. Über die Preistabelle lassen sich daraus die Kosten
+einer Sitzung berechnen. Die Preise können über die Umgebungsvariable
+``OPENAI_PREISE_JSON`` überschrieben werden, z. B.
+``{"gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10.0}}``
+(US-Dollar je 1 Mio. Tokens).
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
 import streamlit as st
 
+__all__ = [
+    "add_saved_tokens",
+    "add_usage",
+    "berechne_kosten_usd",
+    "get_cached_tokens",
+    "get_saved_tokens",
+    "get_token_nutzung",
+    "get_token_sums",
+    "init_token_counters",
+    "lese_cached_tokens",
+]
+
+# Wird wie ``token_sums`` beim Fallwechsel über ``_FALL_SESSION_KEYS`` entfernt.
+_SESSION_KEY_NUTZUNG = "token_nutzung"
+
+# Listenpreise in US-Dollar je 1 Mio. Tokens: (Input, gecachter Input, Output).
+# Modellvarianten mit Datumssuffix (z. B. "gpt-4o-2024-08-06") werden über den
+# längsten passenden Präfix zugeordnet.
+_STANDARD_PREISE_USD_PRO_MIO: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+
 def init_token_counters():
     """Initialisiert die Token-Zähler einmal pro Session."""
     if "token_sums" not in st.session_state:
-        st.session_state["token_sums"] = {"prompt": 0, "completion": 0, "total": 0}
+        st.session_state["token_sums"] = {"prompt": 0, "completion": 0, "total": 0, "gespart": 0, "cached": 0}
+    if _SESSION_KEY_NUTZUNG not in st.session_state:
+        st.session_state[_SESSION_KEY_NUTZUNG] = {}
 
-def add_usage(prompt_tokens: int, completion_tokens: int, total_tokens: int):
-    """Addiert die Tokenwerte auf die Session-Summen."""
-    if "token_sums" not in st.session_state:
-        init_token_counters()
-    st.session_state["token_sums"]["prompt"]    += int(prompt_tokens or 0)
-    st.session_state["token_sums"]["completion"]+= int(completion_tokens or 0)
-    st.session_state["token_sums"]["total"]     += int(total_tokens or 0)
+def lese_cached_tokens(usage: Any) -> int:
+    """Liest die gecachten Prompt-Tokens aus einem Usage-Objekt (falls gemeldet)."""
+    if usage is None:
+        return 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is None and isinstance(usage, dict):
+        details = usage.get("prompt_tokens_details")
+    if details is None:
+        return 0
+    if isinstance(details, dict):
+        return int(details.get("cached_tokens", 0) or 0)
+    return int(getattr(details, "cached_tokens", 0) or 0)
+
+def add_usage(
+    prompt_tokens: int,
+    completion_tokens: int,
+    total_tokens: int,
+    *,
+    model: str = "",
+    kontext: str = "",
+    cached_tokens: int = 0,
+):
+    """Addiert die Tokenwerte auf die Session-Summen und je Modell/Kontext."""
+    init_token_counters()
+    summen = st.session_state["token_sums"]
+    summen["prompt"]    += int(prompt_tokens or 0)
+    summen["completion"]+= int(completion_tokens or 0)
+    summen["total"]     += int(total_tokens or 0)
+    summen["cached"] = summen.get("cached", 0) + int(cached_tokens or 0)
+
+    eintrag = (
+        st.session_state[_SESSION_KEY_NUTZUNG]
+        .setdefault(model or "unbekannt", {})
+        .setdefault(kontext or "ohne Kontext", {"aufrufe": 0, "prompt": 0, "cached": 0, "completion": 0})
+    )
+    eintrag["aufrufe"] += 1
+    eintrag["prompt"] += int(prompt_tokens or 0)
+    eintrag["cached"] += int(cached_tokens or 0)
+    eintrag["completion"] += int(completion_tokens or 0)
+    # Debug-Hinweis: ``st.write(st.session_state["token_nutzung"])`` zeigt die
+    # Aufschlüsselung nach Modell und Kontext.
 
 def get_token_sums():
     """Gibt die aktuellen Summen zurück."""
@@ -22,3 +104,87 @@ def get_token_sums():
         st.session_state["token_sums"]["completion"],
         st.session_state["token_sums"]["total"]
     )
+
+def get_cached_tokens() -> int:
+    """Gibt die Summe der gecachten Prompt-Tokens der Session zurück."""
+    init_token_counters()
+    return int(st.session_state["token_sums"].get("cached", 0))
+
+def get_token_nutzung() -> Dict[str, Dict[str, Dict[str, int]]]:
+    """Kopie der Aufschlüsselung ``{modell: {kontext: {aufrufe, prompt, cached, completion}}}``."""
+    init_token_counters()
+    return copy.deepcopy(st.session_state[_SESSION_KEY_NUTZUNG])
+
+def add_saved_tokens(anzahl: int):
+    """Addiert Prompt-Tokens, die durch Verlaufskompaktierung eingespart wurden."""
+    if "token_sums" not in st.session_state:
+        init_token_counters()
+    st.session_state["token_sums"]["gespart"] = (
+        st.session_state["token_sums"].get("gespart", 0) + max(0, int(anzahl or 0))
+    )
+
+def get_saved_tokens() -> int:
+    """Gibt die Summe der eingesparten Prompt-Tokens der Session zurück."""
+    if "token_sums" not in st.session_state:
+        init_token_counters()
+    return int(st.session_state["token_sums"].get("gespart", 0))
+
+def _lade_preise() -> Dict[str, Tuple[float, float, float]]:
+    preise = dict(_STANDARD_PREISE_USD_PRO_MIO)
+    roh = os.getenv("OPENAI_PREISE_JSON")
+    if not roh:
+        return preise
+    try:
+        for model, werte in json.loads(roh).items():
+            eingabe = float(werte["input"])
+            preise[model] = (
+                eingabe,
+                float(werte.get("cached_input", eingabe)),
+                float(werte["output"]),
+            )
+    except (ValueError, TypeError, KeyError, AttributeError):
+        # Debug-Hinweis: ``st.write(roh)`` hilft, Tippfehler im JSON zu finden.
+        # Bei ungültiger Konfiguration bleiben die Standardpreise aktiv.
+        return dict(_STANDARD_PREISE_USD_PRO_MIO)
+    return preise
+
+def _preis_fuer(model: str, preise: Dict[str, Tuple[float, float, float]]) -> Optional[Tuple[float, float, float]]:
+    if model in preise:
+        return preise[model]
+    passende = [name for name in preise if model.startswith(name)]
+    if not passende:
+        return None
+    return preise[max(passende, key=len)]
+
+def berechne_kosten_usd(nutzung: Optional[Dict[str, Dict[str, Dict[str, int]]]] = None) -> Dict[str, Any]:
+    """Berechnet die Kosten der Session (oder einer übergebenen Aufschlüsselung).
+
+    Gecachte Prompt-Tokens werden zum ermäßigten Preis, die übrigen zum
+    regulären Input-Preis abgerechnet. Modelle ohne Preis landen in
+    ``unbepreist`` und fließen nicht in die Summe ein.
+    """
+    if nutzung is None:
+        nutzung = get_token_nutzung()
+    preise = _lade_preise()
+    je_modell: Dict[str, float] = {}
+    unbepreist = []
+    for model, kontexte in nutzung.items():
+        preis = _preis_fuer(model, preise)
+        if preis is None:
+            unbepreist.append(model)
+            continue
+        eingabe, eingabe_cached, ausgabe = preis
+        kosten = 0.0
+        for werte in kontexte.values():
+            cached = min(werte.get("cached", 0), werte.get("prompt", 0))
+            kosten += (
+                (werte.get("prompt", 0) - cached) * eingabe
+                + cached * eingabe_cached
+                + werte.get("completion", 0) * ausgabe
+            ) / 1_000_000
+        je_modell[model] = round(kosten, 6)
+    return {
+        "gesamt_usd": round(sum(je_modell.values()), 6),
+        "je_modell_usd": je_modell,
+        "unbepreist": sorted(unbepreist),
+    }
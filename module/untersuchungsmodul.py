@@ -4,8 +4,7 @@ from module.offline import (
     get_offline_sonderuntersuchung,
     is_offline,
 )
-from module.token_counter import init_token_counters, add_usage
-from module.gpt_timing import messe_gpt_aktion
+from module.llm_gateway import chat_completion
 
 
 def generiere_koerperbefund(client, diagnose_szenario, diagnose_features, koerper_befund_tip):
@@ -38,28 +37,17 @@ Gib ausschließlich körperliche Untersuchungsbefunde an – keine Bildgebung, L
 Formuliere neutral, präzise und sachlich – so, wie es in einem klinischen Untersuchungsprotokoll stehen würde.
 """
 
-    # Vor dem API-Aufruf initialisieren wir die Token-Zähler, damit auch bei parallelen Aufrufen
-    # keine leeren Strukturen entstehen und die Summen konsistent bleiben.
-    init_token_counters()
     # Für strukturierte, medizinische Befundtexte ist ein ausgewogenes Modell
-    # mit guter fachlicher Präzision sinnvoll, ohne unnötig hohe Kosten zu erzeugen.
-    response = messe_gpt_aktion(
-        lambda: client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5,
-        ),
+    # mit guter fachlicher Präzision sinnvoll, ohne unnötig hohe Kosten zu erzeugen
+    # (Profil "koerperbefund"). Zeitmessung und Tokenverbrauch verbucht das Gateway
+    # fortlaufend in den Sitzungssummen. Für Detailanalysen können bei Bedarf
+    # ergänzende Debug-Ausgaben aktiviert werden.
+    response = chat_completion(
+        "koerperbefund",
+        [{"role": "user", "content": prompt}],
+        client=client,
         kontext="Körperbefund",
     )
-    # Damit der Tokenverbrauch jederzeit nachvollziehbar bleibt, addieren wir ihn direkt.
-    # Auch hier gilt: "total_tokens" beschreibt nur diesen einen Call; durch das fortlaufende
-    # Aufsummieren halten wir eine gesamt Sitzungssumme bereit. Für Detailanalysen können bei
-    # Bedarf ergänzende Debug-Ausgaben aktiviert werden.
-    add_usage(
-        prompt_tokens=response.usage.prompt_tokens,
-        completion_tokens=response.usage.completion_tokens,
-        total_tokens=response.usage.total_tokens,
-    )
     return response.choices[0].message.content.strip()
 
 
@@ -102,20 +90,12 @@ Wiederhole keine Befunde aus dem bestehenden Untersuchungsblock.
 Gib ausschließlich neue körperliche Untersuchungsbefunde an. Keine Diagnosen, kein Ausblick.
 """
 
-    init_token_counters()
     # Auch hier genügt ein ausgewogenes Modell, da der Fokus auf klaren,
-    # stichpunktartigen Befunden liegt.
-    response = messe_gpt_aktion(
-        lambda: client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.4,
-        ),
+    # stichpunktartigen Befunden liegt (Profil "sonderuntersuchung").
+    response = chat_completion(
+        "sonderuntersuchung",
+        [{"role": "user", "content": prompt}],
+        client=client,
         kontext="Sonderuntersuchung",
     )
-    add_usage(
-        prompt_tokens=response.usage.prompt_tokens,
-        completion_tokens=response.usage.completion_tokens,
-        total_tokens=response.usage.total_tokens,
-    )
     return response.choices[0].message.content.strip()
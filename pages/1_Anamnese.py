@@ -1,6 +1,5 @@
 import streamlit as st
-from openai import OpenAI, RateLimitError
-import os
+from openai import RateLimitError
 from datetime import datetime
 from module.sidebar import show_sidebar
 from module.navigation import redirect_to_start_page, render_next_page_link
@@ -12,8 +11,9 @@ from module.offline import (
 )
 from module.loading_indicator import task_spinner
 from module.supabase_content import SupabaseContentError
-from module.token_counter import init_token_counters, add_usage
-from module.gpt_timing import messe_gpt_aktion
+from module.openai_client import get_openai_client
+from module.llm_gateway import chat_stream
+from module.anamnese_verlauf import baue_kompakten_verlauf
 
 copyright_footer()
 show_sidebar()
@@ -23,9 +23,9 @@ display_offline_banner()
 if "SYSTEM_PROMPT" not in st.session_state or "patient_name" not in st.session_state:
     redirect_to_start_page("⚠️ Der Fall ist noch nicht geladen. Bitte beginne über die Startseite.")
 
-# OpenAI-Client initialisieren (nur wenn nicht bereits vorhanden)
+# OpenAI-Client hinterlegen (prozessweit geteilte Instanz, nur wenn nicht bereits vorhanden)
 if "openai_client" not in st.session_state:
-    st.session_state["openai_client"] = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    st.session_state["openai_client"] = get_openai_client()
 
 client = st.session_state["openai_client"]
 
@@ -67,6 +67,17 @@ if submit_button and user_input:
         reply = get_offline_patient_reply(st.session_state.get("patient_name", ""))
         st.session_state.messages.append({"role": "assistant", "content": reply})
     else:
+        # Frage und (gestreamte) Antwort erscheinen sofort unter dem Verlauf,
+        # damit Studierende nicht bis zum Ende der Generierung warten müssen.
+        # Nach ``st.rerun()`` übernimmt wieder die reguläre Verlaufsanzeige oben.
+        st.markdown(f"**Du:** {user_input}")
+        antwort_platzhalter = st.empty()
+
+        def _zeige_teilantwort(_fragment: str, bisher: str) -> None:
+            antwort_platzhalter.markdown(
+                f"**{st.session_state.patient_name}:** {bisher}▌"
+            )
+
         ladeaufgaben = [
             "Übermittle Frage an das Sprachmodell",
             "Warte auf Antwortgenerierung",
@@ -75,32 +86,26 @@ if submit_button and user_input:
         with task_spinner(f"{st.session_state.patient_name} antwortet...", ladeaufgaben) as indikator:
             try:
                 indikator.advance(1)
-                # Vor jedem API-Kontakt stellen wir sicher, dass die Zähler existieren,
-                # damit mehrere Chatsitzungen sauber kumuliert werden können.
-                init_token_counters()
+                # Lange Gespräche werden kompakt übermittelt: System-Prompt und die
+                # letzten Runden wörtlich, ältere Runden als laufende Zusammenfassung.
+                # Der vollständige Verlauf bleibt in ``st.session_state.messages``.
+                anfrage_nachrichten = baue_kompakten_verlauf(client, st.session_state.messages)
                 # Für patientennahe, dialogische Antworten ist ein kleines,
                 # natürlich klingendes Modell ausreichend und hält die Kosten
-                # bei vielen Gesprächsrunden niedrig.
-                response = messe_gpt_aktion(
-                    lambda: client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=st.session_state.messages,
-                        temperature=0.6,
-                    ),
+                # bei vielen Gesprächsrunden niedrig (Profil "anamnese_chat"). Die
+                # Antwort wird gestreamt; Gesamtdauer, Time-to-first-Token und
+                # Token-Summen verbucht das Gateway. Für Debugging kann hier bei
+                # Bedarf ein st.write(ergebnis) aktiviert werden.
+                ergebnis = chat_stream(
+                    "anamnese_chat",
+                    anfrage_nachrichten,
+                    on_text=_zeige_teilantwort,
+                    client=client,
                     kontext="Anamnese-Chat",
                 )
-                # Die zurückgelieferten Token-Werte werden unmittelbar in die Session-Summen
-                # übernommen. "total_tokens" enthält zwar bereits die Summe des aktuellen Calls,
-                # dennoch addieren wir explizit, um über mehrere Gesprächsrunden hinweg eine
-                # kumulierte Statistik führen zu können. Für Debugging kann hier bei Bedarf ein
-                # st.write(...) aktiviert werden.
-                add_usage(
-                    prompt_tokens=response.usage.prompt_tokens,
-                    completion_tokens=response.usage.completion_tokens,
-                    total_tokens=response.usage.total_tokens,
-                )
                 indikator.advance(1)
-                reply = response.choices[0].message.content
+                reply = ergebnis.text
+                antwort_platzhalter.markdown(f"**{st.session_state.patient_name}:** {reply}")
                 st.session_state.messages.append({"role": "assistant", "content": reply})
                 indikator.advance(1)
             except RateLimitError:
@@ -1,4 +1,4 @@
-from datetime import timezone
+from datetime import datetime, timezone
 
 import streamlit as st
 
@@ -15,6 +15,8 @@ from module.footer import copyright_footer
 from module.offline import display_offline_banner, is_offline
 from module.fallverwaltung import (
     fallauswahl_prompt,
+    get_amboss_refresh_status,
+    get_amboss_speicherprobleme,
     get_verhaltensoptionen,
     lade_fallbeispiele,
     prepare_fall_session_state,
@@ -25,21 +27,34 @@ from module.fall_config import (
     AMBOSS_FETCH_ALWAYS,
     AMBOSS_FETCH_IF_EMPTY,
     AMBOSS_FETCH_RANDOM,
+    DETAIL_CACHE_AUS,
+    DETAIL_CACHE_KONTEXT,
+    FEEDBACK_ENGINE_EINZELPROMPT,
+    FEEDBACK_ENGINE_PIPELINE,
     clear_feedback_mode_fix,
     clear_fixed_behavior,
     clear_fixed_scenario,
     get_all_persisted_parameters,
     get_amboss_fetch_preferences,
+    get_amboss_refresh_im_hintergrund,
     get_behavior_fix_state,
+    get_detail_cache_policy,
+    get_detail_prefetch_enabled,
     get_fall_fix_state,
+    get_feedback_engine,
     get_feedback_mode_fix_info,
     set_amboss_fetch_mode,
     set_amboss_random_probability,
+    set_amboss_refresh_im_hintergrund,
+    set_detail_cache_policy,
+    set_detail_prefetch_enabled,
+    set_feedback_engine,
     set_feedback_mode_fix,
     set_fixed_behavior,
     set_fixed_scenario,
 )
 from module.mcp_client import get_amboss_configuration_status
+from module.amboss_cache import get_amboss_cache_status, leere_amboss_cache
 from module.amboss_render import render_markdown_for_display
 from module.feedback_mode import (
     FEEDBACK_MODE_AMBOSS_CHATGPT,
@@ -50,6 +65,15 @@ from module.feedback_mode import (
 )
 from module.amboss_preprocessing import get_cached_summary
 from module.loading_indicator import task_spinner
+from module.rate_limiter import get_rate_limiter_status
+from module.openai_client import get_openai_verbindungsstatus
+from module.hintergrund_pool import get_hintergrund_status
+from module.gpt_timing import get_prozess_latenzen
+from module.supabase_client import get_supabase_metriken
+from module.supabase_writer import get_schreibwarteschlangen_status
+from module.detail_prefetch import get_vorabruf_status
+from module.feedback_detail import get_detail_cache_statistik
+from module.feedback_benchmark import fuehre_engine_benchmark_aus, werte_benchmark_aus
 
 
 copyright_footer()
@@ -151,6 +175,31 @@ else:
         "📘 Status AMBOSS-Zusammenfassung: Noch keine Aktion durchgeführt (z. B. weil kein Fall geladen wurde)."
     )
 
+# Der Status oben heißt bei "eingereiht" nur, dass die Sicherung in der
+# Schreibwarteschlange liegt. Ob sie Supabase erreicht hat, meldet erst die
+# Warteschlange selbst (verworfen = endgültiger Fehler, ohne_treffer = Fall-ID
+# unbekannt).
+# Debug-Hinweis: ``st.write(get_amboss_speicherprobleme())`` zeigt die Rohdaten.
+amboss_speicherprobleme = get_amboss_speicherprobleme()
+if amboss_speicherprobleme:
+    st.warning(
+        "⚠️ {anzahl} AMBOSS-Sicherung(en) seit Prozessstart nicht in Supabase gespeichert."
+        " Endgültig verworfene Aufträge stehen zusätzlich in `<Spool-Datei>.fehler.jsonl`.".format(
+            anzahl=len(amboss_speicherprobleme)
+        )
+    )
+    st.table(
+        [
+            {
+                "Fall-ID": problem["filter"].get("id"),
+                "Grund": "Fall-ID unbekannt" if problem["grund"] == "ohne_treffer" else "verworfen",
+                "Fehler": problem["fehler"] or "–",
+                "Zeitpunkt": datetime.fromtimestamp(problem["zeitpunkt"]).strftime("%H:%M:%S"),
+            }
+            for problem in reversed(amboss_speicherprobleme)
+        ]
+    )
+
 # Wenn lediglich ein fragmentarisches Ergebnis vorliegt, wird dieses klar
 # gekennzeichnet. Administrator*innen sehen zusätzlich das konservierte
 # Teilfragment, um bei Bedarf eigenständig zu prüfen, ob daraus weiterer
@@ -208,6 +257,192 @@ else:
                 st.markdown(f"**{fix_key}**")
                 st.json(details)
 
+# Der Ratenbegrenzer ist prozessweit aktiv, die Werte gelten also für alle
+# laufenden Sitzungen. Steigende Wartezeiten in der Spur "interaktiv" deuten
+# darauf hin, dass die Budgets (OPENAI_LIMIT_RPM/OPENAI_LIMIT_TPM) zu knapp
+# gewählt sind. Für Debugging kann ``st.write(limiter_status)`` aktiviert werden.
+limiter_status = get_rate_limiter_status()
+with st.expander("🚦 OpenAI-Ratenbegrenzung (alle Sitzungen)"):
+    st.caption(
+        "Budget: {rpm} Anfragen/min, {tpm} Tokens/min – aktuell verfügbar: "
+        "{rpm_frei} Anfragen, {tpm_frei} Tokens.".format(
+            rpm=limiter_status["rpm_budget"],
+            tpm=limiter_status["tpm_budget"],
+            rpm_frei=limiter_status["rpm_verfuegbar"],
+            tpm_frei=limiter_status["tpm_verfuegbar"],
+        )
+    )
+    if limiter_status["pausiert_sek"]:
+        st.warning(
+            f"Die API hat ein Limit gemeldet – alle Spuren pausieren noch {limiter_status['pausiert_sek']} s."
+        )
+    st.table(
+        [
+            {
+                "Spur": spur,
+                "Wartend": werte["wartend"],
+                "Bedient": werte["bedient"],
+                "Ø Wartezeit (s)": round(werte["wartezeit_mittel_sek"], 2),
+                "p95 Wartezeit (s)": round(werte["wartezeit_p95_sek"], 2),
+                "Max. Wartezeit (s)": round(werte["wartezeit_max_sek"], 2),
+            }
+            for spur, werte in limiter_status["spuren"].items()
+        ]
+    )
+    # HTTP/2 setzt das Paket ``h2`` voraus (``httpx[http2]`` in requirements.txt).
+    # Für Debugging kann ``st.write(verbindung_status)`` aktiviert werden.
+    verbindung_status = get_openai_verbindungsstatus()
+    if not verbindung_status["http2_verfuegbar"]:
+        st.warning("Das Paket `h2` fehlt – der OpenAI-Client verwendet nur HTTP/1.1.")
+    protokolle = ", ".join(
+        f"{protokoll}: {anzahl}" for protokoll, anzahl in sorted(verbindung_status["protokolle"].items())
+    )
+    st.caption(
+        "Ausgehandeltes Protokoll: {letztes} (Antworten seit Prozessstart: {protokolle}).".format(
+            letztes=verbindung_status["letztes_protokoll"] or "noch keine Anfrage",
+            protokolle=protokolle or "–",
+        )
+    )
+
+
+def _runde_sek(wert):
+    return round(wert, 2) if wert is not None else "–"
+
+
+# Gemeinsamer Hintergrund-Pool für Pipeline, spekulatives Abschlussfeedback und
+# Detail-Vorabruf. Dauerhaft wartende Aufträge bei voll ausgelasteten Workern
+# deuten darauf hin, dass HINTERGRUND_WORKER zu knapp gewählt ist. Für
+# Debugging kann ``st.write(hintergrund_status)`` aktiviert werden.
+hintergrund_status = get_hintergrund_status()
+with st.expander("🧵 Hintergrund-Pool (alle Sitzungen)"):
+    st.caption(
+        "{aktiv} von {max_worker} Workern aktiv ({threads} gestartet); {wartend} Aufträge von "
+        "{absender} Sitzungen warten ({spuren}).".format(
+            aktiv=hintergrund_status["aktiv"],
+            max_worker=hintergrund_status["max_worker"],
+            threads=hintergrund_status["threads"],
+            wartend=hintergrund_status["wartend"],
+            absender=hintergrund_status["absender_wartend"],
+            spuren=", ".join(
+                f"{spur}: {anzahl}" for spur, anzahl in hintergrund_status["wartend_je_spur"].items()
+            ),
+        )
+    )
+    if not hintergrund_status["arten"]:
+        st.info("Seit dem Start dieses Prozesses wurden noch keine Hintergrundaufträge eingereiht.")
+    else:
+        st.table(
+            [
+                {
+                    "Auftragsart": art,
+                    "Eingereicht": werte["eingereicht"],
+                    "Erledigt": werte["erledigt"],
+                    "Fehler": werte["fehler"],
+                    "Abgebrochen": werte["abgebrochen"],
+                    "Wartezeit p50/p95 (s)": (
+                        f"{_runde_sek(werte['wartezeit_p50_sek'])} / {_runde_sek(werte['wartezeit_p95_sek'])}"
+                    ),
+                    "Laufzeit p50/p95 (s)": (
+                        f"{_runde_sek(werte['laufzeit_p50_sek'])} / {_runde_sek(werte['laufzeit_p95_sek'])}"
+                    ),
+                }
+                for art, werte in hintergrund_status["arten"].items()
+            ]
+        )
+
+# Latenzen je Kontext über alle Sitzungen dieses Prozesses (rollierend die
+# letzten Messungen je Kontext). Für Debugging kann
+# ``st.write(prozess_latenzen)`` aktiviert werden.
+prozess_latenzen = get_prozess_latenzen()
+
+with st.expander("⏱️ GPT-Latenzen je Kontext (alle Sitzungen)"):
+    st.caption(
+        "Die Cache-Quote ist der Anteil der Prompt-Tokens, die der Anbieter aus "
+        "seinem Prompt-Cache bedient hat (erst ab ca. 1.024 identischen Präfix-Tokens)."
+    )
+    if not prozess_latenzen:
+        st.info("Seit dem Start dieses Prozesses wurden noch keine GPT-Aufrufe gemessen.")
+    else:
+        st.table(
+            [
+                {
+                    "Kontext": kontext,
+                    "Anzahl": werte["anzahl"],
+                    "Fehler": werte["fehler"],
+                    "p50 (s)": _runde_sek(werte["p50_sek"]),
+                    "p95 (s)": _runde_sek(werte["p95_sek"]),
+                    "p99 (s)": _runde_sek(werte["p99_sek"]),
+                    "TTFT p50 (s)": _runde_sek(werte["ttft_p50_sek"]),
+                    "Cache-Quote": (
+                        f"{werte['cache_trefferquote']:.0%}"
+                        if werte["cache_trefferquote"] is not None
+                        else "–"
+                    ),
+                    "p50 mit/ohne Cache (s)": (
+                        f"{_runde_sek(werte['p50_mit_cache_sek'])} / "
+                        f"{_runde_sek(werte['p50_ohne_cache_sek'])}"
+                    ),
+                    "Modelle": ", ".join(werte["modelle"]),
+                }
+                for kontext, werte in sorted(prozess_latenzen.items())
+            ]
+        )
+
+# Supabase-Anfragen des geteilten Clients. Ein Seitenaufruf gilt ab
+# ``show_sidebar`` bis zum nächsten Seitenaufruf derselben Sitzung. Für
+# Debugging kann ``st.write(supabase_metriken)`` aktiviert werden.
+supabase_metriken = get_supabase_metriken()
+with st.expander("🗃️ Supabase-Anfragen (alle Sitzungen)"):
+    st.caption(
+        "{gesamt} Anfragen seit Prozessstart; je Seitenaufruf im Mittel {mittel:.1f}, "
+        "p95 {p95}, maximal {maximum} (über {aufrufe} Seitenaufrufe).".format(
+            gesamt=supabase_metriken["anfragen_gesamt"],
+            mittel=supabase_metriken["je_seitenaufruf_mittel"],
+            p95=supabase_metriken["je_seitenaufruf_p95"],
+            maximum=supabase_metriken["je_seitenaufruf_max"],
+            aufrufe=supabase_metriken["seitenaufrufe"],
+        )
+    )
+    letzter = supabase_metriken["letzter_seitenaufruf"]
+    if letzter:
+        st.markdown(
+            f"Vorheriger Seitenaufruf dieser Sitzung: **{letzter['anfragen']}** Anfragen "
+            f"({', '.join(f'{t}: {n}' for t, n in sorted(letzter['tabellen'].items())) or 'keine'})."
+        )
+    if supabase_metriken["anfragen_je_tabelle"]:
+        st.table(
+            [
+                {"Tabelle": tabelle, "Anfragen": anzahl}
+                for tabelle, anzahl in sorted(
+                    supabase_metriken["anfragen_je_tabelle"].items(),
+                    key=lambda eintrag: eintrag[1],
+                    reverse=True,
+                )
+            ]
+        )
+
+    # Write-behind-Warteschlange (``module/supabase_writer.py``): offene
+    # Aufträge liegen zusätzlich in der Spool-Datei und überstehen Neustarts.
+    schreib_status = get_schreibwarteschlangen_status()
+    st.markdown(
+        "**Hintergrund-Schreibvorgänge:** {ausstehend} offen (ältester {alter} s), "
+        "{geschrieben} geschrieben in {anfragen} Anfragen, {wiederholungen} Wiederholungen, "
+        "{verworfen} verworfen, {ohne_treffer} Updates ohne Treffer.".format(
+            ausstehend=schreib_status["ausstehend"],
+            alter=schreib_status["aeltester_auftrag_sek"],
+            geschrieben=schreib_status["geschrieben"],
+            anfragen=schreib_status["anfragen"],
+            wiederholungen=schreib_status["wiederholungen"],
+            verworfen=schreib_status["verworfen"],
+            ohne_treffer=schreib_status["ohne_treffer"],
+        )
+    )
+    st.caption(f"Spool-Datei: `{schreib_status['spool_datei']}`")
+    if schreib_status["spool_fehler"]:
+        st.warning(schreib_status["spool_fehler"])
+    if schreib_status["letzter_fehler"]:
+        st.caption(f"Letzter Schreibfehler: {schreib_status['letzter_fehler']}")
+
 st.subheader("Verbindungsmodus")
 current_offline = is_offline()
 offline_toggle = st.toggle(
@@ -298,6 +533,40 @@ if persisted_active:
 else:
     st.caption("Keine persistente ChatGPT+AMBOSS-Voreinstellung aktiv.")
 
+st.subheader("Feedback-Engine")
+st.write(
+    "Das Abschlussfeedback entsteht entweder in einem gemeinsamen Prompt oder abschnittsweise in"
+    " parallelen Aufrufen. Beide liefern dieselben nummerierten Unterpunkte."
+)
+_FEEDBACK_ENGINE_OPTIONEN = {
+    FEEDBACK_ENGINE_EINZELPROMPT: "Einzelprompt (Standard, gestreamt)",
+    FEEDBACK_ENGINE_PIPELINE: "Parallele Pipeline – ein Aufruf je Unterpunkt",
+}
+try:
+    feedback_engine = get_feedback_engine()
+except RuntimeError as exc:
+    st.warning(f"Einstellung konnte nicht geladen werden: {exc}")
+    feedback_engine = FEEDBACK_ENGINE_EINZELPROMPT
+feedback_engine_auswahl = st.radio(
+    "Engine für künftige Feedbacks",
+    options=list(_FEEDBACK_ENGINE_OPTIONEN),
+    index=list(_FEEDBACK_ENGINE_OPTIONEN).index(feedback_engine),
+    format_func=_FEEDBACK_ENGINE_OPTIONEN.get,
+    key="admin_feedback_engine",
+    help=(
+        "Die Pipeline nutzt je Unterpunkt das Modell aus module/feedback_tasks.py (bzw. das Profil"
+        " „feedback_abschnitt“) und fällt bei Fehlern auf den Einzelprompt zurück. Ein Vorabstart"
+        " auf Seite 5 findet nur beim Einzelprompt statt."
+    ),
+)
+if feedback_engine_auswahl != feedback_engine:
+    try:
+        set_feedback_engine(feedback_engine_auswahl)
+    except (RuntimeError, ValueError) as exc:
+        st.error(f"Speichern fehlgeschlagen: {exc}")
+    else:
+        st.success(f"Persistente Einstellung: {_FEEDBACK_ENGINE_OPTIONEN[feedback_engine_auswahl]}.")
+
 st.subheader("AMBOSS-Abrufsteuerung")
 st.write(
     "Lege fest, ob der AMBOSS-MCP bei jedem Fall neu kontaktiert wird oder ob die"
@@ -372,6 +641,191 @@ else:
         )
     )
 
+try:
+    amboss_refresh_hintergrund = get_amboss_refresh_im_hintergrund()
+except RuntimeError as exc:
+    st.warning(f"Einstellung konnte nicht geladen werden: {exc}")
+    amboss_refresh_hintergrund = True
+amboss_refresh_toggle = st.toggle(
+    "Refresh im Hintergrund (gespeicherten Text sofort nutzen)",
+    value=amboss_refresh_hintergrund,
+    key="admin_amboss_refresh_hintergrund",
+    help=(
+        "Ist ein Refresh fällig und liegt bereits ein Text vor, startet die Sitzung ohne Wartezeit mit dem"
+        " gespeicherten Text; MCP-Abruf und Zusammenfassung laufen im Hintergrund für künftige Sitzungen."
+        " Ausgeschaltet wird wie bisher im Vordergrund aktualisiert."
+    ),
+)
+if amboss_refresh_toggle != amboss_refresh_hintergrund:
+    try:
+        set_amboss_refresh_im_hintergrund(amboss_refresh_toggle)
+    except RuntimeError as exc:
+        st.error(f"Speichern fehlgeschlagen: {exc}")
+    else:
+        st.success(
+            "Persistente Einstellung: Hintergrund-Refresh ist {status}.".format(
+                status="aktiv" if amboss_refresh_toggle else "deaktiviert"
+            )
+        )
+
+# Debug-Hinweis: ``st.write(get_amboss_refresh_status())`` zeigt die Rohdaten.
+amboss_refresh_status = get_amboss_refresh_status()
+with st.expander("🔄 AMBOSS-Refreshes im Hintergrund (dieser Prozess)"):
+    st.caption(
+        "Ausstehend: {anzahl} Fall/Fälle{ids}.".format(
+            anzahl=len(amboss_refresh_status["laufend"]),
+            ids=(" (IDs " + ", ".join(str(i) for i in amboss_refresh_status["laufend"]) + ")")
+            if amboss_refresh_status["laufend"]
+            else "",
+        )
+    )
+    if amboss_refresh_status["letzte"]:
+        st.table(
+            [
+                {
+                    "Fall-ID": ergebnis.fall_id,
+                    "Szenario": ergebnis.szenario,
+                    "Status": ergebnis.status,
+                    "Dauer (s)": round(ergebnis.dauer_sek, 1),
+                    "Hinweis": ergebnis.hinweis,
+                }
+                for ergebnis in amboss_refresh_status["letzte"]
+            ]
+        )
+    else:
+        st.caption("Seit Prozessstart wurde noch kein Refresh abgeschlossen.")
+
+# Debug-Hinweis: ``st.write(get_amboss_cache_status())`` zeigt alle Zähler samt Pfad.
+amboss_cache_status = get_amboss_cache_status()
+with st.expander("🗄️ AMBOSS-Antwortcache (Festplatte, alle Prozesse)"):
+    st.caption(
+        "Seit Prozessstart: {treffer} Treffer, {fehlschlaege} Fehlschläge ({quote:.0%} Trefferquote), "
+        "{abgelaufen} abgelaufen, {geschrieben} geschrieben, {verdraengt} verdrängt, {fehler} Fehler.".format(
+            treffer=amboss_cache_status["treffer"],
+            fehlschlaege=amboss_cache_status["fehlschlaege"],
+            quote=amboss_cache_status["trefferquote"],
+            abgelaufen=amboss_cache_status["abgelaufen"],
+            geschrieben=amboss_cache_status["geschrieben"],
+            verdraengt=amboss_cache_status["verdraengt"],
+            fehler=amboss_cache_status["fehler"],
+        )
+    )
+    if amboss_cache_status["eintraege"] is None:
+        st.caption(f"Cache-Datei nicht lesbar: {amboss_cache_status['pfad']}")
+    else:
+        st.caption(
+            "Datei {pfad}: {eintraege} Einträge, {belegt:.1f} von {maximal:.0f} MB; Gültigkeit {ttl:.1f} Tage.".format(
+                pfad=amboss_cache_status["pfad"],
+                eintraege=amboss_cache_status["eintraege"],
+                belegt=amboss_cache_status["bytes"] / (1024 * 1024),
+                maximal=amboss_cache_status["max_bytes"] / (1024 * 1024),
+                ttl=amboss_cache_status["ttl_sek"] / 86400,
+            )
+        )
+    if st.button("AMBOSS-Cache leeren", key="admin_amboss_cache_leeren"):
+        try:
+            geloescht = leere_amboss_cache()
+        except RuntimeError as exc:
+            st.error(str(exc))
+        else:
+            st.success(f"{geloescht} Einträge gelöscht.")
+
+st.subheader("Detail-Vorabruf")
+st.write(
+    "Erzeugt die Detailtexte aller Feedback-Unterpunkte direkt nach dem kompakten Feedback"
+    " im Hintergrund, sodass „Mehr Details“ ohne Wartezeit öffnet. Kostet zusätzliche Tokens"
+    " auch für Unterpunkte, die nie geöffnet werden."
+)
+try:
+    detail_prefetch_aktiv = get_detail_prefetch_enabled()
+except RuntimeError as exc:
+    st.warning(f"Einstellung konnte nicht geladen werden: {exc}")
+    detail_prefetch_aktiv = False
+detail_prefetch_toggle = st.toggle(
+    "Detailtexte vorab erzeugen",
+    value=detail_prefetch_aktiv,
+    key="admin_detail_prefetch",
+    help="Die Einstellung wirkt dauerhaft für alle neuen Feedbacks.",
+)
+if detail_prefetch_toggle != detail_prefetch_aktiv:
+    try:
+        set_detail_prefetch_enabled(detail_prefetch_toggle)
+    except RuntimeError as exc:
+        st.error(f"Speichern fehlgeschlagen: {exc}")
+    else:
+        st.success(
+            "Persistente Einstellung: Vorabruf ist {status}.".format(
+                status="aktiv" if detail_prefetch_toggle else "deaktiviert"
+            )
+        )
+
+# Nutzen des Vorabrufs: Anteil der vorab bereitgestellten Texte, die auch
+# geöffnet wurden. Debug-Hinweis: ``st.write(vorabruf_status)`` zeigt alle Zähler.
+vorabruf_status = get_vorabruf_status()
+st.caption(
+    "Seit Prozessstart: {erzeugt} erzeugt, {aus_cache} aus dem Cache übernommen, "
+    "{geoeffnet} davon geöffnet ({quote:.0%}); {fehler} Fehler, {abgebrochen} abgebrochen; "
+    "{prompt} Prompt- und {completion} Completion-Tokens; gemeinsamer Hintergrund-Pool mit {worker} Workern.".format(
+        erzeugt=vorabruf_status["erzeugt"],
+        aus_cache=vorabruf_status["aus_cache"],
+        geoeffnet=vorabruf_status["geoeffnet"],
+        quote=vorabruf_status["nutzungsquote"],
+        fehler=vorabruf_status["fehler"],
+        abgebrochen=vorabruf_status["abgebrochen"],
+        prompt=vorabruf_status["prompt_tokens"],
+        completion=vorabruf_status["completion_tokens"],
+        worker=vorabruf_status["worker"],
+    )
+)
+
+st.subheader("Geteilter Detail-Cache")
+st.write(
+    "Ist die geteilte Ebene aktiv, entstehen Detailtexte ohne Daten der Studierenden (keine Kernaussage,"
+    " keine Eingaben, keine Befunde) aus Szenario, Unterpunkt, Feedback-Modus und AMBOSS-Zusammenfassung."
+    " Alle Feedbacks desselben Szenarios nutzen dann denselben Text. Ausgeschaltet bezieht sich jeder"
+    " Detailtext auf das kompakte Feedback und wird nur je Feedback zwischengespeichert."
+)
+_DETAIL_CACHE_OPTIONEN = {
+    DETAIL_CACHE_AUS: "Aus – nur Cache je Feedback",
+    DETAIL_CACHE_KONTEXT: "Szenario – nicht personalisierte Texte über Feedbacks hinweg teilen",
+}
+try:
+    detail_cache_policy = get_detail_cache_policy()
+except RuntimeError as exc:
+    st.warning(f"Einstellung konnte nicht geladen werden: {exc}")
+    detail_cache_policy = DETAIL_CACHE_KONTEXT
+detail_cache_auswahl = st.radio(
+    "Wiederverwendung",
+    options=list(_DETAIL_CACHE_OPTIONEN),
+    index=list(_DETAIL_CACHE_OPTIONEN).index(detail_cache_policy),
+    format_func=_DETAIL_CACHE_OPTIONEN.get,
+    key="admin_detail_cache_policy",
+)
+if detail_cache_auswahl != detail_cache_policy:
+    try:
+        set_detail_cache_policy(detail_cache_auswahl)
+    except (RuntimeError, ValueError) as exc:
+        st.error(f"Speichern fehlgeschlagen: {exc}")
+    else:
+        st.success(f"Persistente Einstellung: {_DETAIL_CACHE_OPTIONEN[detail_cache_auswahl]}.")
+
+# Debug-Hinweis: ``st.write(get_detail_cache_statistik())`` zeigt alle Zähler.
+detail_cache_statistik = get_detail_cache_statistik()
+st.caption(
+    "Seit Prozessstart {gesamt} Unterpunkte geöffnet: {laufzeit} aus der Sitzung, {vorabruf} aus dem Vorabruf, "
+    "{feedback} aus dem Cache je Feedback, {geteilt} aus dem geteilten Cache, {neu} neu erzeugt. "
+    "Trefferquote gesamt {quote:.0%}, geteilte Ebene {geteilt_quote:.0%}.".format(
+        gesamt=detail_cache_statistik["gesamt"],
+        laufzeit=detail_cache_statistik["laufzeit"],
+        vorabruf=detail_cache_statistik["vorabruf"],
+        feedback=detail_cache_statistik["feedback"],
+        geteilt=detail_cache_statistik["geteilt"],
+        neu=detail_cache_statistik["neu"],
+        quote=detail_cache_statistik["trefferquote"],
+        geteilt_quote=detail_cache_statistik["geteilt_quote"],
+    )
+)
+
 st.subheader("Adminmodus")
 st.write("Der Adminmodus ist aktiv. Bei Bedarf kannst du ihn hier wieder deaktivieren.")
 
@@ -933,3 +1387,83 @@ if fall:
                 st.success(
                     "Alle Durchläufe wurden abgeschlossen und mit gemeinsamer Laufnummer in Supabase gespeichert."
                 )
+
+st.subheader("Feedback-Engines im Vergleich")
+st.write(
+    "Erzeugt für gespeicherte Fälle aus 'feedback_gpt' mehrfach ein Feedback mit beiden Engines und"
+    " vergleicht Latenz, Tokenkosten, Formatkompatibilität und die Streuung der Unterpunkte."
+    " Die Ergebnisse werden nicht gespeichert."
+)
+with st.expander("📊 Benchmark starten"):
+    benchmark_ids_text = st.text_input(
+        "IDs aus 'feedback_gpt' (kommagetrennt)",
+        key="admin_benchmark_ids",
+    )
+    benchmark_wiederholungen = st.slider(
+        "Wiederholungen je Fall und Engine",
+        min_value=1,
+        max_value=10,
+        value=3,
+        key="admin_benchmark_wiederholungen",
+        help="Für die Abschnittsvarianz werden mindestens zwei Wiederholungen benötigt.",
+    )
+    benchmark_amboss = st.checkbox(
+        "ChatGPT+AMBOSS-Modus nutzen", value=False, key="admin_benchmark_amboss"
+    )
+    if st.button("Benchmark ausführen", key="admin_benchmark_start"):
+        try:
+            benchmark_ids = [int(teil) for teil in benchmark_ids_text.replace(";", ",").split(",") if teil.strip()]
+        except ValueError:
+            st.error("Bitte nur ganzzahlige IDs angeben.")
+            benchmark_ids = []
+        if benchmark_ids:
+            fortschritt_balken = st.progress(0.0)
+            try:
+                benchmark_laeufe = fuehre_engine_benchmark_aus(
+                    benchmark_ids,
+                    benchmark_wiederholungen,
+                    modus=FEEDBACK_MODE_AMBOSS_CHATGPT if benchmark_amboss else FEEDBACK_MODE_CHATGPT,
+                    fortschritt=lambda erledigt, gesamt: fortschritt_balken.progress(erledigt / max(1, gesamt)),
+                )
+            except FeedbackVariationError as exc:
+                st.error(str(exc))
+            else:
+                st.session_state["admin_benchmark_laeufe"] = benchmark_laeufe
+
+    benchmark_laeufe = st.session_state.get("admin_benchmark_laeufe")
+    if benchmark_laeufe:
+        # Debug-Hinweis: ``st.write(benchmark_laeufe)`` zeigt alle Einzelläufe samt Abschnittstexten.
+        benchmark_auswertung = werte_benchmark_aus(benchmark_laeufe)
+        st.table(
+            [
+                {
+                    "Engine": a.engine,
+                    "Läufe": a.laeufe,
+                    "Fehler": a.fehler,
+                    "Latenz Ø (s)": a.latenz_mittel_sek,
+                    "p50 (s)": a.latenz_p50_sek,
+                    "p95 (s)": a.latenz_p95_sek,
+                    "Prompt-Tokens Ø": a.prompt_tokens_mittel,
+                    "Completion-Tokens Ø": a.completion_tokens_mittel,
+                    "Kosten Ø (USD)": a.kosten_mittel_usd,
+                    "Format ok": f"{a.formatquote:.0%}",
+                }
+                for a in benchmark_auswertung.values()
+            ]
+        )
+        st.caption("Abschnittsvarianz je Unterpunkt (Std. der Wortanzahl / mittlere Jaccard-Distanz, 0 = identisch):")
+        st.table(
+            [
+                {
+                    "Engine": a.engine,
+                    "Unterpunkt": key,
+                    "Std. Wörter": werte["woerter_std"],
+                    "Jaccard-Distanz": werte["jaccard_distanz"],
+                }
+                for a in benchmark_auswertung.values()
+                for key, werte in sorted(a.abschnittsvarianz.items())
+            ]
+        )
+        unbepreist = sorted({model for lauf in benchmark_laeufe for model in lauf.unbepreist})
+        if unbepreist:
+            st.caption("Ohne Preis (nicht in den Kosten enthalten): " + ", ".join(unbepreist))
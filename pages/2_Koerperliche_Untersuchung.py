@@ -11,6 +11,7 @@ from module.sidebar import show_sidebar
 from module.footer import copyright_footer
 from module.offline import display_offline_banner, is_offline
 from module.loading_indicator import task_spinner
+from module.llm_gateway import chat_completion
 
 copyright_footer()
 show_sidebar()
@@ -188,11 +189,11 @@ WICHTIG: Rein körperliche Untersuchungen (z.B. Blutdruck messen, Puls, Auskulta
 Antworte AUSSCHLIESSLICH mit 'JA', wenn Labor/Bildgebung/Apparative Diagnostik verlangt wird. Antworte mit 'NEIN', wenn es sich um eine rein körperliche Untersuchung handelt.
 Anforderung: {sonder_input.strip()}"""
                         try:
-                            antwort = client.chat.completions.create(
-                                model="gpt-4o-mini",
-                                messages=[{"role": "user", "content": check_prompt}],
-                                temperature=0,
-                                max_tokens=5
+                            antwort = chat_completion(
+                                "untersuchung_intent",
+                                [{"role": "user", "content": check_prompt}],
+                                client=client,
+                                kontext="Untersuchungstyp-Check",
                             )
                             if "JA" in antwort.choices[0].message.content.upper():
                                 is_labor = True
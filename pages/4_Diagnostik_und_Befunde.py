@@ -6,7 +6,7 @@ from diagnostikmodul import diagnostik_und_befunde_routine
 from befundmodul import generiere_befund
 from module.offline import display_offline_banner, is_offline
 from module.loading_indicator import task_spinner
-from module.gpt_timing import messe_gpt_aktion
+from module.llm_gateway import chat_completion
 
 show_sidebar()
 display_offline_banner()
@@ -83,12 +83,10 @@ Kriterien:
 - Wenn Maßnahmen dem Setting deutlich widersprechen, setze is_congruent auf false.
 """
     try:
-        antwort = messe_gpt_aktion(
-            lambda: client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-            ),
+        antwort = chat_completion(
+            "setting_kongruenz",
+            [{"role": "user", "content": prompt}],
+            client=client,
             kontext="Setting-Kongruenz Diagnostik",
         )
         raw_text = (antwort.choices[0].message.content or "").strip()
@@ -4,6 +4,8 @@ from module.navigation import redirect_to_start_page, render_next_page_link
 from sprachmodul import sprach_check
 from module.footer import copyright_footer
 from module.offline import display_offline_banner, is_offline
+from diagnostikmodul import aktualisiere_diagnostik_zusammenfassung
+from feedbackmodul import starte_vorab_feedback
 
 show_sidebar()
 display_offline_banner()
@@ -146,6 +148,18 @@ else:
         st.session_state.diagnose_therapie_edit = False
         if is_offline():
             st.info("🔌 Offline-Modus: Eingaben wurden ohne GPT-Korrektur übernommen.")
+        else:
+            # Abschlussfeedback schon jetzt im Hintergrund starten; die
+            # Feedback-Seite übernimmt das Ergebnis, solange sich die Eingaben
+            # bis dahin nicht mehr ändern (Digest über den vollständigen Prompt).
+            try:
+                aktualisiere_diagnostik_zusammenfassung()
+                starte_vorab_feedback(client)
+            except Exception:
+                # Das Feedback entsteht dann wie bisher auf der Feedback-Seite.
+                # Debug-Hinweis: Für die Ursache temporär ``except Exception as exc``
+                # mit ``st.write(exc)`` verwenden.
+                pass
         st.rerun()
 
 
@@ -10,8 +10,8 @@ import streamlit as st
 from diagnostikmodul import aktualisiere_diagnostik_zusammenfassung
 from feedbackmodul import feedback_erzeugen
 from module.footer import copyright_footer
-from module.gpt_feedback import speichere_gpt_feedback_in_supabase
-from module.feedback_detail import render_feedback_with_details
+from module.gpt_feedback import feedback_speicherung_angestossen, speichere_gpt_feedback_in_supabase
+from module.feedback_detail import FeedbackStreamAnzeige, render_feedback_with_details
 from module.loading_indicator import task_spinner
 from module.navigation import redirect_to_start_page, render_next_page_link
 from module.offline import display_offline_banner, is_offline
@@ -131,6 +131,9 @@ def _generiere_feedback() -> str:
             "Analysiere Antworten der Studierenden",
             "Formuliere individualisiertes Feedback",
         ]
+        # Das Feedback wird gestreamt; fertige Unterpunkte erscheinen sofort.
+        # Nach Abschluss ersetzt die reguläre Darstellung die Streaming-Ansicht.
+        stream_anzeige = FeedbackStreamAnzeige()
         with task_spinner("⏳ Abschluss-Feedback wird erstellt...", ladeaufgaben) as indikator:
             indikator.advance(1)
             feedback = feedback_erzeugen(
@@ -146,12 +149,15 @@ def _generiere_feedback() -> str:
                 diagnose_szenario,
                 therapie_setting_verdacht,
                 therapie_setting_final,
+                on_text=stream_anzeige.aktualisiere,
             )
             indikator.advance(1)
             st.session_state.final_feedback = feedback
             indikator.advance(1)
+        stream_anzeige.schliesse()
     st.session_state["student_evaluation_done"] = False
     st.session_state.pop("feedback_row_id", None)
+    st.session_state.pop("feedback_row_handle", None)
     return feedback
 
 
@@ -160,7 +166,7 @@ def _zeige_feedback(feedback_text: str) -> None:
 
     if is_offline():
         st.info("🔌 Offline-Modus: Feedback wird nicht in Supabase gespeichert.")
-    elif "feedback_row_id" not in st.session_state:
+    elif not feedback_speicherung_angestossen():
         # Sobald das Feedback erstmals angezeigt wird, erfolgt das Persistieren.
         speichere_gpt_feedback_in_supabase()
 
@@ -3,11 +3,11 @@ from feedbackmodul import feedback_erzeugen
 from module.feedback_ui import student_feedback
 from module.sidebar import show_sidebar
 from module.footer import copyright_footer
-from module.gpt_feedback import speichere_gpt_feedback_in_supabase
+from module.gpt_feedback import feedback_speicherung_angestossen, speichere_gpt_feedback_in_supabase
 from diagnostikmodul import aktualisiere_diagnostik_zusammenfassung
 from module.offline import display_offline_banner, is_offline
 from module.amboss_config import sync_chatgpt_amboss_session_state
-from module.feedback_detail import render_feedback_with_details
+from module.feedback_detail import FeedbackStreamAnzeige, render_feedback_with_details
 
 show_sidebar()
 copyright_footer()
@@ -141,6 +141,9 @@ if not feedback_text:
             patient_alter=st.session_state.get("patient_age"),
         )
     else:
+        # Das Feedback wird gestreamt; fertige Unterpunkte erscheinen sofort.
+        # Nach Abschluss ersetzt die reguläre Darstellung die Streaming-Ansicht.
+        stream_anzeige = FeedbackStreamAnzeige()
         if st.session_state.get("is_admin"):
             status_container = st.container()
             status_eintraege = []
@@ -172,6 +175,7 @@ if not feedback_text:
                 amboss_payload=st.session_state.get("amboss_result"),
                 patient_alter=st.session_state.get("patient_age"),
                 status_updater=status_updater,
+                on_text=stream_anzeige.aktualisiere,
             )
             status_updater("Abschlussfeedback erfolgreich erstellt.", "success")
         else:
@@ -191,11 +195,14 @@ if not feedback_text:
                     therapie_setting_final=therapie_setting_final,
                     amboss_payload=st.session_state.get("amboss_result"),
                     patient_alter=st.session_state.get("patient_age"),
+                    on_text=stream_anzeige.aktualisiere,
                 )
+        stream_anzeige.schliesse()
 
     st.session_state.final_feedback = feedback
     st.session_state["student_evaluation_done"] = False
     st.session_state.pop("feedback_row_id", None)
+    st.session_state.pop("feedback_row_handle", None)
     feedback_text = feedback
     st.success("✅ Evaluation erstellt")
     if is_offline():
@@ -204,7 +211,7 @@ if not feedback_text:
 if feedback_text:
     if is_offline():
         st.info("🔌 Offline-Modus: Feedback wird nicht in Supabase gespeichert.")
-    elif "feedback_row_id" not in st.session_state:
+    elif not feedback_speicherung_angestossen():
         speichere_gpt_feedback_in_supabase()
 
     # Die Kernbewertung bleibt kurz; zusätzliche Inhalte werden je Punkt
@@ -1,7 +1,6 @@
 import streamlit as st
-from module.token_counter import init_token_counters, add_usage
 from module.offline import get_offline_sprachcheck, is_offline
-from module.gpt_timing import messe_gpt_aktion
+from module.llm_gateway import chat_completion
 
 def sprach_check(text_input, client):
     if not text_input.strip():
@@ -30,25 +29,18 @@ Text:
 """
 
     try:
-        init_token_counters()
-        # Für reine Sprachkorrektur und Formatierung reicht ein kompaktes Modell.
-        # Dadurch sinken Kosten und Tokenverbrauch, während die Genauigkeit für
-        # orthografische Anpassungen erhalten bleibt.
-        response = messe_gpt_aktion(
-            lambda: client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-            ),
+        # Für reine Sprachkorrektur und Formatierung reicht ein kompaktes Modell
+        # (Profil "sprachcheck"). Dadurch sinken Kosten und Tokenverbrauch, während
+        # die Genauigkeit für orthografische Anpassungen erhalten bleibt. Ohne
+        # übergebenen Client nutzt das Gateway die prozessweit geteilte Instanz.
+        response = chat_completion(
+            "sprachcheck",
+            [{"role": "user", "content": prompt}],
+            client=client,
             kontext="Sprachcheck",
         )
         korrigiert = response.choices[0].message.content.strip()
         # korrigiert = korrigiert.replace("- ", "• ") # zerschiesst das Format.
-        add_usage(
-            prompt_tokens=response.usage.prompt_tokens,
-            completion_tokens=response.usage.completion_tokens,
-            total_tokens=response.usage.total_tokens
-        )
         return korrigiert
 
     except Exception as e: